@@ -0,0 +1,202 @@
+"""
+Admission control and load shedding for the API endpoints.
+
+Endpoints are grouped into gates, each with its own concurrency limit and a
+bounded wait queue. A request that finds its gate full waits in the queue for
+at most ADMISSION_QUEUE_TIMEOUT seconds. A request that finds the queue full,
+or times out waiting, is shed: it gets the last cached response if one
+exists (marked stale), otherwise 429 with a Retry-After estimate.
+
+Gates also have a priority. All gates share ADMISSION_MAX_INFLIGHT slots, but
+a low-priority gate (matching) may only fill part of them, so a burst of
+expensive reads always leaves room for writes. /api/health and the other
+ungated endpoints are never queued.
+"""
+
+import functools
+import math
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from flask import Response, jsonify
+
+# Turn admission control off entirely (every request is admitted at once)
+ADMISSION_ENABLED = os.getenv('ADMISSION_ENABLED', '1') == '1'
+
+# Requests running at once across every gate
+ADMISSION_MAX_INFLIGHT = int(os.getenv('ADMISSION_MAX_INFLIGHT', '32'))
+
+# Longest a request waits in a gate's queue before it is shed
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '5'))
+
+# Per gate: requests running at once, and requests allowed to wait
+ADMISSION_MATCHES_CONCURRENCY = int(os.getenv('ADMISSION_MATCHES_CONCURRENCY', '2'))
+ADMISSION_MATCHES_QUEUE = int(os.getenv('ADMISSION_MATCHES_QUEUE', '8'))
+ADMISSION_READS_CONCURRENCY = int(os.getenv('ADMISSION_READS_CONCURRENCY', '8'))
+ADMISSION_READS_QUEUE = int(os.getenv('ADMISSION_READS_QUEUE', '32'))
+ADMISSION_WRITES_CONCURRENCY = int(os.getenv('ADMISSION_WRITES_CONCURRENCY', '8'))
+ADMISSION_WRITES_QUEUE = int(os.getenv('ADMISSION_WRITES_QUEUE', '64'))
+ADMISSION_EXPORTS_CONCURRENCY = int(os.getenv('ADMISSION_EXPORTS_CONCURRENCY', '1'))
+ADMISSION_EXPORTS_QUEUE = int(os.getenv('ADMISSION_EXPORTS_QUEUE', '2'))
+
+# Priority classes and the share of ADMISSION_MAX_INFLIGHT each may fill
+HIGH, NORMAL, LOW = 'high', 'normal', 'low'
+PRIORITY_SHARES = {HIGH: 1.0, NORMAL: 0.75, LOW: 0.5}
+
+
+class Gate:
+    """Concurrency limit and wait queue for one group of endpoints."""
+
+    # Weight of the newest request in the service-time average
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, concurrency: int, queue: int, priority: str):
+        self.name = name
+        self.concurrency = concurrency
+        self.queue = queue
+        self.priority = priority
+        self.active = 0
+        self.waiting = 0
+        self.service_seconds: Optional[float] = None
+        self.counters = {'admitted': 0, 'queued': 0, 'shed': 0, 'timed_out': 0, 'served_stale': 0}
+
+    def observe(self, seconds: float) -> None:
+        if self.service_seconds is None:
+            self.service_seconds = seconds
+        else:
+            self.service_seconds = (1 - self.EWMA_ALPHA) * self.service_seconds + self.EWMA_ALPHA * seconds
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request has likely drained (1-60)."""
+        per_request = self.service_seconds if self.service_seconds is not None else 1.0
+        return max(1, min(60, math.ceil(per_request * (self.waiting + 1) / max(self.concurrency, 1))))
+
+
+class AdmissionController:
+    """Gates sharing one in-flight budget, with priority-based headroom."""
+
+    def __init__(self, max_inflight: int = ADMISSION_MAX_INFLIGHT,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, enabled: bool = ADMISSION_ENABLED):
+        self.max_inflight = max_inflight
+        self.queue_timeout = queue_timeout
+        self.enabled = enabled
+        self.inflight = 0
+        self._changed = threading.Condition()
+        self.gates: Dict[str, Gate] = {}
+
+    def add_gate(self, name: str, concurrency: int, queue: int, priority: str = NORMAL) -> Gate:
+        if priority not in PRIORITY_SHARES:
+            raise ValueError(f'Unknown priority: {priority}')
+        gate = self.gates[name] = Gate(name, concurrency, queue, priority)
+        return gate
+
+    def _has_room(self, gate: Gate) -> bool:
+        return (gate.active < gate.concurrency
+                and self.inflight < max(1, int(self.max_inflight * PRIORITY_SHARES[gate.priority])))
+
+    def acquire(self, name: str) -> bool:
+        """
+        Take a slot in a gate, waiting in its queue if needed.
+
+        Returns:
+            bool: True if admitted (call release() afterwards), False if shed
+        """
+        gate = self.gates[name]
+        with self._changed:
+            if not self._has_room(gate):
+                if gate.waiting >= gate.queue:
+                    gate.counters['shed'] += 1
+                    return False
+                gate.waiting += 1
+                gate.counters['queued'] += 1
+                deadline = time.monotonic() + self.queue_timeout
+                try:
+                    while not self._has_room(gate):
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            gate.counters['timed_out'] += 1
+                            gate.counters['shed'] += 1
+                            return False
+                        self._changed.wait(remaining)
+                finally:
+                    gate.waiting -= 1
+            gate.active += 1
+            gate.counters['admitted'] += 1
+            self.inflight += 1
+            return True
+
+    def release(self, name: str, seconds: float) -> None:
+        gate = self.gates[name]
+        with self._changed:
+            gate.active -= 1
+            self.inflight -= 1
+            gate.observe(seconds)
+            # Waiters of every gate share the in-flight budget, so wake them all
+            self._changed.notify_all()
+
+    def stats(self) -> Dict:
+        with self._changed:
+            return {
+                'enabled': self.enabled,
+                'inflight': self.inflight,
+                'max_inflight': self.max_inflight,
+                'queue_timeout_seconds': self.queue_timeout,
+                'gates': {name: dict(gate.counters, active=gate.active, waiting=gate.waiting,
+                                     concurrency=gate.concurrency, queue=gate.queue, priority=gate.priority,
+                                     service_ms=round(gate.service_seconds * 1000, 1)
+                                     if gate.service_seconds is not None else None)
+                          for name, gate in self.gates.items()}
+            }
+
+
+def default_controller() -> AdmissionController:
+    """Controller with the standard gates: matches and exports (low), reads (normal), writes (high)."""
+    controller = AdmissionController()
+    controller.add_gate('matches', ADMISSION_MATCHES_CONCURRENCY, ADMISSION_MATCHES_QUEUE, LOW)
+    controller.add_gate('reads', ADMISSION_READS_CONCURRENCY, ADMISSION_READS_QUEUE, NORMAL)
+    controller.add_gate('writes', ADMISSION_WRITES_CONCURRENCY, ADMISSION_WRITES_QUEUE, HIGH)
+    controller.add_gate('exports', ADMISSION_EXPORTS_CONCURRENCY, ADMISSION_EXPORTS_QUEUE, LOW)
+    return controller
+
+
+def admitted(controller: AdmissionController, gate: str, fallback: Optional[Callable] = None):
+    """
+    Run a Flask view only once its gate admits the request.
+
+    A shed request gets fallback() if it returns a response (e.g. the last
+    cached body), otherwise 429 with Retry-After.
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not controller.enabled:
+                return view(*args, **kwargs)
+            if not controller.acquire(gate):
+                stale = fallback() if fallback is not None else None
+                if stale is not None:
+                    with controller._changed:
+                        controller.gates[gate].counters['served_stale'] += 1
+                    return stale
+                response = jsonify({
+                    'success': False,
+                    'error': 'Server is busy; retry later'
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(controller.gates[gate].retry_after())
+                return response
+            started = time.perf_counter()
+            try:
+                response = view(*args, **kwargs)
+            except BaseException:
+                controller.release(gate, time.perf_counter() - started)
+                raise
+            if isinstance(response, Response) and response.is_streamed:
+                # A streamed body is produced after the view returns; hold the slot until it is sent
+                response.call_on_close(lambda: controller.release(gate, time.perf_counter() - started))
+            else:
+                controller.release(gate, time.perf_counter() - started)
+            return response
+        return wrapper
+    return decorate
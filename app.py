@@ -1,69 +1,411 @@
-from flask import Flask, jsonify
-from firebase_admin import credentials, firestore, initialize_app
+from flask import Flask, Response, jsonify, request
 from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
 import os
+import threading
+import time
+from datetime import datetime, timedelta
 from typing import Dict, List, Tuple, Optional
+from response_cache import (ResponseCache, VersionCounter, cached_json_response, request_cache_key,
+                            stale_json_response)
+from match_events import MatchEventLog, MatchNotifier, parse_timestamp, sse_stream
+from geopy.extra.rate_limiter import RateLimiter
+from geocode_cache import GeocodeCache, cached_geocode, normalize_location
+from job_queue import JobQueue, PermanentJobError, WorkerPool
+from spatial_index import NgoSpatialIndex, get_ngo_index
+from sharding import match_donors, match_shard, shard_stats
+from parallel_match import parallel_stats
+from travel_time import match_donors_by_cost, travel_stats
+from food_taxonomy import filter_ngos_by_needs, match_by_food_group
+from quantity import SupplyDemandRollup, cached_region, quantity_fields
+from client_coordinates import checked_stored_coordinates
+from retention import (ARCHIVE_GRACE_HOURS, ARCHIVE_INTERVAL_SECONDS, filter_active, is_archivable, live_version,
+                       live_view_horizon, record_archive_run, retention_stats, window_start)
+from admission import admitted, default_controller
+from geocoder_router import build_router
+from route_planner import plan_routes, route_options, route_stats
+from match_log import MatchLog
+from export import ExportUnavailable, Exporter, export_response
+from snapshots import MatchMemo, Snapshotter
+from record_query import (EXPIRES_AT_FIELD, FOOD_TYPE_KEY_FIELD, RecordQuery, firestore_query, parse_record_query,
+                          query_fields, sort_records)
+from http_pool import PooledGeopyAdapter, http_stats
 
 app = Flask(__name__)
 
-# Initialize Firebase Admin SDK
-# You can either use a service account key file or set environment variables
-try:
-    # Option 1: Using service account key file
-    cred = credentials.Certificate("path/to/serviceAccountKey.json")
-    initialize_app(cred)
-except FileNotFoundError:
-    # Option 2: Using environment variables (recommended for production)
-    # Set these environment variables:
-    # FIREBASE_PROJECT_ID=your-project-id
-    # FIREBASE_PRIVATE_KEY_ID=your-private-key-id
-    # FIREBASE_PRIVATE_KEY=your-private-key
-    # FIREBASE_CLIENT_EMAIL=your-client-email
-    # FIREBASE_CLIENT_ID=your-client-id
-    # FIREBASE_AUTH_URI=https://accounts.google.com/o/oauth2/auth
-    # FIREBASE_TOKEN_URI=https://oauth2.googleapis.com/token
-    # FIREBASE_AUTH_PROVIDER_X509_CERT_URL=https://www.googleapis.com/oauth2/v1/certs
-    # FIREBASE_CLIENT_X509_CERT_URL=your-cert-url
-    
-    cred = credentials.Certificate({
-        "type": "service_account",
-        "project_id": os.getenv("FIREBASE_PROJECT_ID"),
-        "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
-        "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace("\\n", "\n"),
-        "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
-        "client_id": os.getenv("FIREBASE_CLIENT_ID"),
-        "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
-        "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
-        "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_X509_CERT_URL"),
-        "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL")
-    })
-    initialize_app(cred)
+def init_firebase():
+    """
+    Initialize the Firebase Admin SDK and return a Firestore client.
+    
+    You can either use a service account key file or set environment variables.
+    """
+    # Imported here: firebase_admin/gRPC add ~0.3s to every cold start
+    from firebase_admin import credentials, firestore, initialize_app
+    
+    try:
+        # Option 1: Using service account key file
+        cred = credentials.Certificate("path/to/serviceAccountKey.json")
+        initialize_app(cred)
+    except FileNotFoundError:
+        # Option 2: Using environment variables (recommended for production)
+        # Set these environment variables:
+        # FIREBASE_PROJECT_ID=your-project-id
+        # FIREBASE_PRIVATE_KEY_ID=your-private-key-id
+        # FIREBASE_PRIVATE_KEY=your-private-key
+        # FIREBASE_CLIENT_EMAIL=your-client-email
+        # FIREBASE_CLIENT_ID=your-client-id
+        # FIREBASE_AUTH_URI=https://accounts.google.com/o/oauth2/auth
+        # FIREBASE_TOKEN_URI=https://oauth2.googleapis.com/token
+        # FIREBASE_AUTH_PROVIDER_X509_CERT_URL=https://www.googleapis.com/oauth2/v1/certs
+        # FIREBASE_CLIENT_X509_CERT_URL=your-cert-url
+        
+        cred = credentials.Certificate({
+            "type": "service_account",
+            "project_id": os.getenv("FIREBASE_PROJECT_ID"),
+            "private_key_id": os.getenv("FIREBASE_PRIVATE_KEY_ID"),
+            "private_key": os.getenv("FIREBASE_PRIVATE_KEY").replace("\\n", "\n"),
+            "client_email": os.getenv("FIREBASE_CLIENT_EMAIL"),
+            "client_id": os.getenv("FIREBASE_CLIENT_ID"),
+            "auth_uri": os.getenv("FIREBASE_AUTH_URI"),
+            "token_uri": os.getenv("FIREBASE_TOKEN_URI"),
+            "auth_provider_x509_cert_url": os.getenv("FIREBASE_AUTH_PROVIDER_X509_CERT_URL"),
+            "client_x509_cert_url": os.getenv("FIREBASE_CLIENT_X509_CERT_URL")
+        })
+        initialize_app(cred)
+    
+    return firestore.client()
+
+# Firestore client, created on first use rather than at import so the
+# process starts (and /api/health answers) without waiting on credentials
+_db = None
+_db_lock = threading.Lock()
+_db_error = None
+
+def get_db():
+    """Return the Firestore client, initializing it thread-safely on first use."""
+    global _db, _db_error
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                try:
+                    _db = init_firebase()
+                    _db_error = None
+                except Exception as e:
+                    _db_error = str(e)
+                    raise
+    return _db
+
+def prewarm_clients() -> threading.Thread:
+    """Initialize the Firestore client in the background."""
+    def warm():
+        try:
+            get_db()
+            print("✅ Firestore client initialized")
+        except Exception as e:
+            print(f"❌ Error initializing Firestore: {e}")
+    
+    thread = threading.Thread(target=warm, name='prewarm-clients', daemon=True)
+    thread.start()
+    return thread
+
+# Realtime listeners bump these on every change to the watched collections,
+# giving a dataset version without re-reading the documents
+COLLECTION_VERSIONS = {
+    'donations': VersionCounter(),
+    'ngoRequests': VersionCounter()
+}
+_collection_watches = {}
+_watch_lock = threading.Lock()
+response_cache = ResponseCache()
+
+# Concurrency limits and load shedding for the matches, read and write endpoints
+admission = default_controller()
+
+# Append-only audit log of match inputs and decisions (match_log.py scan/replay)
+match_log = MatchLog()
+
+# Match results by input digest, so unchanged data skips the matcher (also across restarts)
+match_memo = MatchMemo()
+
+# Supply/demand per region and food category, kept current from the listeners' changes
+stats_rollup = SupplyDemandRollup(lambda location: cached_region(geocode_cache, location))
+ROLLUP_KINDS = {'donations': 'donors', 'ngoRequests': 'ngos'}
+
+def _watch_collection(name: str):
+    """Start a Firestore listener that bumps the collection's version on change."""
+    # The first snapshot replays the whole collection as additions
+    stats_rollup.clear(ROLLUP_KINDS[name])
+    
+    def on_snapshot(col_snapshot, changes, read_time):
+        if not changes:
+            return
+        COLLECTION_VERSIONS[name].bump()
+        notify = False
+        for change in changes:
+            if change.type.name == 'REMOVED':
+                notify = True
+                stats_rollup.remove(ROLLUP_KINDS[name], change.document.id)
+                continue
+            data = {**(change.document.to_dict() or {}), 'id': change.document.id}
+            if name == 'donations':
+                enqueue_query_fields(data)
+            if checked_stored_coordinates(data, geocode_cache) is None:
+                # Client coordinates missing or implausible: geocode the location
+                # in the background, which then refreshes the matches
+                data.pop('lat', None)
+                data.pop('lon', None)
+                enqueue_geocode(data.get('location', ''))
+            else:
+                notify = True
+            stats_rollup.add(ROLLUP_KINDS[name], data)
+        if notify:
+            match_notifier.notify()
+    
+    return get_db().collection(name).on_snapshot(on_snapshot)
+
+def get_dataset_version() -> Optional[str]:
+    """
+    Current version of the donations and ngoRequests collections.
+    
+    Returns:
+        Optional[str]: Version string, or None if the listeners are not running
+    """
+    with _watch_lock:
+        try:
+            for name in COLLECTION_VERSIONS:
+                watch = _collection_watches.get(name)
+                if watch is None or not watch.is_active:
+                    _collection_watches[name] = _watch_collection(name)
+                    # Anything cached before the listener (re)started is suspect
+                    COLLECTION_VERSIONS[name].bump()
+        except Exception as e:
+            print(f"Error starting Firestore listener: {e}")
+            return None
+    
+    return '.'.join(str(COLLECTION_VERSIONS[name].value) for name in COLLECTION_VERSIONS)
+
+# Firestore accepts at most 500 writes per batch commit
+FIRESTORE_BATCH_LIMIT = 500
+
+def _bulk_set(collection: str, docs: List[Tuple[str, Dict]]) -> int:
+    """Write (id, data) pairs with batched commits. Returns documents written."""
+    db = get_db()
+    written = 0
+    for start in range(0, len(docs), FIRESTORE_BATCH_LIMIT):
+        batch = db.batch()
+        chunk = docs[start:start + FIRESTORE_BATCH_LIMIT]
+        for doc_id, data in chunk:
+            # set() with a deterministic ID makes a replayed import idempotent
+            batch.set(db.collection(collection).document(doc_id), data)
+        batch.commit()
+        written += len(chunk)
+    return written
+
+def donor_document(record: Dict) -> Dict:
+    """Firestore document for a donor record, with the fields ?foodType=/?expires_before= query."""
+    data = {
+        'foodType': record.get('foodType', ''),
+        'quantity': record.get('quantity', ''),
+        'expiryTime': record.get('expiryTime', 0),
+        'location': record.get('location', ''),
+        # Stored as a Firestore timestamp so active-window range queries see it
+        'timestamp': parse_timestamp(record.get('timestamp')) or datetime.now().astimezone(),
+        # Parsed once here; stats and readers use the normalized amount
+        **quantity_fields(record.get('quantity', ''), record.get('amount'), record.get('unit'))
+    }
+    data.update(query_fields(data))
+    return data
+
+def bulk_add_donors(records: List[Dict]) -> int:
+    """Write many donors to the donations collection. Returns documents written."""
+    return _bulk_set('donations', [(record['id'], donor_document(record)) for record in records])
+
+def bulk_add_ngos(records: List[Dict]) -> int:
+    """Write many NGOs to the ngoRequests collection. Returns documents written."""
+    return _bulk_set('ngoRequests', [(record['id'], {
+        'ngoName': record.get('ngoName', ''),
+        'foodNeeded': record.get('foodNeeded', ''),
+        'location': record.get('location', ''),
+        # Stored as a Firestore timestamp so active-window range queries see it
+        'timestamp': parse_timestamp(record.get('timestamp')) or datetime.now().astimezone()
+    }) for record in records])
+
+def fetch_donors(include_expired: bool = False, query: RecordQuery = RecordQuery()) -> List[Dict]:
+    """Live donations from Firestore, or every donation with include_expired, filtered by query."""
+    # Range query on creation time bounds the read; the exact expiry check follows
+    donors_ref = firestore_query(get_db().collection('donations'), query,
+                                 created_after=None if include_expired else window_start())
+    
+    donors = []
+    for doc in donors_ref.stream():
+        donor_data = doc.to_dict()
+        donor_data['id'] = doc.id
+        # Query-only fields; the readable ones are foodType, timestamp and expiryTime
+        donor_data.pop(FOOD_TYPE_KEY_FIELD, None)
+        donor_data.pop(EXPIRES_AT_FIELD, None)
+        # Donations written by the web form carry only the free-text quantity
+        donor_data.update(quantity_fields(donor_data.get('quantity', ''), donor_data.get('amount'),
+                                          donor_data.get('unit')))
+        donors.append(donor_data)
+    
+    return sort_records(donors if include_expired else filter_active(donors), query)
+
+def fetch_ngos(query: RecordQuery = RecordQuery()) -> List[Dict]:
+    """NGOs from Firestore, filtered and ordered by query."""
+    ngos = []
+    for doc in firestore_query(get_db().collection('ngoRequests'), query).stream():
+        ngo_data = doc.to_dict()
+        ngo_data['id'] = doc.id
+        ngos.append(ngo_data)
+    return ngos
 
-# Initialize Firestore
-db = firestore.client()
+def archive_expired_donors() -> int:
+    """Move long-expired donations to the donationsArchive collection. Returns documents moved."""
+    db = get_db()
+    # Anything archivable expired before this cutoff, so it was also created before it
+    cutoff = datetime.now().astimezone() - timedelta(hours=ARCHIVE_GRACE_HOURS)
+    moves = []
+    for doc in db.collection('donations').where('timestamp', '<', cutoff).stream():
+        data = doc.to_dict()
+        if is_archivable(data):
+            moves.append((doc.id, data))
+    
+    # Each move is a set plus a delete, committed together
+    per_batch = FIRESTORE_BATCH_LIMIT // 2
+    for start in range(0, len(moves), per_batch):
+        batch = db.batch()
+        for doc_id, data in moves[start:start + per_batch]:
+            batch.set(db.collection('donationsArchive').document(doc_id), data)
+            batch.delete(db.collection('donations').document(doc_id))
+        batch.commit()
+    if moves:
+        print(f"🗄️ Archived {len(moves)} expired donors")
+    return len(moves)
 
 # Initialize geocoder for converting addresses to coordinates
-geolocator = Nominatim(user_agent="xylemcscis_food_donation")
+# Pooled keep-alive connections shared with the other outbound HTTP clients
+geolocator = Nominatim(
+    user_agent="xylemcscis_food_donation",
+    timeout=float(os.getenv('GEOCODER_TIMEOUT', '3')),
+    adapter_factory=PooledGeopyAdapter
+)
+
+# Geocode results shared by the request path and the background workers
+geocode_cache = GeocodeCache()
+
+# Geocodes and match results are snapshotted while serving and restored here at startup
+snapshotter = Snapshotter('app', {
+    'geocodes': (geocode_cache.memory_entries, geocode_cache.warm),
+    'matches': (match_memo.dump, match_memo.restore)
+})
+snapshotter.restore()
+
+# On a cache miss, geocode inline (default) or leave it to the background workers
+GEOCODE_INLINE_ON_MISS = os.getenv('GEOCODE_INLINE_ON_MISS', '1') == '1'
+
+# Hedged, failover-capable routing over the GEOCODER_PROVIDERS
+geocoder_router = build_router(geolocator)
+
+def geocode_uncached(location: str) -> Optional[Tuple[float, float]]:
+    """Geocode without the cache; raises if every provider errored."""
+    return geocoder_router.geocode(location)
 
 def get_coordinates(location: str) -> Optional[Tuple[float, float]]:
     """
     Convert location string to latitude and longitude coordinates.
     
+    Results come from the geocode cache when possible.
+    
     Args:
         location (str): Location string (e.g., "New York, NY")
         
     Returns:
         Optional[Tuple[float, float]]: (latitude, longitude) or None if geocoding fails
     """
+    if not GEOCODE_INLINE_ON_MISS:
+        found, coords = geocode_cache.lookup(location)
+        if not found:
+            enqueue_geocode(location)
+        return coords
+    return cached_geocode(geocode_cache, location, geocode_uncached)
+
+# Background jobs: geocode new records, then refresh matches off the request path
+job_queue = JobQueue()
+
+# Nominatim allows one request per second; background geocoding stays under it
+rate_limited_geocode = RateLimiter(
+    geocode_uncached,
+    min_delay_seconds=float(os.getenv('GEOCODE_MIN_DELAY_SECONDS', '1.0')),
+    max_retries=0,
+    swallow_exceptions=False
+)
+
+def handle_geocode_job(payload: Dict) -> None:
+    """Geocode a record's location, then queue a match refresh."""
+    location = payload['location']
+    found, _ = geocode_cache.lookup(location)
+    if not found:
+        coords = rate_limited_geocode(location)
+        geocode_cache.put(location, coords)
+        if coords is None:
+            raise PermanentJobError(f"Ungeocodable address: {location}")
+    stats_rollup.relocate(location)
+    job_queue.enqueue('refresh_matches', {}, dedupe_key='refresh_matches')
+
+def handle_archive_job(payload: Dict) -> None:
+    """Archive expired donations and finished jobs, then queue the next run."""
+    job_queue.enqueue_periodic('archive_expired', ARCHIVE_INTERVAL_SECONDS)
+    job_queue.purge_done()
     try:
-        location_data = geolocator.geocode(location)
-        if location_data:
-            return (location_data.latitude, location_data.longitude)
-        return None
+        archived = archive_expired_donors()
     except Exception as e:
-        print(f"Error geocoding location '{location}': {e}")
-        return None
+        record_archive_run(0, str(e))
+        raise
+    record_archive_run(archived)
+
+def handle_query_fields_job(payload: Dict) -> None:
+    """Write the query fields on a donation added without them (e.g. by the web form)."""
+    doc_ref = get_db().collection('donations').document(payload['id'])
+    snapshot = doc_ref.get()
+    if not snapshot.exists:
+        return
+    data = snapshot.to_dict() or {}
+    fields = query_fields(data)
+    if any(data.get(field) != value for field, value in fields.items()):
+        doc_ref.update(fields)
+
+def handle_refresh_matches_job(payload: Dict) -> None:
+    """Recompute matches and publish the deltas to stream subscribers."""
+    matches = compute_current_matches()
+    if matches is not None:
+        match_event_log.update(matches)
+
+job_workers = WorkerPool(
+    job_queue,
+    {'geocode': handle_geocode_job, 'refresh_matches': handle_refresh_matches_job,
+     'archive_expired': handle_archive_job, 'query_fields': handle_query_fields_job},
+    workers=int(os.getenv('JOB_WORKERS', '1'))
+)
+
+def enqueue_geocode(location: str) -> None:
+    """Queue background geocoding for a location (deduplicated while pending)."""
+    if not location:
+        return
+    job_queue.enqueue('geocode', {'location': location},
+                      dedupe_key=f'geocode:{normalize_location(location)}')
+    job_workers.ensure_started()
+    job_workers.wake()
+
+def enqueue_query_fields(donor: Dict) -> None:
+    """Queue a query-field write if a donation's stored fields are missing or stale."""
+    if not donor.get('timestamp'):
+        # Server timestamp not applied yet; the next snapshot carries it
+        return
+    if all(donor.get(field) == value for field, value in query_fields(donor).items()):
+        return
+    job_queue.enqueue('query_fields', {'id': donor['id']}, dedupe_key=f"query_fields:{donor['id']}")
+    job_workers.ensure_started()
+    job_workers.wake()
 
 def calculate_distance(coord1: Tuple[float, float], coord2: Tuple[float, float]) -> float:
     """
@@ -78,17 +420,31 @@ def calculate_distance(coord1: Tuple[float, float], coord2: Tuple[float, float])
     """
     return geodesic(coord1, coord2).kilometers
 
-def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict]) -> Optional[Dict]:
+def ngo_from_result(ngo_locations: List[Dict], result: Optional[Tuple[int, float]]) -> Optional[Dict]:
+    """Copy of the matched NGO with 'distance_km', from a (position, distance) result."""
+    if result is None:
+        return None
+    position, distance = result
+    closest_ngo = ngo_locations[position].copy()
+    closest_ngo['distance_km'] = round(distance, 2)
+    return closest_ngo
+
+def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict],
+                     ngo_index: Optional[NgoSpatialIndex] = None) -> Optional[Dict]:
     """
     Find the closest NGO to a donor based on coordinates.
     
     Args:
         donor_coords (Tuple[float, float]): Donor's coordinates
         ngo_locations (List[Dict]): List of NGOs with their coordinates
+        ngo_index (Optional[NgoSpatialIndex]): Grid index over ngo_locations, if built
         
     Returns:
         Optional[Dict]: Closest NGO data or None if no valid NGOs
     """
+    if ngo_index is not None:
+        return ngo_from_result(ngo_locations, ngo_index.nearest(donor_coords, calculate_distance))
+    
     closest_ngo = None
     min_distance = float('inf')
     
@@ -102,27 +458,19 @@ def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict
     
     return closest_ngo
 
-@app.route('/api/matches', methods=['GET'])
-def get_donor_ngo_matches():
+def build_matches_payload() -> Tuple[Dict, int]:
     """
-    Main endpoint to get donor-NGO matches.
+    Compute donor-NGO matches from Firestore.
     
     Returns:
-        JSON response with donor → matched NGO data
+        Tuple[Dict, int]: Response payload with donor → matched NGO data, HTTP status
     """
     try:
-        # Fetch donors from Firestore
-        donors_ref = db.collection('donations')
-        donors_docs = donors_ref.stream()
-        
-        donors = []
-        for doc in donors_docs:
-            donor_data = doc.to_dict()
-            donor_data['id'] = doc.id
-            donors.append(donor_data)
+        # Fetch live donors from Firestore
+        donors = fetch_donors()
         
         # Fetch NGOs from Firestore
-        ngos_ref = db.collection('ngoRequests')
+        ngos_ref = get_db().collection('ngoRequests')
         ngos_docs = ngos_ref.stream()
         
         ngos = []
@@ -136,98 +484,332 @@ def get_donor_ngo_matches():
         for ngo in ngos:
             location = ngo.get('location', '')
             if location:
-                coords = get_coordinates(location)
+                # Coordinates sent by the web form skip geocoding
+                coords = checked_stored_coordinates(ngo, geocode_cache) or get_coordinates(location)
                 if coords:
                     ngo['coordinates'] = coords
                     ngo_locations.append(ngo)
         
-        # Match donors with closest NGOs
-        matches = []
+        # Shared, memory-mapped grid index over the geocoded NGOs
+        ngo_index = get_ngo_index(ngo_locations)
+        
+        # Match donors with closest NGOs; large datasets are sharded by region
+        located = []
         for donor in donors:
             donor_location = donor.get('location', '')
             if donor_location:
-                donor_coords = get_coordinates(donor_location)
+                donor_coords = checked_stored_coordinates(donor, geocode_cache) or get_coordinates(donor_location)
                 if donor_coords:
-                    closest_ngo = find_closest_ngo(donor_coords, ngo_locations)
-                    if closest_ngo:
-                        match = {
-                            'donor': {
-                                'id': donor['id'],
-                                'food_type': donor.get('foodType', ''),
-                                'quantity': donor.get('quantity', ''),
-                                'expiry_time_hours': donor.get('expiryTime', 0),
-                                'location': donor_location,
-                                'coordinates': donor_coords,
-                                'timestamp': donor.get('timestamp', '')
-                            },
-                            'matched_ngo': {
-                                'id': closest_ngo['id'],
-                                'ngo_name': closest_ngo.get('ngoName', ''),
-                                'food_needed': closest_ngo.get('foodNeeded', ''),
-                                'location': closest_ngo.get('location', ''),
-                                'coordinates': closest_ngo['coordinates'],
-                                'distance_km': closest_ngo['distance_km'],
-                                'timestamp': closest_ngo.get('timestamp', '')
-                            }
-                        }
-                        matches.append(match)
+                    located.append((donor, donor_location, donor_coords))
         
-        return jsonify({
+        # Cost is geodesic distance, or travel time when MATCH_COST_MODE=travel_time
+        # Only NGOs whose needs overlap the donor's food are considered
+        match_started = time.perf_counter()
+        nearest, travel_minutes = match_memo.match(
+            [donor for donor, _, _ in located], [coords for _, _, coords in located], ngo_locations,
+            lambda: match_by_food_group(
+                [donor for donor, _, _ in located], [coords for _, _, coords in located], ngo_locations, ngo_index,
+                lambda coords, subset, subset_index: match_donors_by_cost(
+                    coords, subset, lambda group: match_donors(group, subset, subset_index))
+            )
+        )
+        match_log.record_run(
+            get_dataset_version(), [donor for donor, _, _ in located], [coords for _, _, coords in located],
+            ngo_locations, nearest, travel_minutes, (time.perf_counter() - match_started) * 1000
+        )
+        
+        matches = []
+        for (donor, donor_location, donor_coords), result, minutes in zip(located, nearest, travel_minutes):
+            closest_ngo = ngo_from_result(ngo_locations, result)
+            if closest_ngo:
+                match = {
+                    'donor': {
+                        'id': donor['id'],
+                        'food_type': donor.get('foodType', ''),
+                        'quantity': donor.get('quantity', ''),
+                        'expiry_time_hours': donor.get('expiryTime', 0),
+                        'location': donor_location,
+                        'coordinates': donor_coords,
+                        'timestamp': donor.get('timestamp', '')
+                    },
+                    'matched_ngo': {
+                        'id': closest_ngo['id'],
+                        'ngo_name': closest_ngo.get('ngoName', ''),
+                        'food_needed': closest_ngo.get('foodNeeded', ''),
+                        'location': closest_ngo.get('location', ''),
+                        'coordinates': closest_ngo['coordinates'],
+                        'distance_km': closest_ngo['distance_km'],
+                        'timestamp': closest_ngo.get('timestamp', '')
+                    }
+                }
+                if minutes is not None:
+                    match['matched_ngo']['travel_time_min'] = round(minutes, 1)
+                matches.append(match)
+        
+        return {
             'success': True,
             'total_donors': len(donors),
             'total_ngos': len(ngos),
             'successful_matches': len(matches),
             'matches': matches
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500
 
-@app.route('/api/donors', methods=['GET'])
-def get_donors():
-    """Get all donors from Firestore."""
+def build_donors_payload() -> Tuple[Dict, int]:
+    """
+    Return (payload, status) listing live donors from Firestore (all with ?include_expired=1).
+    
+    ?foodType=, ?since=, ?expires_before= and ?sort= run as Firestore where/order_by clauses.
+    """
     try:
-        donors_ref = db.collection('donations')
-        donors_docs = donors_ref.stream()
-        
-        donors = []
-        for doc in donors_docs:
-            donor_data = doc.to_dict()
-            donor_data['id'] = doc.id
-            donors.append(donor_data)
+        query = parse_record_query(request.args, 'donors')
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    try:
+        donors = fetch_donors(include_expired=request.args.get('include_expired') == '1', query=query)
         
-        return jsonify({
+        return {
             'success': True,
             'count': len(donors),
             'donors': donors
-        })
+        }, 200
         
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def build_ngos_payload() -> Tuple[Dict, int]:
+    """Return (payload, status) listing NGOs from Firestore (?needs= filters by food category; ?since=, ?sort=)."""
+    try:
+        query = parse_record_query(request.args, 'ngos')
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    try:
+        ngos = fetch_ngos(query)
+        
+        needs = request.args.get('needs')
+        if needs:
+            try:
+                # The category index is memoized per version only for the unfiltered list
+                ngos = filter_ngos_by_needs(ngos, needs, get_dataset_version() if query.empty else None)
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }, 400
+        
+        return {
+            'success': True,
+            'count': len(ngos),
+            'ngos': ngos
+        }, 200
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def build_stats_payload() -> Tuple[Dict, int]:
+    """Return (payload, status) with supply/demand rollups by region and food category."""
+    try:
+        # Starts the listeners that feed the rollup if they are not running
+        if get_dataset_version() is None:
+            return {
+                'success': False,
+                'error': 'Firestore listeners are not running'
+            }, 503
+        # Records geocoded since they were added move out of 'unlocated'
+        stats_rollup.relocate()
+        
+        return {
+            'success': True,
+            **stats_rollup.snapshot()
+        }, 200
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def compute_current_matches() -> Optional[List[Dict]]:
+    """Matches for the stream notifier, or None if the computation failed."""
+    payload, status = build_matches_payload()
+    return payload['matches'] if status == 200 else None
+
+def build_routes_payload() -> Tuple[Dict, int]:
+    """
+    Plan multi-stop pickup routes from each NGO to its matched donors.
+    
+    Query options: capacity_kg, speed_kmh, budget_ms (solver time) and seed.
+    
+    Returns:
+        Tuple[Dict, int]: Routes per NGO, unroutable donors and solver stats, HTTP status
+    """
+    try:
+        options = route_options(request.args)
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    payload, status = build_matches_payload()
+    if status != 200:
+        return payload, status
+    try:
+        # Planned as of the end of the cache bucket, so cached deadlines stay feasible
+        plan = plan_routes(payload['matches'], now=live_view_horizon(), **options)
+        return dict({'success': True}, **plan), 200
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+# Match deltas pushed to /api/matches/stream subscribers
+match_event_log = MatchEventLog()
+match_notifier = MatchNotifier(compute_current_matches, match_event_log, version_fn=get_dataset_version)
+
+_archival_scheduled = False
+
+@app.before_request
+def schedule_archival():
+    """Queue the periodic archival job once this process starts taking requests."""
+    global _archival_scheduled
+    if not _archival_scheduled:
+        _archival_scheduled = True
+        job_queue.enqueue_periodic('archive_expired', ARCHIVE_INTERVAL_SECONDS)
+        job_workers.ensure_started()
+
+@app.before_request
+def start_snapshots():
+    """Snapshot the caches periodically once this process starts taking requests."""
+    snapshotter.start()
+
+@app.route('/api/matches', methods=['GET'])
+@admitted(admission, 'matches', lambda: stale_json_response(response_cache))
+def get_donor_ngo_matches():
+    """
+    Main endpoint to get donor-NGO matches.
+    
+    Served through the version-keyed response cache; honors If-None-Match.
+    
+    Returns:
+        JSON response with donor → matched NGO data
+    """
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_matches_payload)
+
+@app.route('/api/matches/stream', methods=['GET'])
+def stream_matches():
+    """Push match deltas (new, reassigned, expired) as Server-Sent Events."""
+    # Listeners also feed the notifier, so writes from any client are pushed
+    get_dataset_version()
+    match_notifier.prime()
+    return Response(
+        sse_stream(match_event_log, request.headers.get('Last-Event-ID')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/routes', methods=['GET'])
+@admitted(admission, 'matches', lambda: stale_json_response(response_cache))
+def get_pickup_routes():
+    """Pickup routes per NGO under vehicle capacity and donor expiry (cached per dataset version and time bucket)."""
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_routes_payload)
+
+def export_records(kind: str) -> List[Dict]:
+    """Every donor (expired included) or NGO in Firestore, for export.py."""
+    if kind == 'donors':
+        return fetch_donors(include_expired=True)
+    return fetch_ngos()
+
+# Columnar exports for analytics; runs outside the JSON endpoints and their caches
+exporter = Exporter(export_records, geocode_cache, match_log)
+
+@app.route('/api/export/<table>', methods=['GET'])
+@admitted(admission, 'exports')
+def export_table(table):
+    """Stream a table as Arrow IPC or Parquet (?format=); ?since=<watermark> returns only changed rows."""
+    try:
+        return export_response(exporter, table, request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except ExportUnavailable as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 501
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/donors', methods=['GET'])
+@admitted(admission, 'reads', lambda: stale_json_response(response_cache))
+def get_donors():
+    """Get all donors from Firestore."""
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_donors_payload)
+
 @app.route('/api/ngos', methods=['GET'])
+@admitted(admission, 'reads', lambda: stale_json_response(response_cache))
 def get_ngos():
     """Get all NGOs from Firestore."""
+    return cached_json_response(response_cache, request_cache_key(), get_dataset_version(), build_ngos_payload)
+
+@app.route('/api/stats', methods=['GET'])
+@admitted(admission, 'reads')
+def get_stats():
+    """Supply (donated amounts) and demand (NGOs) per region and food category."""
+    payload, status = build_stats_payload()
+    return jsonify(payload), status
+
+@app.route('/api/shards/match', methods=['POST'])
+@admitted(admission, 'matches')
+def match_shard_endpoint():
+    """Match one geographic shard on behalf of a coordinating node."""
     try:
-        ngos_ref = db.collection('ngoRequests')
-        ngos_docs = ngos_ref.stream()
-        
-        ngos = []
-        for doc in ngos_docs:
-            ngo_data = doc.to_dict()
-            ngo_data['id'] = doc.id
-            ngos.append(ngo_data)
+        task = request.get_json()
+        if not task or 'donors' not in task or 'ngos' not in task or 'bounds' not in task:
+            return jsonify({
+                'success': False,
+                'error': 'Shard task must include donors, ngos and bounds'
+            }), 400
+        return jsonify({'success': True, 'results': match_shard(task)})
         
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def job_metrics():
+    """Background job queue depth, worker and geocode cache stats."""
+    try:
         return jsonify({
             'success': True,
-            'count': len(ngos),
-            'ngos': ngos
+            'queue': job_queue.metrics(),
+            'workers': job_workers.stats(),
+            'geocode_cache': geocode_cache.stats(),
+            'dead_letters': job_queue.dead_letters(limit=20)
         })
         
     except Exception as e:
@@ -239,11 +821,34 @@ def get_ngos():
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
+    # Never blocks on Firestore: reports whether the lazy client exists yet
+    if _db is not None:
+        firestore_status = 'connected'
+    elif _db_error:
+        firestore_status = 'error'
+    else:
+        firestore_status = 'not_initialized'
+    
     return jsonify({
         'status': 'healthy',
         'service': 'XylemCSCIS Food Donation Backend',
-        'version': '1.0.0'
+        'version': '1.0.0',
+        'firestore_status': firestore_status,
+        'http_pool': http_stats(),
+        'sharding': shard_stats(),
+        'parallel_match': parallel_stats(),
+        'travel_time': travel_stats(),
+        'retention': retention_stats(),
+        'geocoder': geocoder_router.stats(),
+        'admission': admission.stats(),
+        'routes': route_stats(),
+        'match_log': match_log.stats(),
+        'snapshots': snapshotter.stats(),
+        'match_memo': match_memo.stats()
     })
 
+if os.getenv('PREWARM_CLIENTS', '0') == '1':
+    prewarm_clients()
+
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -1,11 +1,41 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
-from typing import Dict, List, Tuple, Optional
-import gspread
-from google.oauth2.service_account import Credentials
+from typing import TYPE_CHECKING, Dict, List, Tuple, Optional, Set
 from datetime import datetime
 import os
+import threading
+import time
+from response_cache import (ResponseCache, VersionCounter, cached_json_response, request_cache_key,
+                            stale_json_response)
+from match_events import MatchEventLog, MatchNotifier, sse_stream
+from geopy.extra.rate_limiter import RateLimiter
+from geocode_cache import GeocodeCache, cached_geocode, normalize_location
+from job_queue import JobQueue, PermanentJobError, WorkerPool
+from spatial_index import NgoSpatialIndex, get_ngo_index
+from sharding import match_donors, match_shard, shard_stats
+from parallel_match import parallel_stats
+from travel_time import match_donors_by_cost, travel_stats
+from food_taxonomy import filter_ngos_by_needs, match_by_food_group
+from quantity import SupplyDemandRollup, cached_region, quantity_fields
+from ids import new_id
+from idempotency import IdempotencyStore, idempotent
+from admission import admitted, default_controller
+from sheets_sync import SheetReplica
+from client_coordinates import accept_client_coordinates, coordinate_fields, coordinate_stats, stored_coordinates
+from bulk_import import DEFAULT_BATCH_SIZE, import_status, start_background_import
+from retention import (ARCHIVE_INTERVAL_SECONDS, current_time, filter_active, is_archivable, live_version,
+                       live_view_horizon, record_archive_run, retention_stats, row_ranges)
+from geocoder_router import build_router
+from route_planner import plan_routes, route_options, route_stats
+from match_log import MatchLog
+from export import ExportUnavailable, Exporter, export_response
+from snapshots import MatchMemo, Snapshotter
+from record_query import apply_query, get_record_index, parse_record_query
+from http_pool import PooledGeopyAdapter, http_stats, pooled_authorized_session
+
+if TYPE_CHECKING:
+    import gspread
 
 app = Flask(__name__)
 
@@ -18,6 +48,10 @@ SCOPES = [
 # Initialize Google Sheets client
 def init_google_sheets():
     """Initialize Google Sheets client with credentials."""
+    # Imported here: gspread and google-auth add ~0.3s to every cold start
+    import gspread
+    from google.oauth2.service_account import Credentials
+    
     try:
         # Option 1: Using service account key file
         creds = Credentials.from_service_account_file(
@@ -39,37 +73,123 @@ def init_google_sheets():
             "client_x509_cert_url": os.getenv("GOOGLE_CLIENT_X509_CERT_URL")
         }, scopes=SCOPES)
     
-    client = gspread.authorize(creds)
+    # Same as gspread.authorize, but on the shared keep-alive connection pool
+    client = gspread.Client(auth=creds, session=pooled_authorized_session(creds))
     return client
 
-# Initialize sheets client
-try:
-    sheets_client = init_google_sheets()
-    print("✅ Google Sheets client initialized successfully")
-except Exception as e:
-    print(f"❌ Error initializing Google Sheets: {e}")
-    sheets_client = None
+# Sheets client, created on first use rather than at import so the process
+# starts (and /api/health answers) without waiting on credentials
+_sheets_client = None
+_sheets_client_lock = threading.Lock()
+_sheets_client_error = None
+
+def get_sheets_client() -> 'gspread.Client':
+    """Return the Google Sheets client, initializing it thread-safely on first use."""
+    global _sheets_client, _sheets_client_error
+    if _sheets_client is None:
+        with _sheets_client_lock:
+            if _sheets_client is None:
+                try:
+                    _sheets_client = init_google_sheets()
+                    _sheets_client_error = None
+                    print("✅ Google Sheets client initialized successfully")
+                except Exception as e:
+                    _sheets_client_error = str(e)
+                    print(f"❌ Error initializing Google Sheets: {e}")
+                    raise
+    return _sheets_client
+
+def prewarm_clients() -> threading.Thread:
+    """Initialize the Sheets client and open both sheets in the background."""
+    def warm():
+        try:
+            get_sheets_client()
+            get_sheets_revision()
+        except Exception:
+            pass  # already logged; requests will retry
+    
+    thread = threading.Thread(target=warm, name='prewarm-clients', daemon=True)
+    thread.start()
+    return thread
 
 # Sheet names (you can change these)
 DONORS_SHEET_NAME = "Donors"
 NGOS_SHEET_NAME = "NGOs"
 
-def get_or_create_sheet(sheet_name: str) -> gspread.Worksheet:
+# Header rows; Amount and Unit hold the quantity normalized at ingest,
+# Latitude and Longitude the coordinates a client sent (if any)
+DONOR_HEADERS = ['ID', 'Food Type', 'Quantity', 'Expiry Time (hours)', 'Location', 'Timestamp', 'Amount', 'Unit',
+                 'Latitude', 'Longitude']
+NGO_HEADERS = ['ID', 'NGO Name', 'Food Needed', 'Location', 'Timestamp', 'Latitude', 'Longitude']
+SHEET_HEADERS = {DONORS_SHEET_NAME: DONOR_HEADERS, NGOS_SHEET_NAME: NGO_HEADERS}
+
+# How long a fetched Drive revision is trusted before asking Drive again
+SHEETS_VERSION_TTL_SECONDS = float(os.getenv('SHEETS_VERSION_TTL_SECONDS', '2'))
+
+# Writes made by this process; folded into the version so they show up at once
+LOCAL_WRITES = VersionCounter()
+response_cache = ResponseCache()
+
+# Concurrency limits and load shedding for the matches, read and write endpoints
+admission = default_controller()
+
+# Append-only audit log of match inputs and decisions (match_log.py scan/replay)
+match_log = MatchLog()
+
+# Match results by input digest, so unchanged data skips the matcher (also across restarts)
+match_memo = MatchMemo()
+
+# Replayed responses for POSTs retried with the same Idempotency-Key
+idempotency_store = IdempotencyStore()
+_sheets_revision = {'value': None, 'checked_at': 0.0}
+
+def get_sheets_revision() -> Optional[str]:
+    """Drive modifiedTime of the donors and NGOs sheets, cached briefly."""
+    now = time.monotonic()
+    if _sheets_revision['value'] and now - _sheets_revision['checked_at'] < SHEETS_VERSION_TTL_SECONDS:
+        return _sheets_revision['value']
+    
+    try:
+        parts = []
+        for sheet_name in (DONORS_SHEET_NAME, NGOS_SHEET_NAME):
+            # One Drive files.list call per sheet; far cheaper than get_all_records
+            files = get_sheets_client().list_spreadsheet_files(sheet_name)
+            modified = [f.get('modifiedTime', '') for f in files if f.get('name') == sheet_name]
+            parts.append(modified[0] if modified else 'missing')
+        revision = '|'.join(parts)
+    except Exception as e:
+        print(f"Error fetching sheet revision: {e}")
+        return None
+    
+    _sheets_revision['value'] = revision
+    _sheets_revision['checked_at'] = now
+    return revision
+
+def get_dataset_version() -> Optional[str]:
+    """Current dataset version (Sheets revision + local write counter), or None if unknown."""
+    revision = get_sheets_revision()
+    if revision is None:
+        return None
+    return f"{revision}|{LOCAL_WRITES.value}"
+
+def get_or_create_sheet(sheet_name: str) -> 'gspread.Worksheet':
     """Get or create a Google Sheet with the given name."""
+    from gspread import SpreadsheetNotFound
+    
     try:
         # Try to open existing sheet
-        sheet = sheets_client.open(sheet_name)
+        sheet = get_sheets_client().open(sheet_name)
         worksheet = sheet.sheet1
-    except gspread.SpreadsheetNotFound:
+    except SpreadsheetNotFound:
         # Create new sheet if it doesn't exist
-        sheet = sheets_client.create(sheet_name)
+        sheet = get_sheets_client().create(sheet_name)
         worksheet = sheet.sheet1
         
         # Set up headers based on sheet type
         if sheet_name == DONORS_SHEET_NAME:
-            headers = ['ID', 'Food Type', 'Quantity', 'Expiry Time (hours)', 'Location', 'Timestamp']
+            headers = DONOR_HEADERS
         elif sheet_name == NGOS_SHEET_NAME:
-            headers = ['ID', 'NGO Name', 'Food Needed', 'Location', 'Timestamp']
+            headers = NGO_HEADERS
         else:
             headers = ['ID', 'Data', 'Timestamp']
         
@@ -78,25 +198,63 @@ def get_or_create_sheet(sheet_name: str) -> gspread.Worksheet:
     
     return worksheet
 
-def get_all_donors() -> List[Dict]:
-    """Get all donors from Google Sheets."""
+_columns_checked = set()
+
+def get_writable_sheet(sheet_name: str) -> 'gspread.Worksheet':
+    """Worksheet to append to, adding columns introduced after the sheet was created."""
+    worksheet = get_or_create_sheet(sheet_name)
+    if sheet_name not in _columns_checked:
+        from gspread.utils import rowcol_to_a1
+        
+        headers = worksheet.row_values(1)
+        missing = [header for header in SHEET_HEADERS[sheet_name] if header not in headers]
+        if missing:
+            # Rows wider than the header row would break get_all_records
+            worksheet.update(rowcol_to_a1(1, len(headers) + 1), [missing])
+            print(f"📊 Added columns to {sheet_name}: {', '.join(missing)}")
+            (donor_replica if sheet_name == DONORS_SHEET_NAME else ngo_replica).invalidate()
+        _columns_checked.add(sheet_name)
+    return worksheet
+
+def parse_donor_row(record: Dict[str, str]) -> Optional[Dict]:
+    """Donor from a {header: value} row, or None for an empty row."""
+    if not record.get('ID'):
+        return None
+    return {
+        'id': record['ID'],
+        'foodType': record.get('Food Type', ''),
+        'quantity': record.get('Quantity', ''),
+        'expiryTime': int(float(record.get('Expiry Time (hours)') or 0)),
+        'location': record.get('Location', ''),
+        'timestamp': record.get('Timestamp', ''),
+        **quantity_fields(record.get('Quantity', ''), record.get('Amount'), record.get('Unit')),
+        **coordinate_fields(record.get('Latitude'), record.get('Longitude'))
+    }
+
+def parse_ngo_row(record: Dict[str, str]) -> Optional[Dict]:
+    """NGO from a {header: value} row, or None for an empty row."""
+    if not record.get('ID'):
+        return None
+    return {
+        'id': record['ID'],
+        'ngoName': record.get('NGO Name', ''),
+        'foodNeeded': record.get('Food Needed', ''),
+        'location': record.get('Location', ''),
+        'timestamp': record.get('Timestamp', ''),
+        **coordinate_fields(record.get('Latitude'), record.get('Longitude'))
+    }
+
+# Local replicas of the sheets: only rows appended since the last read are fetched
+donor_replica = SheetReplica(DONORS_SHEET_NAME, parse_donor_row)
+ngo_replica = SheetReplica(NGOS_SHEET_NAME, parse_ngo_row)
+
+def get_all_donors(include_expired: bool = False) -> List[Dict]:
+    """Get live donors (or every donor) from Google Sheets."""
     try:
         worksheet = get_or_create_sheet(DONORS_SHEET_NAME)
-        records = worksheet.get_all_records()
+        donors = donor_replica.sync(worksheet, get_dataset_version())
         
-        donors = []
-        for record in records:
-            if record.get('ID'):  # Skip empty rows
-                donors.append({
-                    'id': record['ID'],
-                    'foodType': record.get('Food Type', ''),
-                    'quantity': record.get('Quantity', ''),
-                    'expiryTime': int(record.get('Expiry Time (hours)', 0)),
-                    'location': record.get('Location', ''),
-                    'timestamp': record.get('Timestamp', '')
-                })
-        
-        return donors
+        return donors if include_expired else filter_active(donors)
     except Exception as e:
         print(f"Error getting donors: {e}")
         return []
@@ -105,31 +263,21 @@ def get_all_ngos() -> List[Dict]:
     """Get all NGOs from Google Sheets."""
     try:
         worksheet = get_or_create_sheet(NGOS_SHEET_NAME)
-        records = worksheet.get_all_records()
-        
-        ngos = []
-        for record in records:
-            if record.get('ID'):  # Skip empty rows
-                ngos.append({
-                    'id': record['ID'],
-                    'ngoName': record.get('NGO Name', ''),
-                    'foodNeeded': record.get('Food Needed', ''),
-                    'location': record.get('Location', ''),
-                    'timestamp': record.get('Timestamp', '')
-                })
-        
-        return ngos
+        return ngo_replica.sync(worksheet, get_dataset_version())
     except Exception as e:
         print(f"Error getting NGOs: {e}")
         return []
 
-def add_donor(donor_data: Dict) -> bool:
-    """Add a new donor to Google Sheets."""
+def add_donor(donor_data: Dict, coords: Optional[Tuple[float, float]] = None) -> Optional[str]:
+    """Add a new donor to Google Sheets, with client coordinates if validated."""
     try:
-        worksheet = get_or_create_sheet(DONORS_SHEET_NAME)
+        worksheet = get_writable_sheet(DONORS_SHEET_NAME)
         
         # Generate unique ID
-        donor_id = f"donor_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        donor_id = new_id('donor')
+        
+        # Parsed once here; stats and readers use the normalized amount
+        quantity = quantity_fields(donor_data.get('quantity', ''))
         
         # Prepare row data
         row = [
@@ -138,23 +286,28 @@ def add_donor(donor_data: Dict) -> bool:
             donor_data.get('quantity', ''),
             donor_data.get('expiryTime', 0),
             donor_data.get('location', ''),
-            datetime.now().isoformat()
+            datetime.now().isoformat(),
+            quantity['amount'] if quantity['amount'] is not None else '',
+            quantity['unit'] or '',
+            *(coords or ('', ''))
         ]
         
         worksheet.append_row(row)
+        LOCAL_WRITES.bump()
+        stats_rollup.add('donors', {**donor_data, 'id': donor_id, **quantity, **coordinate_fields(*(coords or ('', '')))})
         print(f"✅ Added donor: {donor_id}")
-        return True
+        return donor_id
     except Exception as e:
         print(f"Error adding donor: {e}")
-        return False
+        return None
 
-def add_ngo(ngo_data: Dict) -> bool:
-    """Add a new NGO to Google Sheets."""
+def add_ngo(ngo_data: Dict, coords: Optional[Tuple[float, float]] = None) -> Optional[str]:
+    """Add a new NGO to Google Sheets, with client coordinates if validated."""
     try:
-        worksheet = get_or_create_sheet(NGOS_SHEET_NAME)
+        worksheet = get_writable_sheet(NGOS_SHEET_NAME)
         
         # Generate unique ID
-        ngo_id = f"ngo_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        ngo_id = new_id('ngo')
         
         # Prepare row data
         row = [
@@ -162,36 +315,233 @@ def add_ngo(ngo_data: Dict) -> bool:
             ngo_data.get('ngoName', ''),
             ngo_data.get('foodNeeded', ''),
             ngo_data.get('location', ''),
-            datetime.now().isoformat()
+            datetime.now().isoformat(),
+            *(coords or ('', ''))
         ]
         
         worksheet.append_row(row)
+        LOCAL_WRITES.bump()
+        stats_rollup.add('ngos', {**ngo_data, 'id': ngo_id, **coordinate_fields(*(coords or ('', '')))})
         print(f"✅ Added NGO: {ngo_id}")
-        return True
+        return ngo_id
     except Exception as e:
         print(f"Error adding NGO: {e}")
-        return False
+        return None
+
+def bulk_add_donors(records: List[Dict]) -> int:
+    """Append many donors with a single Sheets API call. Returns rows written."""
+    worksheet = get_writable_sheet(DONORS_SHEET_NAME)
+    now = datetime.now().isoformat()
+    quantities = [quantity_fields(record.get('quantity', ''), record.get('amount'), record.get('unit'))
+                  for record in records]
+    rows = [[
+        record['id'],
+        record.get('foodType', ''),
+        record.get('quantity', ''),
+        record.get('expiryTime', 0),
+        record.get('location', ''),
+        record.get('timestamp') or now,
+        quantity['amount'] if quantity['amount'] is not None else '',
+        quantity['unit'] or ''
+    ] for record, quantity in zip(records, quantities)]
+    if rows:
+        worksheet.append_rows(rows)
+        LOCAL_WRITES.bump()
+        for record, quantity in zip(records, quantities):
+            stats_rollup.add('donors', {**record, **quantity})
+    return len(rows)
+
+def existing_record_ids(kind: str) -> Set[str]:
+    """IDs already in the donors or NGOs sheet; bulk imports skip them when resuming, since append_rows can't upsert."""
+    if kind == 'donors':
+        records = donor_replica.sync(get_or_create_sheet(DONORS_SHEET_NAME), get_dataset_version())
+    else:
+        records = ngo_replica.sync(get_or_create_sheet(NGOS_SHEET_NAME), get_dataset_version())
+    return {str(record.get('id')) for record in records}
+
+def bulk_add_ngos(records: List[Dict]) -> int:
+    """Append many NGOs with a single Sheets API call. Returns rows written."""
+    worksheet = get_writable_sheet(NGOS_SHEET_NAME)
+    now = datetime.now().isoformat()
+    rows = [[
+        record['id'],
+        record.get('ngoName', ''),
+        record.get('foodNeeded', ''),
+        record.get('location', ''),
+        record.get('timestamp') or now
+    ] for record in records]
+    if rows:
+        worksheet.append_rows(rows)
+        LOCAL_WRITES.bump()
+        for record in records:
+            stats_rollup.add('ngos', record)
+    return len(rows)
+
+# Expired donations are moved to this tab of the donors spreadsheet
+ARCHIVE_WORKSHEET_NAME = 'Archive'
+
+def get_archive_worksheet(worksheet: 'gspread.Worksheet', headers: List[str]) -> 'gspread.Worksheet':
+    """Get or create the archive tab next to a hot worksheet."""
+    from gspread import WorksheetNotFound
+    
+    try:
+        return worksheet.spreadsheet.worksheet(ARCHIVE_WORKSHEET_NAME)
+    except WorksheetNotFound:
+        archive = worksheet.spreadsheet.add_worksheet(ARCHIVE_WORKSHEET_NAME, rows=1000, cols=len(headers))
+        archive.append_row(headers)
+        return archive
+
+def archive_expired_donors() -> int:
+    """Move long-expired donations from the hot tab to the archive tab. Returns rows moved."""
+    worksheet = get_writable_sheet(DONORS_SHEET_NAME)
+    values = worksheet.get_all_values()
+    if len(values) < 2:
+        return 0
+    
+    headers = values[0]
+    expired_rows = []
+    for row_number, row in enumerate(values[1:], start=2):
+        record = dict(zip(headers, row))
+        donor = {'timestamp': record.get('Timestamp', ''), 'expiryTime': record.get('Expiry Time (hours)', 0)}
+        if record.get('ID') and is_archivable(donor):
+            expired_rows.append(row_number)
+    if not expired_rows:
+        return 0
+    
+    get_archive_worksheet(worksheet, headers).append_rows([values[n - 1] for n in expired_rows])
+    # One request, bottom-up, so each deletion leaves the row numbers above it intact;
+    # rows appended meanwhile land below and are unaffected
+    worksheet.spreadsheet.batch_update({'requests': [{
+        'deleteDimension': {
+            'range': {'sheetId': worksheet.id, 'dimension': 'ROWS', 'startIndex': first - 1, 'endIndex': last}
+        }
+    } for first, last in reversed(row_ranges(expired_rows))]})
+    LOCAL_WRITES.bump()
+    # Rows were removed, so the replica's row positions no longer hold
+    donor_replica.invalidate()
+    for row_number in expired_rows:
+        stats_rollup.remove('donors', values[row_number - 1][headers.index('ID')])
+    print(f"🗄️ Archived {len(expired_rows)} expired donors")
+    return len(expired_rows)
 
 # Initialize geocoder for converting addresses to coordinates
-geolocator = Nominatim(user_agent="xylemcscis_food_donation")
+# Pooled keep-alive connections shared with the other outbound HTTP clients
+geolocator = Nominatim(
+    user_agent="xylemcscis_food_donation",
+    timeout=float(os.getenv('GEOCODER_TIMEOUT', '3')),
+    adapter_factory=PooledGeopyAdapter
+)
+
+# Geocode results shared by the request path and the background workers
+geocode_cache = GeocodeCache()
+
+# Geocodes and match results are snapshotted while serving and restored here at startup
+snapshotter = Snapshotter('app_sheets', {
+    'geocodes': (geocode_cache.memory_entries, geocode_cache.warm),
+    'matches': (match_memo.dump, match_memo.restore)
+})
+snapshotter.restore()
+
+# Supply/demand per region and food category, updated by this process's writes
+stats_rollup = SupplyDemandRollup(lambda location: cached_region(geocode_cache, location))
+
+# Edits made outside this process trigger a full recount, at most this often
+STATS_REBUILD_SECONDS = float(os.getenv('STATS_REBUILD_SECONDS', '300'))
+
+# On a cache miss, geocode inline (default) or leave it to the background workers
+GEOCODE_INLINE_ON_MISS = os.getenv('GEOCODE_INLINE_ON_MISS', '1') == '1'
+
+# Hedged, failover-capable routing over the GEOCODER_PROVIDERS
+geocoder_router = build_router(geolocator)
+
+def geocode_uncached(location: str) -> Optional[Tuple[float, float]]:
+    """Geocode without the cache; raises if every provider errored."""
+    return geocoder_router.geocode(location)
 
 def get_coordinates(location: str) -> Optional[Tuple[float, float]]:
-    """Convert location string to latitude and longitude coordinates."""
+    """Convert location string to latitude and longitude coordinates (cached)."""
+    if not GEOCODE_INLINE_ON_MISS:
+        found, coords = geocode_cache.lookup(location)
+        if not found:
+            enqueue_geocode(location)
+        return coords
+    return cached_geocode(geocode_cache, location, geocode_uncached)
+
+# Background jobs: geocode new records, then refresh matches off the request path
+job_queue = JobQueue()
+
+# Nominatim allows one request per second; background geocoding stays under it
+rate_limited_geocode = RateLimiter(
+    geocode_uncached,
+    min_delay_seconds=float(os.getenv('GEOCODE_MIN_DELAY_SECONDS', '1.0')),
+    max_retries=0,
+    swallow_exceptions=False
+)
+
+def handle_geocode_job(payload: Dict) -> None:
+    """Geocode a record's location, then queue a match refresh."""
+    location = payload['location']
+    found, _ = geocode_cache.lookup(location)
+    if not found:
+        coords = rate_limited_geocode(location)
+        geocode_cache.put(location, coords)
+        if coords is None:
+            raise PermanentJobError(f"Ungeocodable address: {location}")
+    stats_rollup.relocate(location)
+    job_queue.enqueue('refresh_matches', {}, dedupe_key='refresh_matches')
+
+def handle_archive_job(payload: Dict) -> None:
+    """Archive expired donations and finished jobs, then queue the next run."""
+    job_queue.enqueue_periodic('archive_expired', ARCHIVE_INTERVAL_SECONDS)
+    job_queue.purge_done()
     try:
-        location_data = geolocator.geocode(location)
-        if location_data:
-            return (location_data.latitude, location_data.longitude)
-        return None
+        archived = archive_expired_donors()
     except Exception as e:
-        print(f"Error geocoding location '{location}': {e}")
-        return None
+        record_archive_run(0, str(e))
+        raise
+    record_archive_run(archived)
+
+def handle_refresh_matches_job(payload: Dict) -> None:
+    """Recompute matches and publish the deltas to stream subscribers."""
+    matches = compute_current_matches()
+    if matches is not None:
+        match_event_log.update(matches)
+
+job_workers = WorkerPool(
+    job_queue,
+    {'geocode': handle_geocode_job, 'refresh_matches': handle_refresh_matches_job,
+     'archive_expired': handle_archive_job},
+    workers=int(os.getenv('JOB_WORKERS', '1'))
+)
+
+def enqueue_geocode(location: str) -> None:
+    """Queue background geocoding for a location (deduplicated while pending)."""
+    if not location:
+        return
+    job_queue.enqueue('geocode', {'location': location},
+                      dedupe_key=f'geocode:{normalize_location(location)}')
+    job_workers.ensure_started()
+    job_workers.wake()
 
 def calculate_distance(coord1: Tuple[float, float], coord2: Tuple[float, float]) -> float:
     """Calculate distance between two coordinates using geodesic distance."""
     return geodesic(coord1, coord2).kilometers
 
-def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict]) -> Optional[Dict]:
+def ngo_from_result(ngo_locations: List[Dict], result: Optional[Tuple[int, float]]) -> Optional[Dict]:
+    """Copy of the matched NGO with 'distance_km', from a (position, distance) result."""
+    if result is None:
+        return None
+    position, distance = result
+    closest_ngo = ngo_locations[position].copy()
+    closest_ngo['distance_km'] = round(distance, 2)
+    return closest_ngo
+
+def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict],
+                     ngo_index: Optional[NgoSpatialIndex] = None) -> Optional[Dict]:
     """Find the closest NGO to a donor based on coordinates."""
+    if ngo_index is not None:
+        return ngo_from_result(ngo_locations, ngo_index.nearest(donor_coords, calculate_distance))
+    
     closest_ngo = None
     min_distance = float('inf')
     
@@ -207,9 +557,8 @@ def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict
 
 # API Endpoints
 
-@app.route('/api/matches', methods=['GET'])
-def get_donor_ngo_matches():
-    """Main endpoint to get donor-NGO matches."""
+def build_matches_payload() -> Tuple[Dict, int]:
+    """Compute donor-NGO matches and return (payload, status)."""
     try:
         # Get data from Google Sheets
         donors = get_all_donors()
@@ -220,94 +569,305 @@ def get_donor_ngo_matches():
         for ngo in ngos:
             location = ngo.get('location', '')
             if location:
-                coords = get_coordinates(location)
+                # Client-supplied coordinates skip geocoding
+                coords = stored_coordinates(ngo) or get_coordinates(location)
                 if coords:
                     ngo['coordinates'] = coords
                     ngo_locations.append(ngo)
         
-        # Match donors with closest NGOs
-        matches = []
+        # Shared, memory-mapped grid index over the geocoded NGOs
+        ngo_index = get_ngo_index(ngo_locations)
+        
+        # Match donors with closest NGOs; large datasets are sharded by region
+        located = []
         for donor in donors:
             donor_location = donor.get('location', '')
             if donor_location:
-                donor_coords = get_coordinates(donor_location)
+                donor_coords = stored_coordinates(donor) or get_coordinates(donor_location)
                 if donor_coords:
-                    closest_ngo = find_closest_ngo(donor_coords, ngo_locations)
-                    if closest_ngo:
-                        match = {
-                            'donor': {
-                                'id': donor['id'],
-                                'food_type': donor.get('foodType', ''),
-                                'quantity': donor.get('quantity', ''),
-                                'expiry_time_hours': donor.get('expiryTime', 0),
-                                'location': donor_location,
-                                'coordinates': donor_coords,
-                                'timestamp': donor.get('timestamp', '')
-                            },
-                            'matched_ngo': {
-                                'id': closest_ngo['id'],
-                                'ngo_name': closest_ngo.get('ngoName', ''),
-                                'food_needed': closest_ngo.get('foodNeeded', ''),
-                                'location': closest_ngo.get('location', ''),
-                                'coordinates': closest_ngo['coordinates'],
-                                'distance_km': closest_ngo['distance_km'],
-                                'timestamp': closest_ngo.get('timestamp', '')
-                            }
-                        }
-                        matches.append(match)
+                    located.append((donor, donor_location, donor_coords))
         
-        return jsonify({
+        # Cost is geodesic distance, or travel time when MATCH_COST_MODE=travel_time
+        # Only NGOs whose needs overlap the donor's food are considered
+        match_started = time.perf_counter()
+        nearest, travel_minutes = match_memo.match(
+            [donor for donor, _, _ in located], [coords for _, _, coords in located], ngo_locations,
+            lambda: match_by_food_group(
+                [donor for donor, _, _ in located], [coords for _, _, coords in located], ngo_locations, ngo_index,
+                lambda coords, subset, subset_index: match_donors_by_cost(
+                    coords, subset, lambda group: match_donors(group, subset, subset_index))
+            )
+        )
+        match_log.record_run(
+            get_dataset_version(), [donor for donor, _, _ in located], [coords for _, _, coords in located],
+            ngo_locations, nearest, travel_minutes, (time.perf_counter() - match_started) * 1000
+        )
+        
+        matches = []
+        for (donor, donor_location, donor_coords), result, minutes in zip(located, nearest, travel_minutes):
+            closest_ngo = ngo_from_result(ngo_locations, result)
+            if closest_ngo:
+                match = {
+                    'donor': {
+                        'id': donor['id'],
+                        'food_type': donor.get('foodType', ''),
+                        'quantity': donor.get('quantity', ''),
+                        'expiry_time_hours': donor.get('expiryTime', 0),
+                        'location': donor_location,
+                        'coordinates': donor_coords,
+                        'timestamp': donor.get('timestamp', '')
+                    },
+                    'matched_ngo': {
+                        'id': closest_ngo['id'],
+                        'ngo_name': closest_ngo.get('ngoName', ''),
+                        'food_needed': closest_ngo.get('foodNeeded', ''),
+                        'location': closest_ngo.get('location', ''),
+                        'coordinates': closest_ngo['coordinates'],
+                        'distance_km': closest_ngo['distance_km'],
+                        'timestamp': closest_ngo.get('timestamp', '')
+                    }
+                }
+                if minutes is not None:
+                    match['matched_ngo']['travel_time_min'] = round(minutes, 1)
+                matches.append(match)
+        
+        return {
             'success': True,
             'total_donors': len(donors),
             'total_ngos': len(ngos),
             'successful_matches': len(matches),
             'matches': matches,
             'database': 'Google Sheets'
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500
 
-@app.route('/api/donors', methods=['GET'])
-def get_donors():
-    """Get all donors from Google Sheets."""
+def build_donors_payload() -> Tuple[Dict, int]:
+    """
+    Return (payload, status) listing live donors (all with ?include_expired=1).
+    
+    ?foodType=, ?since=, ?expires_before= and ?sort= are answered from an
+    index over the donors that is rebuilt only when the data changes.
+    """
     try:
-        donors = get_all_donors()
-        return jsonify({
+        query = parse_record_query(request.args, 'donors')
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    try:
+        index = get_record_index('sheets_donors', get_dataset_version(), lambda: get_all_donors(include_expired=True))
+        # Expired donations are dropped by the index's expiry range, not a full scan
+        active_at = None if request.args.get('include_expired') == '1' else current_time()
+        donors = index.select(query, active_at)
+        return {
             'success': True,
             'count': len(donors),
             'donors': donors,
             'database': 'Google Sheets'
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500
 
-@app.route('/api/ngos', methods=['GET'])
-def get_ngos():
-    """Get all NGOs from Google Sheets."""
+def build_ngos_payload() -> Tuple[Dict, int]:
+    """Return (payload, status) listing NGOs (?needs= filters by food category; ?since=, ?sort=)."""
     try:
-        ngos = get_all_ngos()
-        return jsonify({
+        query = parse_record_query(request.args, 'ngos')
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    try:
+        needs = request.args.get('needs')
+        if needs:
+            try:
+                ngos = filter_ngos_by_needs(get_all_ngos(), needs, get_dataset_version())
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }, 400
+            ngos = apply_query(ngos, query)
+        else:
+            ngos = get_record_index('sheets_ngos', get_dataset_version(), get_all_ngos).select(query)
+        
+        return {
             'success': True,
             'count': len(ngos),
             'ngos': ngos,
             'database': 'Google Sheets'
-        })
+        }, 200
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def build_stats_payload() -> Tuple[Dict, int]:
+    """Return (payload, status) with supply/demand rollups by region and food category."""
+    try:
+        # Local writes are applied as they happen; a full recount only follows
+        # a revision change, at most every STATS_REBUILD_SECONDS
+        revision = get_sheets_revision()
+        if stats_rollup.stale(revision, STATS_REBUILD_SECONDS):
+            stats_rollup.rebuild(get_all_donors(include_expired=True), get_all_ngos(), revision)
+        else:
+            # Records geocoded since they were added move out of 'unlocated'
+            stats_rollup.relocate()
+        
+        return {
+            'success': True,
+            **stats_rollup.snapshot(),
+            'database': 'Google Sheets'
+        }, 200
         
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def compute_current_matches() -> Optional[List[Dict]]:
+    """Matches for the stream notifier, or None if the computation failed."""
+    payload, status = build_matches_payload()
+    return payload['matches'] if status == 200 else None
+
+def build_routes_payload() -> Tuple[Dict, int]:
+    """
+    Plan multi-stop pickup routes from each NGO to its matched donors.
+    
+    Query options: capacity_kg, speed_kmh, budget_ms (solver time) and seed.
+    
+    Returns:
+        Tuple[Dict, int]: Routes per NGO, unroutable donors and solver stats, HTTP status
+    """
+    try:
+        options = route_options(request.args)
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    payload, status = build_matches_payload()
+    if status != 200:
+        return payload, status
+    try:
+        # Planned as of the end of the cache bucket, so cached deadlines stay feasible
+        plan = plan_routes(payload['matches'], now=live_view_horizon(), **options)
+        return dict({'success': True}, **plan), 200
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+# Match deltas pushed to /api/matches/stream subscribers
+match_event_log = MatchEventLog()
+match_notifier = MatchNotifier(compute_current_matches, match_event_log, version_fn=get_dataset_version)
+
+_archival_scheduled = False
+
+@app.before_request
+def schedule_archival():
+    """Queue the periodic archival job once this process starts taking requests."""
+    global _archival_scheduled
+    if not _archival_scheduled:
+        _archival_scheduled = True
+        job_queue.enqueue_periodic('archive_expired', ARCHIVE_INTERVAL_SECONDS)
+        job_workers.ensure_started()
+
+@app.before_request
+def start_snapshots():
+    """Snapshot the caches periodically once this process starts taking requests."""
+    snapshotter.start()
+
+@app.route('/api/matches', methods=['GET'])
+@admitted(admission, 'matches', lambda: stale_json_response(response_cache))
+def get_donor_ngo_matches():
+    """Main endpoint to get donor-NGO matches (ETag + version-keyed cache)."""
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_matches_payload)
+
+@app.route('/api/matches/stream', methods=['GET'])
+def stream_matches():
+    """Push match deltas (new, reassigned, expired) as Server-Sent Events."""
+    match_notifier.prime()
+    return Response(
+        sse_stream(match_event_log, request.headers.get('Last-Event-ID')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/routes', methods=['GET'])
+@admitted(admission, 'matches', lambda: stale_json_response(response_cache))
+def get_pickup_routes():
+    """Pickup routes per NGO under vehicle capacity and donor expiry (cached per dataset version and time bucket)."""
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_routes_payload)
+
+def export_records(kind: str) -> List[Dict]:
+    """Every donor (expired included) or NGO from the sheet replicas, for export.py."""
+    # Unlike get_all_donors(), errors propagate: an empty read would look like every row was deleted
+    if kind == 'donors':
+        return donor_replica.sync(get_or_create_sheet(DONORS_SHEET_NAME), get_dataset_version())
+    return ngo_replica.sync(get_or_create_sheet(NGOS_SHEET_NAME), get_dataset_version())
+
+# Columnar exports for analytics; runs outside the JSON endpoints and their caches
+exporter = Exporter(export_records, geocode_cache, match_log)
+
+@app.route('/api/export/<table>', methods=['GET'])
+@admitted(admission, 'exports')
+def export_table(table):
+    """Stream a table as Arrow IPC or Parquet (?format=); ?since=<watermark> returns only changed rows."""
+    try:
+        return export_response(exporter, table, request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except ExportUnavailable as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 501
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/donors', methods=['GET'])
+@admitted(admission, 'reads', lambda: stale_json_response(response_cache))
+def get_donors():
+    """Get all donors from Google Sheets."""
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_donors_payload)
+
+@app.route('/api/ngos', methods=['GET'])
+@admitted(admission, 'reads', lambda: stale_json_response(response_cache))
+def get_ngos():
+    """Get all NGOs from Google Sheets."""
+    return cached_json_response(response_cache, request_cache_key(), get_dataset_version(), build_ngos_payload)
+
+@app.route('/api/stats', methods=['GET'])
+@admitted(admission, 'reads')
+def get_stats():
+    """Supply (donated amounts) and demand (NGOs) per region and food category."""
+    payload, status = build_stats_payload()
+    return jsonify(payload), status
+
 @app.route('/api/donors', methods=['POST'])
+@admitted(admission, 'writes')
+@idempotent(idempotency_store)
 def add_donor_endpoint():
     """Add a new donor via API."""
     try:
@@ -328,13 +888,26 @@ def add_donor_endpoint():
                     'error': f'Missing required field: {field}'
                 }), 400
         
+        # Optional client coordinates (browser geolocation, map picker)
+        try:
+            coords = accept_client_coordinates(data, geocode_cache)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
         # Add donor to Google Sheets
-        success = add_donor(data)
+        donor_id = add_donor(data, coords)
         
-        if success:
+        if donor_id:
+            if coords is None:
+                enqueue_geocode(data['location'])
             return jsonify({
                 'success': True,
+                'pre_geocoded': coords is not None,
                 'message': 'Donor added successfully',
+                'id': donor_id,
                 'database': 'Google Sheets'
             })
         else:
@@ -350,6 +923,8 @@ def add_donor_endpoint():
         }), 500
 
 @app.route('/api/ngos', methods=['POST'])
+@admitted(admission, 'writes')
+@idempotent(idempotency_store)
 def add_ngo_endpoint():
     """Add a new NGO via API."""
     try:
@@ -370,13 +945,26 @@ def add_ngo_endpoint():
                     'error': f'Missing required field: {field}'
                 }), 400
         
+        # Optional client coordinates (browser geolocation, map picker)
+        try:
+            coords = accept_client_coordinates(data, geocode_cache)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
         # Add NGO to Google Sheets
-        success = add_ngo(data)
+        ngo_id = add_ngo(data, coords)
         
-        if success:
+        if ngo_id:
+            if coords is None:
+                enqueue_geocode(data['location'])
             return jsonify({
                 'success': True,
+                'pre_geocoded': coords is not None,
                 'message': 'NGO added successfully',
+                'id': ngo_id,
                 'database': 'Google Sheets'
             })
         else:
@@ -391,17 +979,130 @@ def add_ngo_endpoint():
             'error': str(e)
         }), 500
 
+@app.route('/api/import/<kind>', methods=['POST'])
+@admitted(admission, 'writes')
+def start_import(kind):
+    """Start a background bulk import from a CSV or NDJSON request body."""
+    if kind not in ('donors', 'ngos'):
+        return jsonify({
+            'success': False,
+            'error': 'Import kind must be donors or ngos'
+        }), 404
+    
+    fmt = request.args.get('format') or ('ndjson' if 'json' in (request.mimetype or '') else 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({
+            'success': False,
+            'error': 'Format must be csv or ndjson'
+        }), 400
+    
+    batch_size = request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+    if batch_size < 1:
+        return jsonify({
+            'success': False,
+            'error': 'batch_size must be at least 1'
+        }), 400
+    
+    try:
+        import_id = start_background_import(
+            request.stream, kind, fmt,
+            bulk_add_donors if kind == 'donors' else bulk_add_ngos,
+            geocode_cache, rate_limited_geocode,
+            batch_size=batch_size
+        )
+        return jsonify({
+            'success': True,
+            'import_id': import_id,
+            'status_url': f'/api/import/{import_id}'
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/import/<import_id>', methods=['GET'])
+def get_import_status(import_id):
+    """Progress counters of a bulk import."""
+    status = import_status(import_id)
+    if status is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown import'
+        }), 404
+    return jsonify({'success': True, 'import': status})
+
+@app.route('/api/shards/match', methods=['POST'])
+@admitted(admission, 'matches')
+def match_shard_endpoint():
+    """Match one geographic shard on behalf of a coordinating node."""
+    try:
+        task = request.get_json()
+        if not task or 'donors' not in task or 'ngos' not in task or 'bounds' not in task:
+            return jsonify({
+                'success': False,
+                'error': 'Shard task must include donors, ngos and bounds'
+            }), 400
+        return jsonify({'success': True, 'results': match_shard(task)})
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def job_metrics():
+    """Background job queue depth, worker and geocode cache stats."""
+    try:
+        return jsonify({
+            'success': True,
+            'queue': job_queue.metrics(),
+            'workers': job_workers.stats(),
+            'geocode_cache': geocode_cache.stats(),
+            'dead_letters': job_queue.dead_letters(limit=20)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
-    sheets_status = "connected" if sheets_client else "disconnected"
+    # Never blocks on Google: reports whether the lazy client exists yet
+    if _sheets_client is not None:
+        sheets_status = "connected"
+    elif _sheets_client_error:
+        sheets_status = "disconnected"
+    else:
+        sheets_status = "not_initialized"
     
     return jsonify({
         'status': 'healthy',
         'service': 'XylemCSCIS Food Donation Backend (Google Sheets)',
         'version': '1.0.0',
         'database': 'Google Sheets',
-        'sheets_status': sheets_status
+        'sheets_status': sheets_status,
+        'response_cache': response_cache.stats(),
+        'match_stream': match_event_log.stats(),
+        'http_pool': http_stats(),
+        'sharding': shard_stats(),
+        'parallel_match': parallel_stats(),
+        'travel_time': travel_stats(),
+        'retention': retention_stats(),
+        'idempotency': idempotency_store.stats(),
+        'client_coordinates': coordinate_stats(),
+        'geocoder': geocoder_router.stats(),
+        'admission': admission.stats(),
+        'routes': route_stats(),
+        'match_log': match_log.stats(),
+        'snapshots': snapshotter.stats(),
+        'match_memo': match_memo.stats(),
+        'sheets_sync': {'donors': donor_replica.stats(), 'ngos': ngo_replica.stats()}
     })
 
 @app.route('/', methods=['GET'])
@@ -413,10 +1114,18 @@ def home():
         'database': 'Google Sheets',
         'endpoints': {
             'GET /api/matches': 'Get donor-NGO matches based on location',
-            'GET /api/donors': 'Get all donors',
+            'GET /api/matches/stream': 'Server-Sent Events stream of match changes',
+            'GET /api/routes': 'Pickup routes per NGO (?capacity_kg=&speed_kmh=&budget_ms=&seed=)',
+            'GET /api/export/<table>': 'Arrow/Parquet export of donors, ngos, coordinates or matches (?format=&since=)',
+            'GET /api/donors': 'Get all donors (?foodType=, ?since=, ?expires_before=, ?sort=-timestamp)',
             'POST /api/donors': 'Add new donor',
-            'GET /api/ngos': 'Get all NGOs',
+            'GET /api/ngos': 'Get all NGOs (?needs=bread filters by food category; ?since=, ?sort=)',
             'POST /api/ngos': 'Add new NGO',
+            'GET /api/stats': 'Supply and demand by region and food category',
+            'POST /api/import/<kind>': 'Bulk import donors or ngos from CSV/NDJSON',
+            'GET /api/import/<import_id>': 'Bulk import progress',
+            'POST /api/shards/match': 'Match one regional shard (used by a coordinating node)',
+            'GET /api/jobs': 'Background job queue metrics',
             'GET /api/health': 'Health check',
             'GET /': 'This help message'
         },
@@ -426,6 +1135,9 @@ def home():
         }
     })
 
+if os.getenv('PREWARM_CLIENTS', '0') == '1':
+    prewarm_clients()
+
 if __name__ == '__main__':
     print("🚀 Starting XylemCSCIS Food Donation Backend (Google Sheets)...")
     print("📊 Database: Google Sheets")
@@ -1,36 +1,187 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 import json
+import os
+import time
+from response_cache import ResponseCache, cached_json_response, request_cache_key, stale_json_response
+from match_events import MatchEventLog, MatchNotifier, sse_stream
+from geopy.extra.rate_limiter import RateLimiter
+from geocode_cache import GeocodeCache, cached_geocode, normalize_location
+from job_queue import JobQueue, PermanentJobError, WorkerPool
+from spatial_index import NgoSpatialIndex, get_ngo_index
+from sharding import match_donors, match_shard, shard_stats
+from parallel_match import parallel_stats
+from travel_time import match_donors_by_cost, travel_stats
+from food_taxonomy import filter_ngos_by_needs, match_by_food_group
+from quantity import SupplyDemandRollup, cached_region, quantity_fields
+from ids import new_id
+from idempotency import IdempotencyStore, idempotent
+from admission import admitted, default_controller
+from memory_store import MemoryStore
+from client_coordinates import accept_client_coordinates, coordinate_stats, stored_coordinates
+from bulk_import import DEFAULT_BATCH_SIZE, import_status, start_background_import
+from retention import (ARCHIVE_INTERVAL_SECONDS, current_time, filter_active, live_version, live_view_horizon,
+                       partition_archivable, record_archive_run, retention_stats)
+from geocoder_router import build_router
+from route_planner import plan_routes, route_options, route_stats
+from match_log import MatchLog
+from export import ExportUnavailable, Exporter, export_response
+from snapshots import MatchMemo, Snapshotter
+from record_query import apply_query, get_record_index, parse_record_query
+from http_pool import PooledGeopyAdapter, http_stats
 
 app = Flask(__name__)
 
 # Initialize geocoder for converting addresses to coordinates
-geolocator = Nominatim(user_agent="xylemcscis_food_donation")
+# Pooled keep-alive connections shared with the other outbound HTTP clients
+geolocator = Nominatim(
+    user_agent="xylemcscis_food_donation",
+    timeout=float(os.getenv('GEOCODER_TIMEOUT', '3')),
+    adapter_factory=PooledGeopyAdapter
+)
 
-# In-memory storage for demo (simulates Google Sheets)
-DEMO_DONORS = []
-DEMO_NGOS = []
+def cached_coordinates(record: Dict) -> Optional[Tuple[float, float]]:
+    """Client-supplied or already geocoded coordinates of a record (never calls the geocoder)."""
+    return stored_coordinates(record) or geocode_cache.get(record.get('location', ''))
+
+# In-memory storage for demo (simulates Google Sheets); thread-safe, with
+# snapshot reads and a geohash index over already-geocoded records
+DEMO_DONORS = MemoryStore(locate=cached_coordinates)
+DEMO_NGOS = MemoryStore(locate=cached_coordinates)
+
+# Cold storage for expired donations moved out by the archival job
+DEMO_DONORS_ARCHIVE = MemoryStore()
+
+response_cache = ResponseCache()
+
+# Concurrency limits and load shedding for the matches, read and write endpoints
+admission = default_controller()
+
+# Append-only audit log of match inputs and decisions (match_log.py scan/replay)
+match_log = MatchLog()
+
+# Match results by input digest, so unchanged data skips the matcher (also across restarts)
+match_memo = MatchMemo()
+
+# Replayed responses for POSTs retried with the same Idempotency-Key
+idempotency_store = IdempotencyStore()
+
+def get_dataset_version() -> str:
+    """Current version of the demo dataset (store versions move on every write)."""
+    return f"{DEMO_DONORS.version}.{DEMO_NGOS.version}"
+
+# Geocode results shared by the request path and the background workers
+geocode_cache = GeocodeCache()
+
+# Geocodes and match results are snapshotted while serving and restored here at startup
+snapshotter = Snapshotter('app_sheets_demo', {
+    'geocodes': (geocode_cache.memory_entries, geocode_cache.warm),
+    'matches': (match_memo.dump, match_memo.restore)
+})
+snapshotter.restore()
+
+# Supply/demand per region and food category, updated on every write
+stats_rollup = SupplyDemandRollup(lambda location: cached_region(geocode_cache, location))
+
+# On a cache miss, geocode inline (default) or leave it to the background workers
+GEOCODE_INLINE_ON_MISS = os.getenv('GEOCODE_INLINE_ON_MISS', '1') == '1'
+
+# Hedged, failover-capable routing over the GEOCODER_PROVIDERS
+geocoder_router = build_router(geolocator)
+
+def geocode_uncached(location: str) -> Optional[Tuple[float, float]]:
+    """Geocode without the cache; raises if every provider errored."""
+    return geocoder_router.geocode(location)
 
 def get_coordinates(location: str) -> Optional[Tuple[float, float]]:
-    """Convert location string to latitude and longitude coordinates."""
+    """Convert location string to latitude and longitude coordinates (cached)."""
+    if not GEOCODE_INLINE_ON_MISS:
+        found, coords = geocode_cache.lookup(location)
+        if not found:
+            enqueue_geocode(location)
+        return coords
+    return cached_geocode(geocode_cache, location, geocode_uncached)
+
+# Background jobs: geocode new records, then refresh matches off the request path
+job_queue = JobQueue()
+
+# Nominatim allows one request per second; background geocoding stays under it
+rate_limited_geocode = RateLimiter(
+    geocode_uncached,
+    min_delay_seconds=float(os.getenv('GEOCODE_MIN_DELAY_SECONDS', '1.0')),
+    max_retries=0,
+    swallow_exceptions=False
+)
+
+def handle_geocode_job(payload: Dict) -> None:
+    """Geocode a record's location, then queue a match refresh."""
+    location = payload['location']
+    found, _ = geocode_cache.lookup(location)
+    if not found:
+        coords = rate_limited_geocode(location)
+        geocode_cache.put(location, coords)
+        if coords is None:
+            raise PermanentJobError(f"Ungeocodable address: {location}")
+    stats_rollup.relocate(location)
+    DEMO_DONORS.refresh_locations()
+    DEMO_NGOS.refresh_locations()
+    job_queue.enqueue('refresh_matches', {}, dedupe_key='refresh_matches')
+
+def handle_archive_job(payload: Dict) -> None:
+    """Archive expired donations and finished jobs, then queue the next run."""
+    job_queue.enqueue_periodic('archive_expired', ARCHIVE_INTERVAL_SECONDS)
+    job_queue.purge_done()
     try:
-        location_data = geolocator.geocode(location)
-        if location_data:
-            return (location_data.latitude, location_data.longitude)
-        return None
+        archived = archive_expired_donors()
     except Exception as e:
-        print(f"Error geocoding location '{location}': {e}")
-        return None
+        record_archive_run(0, str(e))
+        raise
+    record_archive_run(archived)
+
+def handle_refresh_matches_job(payload: Dict) -> None:
+    """Recompute matches and publish the deltas to stream subscribers."""
+    matches = compute_current_matches()
+    if matches is not None:
+        match_event_log.update(matches)
+
+job_workers = WorkerPool(
+    job_queue,
+    {'geocode': handle_geocode_job, 'refresh_matches': handle_refresh_matches_job,
+     'archive_expired': handle_archive_job},
+    workers=int(os.getenv('JOB_WORKERS', '1'))
+)
+
+def enqueue_geocode(location: str) -> None:
+    """Queue background geocoding for a location (deduplicated while pending)."""
+    if not location:
+        return
+    job_queue.enqueue('geocode', {'location': location},
+                      dedupe_key=f'geocode:{normalize_location(location)}')
+    job_workers.ensure_started()
+    job_workers.wake()
 
 def calculate_distance(coord1: Tuple[float, float], coord2: Tuple[float, float]) -> float:
     """Calculate distance between two coordinates using geodesic distance."""
     return geodesic(coord1, coord2).kilometers
 
-def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict]) -> Optional[Dict]:
+def ngo_from_result(ngo_locations: List[Dict], result: Optional[Tuple[int, float]]) -> Optional[Dict]:
+    """Copy of the matched NGO with 'distance_km', from a (position, distance) result."""
+    if result is None:
+        return None
+    position, distance = result
+    closest_ngo = ngo_locations[position].copy()
+    closest_ngo['distance_km'] = round(distance, 2)
+    return closest_ngo
+
+def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict],
+                     ngo_index: Optional[NgoSpatialIndex] = None) -> Optional[Dict]:
     """Find the closest NGO to a donor based on coordinates."""
+    if ngo_index is not None:
+        return ngo_from_result(ngo_locations, ngo_index.nearest(donor_coords, calculate_distance))
+    
     closest_ngo = None
     min_distance = float('inf')
     
@@ -44,11 +195,11 @@ def find_closest_ngo(donor_coords: Tuple[float, float], ngo_locations: List[Dict
     
     return closest_ngo
 
-def add_donor_demo(donor_data: Dict) -> bool:
-    """Add a new donor to demo storage."""
+def add_donor_demo(donor_data: Dict, coords: Optional[Tuple[float, float]] = None) -> Optional[str]:
+    """Add a new donor to demo storage, with client coordinates if validated."""
     try:
         # Generate unique ID
-        donor_id = f"donor_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        donor_id = new_id('donor')
         
         # Create donor record
         donor = {
@@ -57,21 +208,26 @@ def add_donor_demo(donor_data: Dict) -> bool:
             'quantity': donor_data.get('quantity', ''),
             'expiryTime': donor_data.get('expiryTime', 0),
             'location': donor_data.get('location', ''),
-            'timestamp': datetime.now().isoformat()
+            'timestamp': datetime.now().isoformat(),
+            # Parsed once here; stats and readers use the normalized amount
+            **quantity_fields(donor_data.get('quantity', ''))
         }
+        if coords:
+            donor['lat'], donor['lon'] = coords
         
-        DEMO_DONORS.append(donor)
+        DEMO_DONORS.put(donor)
+        stats_rollup.add('donors', donor)
         print(f"✅ Added donor: {donor_id}")
-        return True
+        return donor_id
     except Exception as e:
         print(f"Error adding donor: {e}")
-        return False
+        return None
 
-def add_ngo_demo(ngo_data: Dict) -> bool:
-    """Add a new NGO to demo storage."""
+def add_ngo_demo(ngo_data: Dict, coords: Optional[Tuple[float, float]] = None) -> Optional[str]:
+    """Add a new NGO to demo storage, with client coordinates if validated."""
     try:
         # Generate unique ID
-        ngo_id = f"ngo_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        ngo_id = new_id('ngo')
         
         # Create NGO record
         ngo = {
@@ -81,66 +237,138 @@ def add_ngo_demo(ngo_data: Dict) -> bool:
             'location': ngo_data.get('location', ''),
             'timestamp': datetime.now().isoformat()
         }
+        if coords:
+            ngo['lat'], ngo['lon'] = coords
         
-        DEMO_NGOS.append(ngo)
+        DEMO_NGOS.put(ngo)
+        stats_rollup.add('ngos', ngo)
         print(f"✅ Added NGO: {ngo_id}")
-        return True
+        return ngo_id
     except Exception as e:
         print(f"Error adding NGO: {e}")
-        return False
+        return None
+
+def bulk_add_donors(records: List[Dict]) -> int:
+    """Add many donors to demo storage. Returns records written."""
+    now = datetime.now().isoformat()
+    donors = [{
+        'id': record['id'],
+        'foodType': record.get('foodType', ''),
+        'quantity': record.get('quantity', ''),
+        'expiryTime': record.get('expiryTime', 0),
+        'location': record.get('location', ''),
+        'timestamp': record.get('timestamp') or now,
+        **quantity_fields(record.get('quantity', ''), record.get('amount'), record.get('unit'))
+    } for record in records]
+    DEMO_DONORS.put_many(donors)
+    for donor in donors:
+        stats_rollup.add('donors', donor)
+    return len(records)
+
+def bulk_add_ngos(records: List[Dict]) -> int:
+    """Add many NGOs to demo storage. Returns records written."""
+    now = datetime.now().isoformat()
+    ngos = [{
+        'id': record['id'],
+        'ngoName': record.get('ngoName', ''),
+        'foodNeeded': record.get('foodNeeded', ''),
+        'location': record.get('location', ''),
+        'timestamp': record.get('timestamp') or now
+    } for record in records]
+    DEMO_NGOS.put_many(ngos)
+    for ngo in ngos:
+        stats_rollup.add('ngos', ngo)
+    return len(records)
+
+def archive_expired_donors() -> int:
+    """Move long-expired donations to the demo archive. Returns records moved."""
+    _, archive = partition_archivable(DEMO_DONORS.values())
+    if not archive:
+        return 0
+    # Copied to the archive first, so a donation is never in neither store
+    DEMO_DONORS_ARCHIVE.put_many(archive)
+    DEMO_DONORS.delete_many([donor['id'] for donor in archive])
+    for donor in archive:
+        stats_rollup.remove('donors', donor['id'])
+    print(f"🗄️ Archived {len(archive)} expired donors")
+    return len(archive)
 
 # API Endpoints
 
-@app.route('/api/matches', methods=['GET'])
-def get_donor_ngo_matches():
-    """Main endpoint to get donor-NGO matches."""
+def build_matches_payload() -> Tuple[Dict, int]:
+    """Compute donor-NGO matches and return (payload, status)."""
     try:
-        # Get data from demo storage
-        donors = DEMO_DONORS.copy()
-        ngos = DEMO_NGOS.copy()
+        # Get data from demo storage (live donations only), one snapshot per store
+        donors = filter_active(DEMO_DONORS.values())
+        ngos = DEMO_NGOS.values()
         
-        # Get coordinates for all NGOs
+        # Get coordinates for all NGOs; stored records are shared, so annotate copies
         ngo_locations = []
         for ngo in ngos:
             location = ngo.get('location', '')
             if location:
-                coords = get_coordinates(location)
+                # Client-supplied coordinates skip geocoding
+                coords = stored_coordinates(ngo) or get_coordinates(location)
                 if coords:
-                    ngo['coordinates'] = coords
-                    ngo_locations.append(ngo)
+                    ngo_locations.append({**ngo, 'coordinates': coords})
         
-        # Match donors with closest NGOs
-        matches = []
+        # Shared, memory-mapped grid index over the geocoded NGOs
+        ngo_index = get_ngo_index(ngo_locations)
+        
+        # Match donors with closest NGOs; large datasets are sharded by region
+        located = []
         for donor in donors:
             donor_location = donor.get('location', '')
             if donor_location:
-                donor_coords = get_coordinates(donor_location)
+                donor_coords = stored_coordinates(donor) or get_coordinates(donor_location)
                 if donor_coords:
-                    closest_ngo = find_closest_ngo(donor_coords, ngo_locations)
-                    if closest_ngo:
-                        match = {
-                            'donor': {
-                                'id': donor['id'],
-                                'food_type': donor.get('foodType', ''),
-                                'quantity': donor.get('quantity', ''),
-                                'expiry_time_hours': donor.get('expiryTime', 0),
-                                'location': donor_location,
-                                'coordinates': donor_coords,
-                                'timestamp': donor.get('timestamp', '')
-                            },
-                            'matched_ngo': {
-                                'id': closest_ngo['id'],
-                                'ngo_name': closest_ngo.get('ngoName', ''),
-                                'food_needed': closest_ngo.get('foodNeeded', ''),
-                                'location': closest_ngo.get('location', ''),
-                                'coordinates': closest_ngo['coordinates'],
-                                'distance_km': closest_ngo['distance_km'],
-                                'timestamp': closest_ngo.get('timestamp', '')
-                            }
-                        }
-                        matches.append(match)
+                    located.append((donor, donor_location, donor_coords))
         
-        return jsonify({
+        # Cost is geodesic distance, or travel time when MATCH_COST_MODE=travel_time
+        # Only NGOs whose needs overlap the donor's food are considered
+        match_started = time.perf_counter()
+        nearest, travel_minutes = match_memo.match(
+            [donor for donor, _, _ in located], [coords for _, _, coords in located], ngo_locations,
+            lambda: match_by_food_group(
+                [donor for donor, _, _ in located], [coords for _, _, coords in located], ngo_locations, ngo_index,
+                lambda coords, subset, subset_index: match_donors_by_cost(
+                    coords, subset, lambda group: match_donors(group, subset, subset_index))
+            )
+        )
+        match_log.record_run(
+            get_dataset_version(), [donor for donor, _, _ in located], [coords for _, _, coords in located],
+            ngo_locations, nearest, travel_minutes, (time.perf_counter() - match_started) * 1000
+        )
+        
+        matches = []
+        for (donor, donor_location, donor_coords), result, minutes in zip(located, nearest, travel_minutes):
+            closest_ngo = ngo_from_result(ngo_locations, result)
+            if closest_ngo:
+                match = {
+                    'donor': {
+                        'id': donor['id'],
+                        'food_type': donor.get('foodType', ''),
+                        'quantity': donor.get('quantity', ''),
+                        'expiry_time_hours': donor.get('expiryTime', 0),
+                        'location': donor_location,
+                        'coordinates': donor_coords,
+                        'timestamp': donor.get('timestamp', '')
+                    },
+                    'matched_ngo': {
+                        'id': closest_ngo['id'],
+                        'ngo_name': closest_ngo.get('ngoName', ''),
+                        'food_needed': closest_ngo.get('foodNeeded', ''),
+                        'location': closest_ngo.get('location', ''),
+                        'coordinates': closest_ngo['coordinates'],
+                        'distance_km': closest_ngo['distance_km'],
+                        'timestamp': closest_ngo.get('timestamp', '')
+                    }
+                }
+                if minutes is not None:
+                    match['matched_ngo']['travel_time_min'] = round(minutes, 1)
+                matches.append(match)
+        
+        return {
             'success': True,
             'total_donors': len(donors),
             'total_ngos': len(ngos),
@@ -148,49 +376,226 @@ def get_donor_ngo_matches():
             'matches': matches,
             'database': 'Demo Mode (In-Memory)',
             'note': 'Data is stored in memory and will be lost when server restarts'
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500
 
-@app.route('/api/donors', methods=['GET'])
-def get_donors():
-    """Get all donors from demo storage."""
+def build_donors_payload() -> Tuple[Dict, int]:
+    """
+    Return (payload, status) listing live donors (all with ?include_expired=1).
+    
+    ?foodType=, ?since=, ?expires_before= and ?sort= are answered from an
+    index over the donors that is rebuilt only when the data changes.
+    """
     try:
-        return jsonify({
+        query = parse_record_query(request.args, 'donors')
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    try:
+        index = get_record_index('demo_donors', str(DEMO_DONORS.version), DEMO_DONORS.values)
+        # Expired donations are dropped by the index's expiry range, not a full scan
+        active_at = None if request.args.get('include_expired') == '1' else current_time()
+        donors = index.select(query, active_at)
+        return {
             'success': True,
-            'count': len(DEMO_DONORS),
-            'donors': DEMO_DONORS,
+            'count': len(donors),
+            'donors': donors,
             'database': 'Demo Mode (In-Memory)'
-        })
+        }, 200
         
     except Exception as e:
-        return jsonify({
+        return {
             'success': False,
             'error': str(e)
-        }), 500
+        }, 500
 
-@app.route('/api/ngos', methods=['GET'])
-def get_ngos():
-    """Get all NGOs from demo storage."""
+def build_ngos_payload() -> Tuple[Dict, int]:
+    """Return (payload, status) listing NGOs (?needs= filters by food category; ?since=, ?sort=)."""
     try:
-        return jsonify({
+        query = parse_record_query(request.args, 'ngos')
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    try:
+        needs = request.args.get('needs')
+        if needs:
+            try:
+                ngos = filter_ngos_by_needs(DEMO_NGOS.values(), needs, get_dataset_version())
+            except ValueError as e:
+                return {
+                    'success': False,
+                    'error': str(e)
+                }, 400
+            ngos = apply_query(ngos, query)
+        else:
+            ngos = get_record_index('demo_ngos', str(DEMO_NGOS.version), DEMO_NGOS.values).select(query)
+        
+        return {
             'success': True,
-            'count': len(DEMO_NGOS),
-            'ngos': DEMO_NGOS,
+            'count': len(ngos),
+            'ngos': ngos,
             'database': 'Demo Mode (In-Memory)'
-        })
+        }, 200
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def build_stats_payload() -> Tuple[Dict, int]:
+    """Return (payload, status) with supply/demand rollups by region and food category."""
+    try:
+        # Records geocoded since they were added move out of 'unlocated'
+        stats_rollup.relocate()
+        return {
+            'success': True,
+            **stats_rollup.snapshot(),
+            'database': 'Demo Mode (In-Memory)'
+        }, 200
         
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+def compute_current_matches() -> Optional[List[Dict]]:
+    """Matches for the stream notifier, or None if the computation failed."""
+    payload, status = build_matches_payload()
+    return payload['matches'] if status == 200 else None
+
+def build_routes_payload() -> Tuple[Dict, int]:
+    """
+    Plan multi-stop pickup routes from each NGO to its matched donors.
+    
+    Query options: capacity_kg, speed_kmh, budget_ms (solver time) and seed.
+    
+    Returns:
+        Tuple[Dict, int]: Routes per NGO, unroutable donors and solver stats, HTTP status
+    """
+    try:
+        options = route_options(request.args)
+    except ValueError as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 400
+    payload, status = build_matches_payload()
+    if status != 200:
+        return payload, status
+    try:
+        # Planned as of the end of the cache bucket, so cached deadlines stay feasible
+        plan = plan_routes(payload['matches'], now=live_view_horizon(), **options)
+        return dict({'success': True}, **plan), 200
+    except Exception as e:
+        return {
+            'success': False,
+            'error': str(e)
+        }, 500
+
+# Match deltas pushed to /api/matches/stream subscribers
+match_event_log = MatchEventLog()
+match_notifier = MatchNotifier(compute_current_matches, match_event_log, version_fn=get_dataset_version)
+
+_archival_scheduled = False
+
+@app.before_request
+def schedule_archival():
+    """Queue the periodic archival job once this process starts taking requests."""
+    global _archival_scheduled
+    if not _archival_scheduled:
+        _archival_scheduled = True
+        job_queue.enqueue_periodic('archive_expired', ARCHIVE_INTERVAL_SECONDS)
+        job_workers.ensure_started()
+
+@app.before_request
+def start_snapshots():
+    """Snapshot the caches periodically once this process starts taking requests."""
+    snapshotter.start()
+
+@app.route('/api/matches', methods=['GET'])
+@admitted(admission, 'matches', lambda: stale_json_response(response_cache))
+def get_donor_ngo_matches():
+    """Main endpoint to get donor-NGO matches (ETag + version-keyed cache)."""
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_matches_payload)
+
+@app.route('/api/matches/stream', methods=['GET'])
+def stream_matches():
+    """Push match deltas (new, reassigned, expired) as Server-Sent Events."""
+    match_notifier.prime()
+    return Response(
+        sse_stream(match_event_log, request.headers.get('Last-Event-ID')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@app.route('/api/routes', methods=['GET'])
+@admitted(admission, 'matches', lambda: stale_json_response(response_cache))
+def get_pickup_routes():
+    """Pickup routes per NGO under vehicle capacity and donor expiry (cached per dataset version and time bucket)."""
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_routes_payload)
+
+def export_records(kind: str) -> List[Dict]:
+    """Every donor (expired included) or NGO in demo storage, for export.py."""
+    return DEMO_DONORS.values() if kind == 'donors' else DEMO_NGOS.values()
+
+# Columnar exports for analytics; runs outside the JSON endpoints and their caches
+exporter = Exporter(export_records, geocode_cache, match_log)
+
+@app.route('/api/export/<table>', methods=['GET'])
+@admitted(admission, 'exports')
+def export_table(table):
+    """Stream a table as Arrow IPC or Parquet (?format=); ?since=<watermark> returns only changed rows."""
+    try:
+        return export_response(exporter, table, request.args)
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except ExportUnavailable as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 501
     except Exception as e:
         return jsonify({
             'success': False,
             'error': str(e)
         }), 500
 
+@app.route('/api/donors', methods=['GET'])
+@admitted(admission, 'reads', lambda: stale_json_response(response_cache))
+def get_donors():
+    """Get all donors from demo storage."""
+    return cached_json_response(response_cache, request_cache_key(), live_version(get_dataset_version()), build_donors_payload)
+
+@app.route('/api/ngos', methods=['GET'])
+@admitted(admission, 'reads', lambda: stale_json_response(response_cache))
+def get_ngos():
+    """Get all NGOs from demo storage."""
+    return cached_json_response(response_cache, request_cache_key(), get_dataset_version(), build_ngos_payload)
+
+@app.route('/api/stats', methods=['GET'])
+@admitted(admission, 'reads')
+def get_stats():
+    """Supply (donated amounts) and demand (NGOs) per region and food category."""
+    payload, status = build_stats_payload()
+    return jsonify(payload), status
+
 @app.route('/api/donors', methods=['POST'])
+@admitted(admission, 'writes')
+@idempotent(idempotency_store)
 def add_donor_endpoint():
     """Add a new donor via API."""
     try:
@@ -211,13 +616,26 @@ def add_donor_endpoint():
                     'error': f'Missing required field: {field}'
                 }), 400
         
+        # Optional client coordinates (browser geolocation, map picker)
+        try:
+            coords = accept_client_coordinates(data, geocode_cache)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
         # Add donor to demo storage
-        success = add_donor_demo(data)
+        donor_id = add_donor_demo(data, coords)
         
-        if success:
+        if donor_id:
+            if coords is None:
+                enqueue_geocode(data['location'])
             return jsonify({
                 'success': True,
+                'pre_geocoded': coords is not None,
                 'message': 'Donor added successfully',
+                'id': donor_id,
                 'database': 'Demo Mode (In-Memory)'
             })
         else:
@@ -233,6 +651,8 @@ def add_donor_endpoint():
         }), 500
 
 @app.route('/api/ngos', methods=['POST'])
+@admitted(admission, 'writes')
+@idempotent(idempotency_store)
 def add_ngo_endpoint():
     """Add a new NGO via API."""
     try:
@@ -253,13 +673,26 @@ def add_ngo_endpoint():
                     'error': f'Missing required field: {field}'
                 }), 400
         
+        # Optional client coordinates (browser geolocation, map picker)
+        try:
+            coords = accept_client_coordinates(data, geocode_cache)
+        except ValueError as e:
+            return jsonify({
+                'success': False,
+                'error': str(e)
+            }), 400
+        
         # Add NGO to demo storage
-        success = add_ngo_demo(data)
+        ngo_id = add_ngo_demo(data, coords)
         
-        if success:
+        if ngo_id:
+            if coords is None:
+                enqueue_geocode(data['location'])
             return jsonify({
                 'success': True,
+                'pre_geocoded': coords is not None,
                 'message': 'NGO added successfully',
+                'id': ngo_id,
                 'database': 'Demo Mode (In-Memory)'
             })
         else:
@@ -274,6 +707,97 @@ def add_ngo_endpoint():
             'error': str(e)
         }), 500
 
+@app.route('/api/import/<kind>', methods=['POST'])
+@admitted(admission, 'writes')
+def start_import(kind):
+    """Start a background bulk import from a CSV or NDJSON request body."""
+    if kind not in ('donors', 'ngos'):
+        return jsonify({
+            'success': False,
+            'error': 'Import kind must be donors or ngos'
+        }), 404
+    
+    fmt = request.args.get('format') or ('ndjson' if 'json' in (request.mimetype or '') else 'csv')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({
+            'success': False,
+            'error': 'Format must be csv or ndjson'
+        }), 400
+    
+    batch_size = request.args.get('batch_size', DEFAULT_BATCH_SIZE, type=int)
+    if batch_size < 1:
+        return jsonify({
+            'success': False,
+            'error': 'batch_size must be at least 1'
+        }), 400
+    
+    try:
+        import_id = start_background_import(
+            request.stream, kind, fmt,
+            bulk_add_donors if kind == 'donors' else bulk_add_ngos,
+            geocode_cache, rate_limited_geocode,
+            batch_size=batch_size
+        )
+        return jsonify({
+            'success': True,
+            'import_id': import_id,
+            'status_url': f'/api/import/{import_id}'
+        }), 202
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/import/<import_id>', methods=['GET'])
+def get_import_status(import_id):
+    """Progress counters of a bulk import."""
+    status = import_status(import_id)
+    if status is None:
+        return jsonify({
+            'success': False,
+            'error': 'Unknown import'
+        }), 404
+    return jsonify({'success': True, 'import': status})
+
+@app.route('/api/shards/match', methods=['POST'])
+@admitted(admission, 'matches')
+def match_shard_endpoint():
+    """Match one geographic shard on behalf of a coordinating node."""
+    try:
+        task = request.get_json()
+        if not task or 'donors' not in task or 'ngos' not in task or 'bounds' not in task:
+            return jsonify({
+                'success': False,
+                'error': 'Shard task must include donors, ngos and bounds'
+            }), 400
+        return jsonify({'success': True, 'results': match_shard(task)})
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@app.route('/api/jobs', methods=['GET'])
+def job_metrics():
+    """Background job queue depth, worker and geocode cache stats."""
+    try:
+        return jsonify({
+            'success': True,
+            'queue': job_queue.metrics(),
+            'workers': job_workers.stats(),
+            'geocode_cache': geocode_cache.stats(),
+            'dead_letters': job_queue.dead_letters(limit=20)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     """Health check endpoint."""
@@ -282,7 +806,24 @@ def health_check():
         'service': 'XylemCSCIS Food Donation Backend (Demo Mode)',
         'version': '1.0.0',
         'database': 'Demo Mode (In-Memory)',
-        'sheets_status': 'demo_mode'
+        'sheets_status': 'demo_mode',
+        'dataset_version': get_dataset_version(),
+        'response_cache': response_cache.stats(),
+        'match_stream': match_event_log.stats(),
+        'http_pool': http_stats(),
+        'sharding': shard_stats(),
+        'parallel_match': parallel_stats(),
+        'travel_time': travel_stats(),
+        'retention': retention_stats(),
+        'idempotency': idempotency_store.stats(),
+        'client_coordinates': coordinate_stats(),
+        'geocoder': geocoder_router.stats(),
+        'admission': admission.stats(),
+        'routes': route_stats(),
+        'match_log': match_log.stats(),
+        'snapshots': snapshotter.stats(),
+        'match_memo': match_memo.stats(),
+        'memory_store': {'donors': DEMO_DONORS.stats(), 'ngos': DEMO_NGOS.stats()}
     })
 
 @app.route('/', methods=['GET'])
@@ -294,10 +835,18 @@ def home():
         'database': 'Demo Mode (In-Memory)',
         'endpoints': {
             'GET /api/matches': 'Get donor-NGO matches based on location',
-            'GET /api/donors': 'Get all donors',
+            'GET /api/matches/stream': 'Server-Sent Events stream of match changes',
+            'GET /api/routes': 'Pickup routes per NGO (?capacity_kg=&speed_kmh=&budget_ms=&seed=)',
+            'GET /api/export/<table>': 'Arrow/Parquet export of donors, ngos, coordinates or matches (?format=&since=)',
+            'GET /api/donors': 'Get all donors (?foodType=, ?since=, ?expires_before=, ?sort=-timestamp)',
             'POST /api/donors': 'Add new donor',
-            'GET /api/ngos': 'Get all NGOs',
+            'GET /api/ngos': 'Get all NGOs (?needs=bread filters by food category; ?since=, ?sort=)',
             'POST /api/ngos': 'Add new NGO',
+            'GET /api/stats': 'Supply and demand by region and food category',
+            'POST /api/import/<kind>': 'Bulk import donors or ngos from CSV/NDJSON',
+            'GET /api/import/<import_id>': 'Bulk import progress',
+            'POST /api/shards/match': 'Match one regional shard (used by a coordinating node)',
+            'GET /api/jobs': 'Background job queue metrics',
             'GET /api/health': 'Health check',
             'GET /': 'This help message'
         },
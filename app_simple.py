@@ -3,11 +3,18 @@ from geopy.geocoders import Nominatim
 from geopy.distance import geodesic
 from typing import Dict, List, Tuple, Optional
 import json
+import os
+from http_pool import PooledGeopyAdapter, http_stats
 
 app = Flask(__name__)
 
 # Initialize geocoder for converting addresses to coordinates
-geolocator = Nominatim(user_agent="xylemcscis_food_donation")
+# Pooled keep-alive connections shared with the other outbound HTTP clients
+geolocator = Nominatim(
+    user_agent="xylemcscis_food_donation",
+    timeout=float(os.getenv('GEOCODER_TIMEOUT', '3')),
+    adapter_factory=PooledGeopyAdapter
+)
 
 # Sample data for testing (simulating Firestore data)
 SAMPLE_DONORS = [
@@ -227,7 +234,8 @@ def health_check():
         'status': 'healthy',
         'service': 'XylemCSCIS Food Donation Backend (Demo Mode)',
         'version': '1.0.0',
-        'note': 'Running with sample data - Firebase not configured'
+        'note': 'Running with sample data - Firebase not configured',
+        'http_pool': http_stats()
     })
 
 @app.route('/', methods=['GET'])
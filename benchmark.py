@@ -0,0 +1,379 @@
+"""
+Benchmarks for the Food Donation backends.
+
+Runs offline: no Google credentials or network access are needed.
+
+Usage:
+    python benchmark.py                    # run every benchmark
+    python benchmark.py startup            # run selected benchmarks
+    python benchmark.py --json bench.json  # also write results as JSON
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+
+BACKEND_MODULES = ['app', 'app_sheets', 'app_sheets_demo', 'app_simple']
+
+BENCHMARKS: Dict[str, Callable[[argparse.Namespace], Dict]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark function under name."""
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def summarize(samples: List[float]) -> Dict:
+    """Median/min/max of a list of timings, in milliseconds."""
+    return {
+        'median_ms': round(statistics.median(samples) * 1000, 2),
+        'min_ms': round(min(samples) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2),
+        'runs': len(samples)
+    }
+
+
+STARTUP_PROBE = '''
+import json, time
+t0 = time.perf_counter()
+import {module} as backend
+t1 = time.perf_counter()
+response = backend.app.test_client().get('/api/health')
+t2 = time.perf_counter()
+print(json.dumps({{'import_s': t1 - t0, 'first_health_s': t2 - t0, 'status': response.status_code}}))
+'''
+
+
+@benchmark('startup')
+def bench_startup(args: argparse.Namespace) -> Dict:
+    """Cold start per backend: process spawn, module import and first /api/health."""
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, BACKEND_DATA_DIR=tempfile.mkdtemp(prefix='bench-'), PYTHONPATH=repo_dir)
+    env.pop('PREWARM_CLIENTS', None)
+
+    results = {}
+    for module in BACKEND_MODULES:
+        process_s, import_s, health_s = [], [], []
+        error = None
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            proc = subprocess.run(
+                [sys.executable, '-c', STARTUP_PROBE.format(module=module)],
+                cwd=repo_dir, env=env, capture_output=True, text=True, timeout=120
+            )
+            elapsed = time.perf_counter() - started
+            if proc.returncode != 0:
+                error = (proc.stderr.strip().splitlines() or ['failed'])[-1]
+                break
+            probe = json.loads(proc.stdout.strip().splitlines()[-1])
+            process_s.append(elapsed)
+            import_s.append(probe['import_s'])
+            health_s.append(probe['first_health_s'])
+
+        if error:
+            results[module] = {'error': error}
+        else:
+            results[module] = {
+                'process_to_exit': summarize(process_s),
+                'import': summarize(import_s),
+                'import_to_first_health': summarize(health_s)
+            }
+    return results
+
+
+@benchmark('http_pool')
+def bench_http_pool(args: argparse.Namespace) -> Dict:
+    """Per-call latency against a local keep-alive server: fresh connection vs shared pool."""
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    import requests
+    import http_pool
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Send headers and body in one segment; avoids Nagle/delayed-ACK stalls on reuse
+        wbufsize = 1 << 16
+        disable_nagle_algorithm = True
+
+        def do_GET(self):
+            body = b'{"lat": 40.7, "lon": -74.0}'
+            self.send_response(200)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            pass
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}/search'
+    calls = 50 * args.runs
+
+    fresh = []
+    for _ in range(calls):
+        started = time.perf_counter()
+        with requests.Session() as session:
+            session.get(url)
+        fresh.append(time.perf_counter() - started)
+
+    pooled = []
+    session = http_pool.mount_shared_adapter(requests.Session())
+    for _ in range(calls):
+        started = time.perf_counter()
+        session.get(url)
+        pooled.append(time.perf_counter() - started)
+
+    server.shutdown()
+    return {
+        'fresh_connection': summarize(fresh),
+        'shared_pool': summarize(pooled),
+        'pool_stats': {k: v for k, v in http_pool.http_stats().items() if k != 'hosts'}
+    }
+
+
+@benchmark('parallel_match')
+def bench_parallel_match(args: argparse.Namespace) -> Dict:
+    """Matching throughput in-process vs on 1, 2, 4, ... pool workers, with scaling efficiency."""
+    import multiprocessing
+    import random
+    from concurrent.futures import ProcessPoolExecutor
+
+    import parallel_match
+    from spatial_index import NgoSpatialIndex, geodesic_km, index_file_path
+
+    rng = random.Random(42)
+    centers = [(40.71, -74.01), (34.05, -118.24), (41.88, -87.63), (29.76, -95.37), (47.61, -122.33)]
+
+    def point():
+        lat, lon = rng.choice(centers)
+        return (lat + rng.gauss(0, 1.0), lon + rng.gauss(0, 1.0))
+
+    ngo_locations = [{'id': f'ngo_{i}', 'coordinates': point()} for i in range(2000)]
+    donor_coords = [point() for _ in range(1000 * args.runs)]
+    built = NgoSpatialIndex.build(ngo_locations)
+    # Content-named, like get_ngo_index, so workers map exactly this NGO set
+    index_path = index_file_path(os.path.join(tempfile.mkdtemp(prefix='bench-'), 'ngo_index.bin'), built.key)
+    built.save(index_path)
+    index = NgoSpatialIndex.load(index_path)
+
+    started = time.perf_counter()
+    expected = [index.nearest(coords, geodesic_km) for coords in donor_coords]
+    in_process_s = time.perf_counter() - started
+
+    # Cores this process may run on (containers and taskset often allow fewer than cpu_count)
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+    worker_counts = sorted({1, cores} | {2 ** k for k in range(1, cores.bit_length()) if 2 ** k <= cores})
+    scaling = {}
+    for workers in worker_counts:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('forkserver')) as pool:
+            # Warm-up: start the processes and map the index before timing
+            parallel_match.match_on_pool(pool, donor_coords[:workers], index_path, index.key, workers)
+            started = time.perf_counter()
+            results = parallel_match.match_on_pool(pool, donor_coords, index_path, index.key, workers)
+            elapsed = time.perf_counter() - started
+        speedup = in_process_s / elapsed
+        scaling[f'{workers}_workers'] = {
+            'seconds': round(elapsed, 3),
+            'donors_per_sec': round(len(donor_coords) / elapsed),
+            'speedup': round(speedup, 2),
+            'efficiency': round(speedup / workers, 2),
+            'matches_equal': results == expected
+        }
+
+    return {
+        'donors': len(donor_coords),
+        'ngos': len(ngo_locations),
+        'cores': cores,
+        'cpu_count': os.cpu_count(),
+        # Speedup needs more than one usable core; on one core only pool overhead is measured
+        'scaling_measured': cores > 1,
+        'in_process': {'seconds': round(in_process_s, 3),
+                       'donors_per_sec': round(len(donor_coords) / in_process_s)},
+        'scaling': scaling
+    }
+
+
+@benchmark('memory_store')
+def bench_memory_store(args: argparse.Namespace) -> Dict:
+    """Concurrent mixed reads/writes on the striped store, checking snapshot consistency."""
+    import random
+    import threading
+
+    from memory_store import MemoryStore
+
+    rng = random.Random(42)
+    coords = {f'loc_{i}': (40.0 + rng.random(), -74.0 + rng.random()) for i in range(500)}
+    operations = 2000 * args.runs
+    write_share = 0.1
+
+    def run(threads: int) -> Dict:
+        store = MemoryStore(locate=lambda record: coords.get(record['location']))
+        store.put_many({'id': f'seed_{i}', 'location': f'loc_{i % 500}'} for i in range(5000))
+        errors = []
+        written = [0] * threads
+
+        def worker(n: int) -> None:
+            local = random.Random(n)
+            last_len = 0
+            for i in range(operations // threads):
+                if local.random() < write_share:
+                    store.put({'id': f'w{n}_{i}', 'location': f'loc_{local.randrange(500)}'})
+                    written[n] += 1
+                else:
+                    snapshot = store.snapshot()
+                    # Inserts only: a later snapshot can never be smaller
+                    if len(snapshot) < last_len:
+                        errors.append('snapshot went backwards')
+                    last_len = len(snapshot)
+                    snapshot.get(f'seed_{local.randrange(5000)}')
+                    snapshot.near(coords[f'loc_{local.randrange(500)}'])
+
+        workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        if len(store) != 5000 + sum(written):
+            errors.append('lost writes')
+        return {
+            'ops_per_sec': round(operations / elapsed),
+            'writes': sum(written),
+            'records': len(store),
+            'consistent': not errors
+        }
+
+    return {f'{threads}_threads': run(threads) for threads in (1, 2, 4, 8)}
+
+
+@benchmark('geocoder_router')
+def bench_geocoder_router(args: argparse.Namespace) -> Dict:
+    """Lookup latency percentiles with one slow-tailed provider vs two providers with hedging."""
+    import random
+
+    from geocoder_router import GeocoderRouter, LocalGeocoder, Provider
+
+    table = {f'place {i}': (40.0 + i / 1000, -74.0) for i in range(100)}
+    lookups = 100 * args.runs
+
+    def provider(name: str, seed: int) -> Provider:
+        rng = random.Random(seed)
+        # Usually ~5 ms, but one call in 50 stalls for 300 ms
+        return Provider(name, LocalGeocoder(table, latency=lambda: 0.3 if rng.random() < 0.02 else 0.005))
+
+    def run(router: GeocoderRouter) -> Dict:
+        # Warm-up: give the providers enough latency history for a hedge threshold
+        for i in range(50):
+            router.geocode(f'place {i % 100}')
+        router.counters['hedged'] = 0
+        samples = []
+        for i in range(lookups):
+            started = time.perf_counter()
+            router.geocode(f'place {i % 100}')
+            samples.append(time.perf_counter() - started)
+        samples.sort()
+        return {
+            'p50_ms': round(samples[len(samples) // 2] * 1000, 1),
+            'p99_ms': round(samples[min(len(samples) - 1, int(0.99 * len(samples)))] * 1000, 1),
+            'hedged': router.counters['hedged']
+        }
+
+    return {
+        'lookups': lookups,
+        'single_provider': run(GeocoderRouter([provider('a', 1)])),
+        'hedged_two_providers': run(GeocoderRouter([provider('a', 1), provider('b', 2)], seed=42))
+    }
+
+
+@benchmark('route_planner')
+def bench_route_planner(args: argparse.Namespace) -> Dict:
+    """Solver time and distance saved vs one trip per donor, for growing pickup counts."""
+    import random
+    from datetime import datetime, timedelta, timezone
+
+    from route_planner import ROUTE_TIME_BUDGET_MS, matrix_cache, plan_routes
+
+    now = datetime.now(timezone.utc)
+    results = {'time_budget_ms': ROUTE_TIME_BUDGET_MS}
+    for n_donors in (50, 200, 500):
+        rng = random.Random(n_donors)
+        ngos = [{'id': f'ngo{i}', 'coordinates': (40.7 + rng.uniform(-0.2, 0.2), -74.0 + rng.uniform(-0.2, 0.2))}
+                for i in range(5)]
+        matches = []
+        for i in range(n_donors):
+            ngo = rng.choice(ngos)
+            matches.append({'matched_ngo': ngo, 'donor': {
+                'id': f'donor{i}',
+                'quantity': f'{rng.randint(5, 120)} kg',
+                'expiry_time_hours': rng.choice([2, 6, 24]),
+                'timestamp': (now - timedelta(minutes=rng.randint(0, 60))).isoformat(),
+                'coordinates': (ngo['coordinates'][0] + rng.uniform(-0.1, 0.1),
+                                ngo['coordinates'][1] + rng.uniform(-0.1, 0.1))
+            }})
+        matrix_cache.clear()
+        cold_started = time.perf_counter()
+        first = plan_routes(matches, seed=1, now=now)
+        cold_ms = (time.perf_counter() - cold_started) * 1000
+        samples = []
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            plan = plan_routes(matches, seed=1, now=now)
+            samples.append(time.perf_counter() - started)
+        results[f'{n_donors}_donors'] = {
+            'cold_ms': round(cold_ms, 1),
+            'warm': summarize(samples),
+            'vehicles': plan['summary']['vehicles'],
+            'saved_pct': plan['summary']['saved_pct'],
+            'stopped': plan['solver']['stopped'],
+            'deterministic': plan['routes'] == first['routes']
+        }
+    return results
+
+
+def print_results(name: str, results: Dict, indent: int = 2) -> None:
+    print(f"\n📊 {name}")
+    for key, value in results.items():
+        if isinstance(value, dict) and any(isinstance(v, dict) for v in value.values()):
+            print(f"{' ' * indent}{key}:")
+            for sub_key, sub_value in value.items():
+                print(f"{' ' * (indent + 2)}{sub_key}: {sub_value}")
+        else:
+            print(f"{' ' * indent}{key}: {value}")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Run backend benchmarks.')
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--runs', type=int, default=5, help='Repetitions per measurement')
+    parser.add_argument('--json', help='Write results to this JSON file')
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"Unknown benchmark(s): {', '.join(unknown)}")
+
+    all_results = {}
+    for name in args.names or list(BENCHMARKS):
+        all_results[name] = BENCHMARKS[name](args)
+        print_results(name, all_results[name])
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(all_results, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
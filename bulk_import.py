@@ -0,0 +1,398 @@
+"""
+Bulk import pipeline for backfilling donors or NGOs.
+
+Streams a CSV or NDJSON file through dedupe → normalize → cached, batched
+geocoding → bulk insert into the selected backend. Memory stays bounded:
+rows are processed in fixed-size batches and dedupe fingerprints live in a
+SQLite checkpoint file next to the progress counters. An interrupted import
+resumes from the last committed batch.
+
+Usage:
+    python bulk_import.py donors partner_donors.csv --backend app_sheets
+    python bulk_import.py ngos ngos.ndjson --backend app --batch-size 400
+"""
+
+import argparse
+import csv
+import hashlib
+import importlib
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from geocode_cache import GeocodeCache, cached_geocode, normalize_location
+
+IMPORTS_DIR = os.getenv(
+    'IMPORTS_DIR',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'imports')
+)
+
+DEFAULT_BATCH_SIZE = 500
+
+# Seconds between progress reports
+PROGRESS_INTERVAL = 5.0
+
+# Accepted column names per field: API keys, Sheets headers and match payload keys
+FIELD_ALIASES = {
+    'donors': {
+        'id': ('id', 'ID'),
+        'foodType': ('foodType', 'Food Type', 'food_type'),
+        'quantity': ('quantity', 'Quantity'),
+        'expiryTime': ('expiryTime', 'Expiry Time (hours)', 'expiry_time_hours'),
+        'location': ('location', 'Location'),
+        'timestamp': ('timestamp', 'Timestamp')
+    },
+    'ngos': {
+        'id': ('id', 'ID'),
+        'ngoName': ('ngoName', 'NGO Name', 'ngo_name'),
+        'foodNeeded': ('foodNeeded', 'Food Needed', 'food_needed'),
+        'location': ('location', 'Location'),
+        'timestamp': ('timestamp', 'Timestamp')
+    }
+}
+
+REQUIRED_FIELDS = {
+    'donors': ('foodType', 'quantity', 'expiryTime', 'location'),
+    'ngos': ('ngoName', 'foodNeeded', 'location')
+}
+
+ID_PREFIXES = {'donors': 'donor', 'ngos': 'ngo'}
+
+
+def read_records(stream: io.TextIOBase, fmt: str) -> Iterator[Dict]:
+    """Yield raw records from a CSV (with header row) or NDJSON text stream."""
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'ndjson':
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                record = None
+            # Malformed lines still count as a row so checkpoints stay aligned
+            yield record if isinstance(record, dict) else {}
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def normalize_record(raw: Dict, kind: str) -> Optional[Dict]:
+    """
+    Map a raw record onto the backend's field names.
+
+    Returns:
+        Optional[Dict]: Normalized record, or None if a required field is missing
+    """
+    record = {}
+    for field, aliases in FIELD_ALIASES[kind].items():
+        for alias in aliases:
+            value = raw.get(alias)
+            if value not in (None, ''):
+                record[field] = value.strip() if isinstance(value, str) else value
+                break
+    if kind == 'donors' and 'expiryTime' in record:
+        try:
+            record['expiryTime'] = int(float(record['expiryTime']))
+        except (TypeError, ValueError):
+            return None
+    if any(not record.get(field) for field in REQUIRED_FIELDS[kind]):
+        return None
+    return record
+
+
+def record_fingerprint(record: Dict, kind: str) -> str:
+    """
+    Hash used for dedupe and for deterministic IDs.
+
+    A source ID identifies the record on its own; without one the content,
+    timestamp included, does, so repeat donations on different dates are kept.
+    """
+    if record.get('id'):
+        fields = ['id', str(record['id'])]
+    else:
+        fields = [str(record.get(field, '')).lower() for field in FIELD_ALIASES[kind] if field != 'id']
+    return hashlib.sha256('\x1f'.join([kind] + fields).encode('utf-8')).hexdigest()
+
+
+class ImportCheckpoint:
+    """Progress counters and dedupe fingerprints for one import, in SQLite."""
+
+    COUNTERS = ('rows_read', 'inserted', 'duplicates', 'invalid', 'ungeocodable')
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('CREATE TABLE IF NOT EXISTS seen (fingerprint TEXT PRIMARY KEY)')
+            self._conn.execute('CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value TEXT)')
+
+    def get_state(self) -> Dict:
+        with self._lock:
+            rows = self._conn.execute('SELECT key, value FROM state').fetchall()
+        state = {key: json.loads(value) for key, value in rows}
+        for counter in self.COUNTERS:
+            state.setdefault(counter, 0)
+        return state
+
+    def set_state(self, **values) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                [(key, json.dumps(value)) for key, value in values.items()]
+            )
+
+    def unseen(self, fingerprints: List[str]) -> set:
+        """Fingerprints not yet committed by an earlier batch."""
+        if not fingerprints:
+            return set()
+        with self._lock:
+            placeholders = ','.join('?' * len(fingerprints))
+            seen = {row[0] for row in self._conn.execute(
+                f'SELECT fingerprint FROM seen WHERE fingerprint IN ({placeholders})', fingerprints)}
+        return set(fingerprints) - seen
+
+    def commit_batch(self, fingerprints: List[str], state: Dict) -> None:
+        """Record a batch's fingerprints and counters atomically."""
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR IGNORE INTO seen (fingerprint) VALUES (?)',
+                                   [(f,) for f in fingerprints])
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)',
+                [(key, json.dumps(value)) for key, value in state.items()]
+            )
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def geocode_batch(records: List[Dict], cache: GeocodeCache,
+                  geocode: Callable[[str], Optional[Tuple[float, float]]]) -> int:
+    """
+    Geocode a batch's distinct locations through the cache.
+
+    Returns:
+        int: Number of records whose location could not be geocoded
+    """
+    resolved: Dict[str, Optional[Tuple[float, float]]] = {}
+    for record in records:
+        key = normalize_location(record['location'])
+        if key not in resolved:
+            resolved[key] = cached_geocode(cache, record['location'], geocode)
+    return sum(1 for record in records if resolved[normalize_location(record['location'])] is None)
+
+
+def run_import(stream: io.TextIOBase, kind: str, fmt: str,
+               insert_batch: Callable[[List[Dict]], int],
+               cache: GeocodeCache,
+               geocode: Callable[[str], Optional[Tuple[float, float]]],
+               checkpoint: ImportCheckpoint,
+               batch_size: int = DEFAULT_BATCH_SIZE,
+               progress: Optional[Callable[[Dict], None]] = None,
+               existing_ids: Optional[Callable[[], Set[str]]] = None) -> Dict:
+    """
+    Run (or resume) an import.
+
+    Args:
+        stream (io.TextIOBase): CSV or NDJSON text
+        kind (str): 'donors' or 'ngos'
+        fmt (str): 'csv' or 'ndjson'
+        insert_batch (Callable): Backend bulk insert; returns rows written
+        cache (GeocodeCache): Geocode cache to fill
+        geocode (Callable): Uncached (rate-limited) geocoder
+        checkpoint (ImportCheckpoint): Progress and dedupe store
+        batch_size (int): Rows per geocode/insert batch
+        progress (Optional[Callable]): Called with the state after each batch
+        existing_ids (Optional[Callable]): IDs already stored, for backends that
+            append rather than upsert by ID (Sheets); on a resumed import it is
+            consulted for the first batch, which may have been written before
+            the interruption
+
+    Returns:
+        Dict: Final counters including rows/sec
+    """
+    if batch_size < 1:
+        raise ValueError(f"batch_size must be at least 1, got {batch_size}")
+    state = checkpoint.get_state()
+    skip = state['rows_read']
+    started = time.monotonic()
+    rows_this_run = 0
+    state.update(status='running', kind=kind)
+    checkpoint.set_state(status='running', kind=kind)
+
+    batch: List[Dict] = []
+    fingerprints: List[str] = []
+    # Inserted but not committed before an interruption, if the backend appends
+    replay_check = existing_ids if skip else None
+
+    def flush():
+        nonlocal batch, fingerprints, replay_check
+        new = checkpoint.unseen(fingerprints)
+        stored: Set[str] = set()
+        if replay_check is not None and batch:
+            stored, replay_check = replay_check(), None
+        unique, unique_fps = [], []
+        for record, fingerprint in zip(batch, fingerprints):
+            if fingerprint not in new:
+                state['duplicates'] += 1
+                continue
+            new.discard(fingerprint)
+            unique_fps.append(fingerprint)
+            if str(record['id']) in stored:
+                # Written by the interrupted run, which didn't get to commit its counters
+                state['inserted'] += 1
+            else:
+                unique.append(record)
+        if unique:
+            state['ungeocodable'] += geocode_batch(unique, cache, geocode)
+            state['inserted'] += insert_batch(unique)
+        elapsed = time.monotonic() - started
+        state['rows_per_sec'] = round(rows_this_run / elapsed, 1) if elapsed else 0.0
+        checkpoint.commit_batch(unique_fps, state)
+        if progress:
+            progress(dict(state))
+        batch, fingerprints = [], []
+
+    for row_number, raw in enumerate(read_records(stream, fmt)):
+        if row_number < skip:
+            continue
+        rows_this_run += 1
+        state['rows_read'] += 1
+        record = normalize_record(raw, kind)
+        if record is None:
+            state['invalid'] += 1
+        else:
+            fingerprint = record_fingerprint(record, kind)
+            # Deterministic IDs: Firestore and the demo store overwrite a replayed
+            # batch by ID; Sheets appends, so run_import is given existing_ids for it
+            record.setdefault('id', f"{ID_PREFIXES[kind]}_{fingerprint[:16]}")
+            batch.append(record)
+            fingerprints.append(fingerprint)
+        if rows_this_run % batch_size == 0:
+            flush()
+    flush()
+
+    state['status'] = 'completed'
+    checkpoint.set_state(**state)
+    return state
+
+
+def print_progress(state: Dict) -> None:
+    print(f"📦 {state['rows_read']} rows read, {state['inserted']} inserted, "
+          f"{state['duplicates']} duplicates, {state['invalid']} invalid, "
+          f"{state['ungeocodable']} ungeocodable ({state.get('rows_per_sec', 0)} rows/sec)")
+
+
+def throttled(callback: Callable[[Dict], None], interval: float = PROGRESS_INTERVAL) -> Callable[[Dict], None]:
+    """Wrap a progress callback so it fires at most once per interval."""
+    last = [0.0]
+
+    def wrapper(state: Dict) -> None:
+        now = time.monotonic()
+        if now - last[0] >= interval:
+            last[0] = now
+            callback(state)
+    return wrapper
+
+
+def detect_format(path: str) -> str:
+    return 'ndjson' if path.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+# Background imports started through the API, by import ID
+_running_imports: Dict[str, threading.Thread] = {}
+
+
+def start_background_import(upload: io.BufferedIOBase, kind: str, fmt: str,
+                            insert_batch: Callable[[List[Dict]], int], cache: GeocodeCache,
+                            geocode: Callable[[str], Optional[Tuple[float, float]]],
+                            batch_size: int = DEFAULT_BATCH_SIZE) -> str:
+    """Spool an uploaded file to disk and import it in a background thread. Returns the import ID."""
+    import_id = uuid.uuid4().hex
+    os.makedirs(IMPORTS_DIR, exist_ok=True)
+    data_path = os.path.join(IMPORTS_DIR, f'{import_id}.{fmt}')
+    with open(data_path, 'wb') as f:
+        while True:
+            chunk = upload.read(1 << 16)
+            if not chunk:
+                break
+            f.write(chunk)
+
+    checkpoint = ImportCheckpoint(os.path.join(IMPORTS_DIR, f'{import_id}.checkpoint.db'))
+    checkpoint.set_state(status='queued', kind=kind, source=data_path)
+
+    def run():
+        try:
+            with open(data_path, newline='', encoding='utf-8') as stream:
+                run_import(stream, kind, fmt, insert_batch, cache, geocode, checkpoint, batch_size)
+        except Exception as e:
+            print(f"❌ Import {import_id} failed: {e}")
+            checkpoint.set_state(status='failed', error=str(e))
+        finally:
+            checkpoint.close()
+
+    thread = threading.Thread(target=run, name=f'import-{import_id[:8]}', daemon=True)
+    _running_imports[import_id] = thread
+    thread.start()
+    return import_id
+
+
+def import_status(import_id: str) -> Optional[Dict]:
+    """Progress of an API-started import, or None if unknown."""
+    if not all(c in '0123456789abcdef' for c in import_id):
+        return None
+    path = os.path.join(IMPORTS_DIR, f'{import_id}.checkpoint.db')
+    if not os.path.exists(path):
+        return None
+    checkpoint = ImportCheckpoint(path)
+    try:
+        state = checkpoint.get_state()
+    finally:
+        checkpoint.close()
+    state['import_id'] = import_id
+    return state
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Bulk import donors or NGOs from CSV/NDJSON.')
+    parser.add_argument('kind', choices=['donors', 'ngos'])
+    parser.add_argument('path', help='CSV (with header) or NDJSON file')
+    parser.add_argument('--backend', default='app_sheets',
+                        help='Backend module to import into (app, app_sheets, app_sheets_demo)')
+    parser.add_argument('--format', choices=['csv', 'ndjson'], help='Defaults to the file extension')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <path>.checkpoint.db)')
+    parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint')
+    args = parser.parse_args(argv)
+
+    backend = importlib.import_module(args.backend)
+    insert_batch = backend.bulk_add_donors if args.kind == 'donors' else backend.bulk_add_ngos
+    fmt = args.format or detect_format(args.path)
+    checkpoint_path = args.checkpoint or f'{args.path}.checkpoint.db'
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    checkpoint = ImportCheckpoint(checkpoint_path)
+    if checkpoint.get_state()['rows_read']:
+        print(f"↩️ Resuming from row {checkpoint.get_state()['rows_read']}")
+    with open(args.path, newline='', encoding='utf-8') as stream:
+        existing = getattr(backend, 'existing_record_ids', None)
+        state = run_import(stream, args.kind, fmt, insert_batch, backend.geocode_cache,
+                           backend.rate_limited_geocode, checkpoint, args.batch_size,
+                           progress=throttled(print_progress),
+                           existing_ids=(lambda: existing(args.kind)) if existing else None)
+    checkpoint.close()
+    print_progress(state)
+    print("✅ Import complete")
+
+
+if __name__ == '__main__':
+    main()
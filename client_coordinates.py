@@ -0,0 +1,131 @@
+"""
+Client-supplied coordinates.
+
+Forms and API clients may send lat/lon along with the free-text location
+(browser geolocation, a map picker). Valid coordinates are stored with the
+record and used instead of geocoding it. Before they are trusted they are
+checked against the geocode cache: if the text location is already
+geocoded and lies more than CLIENT_COORDS_MAX_KM away, the client's
+coordinates are dropped and the record is geocoded as usual. Locations not
+in the cache are not geocoded just for the check.
+"""
+
+import math
+import os
+import threading
+from typing import Dict, Optional, Tuple
+
+from geocode_cache import GeocodeCache
+from spatial_index import geodesic_km
+
+# Farthest client coordinates may lie from the geocoded text location
+CLIENT_COORDS_MAX_KM = float(os.getenv('CLIENT_COORDS_MAX_KM', '50'))
+
+Coordinates = Tuple[float, float]
+
+
+def _coordinate_pair(lat, lon) -> Optional[Coordinates]:
+    """(lat, lon) as floats if both are present, finite and in range; raises ValueError otherwise."""
+    if lat in (None, '') and lon in (None, ''):
+        return None
+    if lat in (None, '') or lon in (None, ''):
+        raise ValueError('lat and lon must be given together')
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        raise ValueError('lat and lon must be numbers')
+    if not (math.isfinite(lat) and math.isfinite(lon)) or not -90 <= lat <= 90 or not -180 <= lon <= 180:
+        raise ValueError('lat must be within [-90, 90] and lon within [-180, 180]')
+    if lat == 0 and lon == 0:
+        # What an unset GPS fix usually reports
+        raise ValueError('lat/lon of 0, 0 is not accepted')
+    return lat, lon
+
+
+def parse_client_coordinates(data: Dict) -> Optional[Coordinates]:
+    """Coordinates from a request body's lat/lon, None if absent; raises ValueError if malformed."""
+    return _coordinate_pair(data.get('lat'), data.get('lon'))
+
+
+def stored_coordinates(record: Dict) -> Optional[Coordinates]:
+    """Coordinates stored on a record, or None if it has none (or they are malformed)."""
+    try:
+        return _coordinate_pair(record.get('lat'), record.get('lon'))
+    except ValueError:
+        return None
+
+
+def coordinate_fields(lat, lon) -> Dict:
+    """{'lat': ..., 'lon': ...} for valid stored values, else {} (e.g. blank Sheets cells)."""
+    coords = stored_coordinates({'lat': lat, 'lon': lon})
+    return {'lat': coords[0], 'lon': coords[1]} if coords else {}
+
+
+def is_plausible(coords: Coordinates, location: str, cache: GeocodeCache) -> bool:
+    """False only if the location is already geocoded and lies farther than CLIENT_COORDS_MAX_KM away."""
+    cached = cache.get(location)
+    return cached is None or geodesic_km(coords, cached) <= CLIENT_COORDS_MAX_KM
+
+
+def checked_stored_coordinates(record: Dict, cache: GeocodeCache) -> Optional[Coordinates]:
+    """
+    Stored coordinates that also pass the plausibility check.
+
+    For records written without passing through this server (the web form
+    writes straight to Firestore), so the check happens when they are read.
+    """
+    coords = stored_coordinates(record)
+    if coords is None or not is_plausible(coords, record.get('location', ''), cache):
+        return None
+    return coords
+
+
+_stats_lock = threading.Lock()
+_stats = {'received': 0, 'with_coordinates': 0, 'accepted': 0, 'implausible': 0, 'invalid': 0}
+
+
+def _count(*names: str) -> None:
+    with _stats_lock:
+        for name in names:
+            _stats[name] += 1
+
+
+def accept_client_coordinates(data: Dict, cache: GeocodeCache) -> Optional[Coordinates]:
+    """
+    Validate a new record's client coordinates.
+
+    Args:
+        data (Dict): Request body with optional 'lat'/'lon' and 'location'
+        cache (GeocodeCache): Geocode cache used for the plausibility check
+
+    Returns:
+        Optional[Coordinates]: Coordinates to store, or None if none were sent
+        or they don't fit the text location
+
+    Raises:
+        ValueError: If lat/lon are malformed or out of range
+    """
+    _count('received')
+    try:
+        coords = parse_client_coordinates(data)
+    except ValueError:
+        _count('invalid')
+        raise
+    if coords is None:
+        return None
+    _count('with_coordinates')
+    if not is_plausible(coords, data.get('location', ''), cache):
+        _count('implausible')
+        print(f"⚠️ Ignoring client coordinates {coords} far from '{data.get('location', '')}'")
+        return None
+    _count('accepted')
+    return coords
+
+
+def coordinate_stats() -> Dict:
+    """Counters of client coordinates seen on new records by this process."""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['pre_geocoded_share'] = round(stats['accepted'] / stats['received'], 3) if stats['received'] else None
+    stats['max_km'] = CLIENT_COORDS_MAX_KM
+    return stats
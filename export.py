@@ -0,0 +1,457 @@
+"""
+Columnar export of donors, NGOs, cached coordinates and matches.
+
+Analysts get Arrow IPC streams or Parquet files instead of scraping the JSON
+endpoints or pulling the Sheets. Rows are converted and written in record
+batches of EXPORT_BATCH_ROWS, so memory stays bounded however large the table.
+pyarrow is only needed for export; without it the endpoint answers 501.
+
+Incremental exports take a watermark (epoch seconds, returned by the previous
+export) and contain only rows changed since then:
+
+- donors, ngos: the backends keep no change time, so every export compares
+  row hashes with a SQLite manifest (export_state.db). New and edited rows
+  get the export's time as changed_at. Rows that disappeared (archived or
+  deleted) come back once as tombstones with deleted=true
+- coordinates: the geocode cache's own updated_at
+- matches: one row per donor per logged match run, from the match log
+
+    python export.py donors ngos --backend app_sheets --out exports/ --format parquet
+    python export.py --backend app_sheets --out exports/ --incremental   # all tables, changes only
+"""
+
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from client_coordinates import stored_coordinates
+from geocode_cache import GeocodeCache
+from match_events import parse_timestamp
+from match_log import MATCH_LOG_FLUSH_SECONDS, MatchLog
+from quantity import record_quantity
+
+EXPORT_STATE_PATH = os.getenv(
+    'EXPORT_STATE_PATH',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'export_state.db')
+)
+
+# Rows per Arrow record batch (and per Parquet row group)
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', '10000'))
+
+# Match runs newer than this are left for the next export, so runs still buffered
+# in another worker's match log are not skipped by the watermark
+EXPORT_MATCHES_LAG_SECONDS = float(os.getenv('EXPORT_MATCHES_LAG_SECONDS', str(MATCH_LOG_FLUSH_SECONDS)))
+
+TABLES = ('donors', 'ngos', 'coordinates', 'matches')
+
+# Format name -> (content type, file extension)
+FORMATS = {
+    'arrow': ('application/vnd.apache.arrow.stream', 'arrows'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet')
+}
+
+# Manifest rows looked up per SQLite query
+_CHUNK = 500
+
+
+class ExportUnavailable(Exception):
+    """pyarrow is not installed."""
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ExportUnavailable('Export needs pyarrow: pip install pyarrow')
+    return pyarrow
+
+
+def table_schema(table: str):
+    """
+    Arrow schema of an export table.
+
+    Raises:
+        ValueError: For an unknown table
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}' (choose from {', '.join(TABLES)})")
+    pa = _pyarrow()
+    timestamp = pa.timestamp('us', tz='UTC')
+    location = [('location', pa.string()), ('lat', pa.float64()), ('lon', pa.float64())]
+    change = [('created_at', timestamp), ('changed_at', timestamp), ('deleted', pa.bool_())]
+    fields = {
+        'donors': [('id', pa.string()), ('food_type', pa.string()), ('quantity', pa.string()),
+                   ('amount', pa.float64()), ('unit', pa.string()), ('expiry_time_hours', pa.float64()),
+                   *location, *change],
+        'ngos': [('id', pa.string()), ('ngo_name', pa.string()), ('food_needed', pa.string()),
+                 *location, *change],
+        'coordinates': [*location, ('updated_at', timestamp)],
+        'matches': [('run_at', timestamp), ('version', pa.string()), ('donor_id', pa.string()),
+                    ('ngo_id', pa.string()), ('distance_km', pa.float64()), ('travel_minutes', pa.float64())]
+    }[table]
+    return pa.schema(fields)
+
+
+def _utc(ts: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(ts, timezone.utc) if ts is not None else None
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class ExportState:
+    """SQLite manifest of exported donor/NGO rows: content hash and when it last changed."""
+
+    def __init__(self, path: str = EXPORT_STATE_PATH):
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS manifest ('
+                'kind TEXT, id TEXT, hash TEXT, changed_at REAL, seen_at REAL, deleted INTEGER, '
+                'PRIMARY KEY (kind, id))'
+            )
+
+    def observe(self, kind: str, hashes: Dict[str, str], run_at: float) -> Dict[str, float]:
+        """
+        Record the current hash of each row; new or edited rows get changed_at = run_at.
+
+        Returns:
+            Dict[str, float]: changed_at for every row in hashes
+        """
+        ids = list(hashes)
+        with self._lock, self._conn:
+            known = {}
+            for start in range(0, len(ids), _CHUNK):
+                chunk = ids[start:start + _CHUNK]
+                known.update((row[0], row[1:]) for row in self._conn.execute(
+                    f"SELECT id, hash, changed_at, deleted FROM manifest WHERE kind = ? "
+                    f"AND id IN ({','.join('?' * len(chunk))})", (kind, *chunk)))
+            changed_at = {}
+            for record_id, digest in hashes.items():
+                previous = known.get(record_id)
+                unchanged = previous is not None and previous[0] == digest and not previous[2]
+                changed_at[record_id] = previous[1] if unchanged else run_at
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO manifest (kind, id, hash, changed_at, seen_at, deleted) '
+                'VALUES (?, ?, ?, ?, ?, 0)',
+                [(kind, record_id, digest, changed_at[record_id], run_at) for record_id, digest in hashes.items()]
+            )
+            return changed_at
+
+    def tombstones(self, kind: str, run_at: float, since: Optional[float]) -> List[Tuple[str, float]]:
+        """
+        Mark rows not seen by the export at run_at as deleted.
+
+        Returns:
+            List[Tuple[str, float]]: (id, changed_at) of deleted rows changed after since
+        """
+        with self._lock, self._conn:
+            self._conn.execute(
+                'UPDATE manifest SET deleted = 1, changed_at = ? WHERE kind = ? AND deleted = 0 AND seen_at < ?',
+                (run_at, kind, run_at)
+            )
+            return self._conn.execute(
+                'SELECT id, changed_at FROM manifest WHERE kind = ? AND deleted = 1 AND changed_at > ? ORDER BY id',
+                (kind, since if since is not None else float('-inf'))
+            ).fetchall()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class Exporter:
+    """
+    Builds export rows from one backend.
+
+    Args:
+        list_records (Callable): kind ('donors' or 'ngos') -> every record, expired included
+        geocode_cache (GeocodeCache): Coordinates of records that carry none (never geocodes)
+        match_log (MatchLog): Source of the matches table
+        state (Optional[ExportState]): Change manifest (default: EXPORT_STATE_PATH)
+    """
+
+    def __init__(self, list_records: Callable[[str], List[Dict]], geocode_cache: GeocodeCache,
+                 match_log: MatchLog, state: Optional[ExportState] = None):
+        self.list_records = list_records
+        self.geocode_cache = geocode_cache
+        self.match_log = match_log
+        self._state = state
+        self._state_lock = threading.Lock()
+
+    @property
+    def state(self) -> ExportState:
+        with self._state_lock:
+            if self._state is None:
+                self._state = ExportState()
+            return self._state
+
+    def _coordinates(self, record: Dict) -> Tuple[Optional[float], Optional[float]]:
+        coords = stored_coordinates(record)
+        if coords is None and record.get('location'):
+            coords = self.geocode_cache.get(record['location'])
+        return coords if coords else (None, None)
+
+    def _record_row(self, kind: str, record: Dict) -> Dict:
+        lat, lon = self._coordinates(record)
+        created = parse_timestamp(record.get('timestamp'))
+        row = {'id': str(record['id'])}
+        if kind == 'donors':
+            amount, unit = record_quantity(record) or (None, None)
+            row.update(food_type=record.get('foodType', ''), quantity=str(record.get('quantity', '')),
+                       amount=amount, unit=unit, expiry_time_hours=_float(record.get('expiryTime')))
+        else:
+            row.update(ngo_name=record.get('ngoName', ''), food_needed=record.get('foodNeeded', ''))
+        row.update(location=record.get('location', ''), lat=lat, lon=lon, created_at=created)
+        return row
+
+    def _record_rows(self, kind: str, records: List[Dict], since: Optional[float], run_at: float) -> Iterator[Dict]:
+        for start in range(0, len(records), EXPORT_BATCH_ROWS):
+            rows = [self._record_row(kind, record) for record in records[start:start + EXPORT_BATCH_ROWS]]
+            # Rows are built with a fixed key order, so the repr of their values is a stable fingerprint
+            hashes = {row['id']: hashlib.sha1(repr(tuple(row.values())).encode('utf-8')).hexdigest()
+                      for row in rows}
+            changed_at = self.state.observe(kind, hashes, run_at)
+            for row in rows:
+                if since is None or changed_at[row['id']] > since:
+                    yield dict(row, changed_at=_utc(changed_at[row['id']]), deleted=False)
+        # Every row still present was seen above; the rest were deleted since their last export
+        for record_id, changed_at in self.state.tombstones(kind, run_at, since):
+            if since is not None:
+                yield {'id': record_id, 'changed_at': _utc(changed_at), 'deleted': True}
+
+    def _coordinate_rows(self, since: Optional[float]) -> Iterator[Dict]:
+        for location, lat, lon, updated_at in self.geocode_cache.entries(since):
+            yield {'location': location, 'lat': lat, 'lon': lon, 'updated_at': _utc(updated_at)}
+
+    def _match_rows(self, since: Optional[float], until: float) -> Iterator[Dict]:
+        self.match_log.flush()
+        for record in self.match_log.scan(since, until):
+            if since is not None and record['ts'] <= since:
+                continue
+            run_at = _utc(record['ts'])
+            version = str(record['version']) if record.get('version') is not None else None
+            for donor_id, ngo_id, distance, minutes in record['decisions']:
+                yield {'run_at': run_at, 'version': version, 'donor_id': str(donor_id),
+                       'ngo_id': str(ngo_id) if ngo_id is not None else None,
+                       'distance_km': distance, 'travel_minutes': minutes}
+
+    def rows(self, table: str, since: Optional[float] = None) -> Tuple[float, Iterator[Dict]]:
+        """
+        Rows of a table, lazily.
+
+        Args:
+            table (str): One of TABLES
+            since (Optional[float]): Watermark from a previous export; None exports everything
+
+        Returns:
+            Tuple[float, Iterator[Dict]]: (watermark for the next incremental export, rows)
+
+        Raises:
+            ValueError: For an unknown table
+        """
+        run_at = time.time()
+        if table in ('donors', 'ngos'):
+            # Read up front so a backend error fails the request before any bytes are sent
+            return run_at, self._record_rows(table, self.list_records(table), since, run_at)
+        if table == 'coordinates':
+            return run_at, self._coordinate_rows(since)
+        if table == 'matches':
+            until = run_at - EXPORT_MATCHES_LAG_SECONDS
+            return until, self._match_rows(since, until)
+        raise ValueError(f"Unknown table '{table}' (choose from {', '.join(TABLES)})")
+
+    def batches(self, table: str, since: Optional[float] = None,
+                batch_rows: int = EXPORT_BATCH_ROWS) -> Tuple[float, Iterator]:
+        """Like rows(), but as pyarrow RecordBatches of at most batch_rows rows."""
+        pa = _pyarrow()
+        schema = table_schema(table)
+        watermark, rows = self.rows(table, since)
+
+        def generate():
+            batch = []
+            for row in rows:
+                batch.append(row)
+                if len(batch) >= batch_rows:
+                    yield pa.RecordBatch.from_pylist(batch, schema=schema)
+                    batch = []
+            if batch:
+                yield pa.RecordBatch.from_pylist(batch, schema=schema)
+
+        return watermark, generate()
+
+    def stream(self, table: str, fmt: str, since: Optional[float] = None) -> Tuple[float, Iterator[bytes]]:
+        """
+        Encoded table as byte chunks, one per record batch.
+
+        Raises:
+            ValueError: For an unknown table or format
+            ExportUnavailable: If pyarrow is missing
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}' (choose from {', '.join(FORMATS)})")
+        watermark, batches = self.batches(table, since)
+        return watermark, _encode(table_schema(table), batches, fmt)
+
+    def write(self, table: str, fmt: str, path: str, since: Optional[float] = None) -> Dict:
+        """Export a table to a file (atomically). Returns rows written, bytes and the new watermark."""
+        if fmt not in FORMATS:
+            raise ValueError(f"Unknown format '{fmt}' (choose from {', '.join(FORMATS)})")
+        watermark, batches = self.batches(table, since)
+        rows = 0
+
+        def counted():
+            nonlocal rows
+            for batch in batches:
+                rows += batch.num_rows
+                yield batch
+
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'wb') as f:
+            for chunk in _encode(table_schema(table), counted(), fmt):
+                f.write(chunk)
+        os.replace(tmp_path, path)
+        return {'table': table, 'path': path, 'rows': rows, 'bytes': os.path.getsize(path), 'watermark': watermark}
+
+
+class _ChunkSink:
+    """Write-only file object whose bytes are handed out after each batch."""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _encode(schema, batches: Iterator, fmt: str) -> Iterator[bytes]:
+    pa = _pyarrow()
+    sink = _ChunkSink()
+    if fmt == 'parquet':
+        writer = pa.parquet.ParquetWriter(pa.PythonFile(sink, mode='w'), schema)
+        write = writer.write_batch
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+        write = writer.write_batch
+    for batch in batches:
+        write(batch)
+        chunk = sink.drain()
+        if chunk:
+            yield chunk
+    writer.close()
+    yield sink.drain()
+
+
+def parse_watermark(value) -> Optional[float]:
+    """Watermark from a query string or CLI value (epoch seconds or ISO time); None if absent."""
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        raise ValueError(f'since must be epoch seconds or an ISO timestamp, not {value!r}')
+    return parsed.timestamp()
+
+
+def export_response(exporter: Exporter, table: str, args):
+    """
+    Streamed Flask response for GET /api/export/<table>.
+
+    Raises:
+        ValueError: For a bad table, format or watermark
+        ExportUnavailable: If pyarrow is missing
+    """
+    from flask import Response
+
+    fmt = args.get('format', 'arrow')
+    watermark, chunks = exporter.stream(table, fmt, parse_watermark(args.get('since')))
+    content_type, extension = FORMATS[fmt]
+    return Response(chunks, mimetype=content_type, headers={
+        'Content-Disposition': f'attachment; filename="{table}.{extension}"',
+        'X-Export-Watermark': repr(watermark),
+        'Cache-Control': 'no-store'
+    })
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Export backend tables as Arrow IPC or Parquet.')
+    parser.add_argument('tables', nargs='*',
+                        help=f"Tables to export (default: all of {', '.join(TABLES)})")
+    parser.add_argument('--backend', default='app_sheets',
+                        help='Backend module to export from (app, app_sheets, app_sheets_demo)')
+    parser.add_argument('--format', choices=list(FORMATS), default='parquet')
+    parser.add_argument('--out', default='exports', help='Output directory')
+    parser.add_argument('--since', help='Only rows changed after this watermark (epoch seconds or ISO time)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Continue from the watermarks saved in <out>/watermarks.json, and update them')
+    args = parser.parse_args(argv)
+    unknown = [table for table in args.tables if table not in TABLES]
+    if unknown:
+        parser.error(f"Unknown table(s): {', '.join(unknown)}")
+
+    backend = importlib.import_module(args.backend)
+    exporter = Exporter(backend.export_records, backend.geocode_cache, backend.match_log)
+    os.makedirs(args.out, exist_ok=True)
+    watermarks_path = os.path.join(args.out, 'watermarks.json')
+    watermarks = {}
+    if args.incremental and os.path.exists(watermarks_path):
+        with open(watermarks_path) as f:
+            watermarks = json.load(f)
+
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    try:
+        for table in args.tables or TABLES:
+            since = watermarks.get(table) if args.incremental else parse_watermark(args.since)
+            path = os.path.join(args.out, f'{table}-{stamp}.{FORMATS[args.format][1]}')
+            result = exporter.write(table, args.format, path, since)
+            watermarks[table] = result['watermark']
+            print(f"📦 {table}: {result['rows']} rows, {result['bytes']} bytes -> {path}")
+    except (ValueError, ExportUnavailable) as e:
+        parser.error(str(e))
+
+    with open(watermarks_path, 'w') as f:
+        json.dump(watermarks, f, indent=2)
+    print(f"💾 Watermarks saved to {watermarks_path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,679 @@
+"""
+In-process fakes of the external services, for load tests and offline runs.
+
+FakeFirestore covers the subset of the Firestore client the backends use
+(collections, documents, where/order_by/limit queries, stream, batches and
+on_snapshot listeners). FakeSheetsClient covers the gspread client,
+spreadsheet and worksheet calls of app_sheets. FakeNominatim answers any
+location with stable made-up coordinates. Each takes a FaultProfile that
+injects latency, random errors and a per-minute request quota, raising the
+same exception types the real client libraries raise.
+
+install() points a backend module at the fakes:
+
+    import app_sheets
+    fakes.install(app_sheets, FaultProfile(latency_ms=80, error_rate=0.01))
+"""
+
+import contextlib
+import hashlib
+import itertools
+import json
+import random
+import string
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+
+class FaultProfile:
+    """
+    Latency, error and quota behaviour of a fake service.
+
+    Each call sleeps latency_ms plus an exponentially distributed extra with
+    mean jitter_ms (a long tail, like real network calls), then fails with
+    probability error_rate. At most quota_per_minute calls are admitted per
+    rolling minute (0: unlimited); the rest fail with a quota error.
+    """
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0, error_rate: float = 0.0,
+                 quota_per_minute: int = 0, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.quota_per_minute = quota_per_minute
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._calls = deque()
+        self._paused = 0
+        self.counters = {'calls': 0, 'errors': 0, 'quota_rejections': 0}
+
+    @contextlib.contextmanager
+    def paused(self):
+        """Serve calls instantly and without faults (e.g. while seeding data)."""
+        with self._lock:
+            self._paused += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._paused -= 1
+
+    def apply(self, unavailable: Callable[[str], Exception], quota: Callable[[str], Exception]) -> None:
+        """Delay the calling thread, then raise an injected failure if one is drawn."""
+        with self._lock:
+            self.counters['calls'] += 1
+            if self._paused:
+                return
+            now = time.monotonic()
+            if self.quota_per_minute:
+                while self._calls and now - self._calls[0] >= 60:
+                    self._calls.popleft()
+                if len(self._calls) >= self.quota_per_minute:
+                    self.counters['quota_rejections'] += 1
+                    raise quota(f'Quota exceeded: {self.quota_per_minute} requests per minute')
+                self._calls.append(now)
+            delay = self.latency_ms + (self._rng.expovariate(1 / self.jitter_ms) if self.jitter_ms else 0.0)
+            fail = self.error_rate and self._rng.random() < self.error_rate
+            if fail:
+                self.counters['errors'] += 1
+        if delay:
+            time.sleep(delay / 1000)
+        if fail:
+            raise unavailable('Injected fault: service unavailable')
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.counters, latency_ms=self.latency_ms, jitter_ms=self.jitter_ms,
+                        error_rate=self.error_rate, quota_per_minute=self.quota_per_minute)
+
+
+# Firestore ---------------------------------------------------------------
+
+def _firestore_unavailable(message: str) -> Exception:
+    from google.api_core.exceptions import ServiceUnavailable
+    return ServiceUnavailable(message)
+
+
+def _firestore_quota(message: str) -> Exception:
+    from google.api_core.exceptions import ResourceExhausted
+    return ResourceExhausted(message)
+
+
+class ChangeType(Enum):
+    """Same names and values as google.cloud.firestore_v1.watch.ChangeType."""
+    ADDED = 1
+    REMOVED = 2
+    MODIFIED = 3
+
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: 'FakeDocumentReference', data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+
+    @property
+    def exists(self) -> bool:
+        return self._data is not None
+
+    def to_dict(self) -> Optional[Dict]:
+        return dict(self._data) if self._data is not None else None
+
+    def get(self, field: str) -> Any:
+        return (self._data or {}).get(field)
+
+
+class FakeDocumentChange:
+    def __init__(self, change_type: ChangeType, document: FakeDocumentSnapshot):
+        self.type = change_type
+        self.document = document
+
+
+class FakeWatch:
+    """A running on_snapshot listener; callbacks run on its own thread, as with the real client."""
+
+    def __init__(self, collection: 'FakeCollectionReference', callback: Callable):
+        self._collection = collection
+        self._callback = callback
+        self._queue = deque()
+        self._wake = threading.Condition()
+        self.is_active = True
+        threading.Thread(target=self._run, name=f'fake-watch-{collection.id}', daemon=True).start()
+
+    def push(self, changes: List[FakeDocumentChange]) -> None:
+        with self._wake:
+            self._queue.append(changes)
+            self._wake.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._wake:
+                while self.is_active and not self._queue:
+                    self._wake.wait()
+                if not self.is_active:
+                    return
+                changes = self._queue.popleft()
+            try:
+                self._callback(self._collection.stream_unfaulted(), changes, datetime.now(timezone.utc))
+            except Exception as e:
+                print(f"❌ Fake Firestore listener callback failed: {e}")
+
+    def unsubscribe(self) -> None:
+        with self._wake:
+            self.is_active = False
+            self._wake.notify()
+        self._collection._client._unwatch(self._collection.id, self)
+
+
+_OPERATORS: Dict[str, Callable[[Any, Any], bool]] = {
+    '==': lambda a, b: a == b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+    'in': lambda a, b: a in b,
+    'not-in': lambda a, b: a not in b,
+    'array_contains': lambda a, b: isinstance(a, list) and b in a,
+    'array_contains_any': lambda a, b: isinstance(a, list) and any(item in a for item in b),
+}
+
+
+class FakeQuery:
+    """Immutable query over one collection; each call returns a narrowed copy."""
+
+    ASCENDING = 'ASCENDING'
+    DESCENDING = 'DESCENDING'
+
+    def __init__(self, collection: 'FakeCollectionReference', filters=(), orders=(),
+                 limit: Optional[int] = None, offset: int = 0):
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+
+    def _copy(self, **changes) -> 'FakeQuery':
+        state = {'filters': self._filters, 'orders': self._orders, 'limit': self._limit, 'offset': self._offset}
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value: Any = None,
+              filter=None) -> 'FakeQuery':
+        if filter is not None:
+            # FieldFilter(field_path, op_string, value)
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in _OPERATORS:
+            raise ValueError(f'Unsupported operator: {op_string}')
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> 'FakeQuery':
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'FakeQuery':
+        return self._copy(limit=count)
+
+    def offset(self, count: int) -> 'FakeQuery':
+        return self._copy(offset=count)
+
+    def _matches(self, data: Dict) -> bool:
+        for field, op, value in self._filters:
+            if field not in data:
+                return False
+            try:
+                if not _OPERATORS[op](data[field], value):
+                    return False
+            except TypeError:
+                # Firestore never compares values of different types
+                return False
+        return True
+
+    def _results(self) -> List[FakeDocumentSnapshot]:
+        docs = [(doc_id, data) for doc_id, data in self._collection._documents() if self._matches(data)]
+        for field, direction in reversed(self._orders):
+            # Like Firestore, ordering on a field drops documents without it
+            docs = [doc for doc in docs if field in doc[1]]
+            docs.sort(key=lambda doc: doc[1][field], reverse=direction == self.DESCENDING)
+        docs = docs[self._offset:]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return [FakeDocumentSnapshot(self._collection.document(doc_id), data) for doc_id, data in docs]
+
+    def stream(self) -> Iterator[FakeDocumentSnapshot]:
+        self._collection._client.profile.apply(_firestore_unavailable, _firestore_quota)
+        return iter(self._results())
+
+    def get(self) -> List[FakeDocumentSnapshot]:
+        return list(self.stream())
+
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, client: 'FakeFirestore', name: str):
+        super().__init__(self)
+        self._client = client
+        self.id = name
+
+    def _documents(self) -> List[Tuple[str, Dict]]:
+        with self._client._lock:
+            return list(self._client._data.get(self.id, {}).items())
+
+    def stream_unfaulted(self) -> List[FakeDocumentSnapshot]:
+        return self._results()
+
+    def document(self, document_id: Optional[str] = None) -> 'FakeDocumentReference':
+        return FakeDocumentReference(self, document_id or _auto_id())
+
+    def add(self, document_data: Dict, document_id: Optional[str] = None):
+        reference = self.document(document_id)
+        reference.set(document_data)
+        return datetime.now(timezone.utc), reference
+
+    def on_snapshot(self, callback: Callable) -> FakeWatch:
+        return self._client._watch(self, callback)
+
+
+class FakeDocumentReference:
+    def __init__(self, collection: FakeCollectionReference, document_id: str):
+        self._collection = collection
+        self.id = document_id
+
+    @property
+    def _client(self) -> 'FakeFirestore':
+        return self._collection._client
+
+    def get(self) -> FakeDocumentSnapshot:
+        self._client.profile.apply(_firestore_unavailable, _firestore_quota)
+        with self._client._lock:
+            data = self._client._data.get(self._collection.id, {}).get(self.id)
+        return FakeDocumentSnapshot(self, dict(data) if data is not None else None)
+
+    def set(self, document_data: Dict, merge: bool = False) -> None:
+        self._client._commit([('set', self, dict(document_data), merge)])
+
+    def update(self, field_updates: Dict) -> None:
+        self._client._commit([('update', self, dict(field_updates), True)])
+
+    def delete(self) -> None:
+        self._client._commit([('delete', self, None, False)])
+
+
+class FakeWriteBatch:
+    # Same cap as Firestore batched writes
+    MAX_WRITES = 500
+
+    def __init__(self, client: 'FakeFirestore'):
+        self._client = client
+        self._writes = []
+
+    def _add(self, write) -> None:
+        if len(self._writes) >= self.MAX_WRITES:
+            from google.api_core.exceptions import InvalidArgument
+            raise InvalidArgument(f'maximum {self.MAX_WRITES} writes allowed per request')
+        self._writes.append(write)
+
+    def set(self, reference: FakeDocumentReference, document_data: Dict, merge: bool = False) -> None:
+        self._add(('set', reference, dict(document_data), merge))
+
+    def update(self, reference: FakeDocumentReference, field_updates: Dict) -> None:
+        self._add(('update', reference, dict(field_updates), True))
+
+    def delete(self, reference: FakeDocumentReference) -> None:
+        self._add(('delete', reference, None, False))
+
+    def commit(self) -> List:
+        self._client._commit(self._writes)
+        return [None] * len(self._writes)
+
+
+def _auto_id() -> str:
+    alphabet = string.ascii_letters + string.digits
+    return ''.join(random.choice(alphabet) for _ in range(20))
+
+
+class FakeFirestore:
+    """In-memory Firestore client; a commit (one write or a batch) is one faultable call."""
+
+    def __init__(self, profile: Optional[FaultProfile] = None):
+        self.profile = profile or FaultProfile()
+        self._lock = threading.Lock()
+        self._data: Dict[str, Dict[str, Dict]] = {}
+        self._watches: Dict[str, List[FakeWatch]] = {}
+
+    def collection(self, name: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, name)
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def _watch(self, collection: FakeCollectionReference, callback: Callable) -> FakeWatch:
+        self.profile.apply(_firestore_unavailable, _firestore_quota)
+        watch = FakeWatch(collection, callback)
+        with self._lock:
+            self._watches.setdefault(collection.id, []).append(watch)
+            docs = list(self._data.get(collection.id, {}).items())
+        # The first snapshot delivers the whole collection as additions
+        watch.push([FakeDocumentChange(ChangeType.ADDED, FakeDocumentSnapshot(collection.document(doc_id), dict(data)))
+                    for doc_id, data in docs])
+        return watch
+
+    def _unwatch(self, name: str, watch: FakeWatch) -> None:
+        with self._lock:
+            if watch in self._watches.get(name, []):
+                self._watches[name].remove(watch)
+
+    def _commit(self, writes: List) -> None:
+        self.profile.apply(_firestore_unavailable, _firestore_quota)
+        changes: Dict[str, List[FakeDocumentChange]] = {}
+        with self._lock:
+            for kind, reference, data, merge in writes:
+                collection = self._data.setdefault(reference._collection.id, {})
+                old = collection.get(reference.id)
+                if kind == 'delete':
+                    if old is None:
+                        continue
+                    del collection[reference.id]
+                    change, snapshot_data = ChangeType.REMOVED, old
+                else:
+                    if kind == 'update' and old is None:
+                        from google.api_core.exceptions import NotFound
+                        raise NotFound(f'No document to update: {reference.id}')
+                    new = {**old, **data} if merge and old is not None else data
+                    collection[reference.id] = new
+                    change, snapshot_data = (ChangeType.ADDED if old is None else ChangeType.MODIFIED), new
+                changes.setdefault(reference._collection.id, []).append(
+                    FakeDocumentChange(change, FakeDocumentSnapshot(reference, dict(snapshot_data))))
+            watches = {name: list(self._watches.get(name, [])) for name in changes}
+        for name, collection_changes in changes.items():
+            for watch in watches[name]:
+                watch.push(collection_changes)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            documents = {name: len(docs) for name, docs in self._data.items()}
+            listeners = sum(len(watches) for watches in self._watches.values())
+        return {'documents': documents, 'listeners': listeners, 'profile': self.profile.stats()}
+
+
+# Google Sheets -----------------------------------------------------------
+
+def _sheets_error(status: int, message: str) -> Exception:
+    """gspread APIError carrying a Sheets-style JSON error body."""
+    import requests
+    from gspread.exceptions import APIError
+
+    response = requests.Response()
+    response.status_code = status
+    response._content = json.dumps({'error': {'code': status, 'message': message}}).encode()
+    return APIError(response)
+
+
+def _sheets_unavailable(message: str) -> Exception:
+    return _sheets_error(503, message)
+
+
+def _sheets_quota(message: str) -> Exception:
+    return _sheets_error(429, message)
+
+
+def _a1_cell(label: str) -> Tuple[int, Optional[int]]:
+    """(row, column) of an A1 cell like 'B3'; the row is None for a bare column like 'J'."""
+    letters = ''.join(ch for ch in label if ch.isalpha()).upper()
+    digits = ''.join(ch for ch in label if ch.isdigit())
+    column = 0
+    for ch in letters:
+        column = column * 26 + ord(ch) - ord('A') + 1
+    return column, int(digits) if digits else None
+
+
+class FakeWorksheet:
+    def __init__(self, spreadsheet: 'FakeSpreadsheet', title: str, sheet_id: int):
+        self.spreadsheet = spreadsheet
+        self.title = title
+        self.id = sheet_id
+        self._rows: List[List[str]] = []
+
+    @property
+    def _client(self) -> 'FakeSheetsClient':
+        return self.spreadsheet.client
+
+    def _read(self) -> None:
+        self._client.profile.apply(_sheets_unavailable, _sheets_quota)
+
+    def _written(self) -> None:
+        self.spreadsheet.touch()
+
+    def get_all_values(self) -> List[List[str]]:
+        self._read()
+        with self._client._lock:
+            width = max((len(row) for row in self._rows), default=0)
+            # gspread pads every row to the width of the widest one
+            return [row + [''] * (width - len(row)) for row in self._rows]
+
+    def get_all_records(self) -> List[Dict[str, str]]:
+        values = self.get_all_values()
+        if not values:
+            return []
+        headers = values[0]
+        return [dict(zip(headers, row + [''] * (len(headers) - len(row)))) for row in values[1:]]
+
+    def row_values(self, row: int) -> List[str]:
+        self._read()
+        with self._client._lock:
+            return list(self._rows[row - 1]) if row <= len(self._rows) else []
+
+    def get(self, range_name: str) -> List[List[str]]:
+        """Values of an A1 range such as 'A5:J' (open-ended rows run to the last row)."""
+        self._read()
+        start, _, end = range_name.partition(':')
+        first_column, first_row = _a1_cell(start)
+        last_column, last_row = _a1_cell(end or start)
+        with self._client._lock:
+            rows = self._rows[(first_row or 1) - 1:last_row]
+            values = [[str(value) for value in row[first_column - 1:last_column]] for row in rows]
+        # Like the API, trailing empty cells and rows are left out
+        values = [row[:max([i + 1 for i, value in enumerate(row) if value != ''], default=0)] for row in values]
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def append_row(self, values: List, **kwargs) -> None:
+        self.append_rows([values], **kwargs)
+
+    def append_rows(self, values: List[List], **kwargs) -> None:
+        self._read()
+        with self._client._lock:
+            self._rows.extend([str(value) for value in row] for row in values)
+        self._written()
+
+    def update(self, range_name: str, values: List[List], **kwargs) -> None:
+        self._read()
+        column, row = _a1_cell(range_name.partition(':')[0])
+        with self._client._lock:
+            for r, row_values in enumerate(values, start=(row or 1) - 1):
+                while len(self._rows) <= r:
+                    self._rows.append([])
+                current = self._rows[r]
+                for c, value in enumerate(row_values, start=column - 1):
+                    while len(current) <= c:
+                        current.append('')
+                    current[c] = str(value)
+        self._written()
+
+    def delete_rows(self, start_index: int, end_index: Optional[int] = None) -> None:
+        self._read()
+        with self._client._lock:
+            del self._rows[start_index - 1:(end_index or start_index)]
+        self._written()
+
+
+class FakeSpreadsheet:
+    _ids = itertools.count(1)
+
+    def __init__(self, client: 'FakeSheetsClient', title: str):
+        from gspread.exceptions import WorksheetNotFound
+
+        self._not_found = WorksheetNotFound
+        self.client = client
+        self.title = title
+        self.id = uuid.uuid4().hex
+        self._revision = 0
+        self.modified_time = ''
+        self.worksheets_list = [FakeWorksheet(self, 'Sheet1', 0)]
+        self.touch()
+
+    def touch(self) -> None:
+        with self.client._lock:
+            self._revision += 1
+            # Drive's modifiedTime; the revision keeps it distinct within one millisecond
+            self.modified_time = f"{datetime.now(timezone.utc).isoformat()}#{self._revision}"
+
+    @property
+    def sheet1(self) -> FakeWorksheet:
+        return self.worksheets_list[0]
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        return list(self.worksheets_list)
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        self.client.profile.apply(_sheets_unavailable, _sheets_quota)
+        for worksheet in self.worksheets_list:
+            if worksheet.title == title:
+                return worksheet
+        raise self._not_found(title)
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, **kwargs) -> FakeWorksheet:
+        self.client.profile.apply(_sheets_unavailable, _sheets_quota)
+        worksheet = FakeWorksheet(self, title, next(self._ids))
+        self.worksheets_list.append(worksheet)
+        self.touch()
+        return worksheet
+
+    def batch_update(self, body: Dict) -> Dict:
+        """Supports the deleteDimension (ROWS) requests the archival job sends."""
+        self.client.profile.apply(_sheets_unavailable, _sheets_quota)
+        by_id = {worksheet.id: worksheet for worksheet in self.worksheets_list}
+        with self.client._lock:
+            for item in body.get('requests', []):
+                dimension = item.get('deleteDimension')
+                if not dimension or dimension['range'].get('dimension') != 'ROWS':
+                    raise NotImplementedError(f'Fake batch_update does not support {list(item)}')
+                target = dimension['range']
+                del by_id[target['sheetId']]._rows[target['startIndex']:target['endIndex']]
+        self.touch()
+        return {'spreadsheetId': self.id, 'replies': [{} for _ in body.get('requests', [])]}
+
+
+class FakeSheetsClient:
+    """In-memory gspread Client: spreadsheets by title, with Drive-style modifiedTime."""
+
+    def __init__(self, profile: Optional[FaultProfile] = None):
+        self.profile = profile or FaultProfile()
+        self._lock = threading.RLock()
+        self._spreadsheets: Dict[str, FakeSpreadsheet] = {}
+
+    def open(self, title: str) -> FakeSpreadsheet:
+        from gspread.exceptions import SpreadsheetNotFound
+
+        self.profile.apply(_sheets_unavailable, _sheets_quota)
+        with self._lock:
+            if title not in self._spreadsheets:
+                raise SpreadsheetNotFound(title)
+            return self._spreadsheets[title]
+
+    def create(self, title: str, folder_id: Optional[str] = None) -> FakeSpreadsheet:
+        self.profile.apply(_sheets_unavailable, _sheets_quota)
+        with self._lock:
+            if title not in self._spreadsheets:
+                self._spreadsheets[title] = FakeSpreadsheet(self, title)
+            return self._spreadsheets[title]
+
+    def list_spreadsheet_files(self, title: Optional[str] = None, folder_id: Optional[str] = None) -> List[Dict]:
+        self.profile.apply(_sheets_unavailable, _sheets_quota)
+        with self._lock:
+            return [{'id': s.id, 'name': s.title, 'modifiedTime': s.modified_time}
+                    for s in self._spreadsheets.values() if title is None or s.title == title]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            rows = {s.title: {w.title: len(w._rows) for w in s.worksheets_list} for s in self._spreadsheets.values()}
+        return {'rows': rows, 'profile': self.profile.stats()}
+
+
+# Geocoder ----------------------------------------------------------------
+
+def _geocoder_unavailable(message: str) -> Exception:
+    from geopy.exc import GeocoderUnavailable
+    return GeocoderUnavailable(message)
+
+
+def _geocoder_quota(message: str) -> Exception:
+    from geopy.exc import GeocoderQuotaExceeded
+    return GeocoderQuotaExceeded(message)
+
+
+class FakeNominatim:
+    """
+    Geopy-compatible geocoder with deterministic answers.
+
+    Every location maps to a fixed point within radius_deg of center (the
+    same text always gives the same point); a not_found_rate share of
+    locations, also fixed per text, has no result.
+    """
+
+    def __init__(self, profile: Optional[FaultProfile] = None, center: Tuple[float, float] = (40.71, -74.01),
+                 radius_deg: float = 0.3, not_found_rate: float = 0.0, timeout: float = 3.0):
+        self.profile = profile or FaultProfile()
+        self.center = center
+        self.radius_deg = radius_deg
+        self.not_found_rate = not_found_rate
+        self.timeout = timeout
+
+    def _point(self, query: str) -> Optional[Tuple[float, float]]:
+        digest = hashlib.sha256(query.strip().lower().encode()).digest()
+        fractions = [int.from_bytes(digest[i:i + 4], 'big') / 2 ** 32 for i in (0, 4, 8)]
+        if fractions[2] < self.not_found_rate:
+            return None
+        return (self.center[0] + (fractions[0] * 2 - 1) * self.radius_deg,
+                self.center[1] + (fractions[1] * 2 - 1) * self.radius_deg)
+
+    def geocode(self, query: str, **kwargs):
+        from geopy.location import Location
+
+        self.profile.apply(_geocoder_unavailable, _geocoder_quota)
+        point = self._point(query)
+        if point is None:
+            return None
+        return Location(query, point, {'display_name': query, 'lat': point[0], 'lon': point[1]})
+
+
+# Wiring ------------------------------------------------------------------
+
+def install(backend, profile: Optional[FaultProfile] = None,
+            geocoder_profile: Optional[FaultProfile] = None) -> Dict[str, Any]:
+    """
+    Point an imported backend module at fakes.
+
+    Args:
+        backend: The app, app_sheets or app_sheets_demo module
+        profile (Optional[FaultProfile]): Faults of the database (Firestore or Sheets)
+        geocoder_profile (Optional[FaultProfile]): Faults of the geocoder
+
+    Returns:
+        Dict[str, Any]: The installed fakes by role ('database', 'geocoder')
+    """
+    from geocoder_router import GeocoderRouter, geopy_provider
+
+    installed = {}
+    if hasattr(backend, 'init_firebase'):
+        backend._db = installed['database'] = FakeFirestore(profile)
+    elif hasattr(backend, 'init_google_sheets'):
+        backend._sheets_client = installed['database'] = FakeSheetsClient(profile)
+    installed['geocoder'] = FakeNominatim(geocoder_profile)
+    # geocode_uncached looks the router up at call time
+    backend.geocoder_router = GeocoderRouter([geopy_provider('nominatim', installed['geocoder'])])
+    return installed
@@ -0,0 +1,217 @@
+"""
+Food taxonomy: free-text food descriptions to category bitsets.
+
+A donor's foodType ("Cooked rice") and an NGO's foodNeeded ("Rice, Bread,
+Vegetables") are parsed into category IDs, each a bit in an int mask, so
+compatibility is a single bitwise AND. An inverted index from category to
+NGO positions answers category-restricted queries such as
+/api/ngos?needs=bread without scanning the text of every NGO.
+"""
+
+import os
+import re
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from spatial_index import NGO_INDEX_PATH, NgoSpatialIndex, get_ngo_index
+
+# Only match donors to NGOs that need something they offer
+MATCH_FOOD_FILTER = os.getenv('MATCH_FOOD_FILTER', '1') == '1'
+
+# Category name → words and phrases that map to it (singular, lowercase)
+CATEGORIES: List[Tuple[str, Tuple[str, ...]]] = [
+    ('produce', ('produce', 'vegetable', 'veggie', 'veg', 'greens', 'salad', 'potato', 'tomato',
+                 'onion', 'carrot', 'spinach', 'cabbage')),
+    ('fruit', ('fruit', 'apple', 'banana', 'orange', 'berry', 'grape', 'mango')),
+    ('bakery', ('bakery', 'bread', 'bun', 'roll', 'pastry', 'cake', 'bagel', 'loaf', 'roti', 'naan', 'pie',
+                'brownie', 'muffin')),
+    ('grains', ('grain', 'rice', 'pasta', 'noodle', 'flour', 'cereal', 'oat', 'wheat', 'lentil',
+                'bean', 'dal', 'pulse')),
+    ('dairy', ('dairy', 'milk', 'cheese', 'yogurt', 'yoghurt', 'butter', 'paneer', 'curd')),
+    ('eggs', ('egg',)),
+    ('meat', ('meat', 'chicken', 'beef', 'pork', 'lamb', 'mutton', 'poultry', 'turkey')),
+    ('seafood', ('seafood', 'fish', 'shrimp', 'prawn', 'tuna', 'salmon')),
+    ('prepared', ('prepared', 'cooked', 'meal', 'sandwich', 'curry', 'soup', 'biryani', 'leftover',
+                  'food packet', 'hot food')),
+    ('canned', ('canned', 'tinned', 'packaged', 'dry goods', 'non-perishable', 'nonperishable', 'grocery',
+                'groceries')),
+    ('beverages', ('beverage', 'drink', 'water', 'juice', 'tea', 'coffee')),
+    ('snacks', ('snack', 'biscuit', 'cookie', 'chip', 'cracker', 'sweet', 'candy', 'chocolate')),
+    ('baby', ('baby', 'infant', 'formula')),
+]
+
+CATEGORY_BITS: Dict[str, int] = {name: 1 << i for i, (name, _) in enumerate(CATEGORIES)}
+
+_WORD_BITS: Dict[str, int] = {}
+_PHRASE_BITS: List[Tuple[str, int]] = []
+for _name, _synonyms in CATEGORIES:
+    for _synonym in (_name,) + _synonyms:
+        if ' ' in _synonym:
+            _PHRASE_BITS.append((_synonym, CATEGORY_BITS[_name]))
+        else:
+            _WORD_BITS[_synonym] = _WORD_BITS.get(_synonym, 0) | CATEGORY_BITS[_name]
+
+_TERM_SPLIT = re.compile(r'[,;/&+\n]|\band\b')
+_WORD = re.compile(r"[a-z][a-z\-']*")
+
+
+def _word_forms(word: str) -> Tuple[str, ...]:
+    """The word as written, then its possible singulars ('cookies' → cookie, cooky)."""
+    forms = [word]
+    if word.endswith('ies') and len(word) > 4:
+        forms += [word[:-1], word[:-3] + 'y']
+    elif word.endswith('oes'):
+        forms += [word[:-2], word[:-1]]
+    elif word.endswith('s') and not word.endswith('ss') and len(word) > 3:
+        forms.append(word[:-1])
+    return tuple(forms)
+
+
+def _canonical(word: str) -> str:
+    """First form of word found in the synonym table, else its most likely singular."""
+    forms = _word_forms(word)
+    for form in forms:
+        if form in _WORD_BITS:
+            return form
+    return forms[-1]
+
+
+@lru_cache(maxsize=8192)
+def food_mask(text: str) -> int:
+    """Category bitset for a free-text food description; 0 if nothing is recognized."""
+    mask = 0
+    for term in _TERM_SPLIT.split(str(text or '').lower()):
+        written = _WORD.findall(term)
+        words = [_canonical(word) for word in written]
+        for word in words:
+            mask |= _WORD_BITS.get(word, 0)
+        # Phrases may be listed plural ('dry goods') or singular ('food packet');
+        # padding with spaces matches whole words only ('laundry goods' is not 'dry goods')
+        texts = (f" {' '.join(written)} ", f" {' '.join(words)} ")
+        for phrase, bit in _PHRASE_BITS:
+            if any(f' {phrase} ' in text for text in texts):
+                mask |= bit
+    return mask
+
+
+def category_names(mask: int) -> List[str]:
+    return [name for name, bit in CATEGORY_BITS.items() if mask & bit]
+
+
+def parse_category_query(value: str) -> int:
+    """Mask for a ?needs= value (category names or any known food words); raises ValueError if none match."""
+    mask = food_mask(value)
+    if not mask:
+        raise ValueError(f"Unknown food category: {value}. Known categories: {', '.join(CATEGORY_BITS)}")
+    return mask
+
+
+def is_compatible(donor_mask: int, ngo_mask: int) -> bool:
+    """Unrecognized food on either side never rules a match out."""
+    return not donor_mask or not ngo_mask or bool(donor_mask & ngo_mask)
+
+
+class CategoryIndex:
+    """Inverted index: category bit → positions of the NGOs that need it."""
+
+    def __init__(self, ngo_masks: Sequence[int]):
+        self.size = len(ngo_masks)
+        self._postings: Dict[int, List[int]] = {bit: [] for bit in CATEGORY_BITS.values()}
+        self.unclassified: List[int] = []
+        for position, mask in enumerate(ngo_masks):
+            if not mask:
+                self.unclassified.append(position)
+                continue
+            for bit in self._postings:
+                if mask & bit:
+                    self._postings[bit].append(position)
+
+    def lookup(self, mask: int) -> List[int]:
+        """Positions of NGOs needing any category in mask, in list order."""
+        positions = set()
+        for bit, posting in self._postings.items():
+            if mask & bit:
+                positions.update(posting)
+        return sorted(positions)
+
+    def compatible(self, donor_mask: int) -> List[int]:
+        """Positions of NGOs a donor with this mask may be matched to, in list order."""
+        if not donor_mask:
+            return list(range(self.size))
+        return sorted(set(self.lookup(donor_mask)) | set(self.unclassified))
+
+    def counts(self) -> Dict[str, int]:
+        return {name: len(self._postings[bit]) for name, bit in CATEGORY_BITS.items()}
+
+
+_index_lock = threading.Lock()
+_index_memo: Dict[str, Tuple[str, CategoryIndex]] = {}
+
+
+def get_category_index(ngos: List[Dict], version: Optional[str] = None, name: str = 'ngos') -> CategoryIndex:
+    """Category index over ngos' foodNeeded, reused while the dataset version is unchanged."""
+    if version is not None:
+        with _index_lock:
+            memo = _index_memo.get(name)
+            if memo is not None and memo[0] == version and memo[1].size == len(ngos):
+                return memo[1]
+    index = CategoryIndex([food_mask(ngo.get('foodNeeded', '')) for ngo in ngos])
+    if version is not None:
+        with _index_lock:
+            _index_memo[name] = (version, index)
+    return index
+
+
+def filter_ngos_by_needs(ngos: List[Dict], needs: str, version: Optional[str] = None) -> List[Dict]:
+    """NGOs needing any category named in a ?needs= value; raises ValueError for unknown categories."""
+    mask = parse_category_query(needs)
+    return [ngos[position] for position in get_category_index(ngos, version).lookup(mask)]
+
+
+MatchResult = Optional[Tuple[int, float]]
+
+
+def match_by_food_group(donors: List[Dict], donor_coords: List[Tuple[float, float]],
+                        ngo_locations: List[Dict], ngo_index: NgoSpatialIndex,
+                        match: Callable[[List[Tuple[float, float]], List[Dict], NgoSpatialIndex],
+                                        Tuple[List[MatchResult], List[Optional[float]]]]
+                        ) -> Tuple[List[MatchResult], List[Optional[float]]]:
+    """
+    Match donors only against NGOs whose needs overlap their food.
+
+    Donors are grouped by food mask; each group is matched by match(coords,
+    ngo_subset, subset_index) against its compatible NGOs, and subset
+    positions are mapped back to ngo_locations. With MATCH_FOOD_FILTER off
+    everything is one group over all NGOs.
+
+    Returns:
+        Tuple: ((ngo position, distance_km) per donor, travel minutes per donor)
+    """
+    if not MATCH_FOOD_FILTER or not ngo_locations:
+        return match(donor_coords, ngo_locations, ngo_index)
+
+    category_index = CategoryIndex([food_mask(ngo.get('foodNeeded', '')) for ngo in ngo_locations])
+    groups: Dict[int, List[int]] = {}
+    for i, donor in enumerate(donors):
+        groups.setdefault(food_mask(donor.get('foodType', '')), []).append(i)
+
+    nearest: List[MatchResult] = [None] * len(donors)
+    minutes: List[Optional[float]] = [None] * len(donors)
+    for mask, donor_ids in groups.items():
+        positions = category_index.compatible(mask)
+        if len(positions) == len(ngo_locations):
+            subset, subset_index = ngo_locations, ngo_index
+        elif positions:
+            subset = [ngo_locations[p] for p in positions]
+            # One shared index file per food mask, like the full index
+            subset_index = get_ngo_index(subset, f'{NGO_INDEX_PATH}.{mask:x}')
+        else:
+            continue
+        group_nearest, group_minutes = match([donor_coords[i] for i in donor_ids], subset, subset_index)
+        for i, result, travel in zip(donor_ids, group_nearest, group_minutes):
+            if result is not None and subset is not ngo_locations:
+                result = (positions[result[0]], result[1])
+            nearest[i] = result
+            minutes[i] = travel
+    return nearest, minutes
@@ -0,0 +1,204 @@
+"""
+Persistent geocode cache.
+
+Results are kept in a SQLite file (WAL mode, so several processes can share
+it) with an in-process dict in front for the hot path. Failed lookups are
+stored as negative entries so an ungeocodable address is not retried on every
+request.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+GEOCODE_CACHE_PATH = os.getenv(
+    'GEOCODE_CACHE_PATH',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'geocode_cache.db')
+)
+
+# Readers map the cache file instead of copying pages; shared by every server process
+MMAP_BYTES = int(os.getenv('GEOCODE_CACHE_MMAP_BYTES', str(64 * 1024 * 1024)))
+
+# Negative entries expire so a temporarily unknown address gets another chance
+NEGATIVE_TTL_SECONDS = float(os.getenv('GEOCODE_NEGATIVE_TTL_SECONDS', str(24 * 3600)))
+
+Coordinates = Tuple[float, float]
+
+
+def normalize_location(location: str) -> str:
+    """Cache key for a location string: lowercase, single-spaced."""
+    return ' '.join(str(location).lower().split())
+
+
+class GeocodeCache:
+    """Thread-safe geocode cache backed by a shared SQLite file."""
+
+    def __init__(self, path: str = GEOCODE_CACHE_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._memory: Dict[str, Tuple[Optional[Coordinates], float]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS geocodes ('
+                'location TEXT PRIMARY KEY, lat REAL, lon REAL, updated_at REAL NOT NULL)'
+            )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute(f'PRAGMA mmap_size={MMAP_BYTES}')
+            self._local.conn = conn
+        return conn
+
+    def _is_fresh(self, coords: Optional[Coordinates], updated_at: float) -> bool:
+        return coords is not None or time.time() - updated_at < NEGATIVE_TTL_SECONDS
+
+    def lookup(self, location: str) -> Tuple[bool, Optional[Coordinates]]:
+        """
+        Look up a location.
+
+        Returns:
+            Tuple[bool, Optional[Coordinates]]: (found, coordinates); found with
+            None coordinates means the address is known to be ungeocodable
+        """
+        key = normalize_location(location)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            row = self._connection().execute(
+                'SELECT lat, lon, updated_at FROM geocodes WHERE location = ?', (key,)
+            ).fetchone()
+            if row is not None:
+                coords = (row[0], row[1]) if row[0] is not None else None
+                entry = (coords, row[2])
+                with self._lock:
+                    self._memory[key] = entry
+
+        with self._lock:
+            if entry is not None and self._is_fresh(*entry):
+                self.hits += 1
+                return True, entry[0]
+            self.misses += 1
+            return False, None
+
+    def get(self, location: str) -> Optional[Coordinates]:
+        """Return cached coordinates, or None on a miss or negative entry."""
+        return self.lookup(location)[1]
+
+    def put(self, location: str, coords: Optional[Coordinates]) -> None:
+        """Store coordinates, or None to record that the address failed to geocode."""
+        key = normalize_location(location)
+        now = time.time()
+        lat, lon = coords if coords else (None, None)
+        self._connection().execute(
+            'INSERT OR REPLACE INTO geocodes (location, lat, lon, updated_at) VALUES (?, ?, ?, ?)',
+            (key, lat, lon, now)
+        )
+        with self._lock:
+            self._memory[key] = (tuple(coords) if coords else None, now)
+
+    def entries(self, since: Optional[float] = None,
+                batch_size: int = 1000) -> Iterator[Tuple[str, Optional[float], Optional[float], float]]:
+        """
+        Stored rows as (location, lat, lon, updated_at), fetched in batches.
+
+        Args:
+            since (Optional[float]): Only rows updated after this epoch time
+            batch_size (int): Rows fetched from SQLite at a time
+        """
+        cursor = self._connection().execute(
+            'SELECT location, lat, lon, updated_at FROM geocodes WHERE updated_at > ? ORDER BY updated_at',
+            (since if since is not None else float('-inf'),)
+        )
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                return
+            yield from rows
+
+    def memory_entries(self) -> List[Tuple[str, Optional[float], Optional[float], float]]:
+        """The in-process entries as (location, lat, lon, updated_at), for warm-start snapshots."""
+        with self._lock:
+            return [(key, *(coords or (None, None)), updated_at)
+                    for key, (coords, updated_at) in self._memory.items()]
+
+    def warm(self, entries: Iterable[Sequence]) -> int:
+        """
+        Load (location, lat, lon, updated_at) entries from a snapshot.
+
+        Expired negative entries are dropped and a newer database row is never
+        replaced; the in-process dict is then filled from the database, so it
+        holds whichever entry won.
+
+        Returns:
+            int: Entries loaded
+        """
+        fresh = []
+        for location, lat, lon, updated_at in entries:
+            coords = (lat, lon) if lat is not None else None
+            if self._is_fresh(coords, updated_at):
+                fresh.append((normalize_location(location), lat, lon, updated_at))
+        conn = self._connection()
+        conn.executemany(
+            'INSERT INTO geocodes (location, lat, lon, updated_at) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT(location) DO UPDATE SET lat = excluded.lat, lon = excluded.lon, '
+            'updated_at = excluded.updated_at WHERE excluded.updated_at > geocodes.updated_at',
+            fresh
+        )
+        # SQLite caps bound parameters per statement
+        for start in range(0, len(fresh), 500):
+            keys = [entry[0] for entry in fresh[start:start + 500]]
+            rows = conn.execute(
+                f"SELECT location, lat, lon, updated_at FROM geocodes WHERE location IN ({','.join('?' * len(keys))})",
+                keys
+            ).fetchall()
+            with self._lock:
+                for key, lat, lon, updated_at in rows:
+                    self._memory[key] = ((lat, lon) if lat is not None else None, updated_at)
+        return len(fresh)
+
+    def stats(self) -> Dict:
+        count = self._connection().execute('SELECT COUNT(*) FROM geocodes').fetchone()[0]
+        with self._lock:
+            return {
+                'entries': count,
+                'in_memory': len(self._memory),
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def cached_geocode(cache: GeocodeCache, location: str,
+                   geocode: Callable[[str], Optional[Coordinates]]) -> Optional[Coordinates]:
+    """
+    Cache-through geocoding.
+
+    Args:
+        cache (GeocodeCache): Cache to consult and fill
+        location (str): Location string
+        geocode (Callable): Uncached geocoder; should raise on transient errors
+
+    Returns:
+        Optional[Coordinates]: (latitude, longitude) or None if geocoding fails
+    """
+    found, coords = cache.lookup(location)
+    if found:
+        return coords
+    try:
+        coords = geocode(location)
+    except Exception as e:
+        # Transient failure: don't poison the cache with a negative entry
+        print(f"Error geocoding location '{location}': {e}")
+        return None
+    cache.put(location, coords)
+    return coords
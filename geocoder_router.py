@@ -0,0 +1,405 @@
+"""
+Multi-provider geocoding with hedged requests and failover.
+
+GeocoderRouter spreads lookups over several providers (Nominatim, Photon,
+ArcGIS, or a local table used as a stand-in in tests and benchmarks). Each
+provider has a circuit breaker that stops sending it traffic after repeated
+errors, and a latency histogram. The primary provider for a lookup is picked
+at random, weighted by recent success rate over recent latency; if it hasn't
+answered within its GEOCODER_HEDGE_PERCENTILE latency, the same lookup is
+also sent to the next-best provider and the first answer wins. A provider
+error fails over to the next provider instead of dropping the lookup.
+"""
+
+import bisect
+import csv
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+Coordinates = Tuple[float, float]
+Geocode = Callable[[str], Optional[Coordinates]]
+
+# Providers to route between, in order of preference (nominatim, photon, arcgis, local)
+GEOCODER_PROVIDERS = [name.strip() for name in os.getenv('GEOCODER_PROVIDERS', 'nominatim').split(',') if name.strip()]
+
+# CSV of location,lat,lon rows served by the 'local' provider
+GEOCODER_LOCAL_TABLE = os.getenv('GEOCODER_LOCAL_TABLE', '')
+
+# Send a hedged request once the primary is slower than this latency percentile of its own history
+GEOCODER_HEDGE_PERCENTILE = float(os.getenv('GEOCODER_HEDGE_PERCENTILE', '0.95'))
+
+# Hedge delay bounds, and the delay used until a provider has GEOCODER_HEDGE_MIN_SAMPLES latencies
+GEOCODER_HEDGE_MIN_MS = float(os.getenv('GEOCODER_HEDGE_MIN_MS', '50'))
+GEOCODER_HEDGE_DEFAULT_MS = float(os.getenv('GEOCODER_HEDGE_DEFAULT_MS', '1000'))
+GEOCODER_HEDGE_MIN_SAMPLES = int(os.getenv('GEOCODER_HEDGE_MIN_SAMPLES', '20'))
+
+# Consecutive errors that open a provider's breaker, and seconds before it is tried again
+GEOCODER_BREAKER_FAILURES = int(os.getenv('GEOCODER_BREAKER_FAILURES', '5'))
+GEOCODER_BREAKER_COOLDOWN = float(os.getenv('GEOCODER_BREAKER_COOLDOWN', '30'))
+
+# Threads running provider calls (a hedged lookup uses two)
+GEOCODER_WORKERS = int(os.getenv('GEOCODER_WORKERS', '8'))
+
+# Histogram bucket upper bounds in milliseconds (the last bucket is open-ended)
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Breaker states
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram plus a window of recent samples for percentiles."""
+
+    def __init__(self, window: int = 256):
+        self.counts = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.recent = deque(maxlen=window)
+
+    def record(self, seconds: float) -> None:
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+        self.recent.append(ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """p-quantile (0-1) of the recent samples in milliseconds, or None if there are none."""
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[int(p * (len(ordered) - 1))]
+
+    def buckets(self) -> Dict[str, int]:
+        labels = [f'le_{bound}ms' for bound in LATENCY_BUCKETS_MS] + [f'gt_{LATENCY_BUCKETS_MS[-1]}ms']
+        return dict(zip(labels, self.counts))
+
+
+class CircuitBreaker:
+    """Closed → open after consecutive failures → half-open (one trial call) after a cooldown."""
+
+    def __init__(self, failures: int = GEOCODER_BREAKER_FAILURES, cooldown: float = GEOCODER_BREAKER_COOLDOWN):
+        self.failure_threshold = failures
+        self.cooldown = cooldown
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.trips = 0
+        self._trial_started: Optional[float] = None
+
+    def allow(self) -> bool:
+        """Whether a call may go to the provider now (claims the trial call when half-open)."""
+        if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        now = time.monotonic()
+        # A trial claimed but never completed (e.g. the lookup was answered elsewhere) expires
+        if self.state == HALF_OPEN and (self._trial_started is None or now - self._trial_started >= self.cooldown):
+            self._trial_started = now
+            return True
+        return False
+
+    def success(self) -> None:
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._trial_started = None
+
+    def failure(self) -> None:
+        self.consecutive_failures += 1
+        self._trial_started = None
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.trips += 1
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+
+class Provider:
+    """One geocoding backend with its breaker, latency histogram and health estimate."""
+
+    # Weight of the newest observation in the success-rate and latency averages
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, geocode: Geocode):
+        self.name = name
+        self.geocode = geocode
+        self.breaker = CircuitBreaker()
+        self.latency = LatencyHistogram()
+        self.success_rate = 1.0
+        self.mean_latency_ms: Optional[float] = None
+        self.counters = {'requests': 0, 'errors': 0, 'not_found': 0, 'hedges': 0, 'wins': 0}
+
+    def health(self) -> float:
+        """Routing weight: recent success rate per unit of recent latency."""
+        latency = self.mean_latency_ms if self.mean_latency_ms is not None else GEOCODER_HEDGE_MIN_MS
+        return max(self.success_rate, 0.01) / max(latency, 1.0)
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait on this provider before hedging."""
+        if len(self.latency.recent) < GEOCODER_HEDGE_MIN_SAMPLES:
+            return GEOCODER_HEDGE_DEFAULT_MS / 1000
+        return max(self.latency.percentile(GEOCODER_HEDGE_PERCENTILE), GEOCODER_HEDGE_MIN_MS) / 1000
+
+    def observe(self, seconds: float, ok: bool) -> None:
+        alpha = self.EWMA_ALPHA
+        self.success_rate = (1 - alpha) * self.success_rate + alpha * (1.0 if ok else 0.0)
+        if ok:
+            ms = seconds * 1000
+            self.latency.record(seconds)
+            self.mean_latency_ms = ms if self.mean_latency_ms is None else (1 - alpha) * self.mean_latency_ms + alpha * ms
+
+
+class LocalGeocoder:
+    """
+    Table-backed geocoder: a stand-in provider for tests, benchmarks and offline runs.
+
+    latency (seconds, or a callable returning seconds) and failure_rate
+    simulate a remote provider's behaviour.
+    """
+
+    def __init__(self, table: Optional[Dict[str, Coordinates]] = None, latency=0.0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.table = {key.strip().lower(): value for key, value in (table or {}).items()}
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'LocalGeocoder':
+        """Load location,lat,lon rows (an optional header row is skipped)."""
+        table = {}
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.reader(f):
+                try:
+                    table[row[0]] = (float(row[1]), float(row[2]))
+                except (IndexError, ValueError):
+                    continue
+        return cls(table)
+
+    def __call__(self, location: str) -> Optional[Coordinates]:
+        delay = self.latency() if callable(self.latency) else self.latency
+        if delay:
+            time.sleep(delay)
+        if self.failure_rate and self._rng.random() < self.failure_rate:
+            raise ConnectionError('local geocoder: simulated provider failure')
+        return self.table.get(location.strip().lower())
+
+
+class AllProvidersFailed(Exception):
+    """Every available provider errored (or none was available)."""
+
+
+class GeocoderRouter:
+    """Routes lookups over providers with health weighting, hedging and failover."""
+
+    def __init__(self, providers: Sequence[Provider], hedging: bool = True,
+                 workers: int = GEOCODER_WORKERS, seed: Optional[int] = None):
+        if not providers:
+            raise ValueError('GeocoderRouter needs at least one provider')
+        self.providers = list(providers)
+        self.hedging = hedging and len(self.providers) > 1
+        self._lock = threading.Lock()
+        self._rng = random.Random(seed)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._workers = workers
+        self.counters = {'lookups': 0, 'hedged': 0, 'failovers': 0, 'failed': 0}
+
+    def _executor(self) -> ThreadPoolExecutor:
+        # Created on first use so importing the module starts no threads
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='geocoder')
+            return self._pool
+
+    def _ranked(self) -> List[Provider]:
+        """Providers whose breaker admits a call: a health-weighted random primary, then the rest by health."""
+        with self._lock:
+            candidates = [provider for provider in self.providers if provider.breaker.allow()]
+            if len(candidates) <= 1:
+                return candidates
+            weights = [provider.health() for provider in candidates]
+            primary = self._rng.choices(candidates, weights=weights)[0]
+            rest = sorted((p for p in candidates if p is not primary), key=Provider.health, reverse=True)
+            return [primary] + rest
+
+    def _call(self, provider: Provider, location: str) -> Optional[Coordinates]:
+        started = time.perf_counter()
+        try:
+            coords = provider.geocode(location)
+        except Exception:
+            with self._lock:
+                provider.counters['requests'] += 1
+                provider.counters['errors'] += 1
+                provider.observe(time.perf_counter() - started, ok=False)
+                provider.breaker.failure()
+            raise
+        with self._lock:
+            provider.counters['requests'] += 1
+            if coords is None:
+                provider.counters['not_found'] += 1
+            provider.observe(time.perf_counter() - started, ok=True)
+            provider.breaker.success()
+        return coords
+
+    def geocode(self, location: str) -> Optional[Coordinates]:
+        """
+        Geocode a location through the providers.
+
+        Args:
+            location (str): Location string
+
+        Returns:
+            Optional[Coordinates]: (latitude, longitude), or None if every
+            provider that answered found nothing
+
+        Raises:
+            AllProvidersFailed: If no provider gave an answer (so callers
+            treat it as transient and don't cache a miss)
+        """
+        with self._lock:
+            self.counters['lookups'] += 1
+        ranked = self._ranked()
+        if not ranked:
+            with self._lock:
+                self.counters['failed'] += 1
+            raise AllProvidersFailed('all geocoding providers are unavailable (circuit open)')
+
+        if not self.hedging:
+            return self._sequential(ranked, location)
+
+        pool = self._executor()
+        pending = {pool.submit(self._call, ranked[0], location): ranked[0]}
+        queued = ranked[1:]
+        answered = False
+        last_error: Optional[Exception] = None
+        timeout = ranked[0].hedge_delay()
+        while pending:
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # The primary is slower than usual: race it against the next provider
+                if queued:
+                    provider = queued.pop(0)
+                    with self._lock:
+                        self.counters['hedged'] += 1
+                        provider.counters['hedges'] += 1
+                    pending[pool.submit(self._call, provider, location)] = provider
+                timeout = None
+                continue
+            for future in done:
+                provider = pending.pop(future)
+                try:
+                    coords = future.result()
+                except Exception as e:
+                    last_error = e
+                    coords = None
+                else:
+                    answered = True
+                if coords is not None:
+                    with self._lock:
+                        provider.counters['wins'] += 1
+                    # Any loser keeps running in the pool; its latency is still recorded
+                    return coords
+            if not pending and queued:
+                # Error or no match: fail over to the next provider
+                provider = queued.pop(0)
+                with self._lock:
+                    self.counters['failovers'] += 1
+                pending[pool.submit(self._call, provider, location)] = provider
+                timeout = provider.hedge_delay()
+        return self._finish(answered, last_error)
+
+    def _sequential(self, ranked: List[Provider], location: str) -> Optional[Coordinates]:
+        answered = False
+        last_error: Optional[Exception] = None
+        for attempt, provider in enumerate(ranked):
+            if attempt:
+                with self._lock:
+                    self.counters['failovers'] += 1
+            try:
+                coords = self._call(provider, location)
+            except Exception as e:
+                last_error = e
+                continue
+            answered = True
+            if coords is not None:
+                with self._lock:
+                    provider.counters['wins'] += 1
+                return coords
+        return self._finish(answered, last_error)
+
+    def _finish(self, answered: bool, last_error: Optional[Exception]) -> Optional[Coordinates]:
+        if answered:
+            return None
+        with self._lock:
+            self.counters['failed'] += 1
+        raise AllProvidersFailed(f'all geocoding providers failed: {last_error}')
+
+    def __call__(self, location: str) -> Optional[Coordinates]:
+        return self.geocode(location)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            providers = {}
+            for provider in self.providers:
+                providers[provider.name] = dict(
+                    provider.counters,
+                    breaker=provider.breaker.state,
+                    breaker_trips=provider.breaker.trips,
+                    success_rate=round(provider.success_rate, 3),
+                    p50_ms=_rounded(provider.latency.percentile(0.5)),
+                    p95_ms=_rounded(provider.latency.percentile(0.95)),
+                    p99_ms=_rounded(provider.latency.percentile(0.99)),
+                    hedge_delay_ms=round(provider.hedge_delay() * 1000, 1),
+                    latency_histogram=provider.latency.buckets()
+                )
+            return dict(self.counters, hedging=self.hedging, providers=providers)
+
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return round(value, 1) if value is not None else None
+
+
+def geopy_provider(name: str, geocoder) -> Provider:
+    """Wrap a geopy geocoder; it raises on provider errors and returns None for no match."""
+    def geocode(location: str) -> Optional[Coordinates]:
+        location_data = geocoder.geocode(location)
+        if location_data:
+            return (location_data.latitude, location_data.longitude)
+        return None
+    return Provider(name, geocode)
+
+
+def build_router(nominatim, names: Sequence[str] = GEOCODER_PROVIDERS) -> GeocoderRouter:
+    """
+    Router over the configured providers.
+
+    Args:
+        nominatim: The app's Nominatim geocoder (shares its pooled HTTP adapter)
+        names (Sequence[str]): Provider names, e.g. GEOCODER_PROVIDERS
+
+    Returns:
+        GeocoderRouter: Router; unknown names are skipped with a warning
+    """
+    from geopy.geocoders import ArcGIS, Photon
+
+    from http_pool import PooledGeopyAdapter
+
+    timeout = nominatim.timeout
+    providers = []
+    for name in names:
+        if name == 'nominatim':
+            providers.append(geopy_provider(name, nominatim))
+        elif name == 'photon':
+            providers.append(geopy_provider(name, Photon(timeout=timeout, adapter_factory=PooledGeopyAdapter)))
+        elif name == 'arcgis':
+            providers.append(geopy_provider(name, ArcGIS(timeout=timeout, adapter_factory=PooledGeopyAdapter)))
+        elif name == 'local':
+            local = LocalGeocoder.from_csv(GEOCODER_LOCAL_TABLE) if GEOCODER_LOCAL_TABLE else LocalGeocoder()
+            providers.append(Provider(name, local))
+        else:
+            print(f"⚠️ Unknown geocoding provider '{name}' ignored")
+    if not providers:
+        providers.append(geopy_provider('nominatim', nominatim))
+    return GeocoderRouter(providers)
@@ -0,0 +1,139 @@
+"""
+Shared, pooled HTTP session layer for outbound API calls.
+
+The geocoder and the gspread client mount one process-wide HTTP adapter, so
+calls to the same host reuse kept-alive TCP/TLS connections instead of
+paying a fresh handshake. The adapter applies default timeouts and a
+retry/backoff policy for idempotent requests, and counts requests against
+new connections so the reuse rate can be checked at runtime.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import requests
+from geopy.adapters import RequestsAdapter
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Distinct hosts kept in the pool manager, and kept-alive connections per host
+HTTP_POOL_CONNECTIONS = int(os.getenv('HTTP_POOL_CONNECTIONS', '10'))
+HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '32'))
+
+# (connect, read) timeout applied when the caller doesn't pass one
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', '3.05'))
+HTTP_READ_TIMEOUT = float(os.getenv('HTTP_READ_TIMEOUT', '15'))
+
+# Retries for idempotent requests on connection errors and throttling/5xx
+HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '3'))
+HTTP_BACKOFF_FACTOR = float(os.getenv('HTTP_BACKOFF_FACTOR', '0.5'))
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter with default timeouts and request/connection counters."""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._stats_lock = threading.Lock()
+        self.requests_sent = 0
+        self.errors = 0
+        self.total_latency = 0.0
+
+    def send(self, request, **kwargs):
+        if kwargs.get('timeout') is None:
+            kwargs['timeout'] = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+        started = time.perf_counter()
+        try:
+            return super().send(request, **kwargs)
+        except Exception:
+            with self._stats_lock:
+                self.errors += 1
+            raise
+        finally:
+            with self._stats_lock:
+                self.requests_sent += 1
+                self.total_latency += time.perf_counter() - started
+
+    def stats(self) -> Dict:
+        """Per-host connection counts and the overall connection reuse rate."""
+        hosts = {}
+        pools = self.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is None:
+                continue
+            hosts[f'{pool.scheme}://{pool.host}:{pool.port}'] = {
+                'connections_opened': pool.num_connections,
+                'requests': pool.num_requests
+            }
+        opened = sum(h['connections_opened'] for h in hosts.values())
+        pooled_requests = sum(h['requests'] for h in hosts.values())
+        with self._stats_lock:
+            sent, errors, latency = self.requests_sent, self.errors, self.total_latency
+        return {
+            'requests': sent,
+            'errors': errors,
+            'connections_opened': opened,
+            'connection_reuse_rate': round(1 - opened / pooled_requests, 4) if pooled_requests else 0.0,
+            'mean_latency_ms': round(latency / sent * 1000, 2) if sent else 0.0,
+            'pool_maxsize': self._pool_maxsize,
+            'hosts': hosts
+        }
+
+
+_shared_adapter: Optional[PooledHTTPAdapter] = None
+_shared_adapter_lock = threading.Lock()
+
+
+def get_shared_adapter() -> PooledHTTPAdapter:
+    """Process-wide adapter; created lazily so forked workers each get their own sockets."""
+    global _shared_adapter
+    if _shared_adapter is None:
+        with _shared_adapter_lock:
+            if _shared_adapter is None:
+                retry = Retry(
+                    total=HTTP_RETRIES,
+                    backoff_factor=HTTP_BACKOFF_FACTOR,
+                    status_forcelist=RETRY_STATUSES,
+                    allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                    respect_retry_after_header=True,
+                    raise_on_status=False
+                )
+                _shared_adapter = PooledHTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                    max_retries=retry
+                )
+    return _shared_adapter
+
+
+def mount_shared_adapter(session: requests.Session) -> requests.Session:
+    """Route a session's http(s) traffic through the shared pooled adapter."""
+    adapter = get_shared_adapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class PooledGeopyAdapter(RequestsAdapter):
+    """geopy adapter whose session uses the shared connection pool."""
+
+    def __init__(self, *, proxies=None, ssl_context=None, **kwargs):
+        super().__init__(proxies=proxies, ssl_context=ssl_context, **kwargs)
+        mount_shared_adapter(self.session)
+
+
+def pooled_authorized_session(credentials) -> requests.Session:
+    """google-auth AuthorizedSession (as used by gspread) on the shared pool."""
+    from google.auth.transport.requests import AuthorizedSession
+    return mount_shared_adapter(AuthorizedSession(credentials))
+
+
+def http_stats() -> Dict:
+    """Connection reuse stats, or an empty summary if nothing has been sent yet."""
+    if _shared_adapter is None:
+        return {'requests': 0, 'connections_opened': 0, 'connection_reuse_rate': 0.0, 'hosts': {}}
+    return _shared_adapter.stats()
@@ -0,0 +1,218 @@
+"""
+Idempotency-Key support for POST endpoints.
+
+A client that retries a POST with the same Idempotency-Key header gets the
+stored response of the first attempt instead of creating a second record.
+Keys live in a SQLite file (WAL mode, shared by every server process) with a
+TTL and an entry cap, so the dedupe window is bounded in time and space.
+"""
+
+import functools
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from flask import Response, current_app, jsonify, request
+
+IDEMPOTENCY_DB_PATH = os.getenv(
+    'IDEMPOTENCY_DB_PATH',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'idempotency.db')
+)
+
+# How long a key is remembered
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv('IDEMPOTENCY_TTL_SECONDS', str(24 * 3600)))
+
+# Most keys kept; the oldest are dropped first
+IDEMPOTENCY_MAX_KEYS = int(os.getenv('IDEMPOTENCY_MAX_KEYS', '10000'))
+
+# A request still unfinished after this long is presumed dead and its key can be reused
+IDEMPOTENCY_PENDING_SECONDS = float(os.getenv('IDEMPOTENCY_PENDING_SECONDS', '60'))
+
+MAX_KEY_LENGTH = 255
+
+# Claim outcomes
+NEW, REPLAY, IN_PROGRESS, MISMATCH = 'new', 'replay', 'in_progress', 'mismatch'
+
+StoredResponse = Tuple[int, bytes, str]
+
+
+class IdempotencyStore:
+    """Bounded, process-shared record of Idempotency-Keys and their responses."""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path: str = IDEMPOTENCY_DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._claims = 0
+        self.replays = 0
+        self.conflicts = 0
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS idempotency_keys ('
+            'key TEXT PRIMARY KEY, fingerprint TEXT NOT NULL, created_at REAL NOT NULL, '
+            'status INTEGER, body BLOB, mimetype TEXT)'
+        )
+        self._connection().execute(
+            'CREATE INDEX IF NOT EXISTS idempotency_created ON idempotency_keys (created_at)'
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def claim(self, key: str, fingerprint: str) -> Tuple[str, Optional[StoredResponse]]:
+        """
+        Reserve a key for a request, or find what happened to it before.
+
+        Returns:
+            Tuple[str, Optional[StoredResponse]]: (NEW, None) if the caller should
+            handle the request; (REPLAY, (status, body, mimetype)) if it already
+            completed; (IN_PROGRESS, None) if another attempt is still running;
+            (MISMATCH, None) if the key was used for a different request
+        """
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT fingerprint, created_at, status, body, mimetype FROM idempotency_keys WHERE key = ?', (key,)
+            ).fetchone()
+            if row is not None and now - row[1] >= IDEMPOTENCY_TTL_SECONDS:
+                row = None
+            if row is None:
+                conn.execute(
+                    'INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, created_at) VALUES (?, ?, ?)',
+                    (key, fingerprint, now)
+                )
+                outcome = (NEW, None)
+            elif row[0] != fingerprint:
+                outcome = (MISMATCH, None)
+            elif row[2] is not None:
+                outcome = (REPLAY, (row[2], bytes(row[3]), row[4]))
+            elif now - row[1] >= IDEMPOTENCY_PENDING_SECONDS:
+                # The first attempt died without finishing; let this one take over
+                conn.execute('UPDATE idempotency_keys SET created_at = ? WHERE key = ?', (now, key))
+                outcome = (NEW, None)
+            else:
+                outcome = (IN_PROGRESS, None)
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+
+        with self._lock:
+            self._claims += 1
+            prune = self._claims % self.PRUNE_EVERY == 0
+            if outcome[0] == REPLAY:
+                self.replays += 1
+            elif outcome[0] in (IN_PROGRESS, MISMATCH):
+                self.conflicts += 1
+        if prune:
+            self.prune()
+        return outcome
+
+    def complete(self, key: str, status: int, body: bytes, mimetype: str) -> None:
+        """Store the response of a claimed key for later replays."""
+        self._connection().execute(
+            'UPDATE idempotency_keys SET status = ?, body = ?, mimetype = ? WHERE key = ?',
+            (status, body, mimetype, key)
+        )
+
+    def release(self, key: str) -> None:
+        """Forget a claimed key (the request failed and may be retried)."""
+        self._connection().execute('DELETE FROM idempotency_keys WHERE key = ?', (key,))
+
+    def prune(self) -> None:
+        """Drop expired keys, then the oldest beyond IDEMPOTENCY_MAX_KEYS."""
+        conn = self._connection()
+        conn.execute('DELETE FROM idempotency_keys WHERE created_at < ?', (time.time() - IDEMPOTENCY_TTL_SECONDS,))
+        conn.execute(
+            'DELETE FROM idempotency_keys WHERE key IN ('
+            'SELECT key FROM idempotency_keys ORDER BY created_at DESC LIMIT -1 OFFSET ?)',
+            (IDEMPOTENCY_MAX_KEYS,)
+        )
+
+    def stats(self) -> Dict:
+        count = self._connection().execute('SELECT COUNT(*) FROM idempotency_keys').fetchone()[0]
+        with self._lock:
+            return {
+                'keys': count,
+                'max_keys': IDEMPOTENCY_MAX_KEYS,
+                'ttl_seconds': IDEMPOTENCY_TTL_SECONDS,
+                'replays': self.replays,
+                'conflicts': self.conflicts
+            }
+
+
+def request_fingerprint() -> str:
+    """Hash of the method, path and body of the current request."""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def idempotent(store: IdempotencyStore):
+    """
+    Make a Flask view honour the Idempotency-Key request header.
+
+    Requests without the header are handled as usual. Responses below 500
+    are stored and replayed for retries with the same key and body; a
+    server error releases the key so the retry runs again.
+    """
+    def decorate(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            key = request.headers.get('Idempotency-Key')
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return jsonify({
+                    'success': False,
+                    'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'
+                }), 400
+
+            # Keys are scoped to the endpoint they were sent to
+            scoped_key = f"{request.method} {request.path} {key}"
+            outcome, stored = store.claim(scoped_key, request_fingerprint())
+            if outcome == REPLAY:
+                status, body, mimetype = stored
+                response = Response(body, status=status, mimetype=mimetype)
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            if outcome == MISMATCH:
+                return jsonify({
+                    'success': False,
+                    'error': 'Idempotency-Key was already used for a different request'
+                }), 422
+            if outcome == IN_PROGRESS:
+                response = jsonify({
+                    'success': False,
+                    'error': 'A request with this Idempotency-Key is still in progress'
+                })
+                response.status_code = 409
+                response.headers['Retry-After'] = '1'
+                return response
+
+            try:
+                response = current_app.make_response(view(*args, **kwargs))
+            except Exception:
+                store.release(scoped_key)
+                raise
+            if response.status_code >= 500:
+                store.release(scoped_key)
+            else:
+                store.complete(scoped_key, response.status_code, response.get_data(), response.mimetype)
+            return response
+        return wrapper
+    return decorate
@@ -0,0 +1,72 @@
+"""
+Collision-free record IDs.
+
+IDs are ULIDs: a 48-bit millisecond timestamp followed by 80 random bits,
+Crockford base32 encoded to 26 characters, so they sort by creation time.
+Within a process, IDs generated in the same millisecond increment the random
+part and stay strictly increasing; separate processes draw independent
+random parts (re-seeded after fork), so pre-forked workers never collide.
+"""
+
+import os
+import secrets
+import threading
+import time
+
+_CROCKFORD = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_RANDOM_BITS = 80
+_RANDOM_LIMIT = 1 << _RANDOM_BITS
+
+
+def encode_ulid(value: int) -> str:
+    """Crockford base32 of a 128-bit value, 26 characters."""
+    chars = []
+    for _ in range(26):
+        chars.append(_CROCKFORD[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+def ulid_timestamp_ms(ulid: str) -> int:
+    """Creation time (ms since the epoch) encoded in a ULID."""
+    value = 0
+    for char in ulid[:10]:
+        value = (value << 5) | _CROCKFORD.index(char)
+    return value
+
+
+class UlidGenerator:
+    """Thread-safe, monotonic ULID source."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget the last ID (a forked child must not continue its parent's sequence)."""
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self) -> str:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = secrets.randbits(_RANDOM_BITS)
+            else:
+                # Same millisecond, or the clock stepped back: keep counting up
+                self._last_random += 1
+                if self._last_random >= _RANDOM_LIMIT:
+                    self._last_ms += 1
+                    self._last_random = secrets.randbits(_RANDOM_BITS)
+            return encode_ulid((self._last_ms << _RANDOM_BITS) | self._last_random)
+
+
+_generator = UlidGenerator()
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_generator.reset)
+
+
+def new_id(prefix: str) -> str:
+    """New record ID such as donor_01JA8X4ZQ6N4V2C5T0M7K3R9PB."""
+    return f"{prefix}_{_generator.new()}"
@@ -0,0 +1,341 @@
+"""
+Persistent background job queue with a local worker pool.
+
+Jobs live in a SQLite file, so they survive restarts and can be shared by
+several server processes without an external broker. A job moves through
+pending → running → done, is retried with exponential backoff on failure,
+and lands in the dead-letter state once it runs out of attempts or raises
+PermanentJobError.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+JOB_QUEUE_PATH = os.getenv(
+    'JOB_QUEUE_PATH',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'jobs.db')
+)
+
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 300.0
+
+# Finished jobs are deleted after this long (purge_done, run with each archival)
+JOB_RETENTION_SECONDS = float(os.getenv('JOB_RETENTION_SECONDS', '3600'))
+
+# Running jobs whose worker disappeared for this long are handed out again
+LEASE_SECONDS = float(os.getenv('JOB_LEASE_SECONDS', '120'))
+
+# Workers renew the lease of a running job this often, so long jobs aren't re-claimed
+HEARTBEAT_SECONDS = LEASE_SECONDS / 4
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+DEAD = 'dead'
+
+
+class PermanentJobError(Exception):
+    """Raised by a handler when retrying the job cannot help."""
+
+
+class JobQueue:
+    """SQLite-backed job queue; safe across threads and processes."""
+
+    def __init__(self, path: str = JOB_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        conn = self._connection()
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            'id INTEGER PRIMARY KEY AUTOINCREMENT, kind TEXT NOT NULL, payload TEXT NOT NULL, '
+            'dedupe_key TEXT, status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, '
+            'max_attempts INTEGER NOT NULL, run_after REAL NOT NULL, last_error TEXT, '
+            'worker TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL)'
+        )
+        # At most one pending job per dedupe key. A running job doesn't block a
+        # follow-up, since it may already have read the inputs that changed
+        conn.execute('DROP INDEX IF EXISTS jobs_live_dedupe')
+        conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_pending_dedupe ON jobs (dedupe_key) "
+            "WHERE dedupe_key IS NOT NULL AND status = 'pending'"
+        )
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_ready ON jobs (status, run_after)')
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, kind: str, payload: Dict, dedupe_key: Optional[str] = None,
+                max_attempts: int = DEFAULT_MAX_ATTEMPTS, delay: float = 0.0) -> Optional[int]:
+        """
+        Add a job.
+
+        Args:
+            kind (str): Handler name
+            payload (Dict): JSON-serializable job arguments
+            dedupe_key (Optional[str]): Skip the enqueue if a pending job has this key
+            max_attempts (int): Attempts before the job is dead-lettered
+            delay (float): Seconds before the job becomes runnable
+
+        Returns:
+            Optional[int]: Job ID, or None if deduplicated
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            'INSERT OR IGNORE INTO jobs (kind, payload, dedupe_key, status, max_attempts, '
+            'run_after, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (kind, json.dumps(payload), dedupe_key, PENDING, max_attempts, now + delay, now, now)
+        )
+        return cursor.lastrowid if cursor.rowcount else None
+
+    def enqueue_periodic(self, kind: str, interval: float, payload: Optional[Dict] = None) -> Optional[int]:
+        """
+        Queue the next run of a periodic job at the next interval boundary.
+
+        The dedupe key names the boundary, so every process can call this
+        freely and each boundary still runs once; a handler calls it again
+        to schedule the following run.
+        """
+        now = time.time()
+        slot = int(now // interval) + 1
+        return self.enqueue(kind, payload or {}, dedupe_key=f'{kind}@{slot}', delay=slot * interval - now)
+
+    def claim(self, worker: str, kinds: Optional[List[str]] = None) -> Optional[Dict]:
+        """Atomically take the oldest runnable job, or return None if there is none."""
+        now = time.time()
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            # An expired job whose follow-up is already pending is covered by it
+            conn.execute(
+                'UPDATE jobs SET status = ?, worker = NULL, last_error = ?, updated_at = ? '
+                'WHERE status = ? AND updated_at < ? AND dedupe_key IN '
+                '(SELECT dedupe_key FROM jobs WHERE status = ? AND dedupe_key IS NOT NULL)',
+                (DONE, 'lease expired; superseded by a pending job', now, RUNNING, now - LEASE_SECONDS, PENDING)
+            )
+            conn.execute(
+                'UPDATE jobs SET status = ?, worker = NULL, updated_at = ? '
+                'WHERE status = ? AND updated_at < ?',
+                (PENDING, now, RUNNING, now - LEASE_SECONDS)
+            )
+            query = 'SELECT id, kind, payload, attempts, max_attempts FROM jobs WHERE status = ? AND run_after <= ?'
+            params: list = [PENDING, now]
+            if kinds:
+                query += f" AND kind IN ({','.join('?' * len(kinds))})"
+                params.extend(kinds)
+            row = conn.execute(query + ' ORDER BY run_after, id LIMIT 1', params).fetchone()
+            if row is None:
+                conn.execute('COMMIT')
+                return None
+            conn.execute(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, worker = ?, updated_at = ? WHERE id = ?',
+                (RUNNING, worker, now, row[0])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return {
+            'id': row[0],
+            'kind': row[1],
+            'payload': json.loads(row[2]),
+            'attempts': row[3] + 1,
+            'max_attempts': row[4],
+            'worker': worker
+        }
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Renew the lease of a running job. Returns False if the worker no longer holds it."""
+        cursor = self._connection().execute(
+            'UPDATE jobs SET updated_at = ? WHERE id = ? AND status = ? AND worker = ?',
+            (time.time(), job_id, RUNNING, worker)
+        )
+        return cursor.rowcount > 0
+
+    def complete(self, job: Dict) -> bool:
+        """Mark a claimed job done. Returns False if its lease was lost to another worker."""
+        cursor = self._connection().execute(
+            'UPDATE jobs SET status = ?, last_error = NULL, updated_at = ? '
+            'WHERE id = ? AND status = ? AND worker = ?',
+            (DONE, time.time(), job['id'], RUNNING, job['worker'])
+        )
+        return cursor.rowcount > 0
+
+    def fail(self, job: Dict, error: str, permanent: bool = False) -> Optional[str]:
+        """
+        Record a failure; retry with backoff or dead-letter.
+
+        Returns:
+            Optional[str]: The new status, or None if the lease was lost to another worker
+        """
+        now = time.time()
+        if permanent or job['attempts'] >= job['max_attempts']:
+            status, run_after = DEAD, now
+        else:
+            status = PENDING
+            run_after = now + min(RETRY_MAX_SECONDS, RETRY_BASE_SECONDS * 2 ** (job['attempts'] - 1))
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if status == PENDING and conn.execute(
+                    'SELECT 1 FROM jobs WHERE status = ? AND dedupe_key = (SELECT dedupe_key FROM jobs WHERE id = ?)',
+                    (PENDING, job['id'])).fetchone():
+                # A follow-up with the same dedupe key is already queued and will redo the work
+                status = DONE
+            cursor = conn.execute(
+                'UPDATE jobs SET status = ?, run_after = ?, last_error = ?, worker = NULL, updated_at = ? '
+                'WHERE id = ? AND status = ? AND worker = ?',
+                (status, run_after, error[:500], now, job['id'], RUNNING, job['worker'])
+            )
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return status if cursor.rowcount else None
+
+    def dead_letters(self, limit: int = 50) -> List[Dict]:
+        """Most recent dead-lettered jobs."""
+        rows = self._connection().execute(
+            'SELECT id, kind, payload, attempts, last_error, updated_at FROM jobs '
+            'WHERE status = ? ORDER BY updated_at DESC LIMIT ?', (DEAD, limit)
+        ).fetchall()
+        return [
+            {'id': r[0], 'kind': r[1], 'payload': json.loads(r[2]), 'attempts': r[3],
+             'error': r[4], 'failed_at': r[5]}
+            for r in rows
+        ]
+
+    def purge_done(self, older_than_seconds: float = JOB_RETENTION_SECONDS) -> int:
+        """Delete finished jobs so the queue file stays small."""
+        cursor = self._connection().execute(
+            'DELETE FROM jobs WHERE status = ? AND updated_at < ?',
+            (DONE, time.time() - older_than_seconds)
+        )
+        return cursor.rowcount
+
+    def metrics(self) -> Dict:
+        """Queue depth by status and kind, plus the age of the oldest runnable job."""
+        conn = self._connection()
+        depth: Dict[str, Dict[str, int]] = {}
+        for kind, status, count in conn.execute(
+                'SELECT kind, status, COUNT(*) FROM jobs GROUP BY kind, status'):
+            depth.setdefault(status, {})[kind] = count
+        oldest = conn.execute(
+            'SELECT MIN(created_at) FROM jobs WHERE status = ?', (PENDING,)
+        ).fetchone()[0]
+        return {
+            'pending': sum(depth.get(PENDING, {}).values()),
+            'running': sum(depth.get(RUNNING, {}).values()),
+            'dead': sum(depth.get(DEAD, {}).values()),
+            'by_status': depth,
+            'oldest_pending_age_seconds': round(time.time() - oldest, 3) if oldest else 0.0
+        }
+
+
+class WorkerPool:
+    """Threads that claim jobs from a JobQueue and dispatch them to handlers by kind."""
+
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[Dict], None]],
+                 workers: int = 1, poll_interval: float = 0.5):
+        self.queue = queue
+        self.handlers = handlers
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self.processed = 0
+        self.failed = 0
+
+    def ensure_started(self) -> None:
+        """Start the worker threads if they aren't running."""
+        with self._lock:
+            self._threads = [t for t in self._threads if t.is_alive()]
+            self._stop.clear()
+            for i in range(len(self._threads), self.workers):
+                thread = threading.Thread(target=self._run, name=f'job-worker-{i}', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self) -> None:
+        """Skip the poll wait, e.g. right after an enqueue."""
+        self._wake.set()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def _keep_leased(self, job: Dict, worker: str, done: threading.Event) -> None:
+        """Renew the job's lease until the handler finishes."""
+        while not done.wait(HEARTBEAT_SECONDS):
+            try:
+                if not self.queue.heartbeat(job['id'], worker):
+                    return
+            except Exception as e:
+                print(f"Error renewing lease of job {job['id']}: {e}")
+
+    def run_once(self, worker: str = 'inline') -> bool:
+        """Process a single job in the calling thread. Returns False if none was ready."""
+        job = self.queue.claim(worker, list(self.handlers))
+        if job is None:
+            return False
+        done = threading.Event()
+        threading.Thread(target=self._keep_leased, args=(job, worker, done),
+                         name=f"job-lease-{job['id']}", daemon=True).start()
+        try:
+            self.handlers[job['kind']](job['payload'])
+        except PermanentJobError as e:
+            self.queue.fail(job, str(e), permanent=True)
+            self._count('failed')
+        except Exception as e:
+            status = self.queue.fail(job, f'{type(e).__name__}: {e}')
+            self._count('failed')
+            if status == DEAD:
+                print(f"❌ Job {job['id']} ({job['kind']}) dead-lettered: {e}")
+        else:
+            self.queue.complete(job)
+            self._count('processed')
+        finally:
+            done.set()
+        return True
+
+    def _run(self) -> None:
+        worker = f'{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        while not self._stop.is_set():
+            try:
+                if self.run_once(worker):
+                    continue
+            except Exception as e:
+                print(f"Error in job worker: {e}")
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+
+    def stats(self) -> Dict:
+        with self._stats_lock:
+            processed, failed = self.processed, self.failed
+        return {
+            'workers': len([t for t in self._threads if t.is_alive()]),
+            'processed': processed,
+            'failed': failed
+        }
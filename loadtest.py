@@ -0,0 +1,411 @@
+"""
+Load generator for the Food Donation backends.
+
+Replays a weighted mix of reads and writes against a backend and reports
+throughput, latency percentiles per operation and SLO pass/fail. By default
+the backend runs in this process with its Firestore/Sheets client and
+geocoder replaced by the fakes in fakes.py, so capacity can be measured on
+one offline machine with chosen service latency, error rate and quota.
+
+Usage:
+    python loadtest.py --backend app_sheets --duration 30 --concurrency 16
+    python loadtest.py --backend app --db-latency-ms 40 --db-error-rate 0.01 --slo p99_ms=300,error_rate=0.01
+    python loadtest.py --backend app_sheets_demo --rate 200 --json load.json
+    python loadtest.py --url http://localhost:5000 --duration 60   # a running server, no fakes
+
+The exit status is 1 if an SLO is missed.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+LOADTEST_BACKENDS = ['app', 'app_sheets', 'app_sheets_demo']
+
+FOOD_TYPES = ['bread', 'rice', 'vegetables', 'milk', 'canned beans', 'fruit', 'pasta', 'cooked meals']
+
+# Operation → (method, path); writes carry a generated JSON body
+OPERATIONS: Dict[str, Tuple[str, str]] = {
+    'matches': ('GET', '/api/matches'),
+    'donors': ('GET', '/api/donors'),
+    'ngos': ('GET', '/api/ngos'),
+    'stats': ('GET', '/api/stats'),
+    'add_donor': ('POST', '/api/donors'),
+    'add_ngo': ('POST', '/api/ngos'),
+}
+
+DEFAULT_MIX = 'matches=50,donors=15,ngos=10,stats=5,add_donor=15,add_ngo=5'
+
+# SLO names and how a measured value passes
+SLO_CHECKS: Dict[str, Callable[[float, float], bool]] = {
+    'p50_ms': lambda measured, limit: measured <= limit,
+    'p95_ms': lambda measured, limit: measured <= limit,
+    'p99_ms': lambda measured, limit: measured <= limit,
+    'error_rate': lambda measured, limit: measured <= limit,
+    'min_rps': lambda measured, limit: measured >= limit,
+}
+
+
+def parse_pairs(text: str, valid: List[str], label: str) -> Dict[str, float]:
+    """'a=1,b=2' → {'a': 1.0, 'b': 2.0}; raises ValueError for unknown names or bad numbers."""
+    pairs = {}
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, _, value = item.partition('=')
+        if name not in valid:
+            raise ValueError(f"Unknown {label} '{name}' (expected one of: {', '.join(valid)})")
+        pairs[name] = float(value)
+    return pairs
+
+
+def percentile(ordered: List[float], p: float) -> float:
+    """p-quantile (0-1) of an already sorted, non-empty list."""
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+def latency_summary(samples: List[float]) -> Dict:
+    """Percentiles of latencies in seconds, reported in milliseconds."""
+    if not samples:
+        return {'p50_ms': None, 'p95_ms': None, 'p99_ms': None, 'max_ms': None}
+    ordered = sorted(samples)
+    return {
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2)
+    }
+
+
+class TrafficModel:
+    """Random request bodies over a fixed pool of locations, so geocoding warms up like real traffic."""
+
+    def __init__(self, locations: int, seed: int):
+        self.locations = [f'{n} Market Street, Loadtown' for n in range(1, locations + 1)]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def donor(self) -> Dict:
+        with self._lock:
+            return {
+                'foodType': self._rng.choice(FOOD_TYPES),
+                'quantity': f'{self._rng.randint(1, 40)} kg',
+                'expiryTime': self._rng.choice([6, 12, 24, 48]),
+                'location': self._rng.choice(self.locations)
+            }
+
+    def ngo(self) -> Dict:
+        with self._lock:
+            return {
+                'ngoName': f'Food Bank {self._rng.randint(1, 10 ** 6)}',
+                'foodNeeded': ', '.join(self._rng.sample(FOOD_TYPES, 2)),
+                'location': self._rng.choice(self.locations)
+            }
+
+    def seed_records(self, kind: str, count: int) -> List[Dict]:
+        make = self.donor if kind == 'donors' else self.ngo
+        return [{**make(), 'id': f'seed_{kind}_{n}'} for n in range(count)]
+
+
+class InProcessTarget:
+    """A backend module served through Flask test clients (one per thread)."""
+
+    def __init__(self, backend, traffic: TrafficModel):
+        self.backend = backend
+        self.traffic = traffic
+        self._local = threading.local()
+        self.routes = {(method, rule.rule) for rule in backend.app.url_map.iter_rules() for method in rule.methods}
+
+    def _client(self):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.backend.app.test_client()
+        return client
+
+    def supports(self, operation: str) -> bool:
+        method, path = OPERATIONS[operation]
+        # Firestore has no write endpoints: the web form writes to it directly, and so do we
+        return (method, path) in self.routes or (method == 'POST' and hasattr(self.backend, 'init_firebase'))
+
+    def request(self, operation: str) -> int:
+        method, path = OPERATIONS[operation]
+        if method == 'GET':
+            return self._client().get(path).status_code
+        body = self.traffic.donor() if operation == 'add_donor' else self.traffic.ngo()
+        if (method, path) not in self.routes:
+            return self._direct_firestore_write(operation, body)
+        return self._client().post(path, json=body).status_code
+
+    def _direct_firestore_write(self, operation: str, body: Dict) -> int:
+        from datetime import datetime
+
+        collection = 'donations' if operation == 'add_donor' else 'ngoRequests'
+        try:
+            self.backend.get_db().collection(collection).add({**body, 'timestamp': datetime.now().astimezone()})
+        except Exception:
+            return 503
+        return 201
+
+
+class HttpTarget:
+    """A running server reached over HTTP (one keep-alive session per thread)."""
+
+    def __init__(self, base_url: str, traffic: TrafficModel):
+        self.base_url = base_url.rstrip('/')
+        self.traffic = traffic
+        self._local = threading.local()
+
+    def supports(self, operation: str) -> bool:
+        return True
+
+    def request(self, operation: str) -> int:
+        import requests
+
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        method, path = OPERATIONS[operation]
+        body = None
+        if method == 'POST':
+            body = self.traffic.donor() if operation == 'add_donor' else self.traffic.ngo()
+        try:
+            return session.request(method, self.base_url + path, json=body, timeout=30).status_code
+        except requests.RequestException:
+            return 599
+
+
+class LoadRun:
+    """
+    Drive a target with a weighted operation mix and record every request.
+
+    Closed loop (rate=None): each worker sends its next request as soon as
+    the last one returns. Open loop: requests are scheduled at a fixed rate
+    and latency is measured from the scheduled time, so a stalled server
+    isn't hidden by workers slowing down (coordinated omission).
+    """
+
+    def __init__(self, target, mix: Dict[str, float], concurrency: int, rate: Optional[float], seed: int):
+        self.target = target
+        self.operations = [op for op, weight in mix.items() if weight > 0]
+        self.weights = [mix[op] for op in self.operations]
+        self.concurrency = concurrency
+        self.rate = rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._slots = 0
+        self.samples: List[Tuple[str, float, int, float]] = []
+
+    def _pick(self) -> str:
+        with self._lock:
+            return self._rng.choices(self.operations, weights=self.weights)[0]
+
+    def _next_slot(self, started: float) -> float:
+        with self._lock:
+            slot = self._slots
+            self._slots += 1
+        return started + slot / self.rate
+
+    def run(self, duration: float, warmup: float) -> float:
+        """Send traffic for warmup + duration seconds; returns the measured window's length."""
+        started = time.perf_counter()
+        measure_from = started + warmup
+        stop_at = measure_from + duration
+
+        def worker() -> None:
+            samples = []
+            while True:
+                if self.rate:
+                    scheduled = self._next_slot(started)
+                    if scheduled >= stop_at:
+                        break
+                    delay = scheduled - time.perf_counter()
+                    if delay > 0:
+                        time.sleep(delay)
+                else:
+                    scheduled = time.perf_counter()
+                    if scheduled >= stop_at:
+                        break
+                operation = self._pick()
+                try:
+                    status = self.target.request(operation)
+                except Exception:
+                    status = 599
+                finished = time.perf_counter()
+                if scheduled >= measure_from:
+                    samples.append((operation, finished - scheduled, status, finished))
+            with self._lock:
+                self.samples.extend(samples)
+
+        threads = [threading.Thread(target=worker, name=f'load-{n}', daemon=True) for n in range(self.concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return max(time.perf_counter() - measure_from, 1e-9)
+
+
+def is_error(status: int) -> bool:
+    # 304 (served from the client's ETag) is a success
+    return status >= 400
+
+
+def build_report(samples: List[Tuple[str, float, int, float]], elapsed: float, slos: Dict[str, float]) -> Dict:
+    """Overall and per-operation throughput, latency and errors, plus SLO results."""
+    per_operation = {}
+    for operation in sorted({sample[0] for sample in samples}):
+        subset = [sample for sample in samples if sample[0] == operation]
+        statuses = {}
+        for sample in subset:
+            statuses[str(sample[2])] = statuses.get(str(sample[2]), 0) + 1
+        per_operation[operation] = {
+            'requests': len(subset),
+            'rps': round(len(subset) / elapsed, 1),
+            'error_rate': round(sum(is_error(s[2]) for s in subset) / len(subset), 4),
+            **latency_summary([s[1] for s in subset]),
+            'statuses': statuses
+        }
+
+    overall = {
+        'requests': len(samples),
+        'rps': round(len(samples) / elapsed, 1),
+        'error_rate': round(sum(is_error(s[2]) for s in samples) / len(samples), 4) if samples else 0.0,
+        **latency_summary([s[1] for s in samples])
+    }
+
+    slo_results = {}
+    for name, limit in slos.items():
+        measured = overall['rps'] if name == 'min_rps' else overall[name]
+        slo_results[name] = {
+            'limit': limit,
+            'measured': measured,
+            'passed': measured is not None and SLO_CHECKS[name](measured, limit)
+        }
+    return {
+        'elapsed_s': round(elapsed, 2),
+        'overall': overall,
+        'operations': per_operation,
+        'slo': slo_results,
+        'slo_passed': all(result['passed'] for result in slo_results.values())
+    }
+
+
+def start_in_process(args: argparse.Namespace, traffic: TrafficModel) -> Tuple[InProcessTarget, Dict]:
+    """Import the backend against fakes and seed it."""
+    # Caches, job queue and keys go to a throwaway directory; read at import time
+    os.environ.setdefault('BACKEND_DATA_DIR', tempfile.mkdtemp(prefix='loadtest-'))
+    import importlib
+
+    import fakes
+
+    backend = importlib.import_module(args.backend)
+    db_profile = fakes.FaultProfile(
+        args.db_latency_ms, args.db_latency_ms / 5 if args.db_jitter_ms is None else args.db_jitter_ms,
+        args.db_error_rate, args.db_quota_per_minute, seed=args.seed)
+    geocoder_profile = fakes.FaultProfile(
+        args.geocoder_latency_ms, args.geocoder_latency_ms / 5 if args.geocoder_jitter_ms is None else args.geocoder_jitter_ms,
+        args.geocoder_error_rate, args.geocoder_quota_per_minute, seed=args.seed + 1)
+    installed = fakes.install(backend, db_profile, geocoder_profile)
+
+    # Seeded instantly and without faults; the fakes' profiles apply from the first measured request
+    with db_profile.paused(), geocoder_profile.paused():
+        if args.seed_donors:
+            backend.bulk_add_donors(traffic.seed_records('donors', args.seed_donors))
+        if args.seed_ngos:
+            backend.bulk_add_ngos(traffic.seed_records('ngos', args.seed_ngos))
+        if not args.cold_geocode_cache:
+            # Steady state: the persistent geocode cache already knows the addresses
+            for location in traffic.locations:
+                backend.geocode_cache.put(location, backend.geocode_uncached(location))
+    return InProcessTarget(backend, traffic), installed
+
+
+def print_report(report: Dict, out) -> None:
+    overall = report['overall']
+    print(f"\n📊 {overall['requests']} requests in {report['elapsed_s']}s: {overall['rps']} req/s, "
+          f"errors {overall['error_rate']:.2%}", file=out)
+    print(f"   p50 {overall['p50_ms']} ms  p95 {overall['p95_ms']} ms  p99 {overall['p99_ms']} ms  "
+          f"max {overall['max_ms']} ms", file=out)
+    for operation, result in report['operations'].items():
+        print(f"   {operation:<10} {result['requests']:>7} req  {result['rps']:>8} req/s  "
+              f"p50 {result['p50_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  errors {result['error_rate']:.2%}",
+              file=out)
+    for name, result in report['slo'].items():
+        mark = '✅' if result['passed'] else '❌'
+        print(f"{mark} SLO {name}: measured {result['measured']} (limit {result['limit']})", file=out)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description='Load-test a backend against fake services.')
+    parser.add_argument('--backend', choices=LOADTEST_BACKENDS, default='app_sheets_demo',
+                        help='Backend module run in-process with fakes')
+    parser.add_argument('--url', help='Load-test a running server instead (no fakes, no seeding)')
+    parser.add_argument('--duration', type=float, default=20, help='Measured seconds')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before the measurement')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent workers')
+    parser.add_argument('--rate', type=float, help='Open-loop target requests/sec (default: closed loop)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'Operation weights (default: {DEFAULT_MIX})')
+    parser.add_argument('--slo', default='', help="Objectives, e.g. 'p99_ms=500,error_rate=0.01,min_rps=50'")
+    parser.add_argument('--seed-donors', type=int, default=200, help='Donors stored before the run')
+    parser.add_argument('--seed-ngos', type=int, default=50, help='NGOs stored before the run')
+    parser.add_argument('--locations', type=int, default=300, help='Distinct addresses in the traffic')
+    parser.add_argument('--cold-geocode-cache', action='store_true',
+                        help='Start with an empty geocode cache (default: the addresses are pre-geocoded)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed')
+    for service, latency in (('db', 50.0), ('geocoder', 150.0)):
+        label = 'Firestore/Sheets' if service == 'db' else 'geocoder'
+        parser.add_argument(f'--{service}-latency-ms', type=float, default=latency, help=f'Fake {label} base latency')
+        parser.add_argument(f'--{service}-jitter-ms', type=float,
+                            help=f'Mean extra (exponential) {label} latency (default: a fifth of the base)')
+        parser.add_argument(f'--{service}-error-rate', type=float, default=0.0, help=f'Fake {label} error share')
+        parser.add_argument(f'--{service}-quota-per-minute', type=int, default=0,
+                            help=f'Fake {label} requests allowed per minute (0: unlimited)')
+    parser.add_argument('--json', help='Write the report to this JSON file')
+    parser.add_argument('--verbose', action='store_true', help="Show the backend's own output")
+    args = parser.parse_args(argv)
+
+    try:
+        mix = parse_pairs(args.mix, list(OPERATIONS), 'operation')
+        slos = parse_pairs(args.slo, list(SLO_CHECKS), 'SLO')
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = sys.stdout
+    traffic = TrafficModel(args.locations, args.seed)
+    quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(io.StringIO())
+    installed = {}
+    with quiet:
+        if args.url:
+            target = HttpTarget(args.url, traffic)
+        else:
+            target, installed = start_in_process(args, traffic)
+        unsupported = [op for op in mix if not target.supports(op)]
+        for op in unsupported:
+            mix.pop(op)
+        print(f"🚀 Load-testing {args.url or args.backend}: {args.concurrency} workers, "
+              f"{f'{args.rate} req/s open loop' if args.rate else 'closed loop'}, "
+              f"{args.warmup}s warm-up + {args.duration}s", file=out)
+        if unsupported:
+            print(f"⚠️ Skipping operations the backend doesn't serve: {', '.join(unsupported)}", file=out)
+        load = LoadRun(target, mix, args.concurrency, args.rate, args.seed)
+        elapsed = load.run(args.duration, args.warmup)
+
+    report = build_report(load.samples, elapsed, slos)
+    report['config'] = {key: value for key, value in vars(args).items() if key not in ('json', 'verbose')}
+    report['services'] = {role: fake.profile.stats() for role, fake in installed.items()}
+    print_report(report, out)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Report written to {args.json}", file=out)
+    return 0 if report['slo_passed'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
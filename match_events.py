@@ -0,0 +1,291 @@
+"""
+Server-Sent Events push of match deltas.
+
+Writers call MatchNotifier.notify(); a single background thread recomputes the
+matches (coalescing bursts of writes), diffs them against the last published
+state and appends 'new', 'reassigned' and 'expired' events to a ring buffer.
+Subscribers share one condition variable instead of holding a queue each, so
+an idle subscriber costs one blocked thread (or greenlet) and nothing else.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+# Events kept for Last-Event-ID resume; older clients get a fresh snapshot
+DEFAULT_MAX_EVENTS = 1000
+
+# Comment line sent to idle subscribers so proxies keep the connection open
+HEARTBEAT_SECONDS = 15
+
+# How often expiry is re-checked when no writes arrive
+EXPIRY_CHECK_SECONDS = 60
+
+# How often the dataset version is polled while anyone is subscribed; picks up
+# writes handled by other server processes or made directly in the backend
+VERSION_POLL_SECONDS = 5
+
+
+def parse_timestamp(value) -> Optional[datetime]:
+    """Parse a record timestamp (datetime, ISO string or 'Z' suffixed) to an aware datetime."""
+    if isinstance(value, datetime):
+        parsed = value
+    elif isinstance(value, str) and value:
+        try:
+            parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    else:
+        return None
+    # Naive timestamps come from datetime.now() in the Sheets/demo backends
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+def donor_expires_at(timestamp, expiry_hours) -> Optional[datetime]:
+    """Return when a donation expires, or None if it cannot be determined."""
+    created = parse_timestamp(timestamp)
+    try:
+        hours = float(expiry_hours)
+    except (TypeError, ValueError):
+        return None
+    if created is None or hours <= 0:
+        return None
+    return created + timedelta(hours=hours)
+
+
+def is_match_expired(match: Dict, now: datetime) -> bool:
+    """True if the donation in a match payload is past its expiry time."""
+    donor = match.get('donor', {})
+    expires_at = donor_expires_at(donor.get('timestamp'), donor.get('expiry_time_hours'))
+    return expires_at is not None and expires_at <= now
+
+
+class MatchEventLog:
+    """
+    Current match state plus a bounded log of the deltas that produced it.
+
+    State is keyed by donor ID, since each donor is matched to at most one NGO.
+    Event IDs count up from 1 in every process, so the stream tags them with
+    an epoch unique to this log; a Last-Event-ID from another epoch (a
+    restart, another pre-fork worker) is answered with a fresh snapshot.
+    """
+
+    def __init__(self, max_events: int = DEFAULT_MAX_EVENTS):
+        self.epoch = f'{os.getpid():x}{time.time_ns():x}'
+        self._events: deque = deque(maxlen=max_events)
+        self._current: Dict[str, Dict] = {}
+        self._last_id = 0
+        self._condition = threading.Condition()
+        self.subscribers = 0
+
+    def update(self, matches: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+        """
+        Replace the current state with a freshly computed match list.
+
+        Args:
+            matches (List[Dict]): Matches as returned by /api/matches
+            now (Optional[datetime]): Reference time for expiry checks
+
+        Returns:
+            List[Dict]: The events that were published
+        """
+        now = now or datetime.now().astimezone()
+        fresh = {
+            str(match['donor']['id']): match
+            for match in matches
+            if not is_match_expired(match, now)
+        }
+
+        with self._condition:
+            events = []
+            for donor_id, match in fresh.items():
+                previous = self._current.get(donor_id)
+                if previous is None:
+                    events.append(('new', match))
+                elif previous['matched_ngo']['id'] != match['matched_ngo']['id']:
+                    events.append(('reassigned', match))
+            for donor_id, match in self._current.items():
+                if donor_id not in fresh:
+                    events.append(('expired', match))
+
+            self._current = fresh
+            return self._publish(events)
+
+    def expire(self, now: Optional[datetime] = None) -> List[Dict]:
+        """Drop matches whose donation has expired, without recomputing."""
+        now = now or datetime.now().astimezone()
+        with self._condition:
+            expired = [(donor_id, match) for donor_id, match in self._current.items()
+                       if is_match_expired(match, now)]
+            for donor_id, _ in expired:
+                del self._current[donor_id]
+            return self._publish([('expired', match) for _, match in expired])
+
+    def _publish(self, events: List[Tuple[str, Dict]]) -> List[Dict]:
+        # Caller holds self._condition
+        published = []
+        for event_type, match in events:
+            self._last_id += 1
+            event = {'id': self._last_id, 'type': event_type, 'match': match}
+            self._events.append(event)
+            published.append(event)
+        if published:
+            self._condition.notify_all()
+        return published
+
+    def snapshot(self) -> Tuple[int, List[Dict]]:
+        """Return (last event ID, current matches) atomically."""
+        with self._condition:
+            return self._last_id, list(self._current.values())
+
+    def events_after(self, last_id: int, timeout: float) -> Optional[List[Dict]]:
+        """
+        Block until events newer than last_id exist or timeout elapses.
+
+        Returns:
+            Optional[List[Dict]]: New events (possibly empty on timeout), or None
+            if last_id has already been evicted, or was never issued by this
+            log, and the caller must resync
+        """
+        with self._condition:
+            if last_id < self._last_id - len(self._events) or last_id > self._last_id:
+                return None
+            self._condition.wait_for(lambda: self._last_id > last_id, timeout=timeout)
+            return [event for event in self._events if event['id'] > last_id]
+
+    def subscribe(self) -> None:
+        with self._condition:
+            self.subscribers += 1
+
+    def unsubscribe(self) -> None:
+        with self._condition:
+            self.subscribers -= 1
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {
+                'subscribers': self.subscribers,
+                'current_matches': len(self._current),
+                'last_event_id': self._last_id,
+                'buffered_events': len(self._events)
+            }
+
+
+class MatchNotifier:
+    """Background recompute of matches, triggered by writes and an expiry timer."""
+
+    def __init__(self, compute_matches: Callable[[], Optional[List[Dict]]],
+                 events: MatchEventLog, expiry_check_seconds: float = EXPIRY_CHECK_SECONDS,
+                 version_fn: Optional[Callable[[], Optional[str]]] = None,
+                 version_poll_seconds: float = VERSION_POLL_SECONDS):
+        self.compute_matches = compute_matches
+        self.events = events
+        self.expiry_check_seconds = expiry_check_seconds
+        self.version_fn = version_fn
+        self.version_poll_seconds = version_poll_seconds
+        self._last_version = None
+        self._pending = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.primed = False
+
+    def notify(self) -> None:
+        """Signal that donors or NGOs changed; bursts collapse into one recompute."""
+        self._ensure_started()
+        self._pending.set()
+
+    def prime(self) -> None:
+        """Trigger the first computation if no write has happened yet."""
+        if not self.primed:
+            self.notify()
+
+    def _ensure_started(self) -> None:
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='match-notifier', daemon=True)
+                self._thread.start()
+
+    def _version_changed(self) -> bool:
+        if self.version_fn is None or not self.events.subscribers:
+            return False
+        version = self.version_fn()
+        return version is not None and version != self._last_version
+
+    def _run(self) -> None:
+        last_expiry_check = time.monotonic()
+        timeout = min(self.expiry_check_seconds, self.version_poll_seconds) if self.version_fn \
+            else self.expiry_check_seconds
+        while True:
+            triggered = self._pending.wait(timeout=timeout) or self._version_changed()
+            if not triggered:
+                if time.monotonic() - last_expiry_check >= self.expiry_check_seconds:
+                    self.events.expire()
+                    last_expiry_check = time.monotonic()
+                continue
+            self._pending.clear()
+            if self.version_fn is not None:
+                self._last_version = self.version_fn()
+            try:
+                matches = self.compute_matches()
+            except Exception as e:
+                print(f"Error recomputing matches for stream: {e}")
+                continue
+            if matches is not None:
+                self.events.update(matches)
+                self.primed = True
+
+
+def _format_sse(epoch: str, event_id: int, event_type: str, data) -> str:
+    return f"id: {epoch}-{event_id}\nevent: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def parse_last_event_id(events: MatchEventLog, last_event_id: Optional[str]) -> Optional[int]:
+    """Resume cursor from a Last-Event-ID header; None (resync) unless it is from this log's epoch."""
+    epoch, _, event_id = (last_event_id or '').rpartition('-')
+    if epoch != events.epoch:
+        return None
+    try:
+        return int(event_id)
+    except ValueError:
+        return None
+
+
+def sse_stream(events: MatchEventLog, last_event_id: Optional[str] = None,
+               heartbeat_seconds: float = HEARTBEAT_SECONDS) -> Iterator[str]:
+    """
+    Generate an SSE stream of match deltas.
+
+    Args:
+        events (MatchEventLog): Shared event log
+        last_event_id (Optional[str]): Value of the Last-Event-ID header, if resuming
+        heartbeat_seconds (float): Idle interval between keep-alive comments
+
+    Yields:
+        str: SSE-formatted chunks
+    """
+    cursor = parse_last_event_id(events, last_event_id)
+
+    events.subscribe()
+    try:
+        yield f"retry: {int(heartbeat_seconds * 1000)}\n\n"
+        while True:
+            if cursor is None:
+                cursor, matches = events.snapshot()
+                yield _format_sse(events.epoch, cursor, 'snapshot', {'matches': matches})
+
+            batch = events.events_after(cursor, timeout=heartbeat_seconds)
+            if batch is None:
+                cursor = None
+                continue
+            if not batch:
+                yield ": keepalive\n\n"
+                continue
+            for event in batch:
+                yield _format_sse(events.epoch, event['id'], event['type'], event['match'])
+                cursor = event['id']
+    finally:
+        events.unsubscribe()
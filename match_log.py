@@ -0,0 +1,544 @@
+"""
+Append-only audit log of match runs, for range scans and replay.
+
+/api/matches computes matches on the fly and keeps only the latest result. This
+log records each run: the geocoded donors and NGOs it saw and the NGO picked
+for every donor. With it you can answer "who was matched to whom, and when"
+after the data has changed. You can also replay old inputs through the
+current matcher to catch regressions or compare speed.
+
+Records are buffered into blocks. Each block is zlib-compressed and appended
+to a segment file after a small header (record count, first/last timestamp,
+CRC32). Every server process writes its own segments, so no file locking is
+needed. Readers memory-map the segments. The time index is built from the
+block headers, so a range scan decompresses only the blocks that overlap it.
+
+    python match_log.py stats
+    python match_log.py scan --since 2024-05-01T00:00 --donor donor_123
+    python match_log.py replay --since 2024-05-01T00:00 --json replay.json
+"""
+
+import argparse
+import atexit
+import bisect
+import heapq
+import json
+import mmap
+import os
+import statistics
+import struct
+import threading
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from match_events import parse_timestamp
+
+MATCH_LOG_DIR = os.getenv(
+    'MATCH_LOG_DIR',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'match_log')
+)
+
+# Record match runs at all
+MATCH_LOG_ENABLED = os.getenv('MATCH_LOG_ENABLED', '1') == '1'
+
+# Uncompressed bytes buffered before a block is compressed and written
+MATCH_LOG_BLOCK_BYTES = int(os.getenv('MATCH_LOG_BLOCK_BYTES', str(256 * 1024)))
+
+# A partly filled block is written by the next append after this many seconds
+MATCH_LOG_FLUSH_SECONDS = float(os.getenv('MATCH_LOG_FLUSH_SECONDS', '30'))
+
+# Segment size at which a writer starts a new file
+MATCH_LOG_SEGMENT_BYTES = int(os.getenv('MATCH_LOG_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+
+# Segments whose newest record is older than this are deleted (0 keeps everything)
+MATCH_LOG_RETENTION_DAYS = float(os.getenv('MATCH_LOG_RETENTION_DAYS', '90'))
+
+# zlib level: 1 is fastest, 9 smallest
+MATCH_LOG_COMPRESSION_LEVEL = int(os.getenv('MATCH_LOG_COMPRESSION_LEVEL', '6'))
+
+_SEGMENT_MAGIC = b'MLOGSEG1'
+_BLOCK_MAGIC = b'MLB1'
+_BLOCK_HEADER = struct.Struct('<4sIIIIdd')  # magic, crc32, records, compressed bytes, raw bytes, first ts, last ts
+_SEGMENT_SUFFIX = '.seg'
+
+
+class Block(NamedTuple):
+    """Location and time range of one compressed block."""
+    path: str
+    offset: int  # of the compressed payload
+    compressed: int
+    raw: int
+    records: int
+    crc: int
+    first_ts: float
+    last_ts: float
+
+
+def _iso(ts: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts is not None else None
+
+
+def _epoch(value) -> Optional[float]:
+    """Epoch seconds from an ISO string, datetime or number; None stays None."""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    parsed = parse_timestamp(value)
+    if parsed is None:
+        raise ValueError(f'Not a timestamp: {value}')
+    return parsed.timestamp()
+
+
+class MatchLog:
+    """
+    Segmented, block-compressed log of match runs.
+
+    Args:
+        directory (str): Folder holding the segment files (created on first write)
+        enabled (bool): When False, record_run() does nothing; reads still work
+    """
+
+    def __init__(self, directory: str = MATCH_LOG_DIR, enabled: bool = MATCH_LOG_ENABLED,
+                 block_bytes: int = MATCH_LOG_BLOCK_BYTES, flush_seconds: float = MATCH_LOG_FLUSH_SECONDS,
+                 segment_bytes: int = MATCH_LOG_SEGMENT_BYTES, retention_days: float = MATCH_LOG_RETENTION_DAYS):
+        self.directory = directory
+        self.enabled = enabled
+        self.block_bytes = block_bytes
+        self.flush_seconds = flush_seconds
+        self.segment_bytes = segment_bytes
+        self.retention_days = retention_days
+        self._lock = threading.RLock()
+        # Time index: blocks of each segment in file order, and their last timestamps for bisect
+        self._blocks: Dict[str, List[Block]] = {}
+        self._block_ends: Dict[str, List[float]] = {}
+        self._indexed_bytes: Dict[str, int] = {}
+        self._maps: Dict[str, mmap.mmap] = {}
+        self._pending: List[Tuple[float, bytes]] = []
+        self._pending_bytes = 0
+        self._pending_since = 0.0
+        self._segment = None
+        self._segment_path: Optional[str] = None
+        self._last_ts = 0.0
+        self._last_version = None
+        self.counters = {'runs_logged': 0, 'skipped_same_version': 0, 'blocks_written': 0,
+                         'raw_bytes': 0, 'compressed_bytes': 0, 'corrupt_blocks': 0, 'write_errors': 0}
+        atexit.register(self.close)
+
+    # Writing
+
+    def record_run(self, version: Optional[str], donors: Sequence[Dict], donor_coords: Sequence[Tuple[float, float]],
+                   ngo_locations: Sequence[Dict], nearest: Sequence[Optional[Tuple[int, float]]],
+                   travel_minutes: Sequence[Optional[float]], elapsed_ms: Optional[float] = None) -> bool:
+        """
+        Log the inputs and decisions of one match run.
+
+        A run at the same dataset version as the previous one is skipped,
+        since its inputs are unchanged. Write errors are counted and printed,
+        never raised, so logging can't fail a request.
+
+        Args:
+            version (Optional[str]): Dataset version the run was computed at
+            donors (Sequence[Dict]): Located donors, in matcher order
+            donor_coords (Sequence[Tuple[float, float]]): Their coordinates
+            ngo_locations (Sequence[Dict]): Geocoded NGOs (positions in nearest refer to these)
+            nearest (Sequence): (ngo position, distance_km) or None per donor
+            travel_minutes (Sequence): Travel minutes per donor, or None
+            elapsed_ms (Optional[float]): How long the matcher took
+
+        Returns:
+            bool: True if the run was logged
+        """
+        if not self.enabled:
+            return False
+        with self._lock:
+            if version is not None and version == self._last_version:
+                self.counters['skipped_same_version'] += 1
+                return False
+            self._last_version = version
+        record = {
+            'version': version,
+            'writer': os.getpid(),
+            'elapsed_ms': round(elapsed_ms, 2) if elapsed_ms is not None else None,
+            'donors': [{
+                'id': donor.get('id'),
+                'foodType': donor.get('foodType', ''),
+                'quantity': donor.get('quantity', ''),
+                'expiryTime': donor.get('expiryTime', 0),
+                'timestamp': donor.get('timestamp', ''),
+                'coordinates': list(coords)
+            } for donor, coords in zip(donors, donor_coords)],
+            'ngos': [{
+                'id': ngo.get('id'),
+                'foodNeeded': ngo.get('foodNeeded', ''),
+                'coordinates': list(ngo['coordinates'])
+            } for ngo in ngo_locations],
+            # [donor id, NGO id or None, distance_km, travel minutes]
+            'decisions': [[
+                donor.get('id'),
+                ngo_locations[result[0]].get('id') if result is not None else None,
+                round(result[1], 4) if result is not None else None,
+                minutes
+            ] for donor, result, minutes in zip(donors, nearest, travel_minutes)]
+        }
+        try:
+            self.append(record)
+        except Exception as e:
+            with self._lock:
+                self.counters['write_errors'] += 1
+            print(f"Error writing match log: {e}")
+            return False
+        with self._lock:
+            self.counters['runs_logged'] += 1
+        return True
+
+    def append(self, record: Dict) -> float:
+        """
+        Buffer a record, writing the block once it is full or old enough.
+
+        Returns:
+            float: The record's timestamp (epoch seconds, never decreasing per writer)
+        """
+        with self._lock:
+            ts = max(time.time(), self._last_ts)
+            self._last_ts = ts
+            line = json.dumps(dict(record, ts=ts), separators=(',', ':'), default=str).encode('utf-8')
+            if not self._pending:
+                self._pending_since = time.monotonic()
+            self._pending.append((ts, line))
+            self._pending_bytes += len(line)
+            if (self._pending_bytes >= self.block_bytes
+                    or time.monotonic() - self._pending_since >= self.flush_seconds):
+                self._write_block()
+            return ts
+
+    def flush(self) -> None:
+        """Write any buffered records as a block."""
+        with self._lock:
+            self._write_block()
+
+    def close(self) -> None:
+        with self._lock:
+            try:
+                self._write_block()
+            except OSError as e:
+                print(f"Error writing match log: {e}")
+            if self._segment is not None:
+                self._segment.close()
+                self._segment = None
+
+    def _write_block(self) -> None:
+        # Caller holds self._lock
+        if not self._pending:
+            return
+        raw = b'\n'.join(line for _, line in self._pending)
+        payload = zlib.compress(raw, MATCH_LOG_COMPRESSION_LEVEL)
+        first_ts, last_ts = self._pending[0][0], self._pending[-1][0]
+        header = _BLOCK_HEADER.pack(_BLOCK_MAGIC, zlib.crc32(payload), len(self._pending), len(payload), len(raw),
+                                    first_ts, last_ts)
+        segment = self._writable_segment(first_ts)
+        offset = segment.tell()
+        # One write per block, so a concurrent reader sees the whole block or none of it
+        segment.write(header + payload)
+        segment.flush()
+        path = self._segment_path
+        self._add_block(Block(path, offset + _BLOCK_HEADER.size, len(payload), len(raw), len(self._pending),
+                              zlib.crc32(payload), first_ts, last_ts))
+        self._indexed_bytes[path] = offset + _BLOCK_HEADER.size + len(payload)
+        self.counters['blocks_written'] += 1
+        self.counters['raw_bytes'] += len(raw)
+        self.counters['compressed_bytes'] += len(payload)
+        self._pending = []
+        self._pending_bytes = 0
+
+    def _writable_segment(self, first_ts: float):
+        # Caller holds self._lock
+        if self._segment is not None and self._segment.tell() < self.segment_bytes:
+            return self._segment
+        if self._segment is not None:
+            self._segment.close()
+        os.makedirs(self.directory, exist_ok=True)
+        # Names sort by start time; the pid keeps writers in separate files
+        path = os.path.join(self.directory, f'{int(first_ts * 1e6):017d}-{os.getpid()}{_SEGMENT_SUFFIX}')
+        self._segment = open(path, 'ab')
+        self._segment.write(_SEGMENT_MAGIC)
+        self._segment.flush()
+        self._segment_path = path
+        self._blocks[path] = []
+        self._block_ends[path] = []
+        self._indexed_bytes[path] = len(_SEGMENT_MAGIC)
+        self._prune()
+        return self._segment
+
+    def _prune(self) -> None:
+        # Caller holds self._lock
+        if self.retention_days <= 0:
+            return
+        cutoff = time.time() - self.retention_days * 86400
+        self._refresh()
+        for path, ends in list(self._block_ends.items()):
+            if path != self._segment_path and ends and ends[-1] < cutoff:
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                self._forget(path)
+
+    # Index
+
+    def _add_block(self, block: Block) -> None:
+        self._blocks[block.path].append(block)
+        self._block_ends[block.path].append(block.last_ts)
+
+    def _forget(self, path: str) -> None:
+        for table in (self._blocks, self._block_ends, self._indexed_bytes):
+            table.pop(path, None)
+        self._maps.pop(path, None)
+
+    def _map(self, path: str, length: int) -> mmap.mmap:
+        """Read-only map of a segment covering at least length bytes (remapped as it grows)."""
+        mapped = self._maps.get(path)
+        if mapped is None or len(mapped) < length:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[path] = mapped
+        return mapped
+
+    def _refresh(self) -> None:
+        """Index blocks appended since the last look, by this or any other writer."""
+        # Caller holds self._lock
+        try:
+            names = sorted(name for name in os.listdir(self.directory) if name.endswith(_SEGMENT_SUFFIX))
+        except FileNotFoundError:
+            names = []
+        paths = {os.path.join(self.directory, name) for name in names}
+        for path in [p for p in self._blocks if p not in paths]:
+            self._forget(path)
+        for name in names:
+            path = os.path.join(self.directory, name)
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            offset = self._indexed_bytes.get(path)
+            if offset is None:
+                self._blocks[path], self._block_ends[path] = [], []
+                offset = 0
+            if size <= max(offset, len(_SEGMENT_MAGIC)):
+                self._indexed_bytes[path] = max(offset, 0)
+                continue
+            buffer = self._map(path, size)
+            if offset == 0:
+                if buffer[:len(_SEGMENT_MAGIC)] != _SEGMENT_MAGIC:
+                    # Not a segment; never look at it again
+                    self._indexed_bytes[path] = size
+                    continue
+                offset = len(_SEGMENT_MAGIC)
+            while offset + _BLOCK_HEADER.size <= size:
+                magic, crc, records, compressed, raw, first_ts, last_ts = _BLOCK_HEADER.unpack_from(buffer, offset)
+                if magic != _BLOCK_MAGIC:
+                    self.counters['corrupt_blocks'] += 1
+                    offset = size
+                    break
+                end = offset + _BLOCK_HEADER.size + compressed
+                if end > size:
+                    # A block still being written
+                    break
+                self._add_block(Block(path, offset + _BLOCK_HEADER.size, compressed, raw, records, crc,
+                                      first_ts, last_ts))
+                offset = end
+            self._indexed_bytes[path] = offset
+
+    # Reading
+
+    def _read_block(self, block: Block) -> List[Dict]:
+        with self._lock:
+            buffer = self._map(block.path, block.offset + block.compressed)
+        payload = buffer[block.offset:block.offset + block.compressed]
+        if zlib.crc32(payload) != block.crc:
+            with self._lock:
+                self.counters['corrupt_blocks'] += 1
+            return []
+        return [json.loads(line) for line in zlib.decompress(payload).split(b'\n')]
+
+    def _segment_records(self, blocks: List[Block], start: float, end: float) -> Iterator[Dict]:
+        for block in blocks:
+            for record in self._read_block(block):
+                if start <= record['ts'] <= end:
+                    yield record
+
+    def scan(self, start=None, end=None) -> Iterator[Dict]:
+        """
+        Records with start <= ts <= end, oldest first, across every writer.
+
+        Args:
+            start: Epoch seconds, ISO string or datetime (None: from the beginning)
+            end: Same forms (None: up to now, including records not yet written out)
+
+        Returns:
+            Iterator[Dict]: Decoded records; each block is decompressed only when reached
+        """
+        start = _epoch(start)
+        end = _epoch(end)
+        start = float('-inf') if start is None else start
+        end = float('inf') if end is None else end
+        with self._lock:
+            self._refresh()
+            streams = []
+            for path, blocks in self._blocks.items():
+                # Blocks of one writer are in time order, so the range is a contiguous slice
+                first = bisect.bisect_left(self._block_ends[path], start)
+                selected = []
+                for block in blocks[first:]:
+                    if block.first_ts > end:
+                        break
+                    selected.append(block)
+                if selected:
+                    streams.append(self._segment_records(selected, start, end))
+            pending = [json.loads(line) for ts, line in self._pending if start <= ts <= end]
+        if pending:
+            streams.append(iter(pending))
+        return heapq.merge(*streams, key=lambda record: record['ts'])
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._refresh()
+            blocks = [block for segment in self._blocks.values() for block in segment]
+            first = min((block.first_ts for block in blocks), default=None)
+            last = max((block.last_ts for block in blocks), default=None)
+            compressed = sum(block.compressed for block in blocks)
+            raw = sum(block.raw for block in blocks)
+            return dict(
+                self.counters,
+                enabled=self.enabled,
+                segments=len(self._blocks),
+                blocks=len(blocks),
+                records=sum(block.records for block in blocks),
+                pending_records=len(self._pending),
+                disk_bytes=sum(self._indexed_bytes.values()),
+                compression_ratio=round(raw / compressed, 2) if compressed else None,
+                oldest=_iso(first),
+                newest=_iso(last)
+            )
+
+
+def current_matcher(donors: List[Dict], ngos: List[Dict]) -> List[Optional[Tuple[int, float]]]:
+    """Today's matching pipeline (food groups, cost mode, sharding) over logged inputs."""
+    from food_taxonomy import match_by_food_group
+    from sharding import match_donors
+    from spatial_index import NgoSpatialIndex
+    from travel_time import match_donors_by_cost
+
+    coords = [tuple(donor['coordinates']) for donor in donors]
+    ngos = [dict(ngo, coordinates=tuple(ngo['coordinates'])) for ngo in ngos]
+    nearest, _ = match_by_food_group(
+        donors, coords, ngos, NgoSpatialIndex.build(ngos),
+        lambda group_coords, subset, subset_index: match_donors_by_cost(
+            group_coords, subset, lambda group: match_donors(group, subset, subset_index))
+    )
+    return nearest
+
+
+def replay(log: MatchLog, start=None, end=None, limit: Optional[int] = None,
+           matcher: Callable[[List[Dict], List[Dict]], List[Optional[Tuple[int, float]]]] = current_matcher,
+           max_examples: int = 20) -> Dict:
+    """
+    Re-run logged inputs through matcher and compare with the logged decisions.
+
+    Args:
+        log (MatchLog): Log to read
+        start, end: Time range, as for MatchLog.scan
+        limit (Optional[int]): Stop after this many runs
+        matcher (Callable): (donors, ngos) -> (ngo position, distance_km) or None per donor
+        max_examples (int): Changed decisions to include in the report
+
+    Returns:
+        Dict: Runs and decisions compared, how many changed (with examples),
+        and logged vs replayed matcher time
+    """
+    runs = decisions = changed = distance_drift = 0
+    logged_ms, replay_ms, examples = [], [], []
+    for record in log.scan(start, end):
+        if limit is not None and runs >= limit:
+            break
+        runs += 1
+        started = time.perf_counter()
+        results = matcher(record['donors'], record['ngos'])
+        replay_ms.append((time.perf_counter() - started) * 1000)
+        if record.get('elapsed_ms') is not None:
+            logged_ms.append(record['elapsed_ms'])
+        for (donor_id, ngo_id, distance, _), result in zip(record['decisions'], results):
+            decisions += 1
+            new_id = record['ngos'][result[0]]['id'] if result is not None else None
+            if new_id != ngo_id:
+                changed += 1
+                if len(examples) < max_examples:
+                    examples.append({'ts': _iso(record['ts']), 'version': record.get('version'),
+                                     'donor_id': donor_id, 'logged_ngo': ngo_id, 'replayed_ngo': new_id})
+            elif result is not None and distance is not None and abs(result[1] - distance) > 0.001:
+                distance_drift += 1
+
+    def timing(samples: List[float]) -> Optional[Dict]:
+        if not samples:
+            return None
+        return {'median_ms': round(statistics.median(samples), 2), 'max_ms': round(max(samples), 2)}
+
+    return {
+        'runs': runs,
+        'decisions': decisions,
+        'changed': changed,
+        'distance_drift': distance_drift,
+        'examples': examples,
+        'logged': timing(logged_ms),
+        'replayed': timing(replay_ms)
+    }
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Inspect and replay the match audit log.')
+    parser.add_argument('command', choices=['stats', 'scan', 'replay'])
+    parser.add_argument('--dir', default=MATCH_LOG_DIR, help='Match log directory')
+    parser.add_argument('--since', help='ISO timestamp to start from')
+    parser.add_argument('--until', help='ISO timestamp to stop at')
+    parser.add_argument('--donor', help='scan: only show decisions for this donor ID')
+    parser.add_argument('--limit', type=int, help='Stop after this many runs')
+    parser.add_argument('--json', help='Write the replay report to this JSON file')
+    args = parser.parse_args(argv)
+
+    log = MatchLog(args.dir, enabled=False)
+    try:
+        if args.command == 'stats':
+            for key, value in log.stats().items():
+                print(f"  {key}: {value}")
+        elif args.command == 'scan':
+            for count, record in enumerate(log.scan(args.since, args.until)):
+                if args.limit is not None and count >= args.limit:
+                    break
+                decisions = record['decisions']
+                if args.donor:
+                    decisions = [d for d in decisions if str(d[0]) == args.donor]
+                    if not decisions:
+                        continue
+                matched = sum(1 for d in decisions if d[1] is not None)
+                print(f"{_iso(record['ts'])}  version={record.get('version')}  donors={len(record['donors'])}  "
+                      f"ngos={len(record['ngos'])}  matched={matched}")
+                if args.donor:
+                    for donor_id, ngo_id, distance, minutes in decisions:
+                        print(f"    {donor_id} -> {ngo_id} ({distance} km)")
+        else:
+            report = replay(log, args.since, args.until, args.limit)
+            print(f"🔁 Replayed {report['runs']} runs, {report['decisions']} decisions: "
+                  f"{report['changed']} changed, {report['distance_drift']} with a different distance")
+            print(f"  logged: {report['logged']}  replayed: {report['replayed']}")
+            for example in report['examples']:
+                print(f"  {example['ts']} {example['donor_id']}: {example['logged_ngo']} -> {example['replayed_ngo']}")
+            if args.json:
+                with open(args.json, 'w') as f:
+                    json.dump(report, f, indent=2)
+                print(f"\n💾 Report written to {args.json}")
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == '__main__':
+    main()
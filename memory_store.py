@@ -0,0 +1,233 @@
+"""
+Thread-safe in-memory record store with snapshot isolation.
+
+Records are spread over lock-striped partitions by ID. A writer locks only
+the stripes it touches, builds a new copy of each (records plus its geohash
+index) and publishes them together; readers take the current snapshot, an immutable
+tuple of stripes, without any lock. A snapshot never changes after it is
+taken, so a request sees one consistent version of the data however many
+writes land while it runs, and never half of a multi-record write.
+
+Used as the demo backend's storage. It is not a read tier in front of
+Firestore or Sheets: app_sheets.py already reads from a local
+sheets_sync.SheetReplica, and app.py caches responses by the version its
+Firestore listeners keep, so a second copy there would only duplicate them.
+"""
+
+import itertools
+import os
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sharding import geohash_encode
+
+# Number of independently locked partitions
+STORE_STRIPES = int(os.getenv('MEMORY_STORE_STRIPES', '16'))
+
+# Geohash length of the secondary location index (5 ≈ 4.9 km cells)
+STORE_GEOHASH_PRECISION = int(os.getenv('MEMORY_STORE_GEOHASH_PRECISION', '5'))
+
+Coordinates = Tuple[float, float]
+
+# Per record: (insertion sequence, record, geohash or None)
+_Entry = Tuple[int, Dict, Optional[str]]
+
+
+class _Stripe:
+    """One immutable partition: records by ID and IDs by geohash."""
+
+    __slots__ = ('records', 'geo')
+
+    def __init__(self, records: Dict[str, _Entry], geo: Dict[str, Tuple[str, ...]]):
+        self.records = records
+        self.geo = geo
+
+
+class StoreSnapshot:
+    """A consistent, read-only view of a MemoryStore at one version."""
+
+    def __init__(self, version: int, stripes: Tuple[_Stripe, ...]):
+        self.version = version
+        self._stripes = stripes
+        self._ordered: Optional[List[Dict]] = None
+
+    def __len__(self) -> int:
+        return sum(len(stripe.records) for stripe in self._stripes)
+
+    def _stripe(self, record_id: str) -> _Stripe:
+        return self._stripes[hash(record_id) % len(self._stripes)]
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        entry = self._stripe(record_id).records.get(record_id)
+        return entry[1] if entry else None
+
+    def values(self) -> List[Dict]:
+        """Records in insertion order (computed once per snapshot)."""
+        if self._ordered is None:
+            entries = [entry for stripe in self._stripes for entry in stripe.records.values()]
+            entries.sort(key=lambda entry: entry[0])
+            self._ordered = [entry[1] for entry in entries]
+        return self._ordered
+
+    def by_geohash(self, prefix: str) -> List[Dict]:
+        """Located records whose geohash starts with prefix, in insertion order."""
+        entries = []
+        # A prefix longer than the index precision is matched at index precision
+        prefix = prefix[:STORE_GEOHASH_PRECISION]
+        for stripe in self._stripes:
+            if len(prefix) == STORE_GEOHASH_PRECISION:
+                cells = [prefix] if prefix in stripe.geo else []
+            else:
+                cells = [cell for cell in stripe.geo if cell.startswith(prefix)]
+            for cell in cells:
+                entries.extend(stripe.records[record_id] for record_id in stripe.geo[cell])
+        entries.sort(key=lambda entry: entry[0])
+        return [entry[1] for entry in entries]
+
+    def near(self, coords: Coordinates, precision: int = STORE_GEOHASH_PRECISION) -> List[Dict]:
+        """Located records in the same geohash cell as coords at the given precision."""
+        return self.by_geohash(geohash_encode(coords[0], coords[1], min(precision, STORE_GEOHASH_PRECISION)))
+
+    def unlocated(self) -> List[Dict]:
+        """Records with no known coordinates."""
+        entries = [entry for stripe in self._stripes for entry in stripe.records.values() if entry[2] is None]
+        entries.sort(key=lambda entry: entry[0])
+        return [entry[1] for entry in entries]
+
+
+class MemoryStore:
+    """
+    Lock-striped, copy-on-write record store.
+
+    Records are dicts with an 'id'; they are stored as given and must be
+    treated as read-only by readers (copy before modifying). locate maps a
+    record to coordinates for the geohash index, or None if not known yet.
+    """
+
+    def __init__(self, locate: Optional[Callable[[Dict], Optional[Coordinates]]] = None,
+                 stripes: int = STORE_STRIPES):
+        self._locate = locate
+        self._stripe_locks = [threading.Lock() for _ in range(stripes)]
+        self._publish_lock = threading.Lock()
+        self._sequence = itertools.count()
+        self._snapshot = StoreSnapshot(0, tuple(_Stripe({}, {}) for _ in range(stripes)))
+        self.writes = 0
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def snapshot(self) -> StoreSnapshot:
+        """Current snapshot; lock-free."""
+        return self._snapshot
+
+    def values(self) -> List[Dict]:
+        return self._snapshot.values()
+
+    def get(self, record_id: str) -> Optional[Dict]:
+        return self._snapshot.get(record_id)
+
+    def __len__(self) -> int:
+        return len(self._snapshot)
+
+    def _geohash(self, record: Dict) -> Optional[str]:
+        coords = self._locate(record) if self._locate else None
+        return geohash_encode(coords[0], coords[1], STORE_GEOHASH_PRECISION) if coords else None
+
+    def _write(self, puts: Iterable[Dict] = (), deletes: Iterable[str] = ()) -> int:
+        """Apply puts and deletes to every touched stripe, then publish once. Returns records changed."""
+        by_stripe: Dict[int, Tuple[List[Tuple[str, Dict, Optional[str], int]], List[str]]] = {}
+        stripes = len(self._stripe_locks)
+        for record in puts:
+            record_id = str(record['id'])
+            # Locating may hit the geocode cache; done before taking any lock. Sequence
+            # numbers are drawn in input order so a batch keeps its order across stripes
+            by_stripe.setdefault(hash(record_id) % stripes, ([], []))[0].append(
+                (record_id, record, self._geohash(record), next(self._sequence)))
+        for record_id in deletes:
+            by_stripe.setdefault(hash(str(record_id)) % stripes, ([], []))[1].append(str(record_id))
+
+        changed = 0
+        touched = sorted(by_stripe)
+        # Locks are taken in stripe order, so concurrent multi-stripe writers cannot deadlock
+        for index in touched:
+            self._stripe_locks[index].acquire()
+        try:
+            built: Dict[int, _Stripe] = {}
+            for index in touched:
+                stripe_puts, stripe_deletes = by_stripe[index]
+                current = self._snapshot._stripes[index]
+                records = dict(current.records)
+                geo = dict(current.geo)
+
+                def unindex(record_id: str) -> None:
+                    old = records.get(record_id)
+                    if old is not None and old[2] is not None:
+                        remaining = tuple(i for i in geo[old[2]] if i != record_id)
+                        if remaining:
+                            geo[old[2]] = remaining
+                        else:
+                            del geo[old[2]]
+
+                for record_id in stripe_deletes:
+                    if record_id in records:
+                        unindex(record_id)
+                        del records[record_id]
+                        changed += 1
+                for record_id, record, cell, sequence in stripe_puts:
+                    old = records.get(record_id)
+                    unindex(record_id)
+                    # Replacing a record keeps its original position
+                    if old is not None:
+                        sequence = old[0]
+                    records[record_id] = (sequence, record, cell)
+                    if cell is not None:
+                        geo[cell] = geo.get(cell, ()) + (record_id,)
+                    changed += 1
+                built[index] = _Stripe(records, geo)
+            if built:
+                self._publish(built)
+        finally:
+            for index in touched:
+                self._stripe_locks[index].release()
+        return changed
+
+    def _publish(self, built: Dict[int, _Stripe]) -> None:
+        with self._publish_lock:
+            stripes = list(self._snapshot._stripes)
+            for index, stripe in built.items():
+                stripes[index] = stripe
+            self.writes += 1
+            self._snapshot = StoreSnapshot(self._snapshot.version + 1, tuple(stripes))
+
+    def put(self, record: Dict) -> None:
+        """Insert or replace a record by its 'id'."""
+        self._write(puts=[record])
+
+    def put_many(self, records: Iterable[Dict]) -> int:
+        """Insert or replace many records, copying each touched stripe once."""
+        return self._write(puts=list(records))
+
+    def delete_many(self, record_ids: Iterable[str]) -> int:
+        return self._write(deletes=list(record_ids))
+
+    def replace_all(self, records: Iterable[Dict]) -> None:
+        """Load a full dataset, dropping what is not in it."""
+        records = list(records)
+        keep = {str(record['id']) for record in records}
+        self._write(puts=records, deletes=[r['id'] for r in self.values() if str(r['id']) not in keep])
+
+    def refresh_locations(self) -> int:
+        """Index records geocoded since they were stored. Returns records newly located."""
+        located = [record for record in self._snapshot.unlocated() if self._geohash(record) is not None]
+        return self._write(puts=located) if located else 0
+
+    def stats(self) -> Dict:
+        snapshot = self._snapshot
+        return {
+            'records': len(snapshot),
+            'version': snapshot.version,
+            'stripes': len(self._stripe_locks),
+            'geohash_cells': sum(len(stripe.geo) for stripe in snapshot._stripes),
+            'writes': self.writes
+        }
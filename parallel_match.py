@@ -0,0 +1,133 @@
+"""
+Parallel nearest-NGO matching on a process pool.
+
+Donors are split into chunks and matched by worker processes. Workers don't
+receive the NGO index in their tasks: each maps the index file that
+get_ngo_index already wrote, so every process reads the same physical pages
+and a task only carries its donor coordinates. That file is named by the NGO
+set's content hash and never rewritten, so a worker always finds the index
+the task was built against. Small
+batches stay in-process, where pool overhead would outweigh the gain.
+"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from spatial_index import NgoSpatialIndex, geodesic_km
+
+# Worker processes for parallel (and sharded) matching
+MATCH_WORKERS = int(os.getenv('MATCH_WORKERS', str(os.cpu_count() or 1)))
+
+# Below this many donors, matching stays in the request process
+PARALLEL_MIN_DONORS = int(os.getenv('MATCH_PARALLEL_MIN_DONORS', '5000'))
+
+# Donors per task; small enough to balance load, large enough to amortize IPC
+MIN_CHUNK_SIZE = 250
+CHUNKS_PER_WORKER = 4
+
+Coordinates = Tuple[float, float]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {'parallel_runs': 0, 'in_process_runs': 0, 'chunks': 0, 'errors': 0}
+
+# Index files a pool worker keeps mapped (one per NGO set or food-type subset)
+WORKER_INDEX_CACHE = 8
+
+# Per worker process: index files mapped so far, by path
+_worker_indexes: Dict[str, NgoSpatialIndex] = {}
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """Long-lived matching pool, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # forkserver: don't fork a threaded server process mid-request
+            _pool = ProcessPoolExecutor(max_workers=MATCH_WORKERS,
+                                        mp_context=multiprocessing.get_context('forkserver'))
+        return _pool
+
+
+def _worker_index(path: str, key: str) -> NgoSpatialIndex:
+    """Map the index file in this worker, keeping the most recently used few."""
+    index = _worker_indexes.pop(path, None)
+    if index is None or index.key != key:
+        index = NgoSpatialIndex.load(path)
+        if index is None or index.key != key:
+            raise RuntimeError(f"NGO index at {path} does not match key {key}")
+    _worker_indexes[path] = index
+    while len(_worker_indexes) > WORKER_INDEX_CACHE:
+        del _worker_indexes[next(iter(_worker_indexes))]
+    return index
+
+
+def match_chunk(task: Tuple[str, str, List[Coordinates]]) -> List[Optional[Tuple[int, float]]]:
+    """Worker entry point: nearest NGO for each donor in a chunk."""
+    path, key, donor_coords = task
+    index = _worker_index(path, key)
+    return [index.nearest(coords, geodesic_km) for coords in donor_coords]
+
+
+def chunk_size_for(n_donors: int, workers: int) -> int:
+    return max(MIN_CHUNK_SIZE, -(-n_donors // (workers * CHUNKS_PER_WORKER)))
+
+
+def match_on_pool(pool: ProcessPoolExecutor, donor_coords: Sequence[Coordinates],
+                  index_path: str, index_key: str, workers: int) -> List[Optional[Tuple[int, float]]]:
+    """Match donors on a pool whose workers map the index file at index_path."""
+    size = chunk_size_for(len(donor_coords), workers)
+    tasks = [(index_path, index_key, list(donor_coords[start:start + size]))
+             for start in range(0, len(donor_coords), size)]
+    results: List[Optional[Tuple[int, float]]] = []
+    for chunk in pool.map(match_chunk, tasks):
+        results.extend(chunk)
+    with _stats_lock:
+        _stats['chunks'] += len(tasks)
+    return results
+
+
+def nearest_all(donor_coords: Sequence[Coordinates], ngo_index: NgoSpatialIndex) -> List[Optional[Tuple[int, float]]]:
+    """
+    Nearest NGO for every donor, in parallel for large batches.
+
+    Distances are always geodesic (geodesic_km, the backends' calculate_distance),
+    in-process and on the pool, so results don't depend on batch size.
+
+    Args:
+        donor_coords (Sequence[Coordinates]): Geocoded donor coordinates
+        ngo_index (NgoSpatialIndex): Index to search; parallel only if mapped
+            from a content-named file (get_ngo_index)
+
+    Returns:
+        List[Optional[Tuple[int, float]]]: (ngo position, distance_km) per donor
+    """
+    # Only a content-named file is guaranteed to still hold this index when workers map it
+    immutable = ngo_index.path is not None and ngo_index.path.endswith(f'.{ngo_index.key}')
+    if len(donor_coords) >= PARALLEL_MIN_DONORS and MATCH_WORKERS > 1 and immutable:
+        try:
+            results = match_on_pool(get_process_pool(), donor_coords, ngo_index.path,
+                                    ngo_index.key, MATCH_WORKERS)
+            with _stats_lock:
+                _stats['parallel_runs'] += 1
+            return results
+        except Exception as e:
+            print(f"Parallel matching failed, matching in-process: {e}")
+            with _stats_lock:
+                _stats['errors'] += 1
+
+    with _stats_lock:
+        _stats['in_process_runs'] += 1
+    return [ngo_index.nearest(coords, geodesic_km) for coords in donor_coords]
+
+
+def parallel_stats() -> Dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update(workers=MATCH_WORKERS, min_donors=PARALLEL_MIN_DONORS)
+    return stats
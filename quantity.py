@@ -0,0 +1,303 @@
+"""
+Quantity parsing and supply/demand rollups.
+
+Donation quantities arrive as free text ("10 kg", "20 loaves", "1/2 gallon").
+parse_quantity() turns them into a numeric amount in a canonical unit (kg
+for mass, l for volume, items for counts) once, when a record is written.
+SupplyDemandRollup keeps per-region, per-food-category totals that are
+updated record by record as donations and NGOs are added or removed, so
+/api/stats never rescans the dataset.
+"""
+
+import os
+import re
+import threading
+import time
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from client_coordinates import stored_coordinates
+from food_taxonomy import category_names, food_mask
+from geocode_cache import GeocodeCache, normalize_location
+from sharding import geohash_encode
+
+# Geohash length of a rollup region (3 ≈ 156 km cells)
+STATS_REGION_PRECISION = int(os.getenv('STATS_REGION_PRECISION', '3'))
+
+# Unit word → (canonical unit, factor)
+UNITS: Dict[str, Tuple[str, float]] = {}
+for _words, _unit, _factor in [
+    (('kg', 'kgs', 'kilo', 'kilos', 'kilogram', 'kilograms'), 'kg', 1.0),
+    (('g', 'gm', 'gms', 'gram', 'grams'), 'kg', 0.001),
+    (('lb', 'lbs', 'pound', 'pounds'), 'kg', 0.45359237),
+    (('oz', 'ounce', 'ounces'), 'kg', 0.028349523125),
+    (('ton', 'tons', 'tonne', 'tonnes'), 'kg', 1000.0),
+    (('l', 'ltr', 'ltrs', 'liter', 'liters', 'litre', 'litres'), 'l', 1.0),
+    (('ml', 'milliliter', 'milliliters', 'millilitre', 'millilitres'), 'l', 0.001),
+    (('gal', 'gallon', 'gallons'), 'l', 3.785411784),
+    (('dozen', 'dozens'), 'items', 12.0),
+]:
+    for _word in _words:
+        UNITS[_word] = (_unit, _factor)
+
+COUNT_UNIT = 'items'
+
+_NUMBER_WORDS = {
+    'a': 1, 'an': 1, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9, 'ten': 10, 'twelve': 12, 'twenty': 20, 'half': 0.5
+}
+
+# "1/2", "2.5", "10-12", "10 to 12" (ranges count their lower bound)
+_AMOUNT = (
+    r'(?P<num>\d+(?:\.\d+)?)(?:\s*/\s*(?P<den>\d+))?'
+    r'(?:\s*(?:-|to)\s*\d+(?:\.\d+)?)?'
+)
+# A whole unit word: "5kg." but not the "t" of "1 t-shirt"
+_UNIT = r'(?P<unit>[a-z]+)\b(?!-[a-z])'
+_COUNT = r'(?<![\w.,/-])(?P<count>\d+)'
+_QUANTITY = re.compile(_AMOUNT + r'(?:\s*' + _UNIT + r')?')
+# Multiples of a per-pack amount, tried before _QUANTITY
+_PACKED = (
+    re.compile(_COUNT + r'\s*[x×*]\s*' + _AMOUNT + r'(?:\s*' + _UNIT + r')?'),  # "2 x 5kg"
+    re.compile(_COUNT + r'\s+(?P<pack>[a-z]+(?:\s+[a-z]+)?)\s+of\s+' + _AMOUNT + r'\s*' + _UNIT),  # "3 bags of 2 kg"
+    re.compile(_COUNT + r'\s+(?P<pack>[a-z]+(?:\s+[a-z]+)?)\s*[(,]\s*' + _AMOUNT + r'\s*' + _UNIT
+               + r'\s+each\b'),  # "3 boxes (2 kg each)"
+)
+_WORD_QUANTITY = re.compile(r'\b(?P<word>' + '|'.join(_NUMBER_WORDS) + r')\s+' + _UNIT)
+
+
+@lru_cache(maxsize=8192)
+def parse_quantity(text: str) -> Optional[Tuple[float, str]]:
+    """
+    Parse a free-text quantity. Packs multiply out: "2 x 5kg" and
+    "3 boxes (2 kg each)" are 10 and 6 kg.
+
+    Returns:
+        Optional[Tuple[float, str]]: (amount, unit) with unit 'kg', 'l' or 'items',
+        or None if no amount can be read
+    """
+    value = str(text or '').strip().lower()
+    for pattern in _PACKED:
+        match = pattern.search(value)
+        # "5 kg of 2 kinds" is an amount, not five packs
+        if match and match.groupdict().get('pack') and match.group('pack').split()[0] in UNITS:
+            match = None
+        if match:
+            break
+    else:
+        match = _QUANTITY.search(value.replace(',', ''))
+    if match:
+        amount = float(match.group('num'))
+        if match.group('den'):
+            denominator = float(match.group('den'))
+            if not denominator:
+                return None
+            amount /= denominator
+        if 'count' in match.groupdict():
+            amount *= int(match.group('count'))
+        unit_word = match.group('unit')
+    else:
+        match = _WORD_QUANTITY.search(value)
+        if not match:
+            if value in UNITS:  # "dozen"
+                unit, factor = UNITS[value]
+                return factor, unit
+            return None
+        amount = float(_NUMBER_WORDS[match.group('word')])
+        unit_word = match.group('unit')
+
+    unit, factor = UNITS.get(unit_word or '', (COUNT_UNIT, 1.0))
+    return round(amount * factor, 6), unit
+
+
+def quantity_fields(text: str, amount=None, unit=None) -> Dict:
+    """
+    Normalized {'amount': ..., 'unit': ...} for a record.
+
+    A stored amount and unit (written at ingest) are used as they are; the
+    free text is parsed only for records written before ingest parsing.
+    Both values are None if the quantity can't be read.
+    """
+    if amount not in (None, '') and unit:
+        try:
+            return {'amount': float(amount), 'unit': str(unit)}
+        except (TypeError, ValueError):
+            pass
+    parsed = parse_quantity(str(text or ''))
+    return {'amount': parsed[0], 'unit': parsed[1]} if parsed else {'amount': None, 'unit': None}
+
+
+def record_quantity(record: Dict) -> Optional[Tuple[float, str]]:
+    """(amount, unit) of a donation record, or None."""
+    fields = quantity_fields(record.get('quantity', ''), record.get('amount'), record.get('unit'))
+    return (fields['amount'], fields['unit']) if fields['unit'] else None
+
+
+UNLOCATED = 'unlocated'
+UNCATEGORIZED = 'uncategorized'
+
+
+def cached_region(cache: GeocodeCache, location: str) -> Optional[str]:
+    """Geohash region of a location from the geocode cache; None if not geocoded yet (never calls the geocoder)."""
+    found, coords = cache.lookup(location)
+    if not found or coords is None:
+        return None
+    return geohash_encode(coords[0], coords[1], STATS_REGION_PRECISION)
+
+
+class SupplyDemandRollup:
+    """
+    Incrementally maintained supply (donated amounts) and demand (NGO counts)
+    per region and food category.
+
+    Each record's contribution is remembered by ID, so re-adding a record
+    replaces its previous contribution and removal is exact even if the
+    record's region has since become known.
+    """
+
+    def __init__(self, region_of: Callable[[str], Optional[str]]):
+        self._region_of = region_of
+        self._lock = threading.Lock()
+        self._cells: Dict[Tuple[str, str], Dict] = {}
+        self._contributions: Dict[Tuple[str, str], Tuple[str, Tuple[str, ...], Optional[Tuple[float, str]], str]] = {}
+        self._by_location: Dict[str, set] = {}
+        # Records that arrived with client coordinates (never 'unlocated')
+        self._pre_geocoded: set = set()
+        self.unparsed_quantities = 0
+        self.version: Optional[str] = None
+        self.rebuilt_at: Optional[float] = None
+
+    def _cell(self, region: str, category: str) -> Dict:
+        cell = self._cells.get((region, category))
+        if cell is None:
+            cell = self._cells[(region, category)] = {'supply': {}, 'donors': 0, 'ngos': 0}
+        return cell
+
+    def _apply(self, kind: str, region: str, categories: Tuple[str, ...],
+               quantity: Optional[Tuple[float, str]], sign: int) -> None:
+        for category in categories:
+            cell = self._cell(region, category)
+            if kind == 'donors':
+                cell['donors'] += sign
+                if quantity is not None:
+                    amount, unit = quantity
+                    cell['supply'][unit] = round(cell['supply'].get(unit, 0.0) + sign * amount, 6)
+            else:
+                cell['ngos'] += sign
+        if kind == 'donors' and quantity is None:
+            self.unparsed_quantities += sign
+
+    def _remove_locked(self, key: Tuple[str, str]) -> None:
+        previous = self._contributions.pop(key, None)
+        if previous is None:
+            return
+        region, categories, quantity, location = previous
+        self._apply(key[0], region, categories, quantity, -1)
+        self._pre_geocoded.discard(key)
+        keys = self._by_location.get(location)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_location[location]
+
+    def add(self, kind: str, record: Dict) -> None:
+        """Add (or replace) a donor or NGO record's contribution."""
+        key = (kind, str(record.get('id', '')))
+        location = normalize_location(record.get('location', ''))
+        coords = stored_coordinates(record)
+        if coords is not None:
+            region = geohash_encode(coords[0], coords[1], STATS_REGION_PRECISION)
+        else:
+            region = self._region_of(record.get('location', '')) or UNLOCATED
+        text = record.get('foodType', '') if kind == 'donors' else record.get('foodNeeded', '')
+        categories = tuple(category_names(food_mask(text))) or (UNCATEGORIZED,)
+        quantity = record_quantity(record) if kind == 'donors' else None
+        with self._lock:
+            self._remove_locked(key)
+            self._contributions[key] = (region, categories, quantity, location)
+            if coords is not None:
+                self._pre_geocoded.add(key)
+            else:
+                self._by_location.setdefault(location, set()).add(key)
+            self._apply(kind, region, categories, quantity, 1)
+
+    def remove(self, kind: str, record_id: str) -> None:
+        with self._lock:
+            self._remove_locked((kind, str(record_id)))
+
+    def clear(self, kind: str) -> None:
+        """Drop every contribution of one kind (before a listener replays the collection)."""
+        with self._lock:
+            for key in [key for key in self._contributions if key[0] == kind]:
+                self._remove_locked(key)
+
+    def relocate(self, location: Optional[str] = None) -> None:
+        """Move records out of 'unlocated' once their location (or, by default, any location) is geocoded."""
+        with self._lock:
+            if location is not None:
+                locations = [normalize_location(location)]
+            else:
+                locations = [loc for loc, keys in self._by_location.items()
+                             if any(self._contributions[key][0] == UNLOCATED for key in keys)]
+        for loc in locations:
+            region = self._region_of(loc)
+            if not region:
+                continue
+            with self._lock:
+                for key in list(self._by_location.get(loc, ())):
+                    old_region, categories, quantity, _ = self._contributions[key]
+                    if old_region == region:
+                        continue
+                    self._apply(key[0], old_region, categories, quantity, -1)
+                    self._contributions[key] = (region, categories, quantity, loc)
+                    self._apply(key[0], region, categories, quantity, 1)
+
+    def stale(self, version: Optional[str], min_interval: float = 0.0) -> bool:
+        """True if never built, or built for another version at least min_interval seconds ago."""
+        if self.rebuilt_at is None:
+            return True
+        return version != self.version and time.monotonic() - self.rebuilt_at >= min_interval
+
+    def rebuild(self, donors: Iterable[Dict], ngos: Iterable[Dict], version: Optional[str] = None) -> None:
+        """Recompute from scratch (initial load, or after changes made outside this process)."""
+        with self._lock:
+            self._cells.clear()
+            self._contributions.clear()
+            self._by_location.clear()
+            self._pre_geocoded.clear()
+            self.unparsed_quantities = 0
+        for donor in donors:
+            self.add('donors', donor)
+        for ngo in ngos:
+            self.add('ngos', ngo)
+        self.version = version
+        self.rebuilt_at = time.monotonic()
+
+    def snapshot(self) -> Dict:
+        """Rollups by region and category, plus supply totals per category."""
+        regions: Dict[str, Dict] = {}
+        totals: Dict[str, Dict] = {}
+        with self._lock:
+            for (region, category), cell in sorted(self._cells.items()):
+                if not cell['donors'] and not cell['ngos']:
+                    continue
+                regions.setdefault(region, {})[category] = {
+                    'supply': {unit: amount for unit, amount in cell['supply'].items() if amount},
+                    'donors': cell['donors'],
+                    'ngos': cell['ngos']
+                }
+                total = totals.setdefault(category, {'supply': {}, 'donors': 0, 'ngos': 0})
+                total['donors'] += cell['donors']
+                total['ngos'] += cell['ngos']
+                for unit, amount in cell['supply'].items():
+                    if amount:
+                        total['supply'][unit] = round(total['supply'].get(unit, 0.0) + amount, 6)
+            records = len(self._contributions)
+            unparsed = self.unparsed_quantities
+            pre_geocoded = {}
+            for kind in ('donors', 'ngos'):
+                total = sum(1 for key in self._contributions if key[0] == kind)
+                located = sum(1 for key in self._pre_geocoded if key[0] == kind)
+                pre_geocoded[kind] = {'records': located, 'share': round(located / total, 3) if total else None}
+        return {'regions': regions, 'totals': totals, 'records': records, 'unparsed_quantities': unparsed,
+                'pre_geocoded': pre_geocoded}
@@ -0,0 +1,265 @@
+"""
+Server-side filtering and sorting for the donor and NGO listings.
+
+?foodType= (exact match, case and spacing ignored), ?since= (created at or
+after), ?expires_before= (donors expiring before) and ?sort= (timestamp,
+-timestamp, expires_at, -expires_at) are parsed once into a RecordQuery.
+Firestore receives them as where/order_by clauses backed by the composite
+indexes in firestore.indexes.json; the Sheets replica and the demo store
+answer them from a RecordIndex kept per dataset version, so a filtered
+request walks the matching records rather than the whole collection.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from match_events import donor_expires_at, parse_timestamp
+
+# Sort keys accepted per listing; a leading '-' sorts newest / latest-expiring first
+SORT_FIELDS = {
+    'donors': ('timestamp', 'expires_at'),
+    'ngos': ('timestamp',)
+}
+
+# Denormalized fields written on donation documents so Firestore can filter on them
+FOOD_TYPE_KEY_FIELD = 'foodTypeKey'
+EXPIRES_AT_FIELD = 'expiresAt'
+
+
+class RecordQuery(NamedTuple):
+    food_type: Optional[str] = None
+    since: Optional[datetime] = None
+    expires_before: Optional[datetime] = None
+    sort: Optional[str] = None
+    descending: bool = False
+
+    @property
+    def empty(self) -> bool:
+        return self.food_type is None and self.since is None and self.expires_before is None and self.sort is None
+
+
+def food_type_key(food_type) -> str:
+    """Match key for a food type: lowercase, single-spaced."""
+    return ' '.join(str(food_type or '').lower().split())
+
+
+def parse_query_time(value: str, name: str) -> datetime:
+    """Parse an ISO 8601 or epoch-seconds query value; raises ValueError."""
+    try:
+        return datetime.fromtimestamp(float(value), timezone.utc).astimezone()
+    except (TypeError, ValueError, OverflowError, OSError):
+        pass
+    parsed = parse_timestamp(value)
+    if parsed is None and ' ' in value:
+        # An unescaped '+' in a UTC offset arrives as a space
+        head, _, offset = value.rpartition(' ')
+        parsed = parse_timestamp(f'{head}+{offset}')
+    if parsed is None:
+        raise ValueError(f"Invalid {name}: {value!r} (use ISO 8601 or epoch seconds)")
+    return parsed
+
+
+def parse_record_query(args, kind: str) -> RecordQuery:
+    """
+    Parse listing query parameters.
+
+    Args:
+        args: Request args (a mapping)
+        kind (str): 'donors' or 'ngos'
+
+    Returns:
+        RecordQuery: Parsed filters and ordering; raises ValueError for bad values
+    """
+    if kind != 'donors':
+        for name in ('foodType', 'expires_before'):
+            if args.get(name):
+                raise ValueError(f"{name} only applies to donors")
+
+    food_type = food_type_key(args.get('foodType')) or None
+    since = parse_query_time(args['since'], 'since') if args.get('since') else None
+    expires_before = (parse_query_time(args['expires_before'], 'expires_before')
+                      if args.get('expires_before') else None)
+
+    sort = args.get('sort') or None
+    descending = False
+    if sort is not None:
+        descending = sort.startswith('-')
+        sort = sort.lstrip('-')
+        if sort not in SORT_FIELDS[kind]:
+            allowed = ', '.join(SORT_FIELDS[kind])
+            raise ValueError(f"Invalid sort: {args['sort']!r} (use {allowed}, optionally prefixed with '-')")
+
+    return RecordQuery(food_type, since, expires_before, sort, descending)
+
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    return value.timestamp() if value is not None else None
+
+
+def _record_times(record: Dict) -> Tuple[Optional[float], Optional[float]]:
+    """(created, expires) as epoch seconds, None where unknown."""
+    created = parse_timestamp(record.get('timestamp'))
+    expires = donor_expires_at(created, record.get('expiryTime'))
+    return _epoch(created), _epoch(expires)
+
+
+def query_fields(donor: Dict) -> Dict:
+    """Denormalized filter fields for a donation document (expiresAt only when known)."""
+    fields = {FOOD_TYPE_KEY_FIELD: food_type_key(donor.get('foodType'))}
+    expires_at = donor_expires_at(donor.get('timestamp'), donor.get('expiryTime'))
+    if expires_at is not None:
+        fields[EXPIRES_AT_FIELD] = expires_at
+    return fields
+
+
+def _sorted_positions(positions: Iterable[int], keys: List[Optional[float]], descending: bool) -> List[int]:
+    """Order positions by key; records without one go last in list order."""
+    dated, undated = [], []
+    for position in positions:
+        (dated if keys[position] is not None else undated).append(position)
+    dated.sort(key=keys.__getitem__, reverse=descending)
+    return dated + sorted(undated)
+
+
+class RecordIndex:
+    """
+    Read-only indexes over one list of records.
+
+    Creation times and expiry times are kept sorted for range bisection and
+    food types as posting lists; select starts from the smallest candidate
+    range and checks the remaining predicates on that range only.
+    """
+
+    def __init__(self, records: List[Dict]):
+        self.records = records
+        self.size = len(records)
+        self._created: List[Optional[float]] = []
+        self._expires: List[Optional[float]] = []
+        self._food_keys: List[str] = []
+        self._food: Dict[str, List[int]] = {}
+        for position, record in enumerate(records):
+            created, expires = _record_times(record)
+            self._created.append(created)
+            self._expires.append(expires)
+            self._food_keys.append(food_type_key(record.get('foodType')))
+            self._food.setdefault(self._food_keys[-1], []).append(position)
+
+        by_created = sorted((t, p) for p, t in enumerate(self._created) if t is not None)
+        self._created_keys = [t for t, _ in by_created]
+        self._created_positions = [p for _, p in by_created]
+        by_expires = sorted((t, p) for p, t in enumerate(self._expires) if t is not None)
+        self._expires_keys = [t for t, _ in by_expires]
+        self._expires_positions = [p for _, p in by_expires]
+        self._never_expire = [p for p, t in enumerate(self._expires) if t is None]
+
+    def _candidates(self, query: RecordQuery, since: Optional[float], before: Optional[float],
+                    active_at: Optional[float]) -> Iterable[int]:
+        """Smallest position range that contains every possible result."""
+        options: List[Tuple[int, Callable[[], Iterable[int]]]] = [(self.size, lambda: range(self.size))]
+        if query.food_type is not None:
+            postings = self._food.get(query.food_type, [])
+            options.append((len(postings), lambda: postings))
+        if since is not None:
+            start = bisect_left(self._created_keys, since)
+            options.append((len(self._created_keys) - start, lambda: self._created_positions[start:]))
+        if before is not None or active_at is not None:
+            low = bisect_right(self._expires_keys, active_at) if active_at is not None else 0
+            high = bisect_left(self._expires_keys, before) if before is not None else len(self._expires_keys)
+            # Donations without a known expiry stay live but never expire "before" anything
+            extra = self._never_expire if before is None else []
+            options.append((max(high - low, 0) + len(extra),
+                            lambda: self._expires_positions[low:high] + extra))
+        return min(options, key=lambda option: option[0])[1]()
+
+    def select(self, query: RecordQuery, active_at: Optional[datetime] = None) -> List[Dict]:
+        """
+        Records matching a query, in query order (list order if unsorted).
+
+        Args:
+            query (RecordQuery): Filters and ordering
+            active_at (Optional[datetime]): Also drop donations expired at this time
+
+        Returns:
+            List[Dict]: Matching records (shared; copy before modifying)
+        """
+        since, before, active = _epoch(query.since), _epoch(query.expires_before), _epoch(active_at)
+        results = []
+        for position in self._candidates(query, since, before, active):
+            if query.food_type is not None and self._food_keys[position] != query.food_type:
+                continue
+            created, expires = self._created[position], self._expires[position]
+            if since is not None and (created is None or created < since):
+                continue
+            if before is not None and (expires is None or expires >= before):
+                continue
+            if active is not None and expires is not None and expires <= active:
+                continue
+            results.append(position)
+
+        if query.sort is not None:
+            keys = self._created if query.sort == 'timestamp' else self._expires
+            results = _sorted_positions(results, keys, query.descending)
+        else:
+            results.sort()
+        return [self.records[position] for position in results]
+
+
+def apply_query(records: List[Dict], query: RecordQuery, active_at: Optional[datetime] = None) -> List[Dict]:
+    """One-off filtering and sorting, for record lists without a cached index."""
+    return RecordIndex(records).select(query, active_at)
+
+
+_index_lock = threading.Lock()
+_index_memo: Dict[str, Tuple[str, RecordIndex]] = {}
+
+
+def get_record_index(name: str, version: Optional[str], load: Callable[[], List[Dict]]) -> RecordIndex:
+    """Index over load()'s records, reused (without calling load) while the dataset version is unchanged."""
+    if version is not None:
+        with _index_lock:
+            memo = _index_memo.get(name)
+            if memo is not None and memo[0] == version:
+                return memo[1]
+    index = RecordIndex(load())
+    if version is not None:
+        with _index_lock:
+            _index_memo[name] = (version, index)
+    return index
+
+
+def firestore_query(ref, query: RecordQuery, created_after: Optional[datetime] = None):
+    """
+    Push a RecordQuery down to a Firestore query.
+
+    Equality on foodTypeKey, ranges on timestamp and expiresAt and ordering
+    on timestamp run server-side; an expires_at sort is applied by the caller
+    since documents without expiresAt would drop out of a Firestore order_by.
+
+    Args:
+        ref: Firestore collection or query
+        query (RecordQuery): Filters and ordering
+        created_after (Optional[datetime]): Extra lower bound on timestamp (the active window)
+
+    Returns:
+        Firestore query
+    """
+    if query.food_type is not None:
+        ref = ref.where(FOOD_TYPE_KEY_FIELD, '==', query.food_type)
+    lower = max((bound for bound in (query.since, created_after) if bound is not None), default=None)
+    if lower is not None:
+        ref = ref.where('timestamp', '>=', lower)
+    if query.expires_before is not None:
+        ref = ref.where(EXPIRES_AT_FIELD, '<', query.expires_before)
+    if query.sort == 'timestamp':
+        ref = ref.order_by('timestamp', direction='DESCENDING' if query.descending else 'ASCENDING')
+    return ref
+
+
+def sort_records(records: List[Dict], query: RecordQuery) -> List[Dict]:
+    """Apply an expires_at sort that firestore_query left to the caller."""
+    if query.sort != 'expires_at':
+        return records
+    keys = [_record_times(record)[1] for record in records]
+    return [records[position] for position in _sorted_positions(range(len(records)), keys, query.descending)]
@@ -0,0 +1,190 @@
+"""
+Conditional GET support and a response cache keyed on dataset version.
+
+Every backend exposes a cheap dataset version string (Firestore listener
+counters, Sheets revision, local write counter). Responses are serialized once
+per (endpoint, version) and served from memory until the version moves on.
+ETags are strong validators computed from the serialized body, so a client
+holding the current representation gets a 304 without the body being rebuilt.
+"""
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from flask import Response, current_app, request
+
+# Maximum number of (endpoint, version) entries kept in memory
+DEFAULT_MAX_ENTRIES = 64
+
+# Fixed pool of single-flight build locks; keys share a lock by hash
+BUILD_LOCK_STRIPES = 32
+
+
+class VersionCounter:
+    """Thread-safe monotonic counter used as a local write version."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def bump(self) -> int:
+        """Increment the counter and return the new value."""
+        with self._lock:
+            self._value += 1
+            return self._value
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized JSON responses.
+
+    Entries are keyed by endpoint key and dataset version; a lookup with a
+    different version is a miss, so stale bodies are never served.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._build_locks = [threading.Lock() for _ in range(BUILD_LOCK_STRIPES)]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str, version: str) -> Optional[Tuple[str, bytes]]:
+        """Return (etag, body) for key at version, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get((key, version))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end((key, version))
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, version: str, etag: str, body: bytes) -> None:
+        """Store a serialized body, dropping older versions of the same key."""
+        with self._lock:
+            for stale in [k for k in self._entries if k[0] == key and k[1] != version]:
+                del self._entries[stale]
+            self._entries[(key, version)] = (etag, body)
+            self._entries.move_to_end((key, version))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def latest(self, key: str) -> Optional[Tuple[str, bytes]]:
+        """Return the most recently stored entry for key regardless of version."""
+        with self._lock:
+            for (entry_key, _), entry in reversed(self._entries.items()):
+                if entry_key == key:
+                    return entry
+            return None
+
+    def build_lock(self, key: str) -> threading.Lock:
+        """
+        Lock for key so concurrent misses build a response only once.
+
+        Locks are striped over a fixed pool, so the set of locks stays bounded
+        however many distinct query strings are requested.
+        """
+        return self._build_locks[hash(key) % len(self._build_locks)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses
+            }
+
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the serialized response body."""
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def _serialize(payload: Dict) -> bytes:
+    # Same JSON provider as jsonify, so Firestore datetimes etc. encode identically
+    return current_app.json.dumps(payload).encode('utf-8')
+
+
+def _conditional_response(etag: str, body: bytes, status: int = 200) -> Response:
+    """Return 304 if the client already holds etag, otherwise the full body."""
+    if status == 200 and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = Response(body, status=status, mimetype='application/json')
+    if status == 200:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_json_response(
+    cache: ResponseCache,
+    key: str,
+    version: Optional[str],
+    build: Callable[[], Tuple[Dict, int]]
+) -> Response:
+    """
+    Serve a JSON endpoint through the version-keyed cache.
+
+    Args:
+        cache (ResponseCache): Cache shared by the app's endpoints
+        key (str): Cache key, normally the request path plus query string
+        version (Optional[str]): Current dataset version; None disables caching
+        build (Callable): Returns (payload, status) when the cache misses
+
+    Returns:
+        Response: 304 if If-None-Match matches, otherwise the JSON body
+    """
+    if version is not None:
+        entry = cache.get(key, version)
+        if entry is None:
+            # Single-flight: the first miss builds, concurrent misses wait for it
+            with cache.build_lock(key):
+                entry = cache.get(key, version)
+                if entry is None:
+                    payload, status = build()
+                    body = _serialize(payload)
+                    if status != 200 or not payload.get('success', True):
+                        return _conditional_response(make_etag(body), body, status)
+                    entry = (make_etag(body), body)
+                    cache.put(key, version, *entry)
+        return _conditional_response(*entry)
+
+    payload, status = build()
+    body = _serialize(payload)
+    return _conditional_response(make_etag(body), body, status)
+
+
+def stale_json_response(cache: ResponseCache) -> Optional[Response]:
+    """
+    Last cached body for the current request whatever its version, or None.
+
+    For load shedding: an overloaded server answers with slightly old data
+    rather than an error. The response is marked with a Warning header.
+    """
+    entry = cache.latest(request_cache_key())
+    if entry is None:
+        return None
+    response = _conditional_response(*entry)
+    response.headers['Warning'] = '110 - "Response is Stale"'
+    response.headers['X-Served-Stale'] = 'true'
+    return response
+
+
+def request_cache_key() -> str:
+    """Cache key for the current request: path plus normalized query string."""
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    return f'{request.path}?{query}' if query else request.path
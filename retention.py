@@ -0,0 +1,133 @@
+"""
+Active-window views and archival of expired donations.
+
+A donation is live until timestamp + expiryTime hours. Read paths only load
+donations created within ACTIVE_WINDOW_HOURS (a range query where the
+backend supports one) and then drop the expired ones, and a periodic
+archival job moves donations that expired more than ARCHIVE_GRACE_HOURS ago
+out of the hot Sheets tab / Firestore collection / demo list into cold
+storage. Per-request cost then follows the number of live donations rather
+than the full history.
+"""
+
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from match_events import donor_expires_at
+
+# Longest expiry a donation can have and still be found by windowed queries
+ACTIVE_WINDOW_HOURS = float(os.getenv('ACTIVE_WINDOW_HOURS', '168'))
+
+# Expired donations stay in the hot store this long (recent history, stream 'expired' events)
+ARCHIVE_GRACE_HOURS = float(os.getenv('ARCHIVE_GRACE_HOURS', '24'))
+
+# Seconds between archival runs
+ARCHIVE_INTERVAL_SECONDS = float(os.getenv('ARCHIVE_INTERVAL_SECONDS', '3600'))
+
+# Cached live views (expiry-filtered responses) are recomputed at least this often
+LIVE_VIEW_RESOLUTION_SECONDS = float(os.getenv('LIVE_VIEW_RESOLUTION_SECONDS', '60'))
+
+
+def current_time() -> datetime:
+    """Clock for expiry checks."""
+    return datetime.now().astimezone()
+
+
+def _now(now: Optional[datetime]) -> datetime:
+    return now if now is not None else current_time()
+
+
+def live_version(version: Optional[str]) -> Optional[str]:
+    """
+    Cache version for a response that drops expired donations.
+
+    Donations expire without any write, so the dataset version alone would
+    keep serving them; the current LIVE_VIEW_RESOLUTION_SECONDS bucket is
+    appended, and a cached live view is at most that old.
+
+    Args:
+        version (Optional[str]): Dataset version; None (caching disabled) is kept
+
+    Returns:
+        Optional[str]: Version that also moves on with the clock
+    """
+    if version is None:
+        return None
+    return f'{version}@{int(current_time().timestamp() // LIVE_VIEW_RESOLUTION_SECONDS)}'
+
+
+def live_view_horizon() -> datetime:
+    """
+    End of the current live_version bucket.
+
+    Time-dependent answers cached under live_version (route deadlines) are
+    computed as of this moment, so they still hold for the whole bucket.
+    """
+    bucket = int(current_time().timestamp() // LIVE_VIEW_RESOLUTION_SECONDS) + 1
+    return datetime.fromtimestamp(bucket * LIVE_VIEW_RESOLUTION_SECONDS).astimezone()
+
+
+def window_start(now: Optional[datetime] = None) -> datetime:
+    """Oldest creation time a live donation can have."""
+    return _now(now) - timedelta(hours=ACTIVE_WINDOW_HOURS)
+
+
+def is_active(donor: Dict, now: Optional[datetime] = None) -> bool:
+    """True unless the donation is known to have expired; undated donations count as live."""
+    expires_at = donor_expires_at(donor.get('timestamp'), donor.get('expiryTime'))
+    return expires_at is None or expires_at > _now(now)
+
+
+def filter_active(donors: List[Dict], now: Optional[datetime] = None) -> List[Dict]:
+    now = _now(now)
+    return [donor for donor in donors if is_active(donor, now)]
+
+
+def is_archivable(donor: Dict, now: Optional[datetime] = None) -> bool:
+    """True if the donation expired more than ARCHIVE_GRACE_HOURS ago."""
+    expires_at = donor_expires_at(donor.get('timestamp'), donor.get('expiryTime'))
+    return expires_at is not None and expires_at + timedelta(hours=ARCHIVE_GRACE_HOURS) <= _now(now)
+
+
+def partition_archivable(donors: List[Dict], now: Optional[datetime] = None) -> Tuple[List[Dict], List[Dict]]:
+    """Split donations into (keep, archive)."""
+    now = _now(now)
+    keep, archive = [], []
+    for donor in donors:
+        (archive if is_archivable(donor, now) else keep).append(donor)
+    return keep, archive
+
+
+def row_ranges(row_numbers: List[int]) -> List[Tuple[int, int]]:
+    """Collapse sorted row numbers into inclusive (first, last) runs."""
+    ranges: List[Tuple[int, int]] = []
+    for number in row_numbers:
+        if ranges and number == ranges[-1][1] + 1:
+            ranges[-1] = (ranges[-1][0], number)
+        else:
+            ranges.append((number, number))
+    return ranges
+
+
+_stats_lock = threading.Lock()
+_stats = {'runs': 0, 'archived': 0, 'last_run': None, 'last_archived': 0, 'last_error': None}
+
+
+def record_archive_run(archived: int, error: Optional[str] = None) -> None:
+    with _stats_lock:
+        _stats['runs'] += 1
+        _stats['archived'] += archived
+        _stats['last_archived'] = archived
+        _stats['last_run'] = time.time()
+        _stats['last_error'] = error
+
+
+def retention_stats() -> Dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update(active_window_hours=ACTIVE_WINDOW_HOURS, archive_grace_hours=ARCHIVE_GRACE_HOURS,
+                 archive_interval_seconds=ARCHIVE_INTERVAL_SECONDS)
+    return stats
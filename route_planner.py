@@ -0,0 +1,515 @@
+"""
+Multi-stop pickup routes per NGO.
+
+/api/matches pairs each donor with one NGO. A van, though, collects from
+several donors per trip. The planner takes each NGO's matched donors and
+builds trips that start and end at the NGO. A trip may not carry more than
+the vehicle capacity, and it must reach every donor before the donation
+expires (timestamp + expiryTime).
+
+Construction uses Clarke-Wright savings. Local search (relocate, swap,
+2-opt) then improves total distance until it converges, hits an iteration
+cap, or runs out of a hard time budget. Ties are broken by a seeded random
+order, so a seed always gives the same routes when the search converges
+within the budget. Distance matrices (great-circle km) are kept in an LRU
+cache keyed on the stop coordinates, so planning again with other options
+reuses them.
+"""
+
+import math
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from match_events import donor_expires_at
+from quantity import COUNT_UNIT, parse_quantity
+from spatial_index import EARTH_RADIUS_KM
+
+# Vehicle capacity in kg (litres count as kg)
+ROUTE_VEHICLE_CAPACITY_KG = float(os.getenv('ROUTE_VEHICLE_CAPACITY_KG', '500'))
+
+# Average road speed, and minutes spent at each pickup
+ROUTE_SPEED_KMH = float(os.getenv('ROUTE_SPEED_KMH', '30'))
+ROUTE_STOP_MINUTES = float(os.getenv('ROUTE_STOP_MINUTES', '5'))
+
+# Load assumed per counted item, and for quantities that could not be parsed
+ROUTE_KG_PER_ITEM = float(os.getenv('ROUTE_KG_PER_ITEM', '0.5'))
+ROUTE_DEFAULT_LOAD_KG = float(os.getenv('ROUTE_DEFAULT_LOAD_KG', '5'))
+
+# Wall-clock budget for local search per request (ms), and the most a client may ask for
+ROUTE_TIME_BUDGET_MS = float(os.getenv('ROUTE_TIME_BUDGET_MS', '200'))
+ROUTE_MAX_TIME_BUDGET_MS = float(os.getenv('ROUTE_MAX_TIME_BUDGET_MS', '5000'))
+
+# Local search passes per NGO before stopping even if still improving
+ROUTE_MAX_ITERATIONS = int(os.getenv('ROUTE_MAX_ITERATIONS', '1000'))
+
+# Distance matrices kept for reuse
+ROUTE_MATRIX_CACHE_SIZE = int(os.getenv('ROUTE_MATRIX_CACHE_SIZE', '64'))
+
+Coordinates = Tuple[float, float]
+
+# Improvements smaller than this (km) are treated as ties
+_EPSILON = 1e-9
+
+# Moves evaluated between checks of the clock
+_CLOCK_EVERY = 256
+
+
+def great_circle_km(a: Coordinates, b: Coordinates) -> float:
+    """Haversine distance; within ~0.5% of geodesic and far cheaper for dense matrices."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(h)))
+
+
+class DistanceMatrixCache:
+    """LRU of symmetric distance matrices keyed by their point lists."""
+
+    def __init__(self, max_entries: int = ROUTE_MATRIX_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Coordinates, ...], List[List[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def matrix(self, points: Sequence[Coordinates]) -> List[List[float]]:
+        key = tuple((round(lat, 6), round(lon, 6)) for lat, lon in points)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+        n = len(key)
+        matrix = [[0.0] * n for _ in range(n)]
+        for i in range(n):
+            for j in range(i + 1, n):
+                matrix[i][j] = matrix[j][i] = great_circle_km(key[i], key[j])
+        with self._lock:
+            self._entries[key] = matrix
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return matrix
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+matrix_cache = DistanceMatrixCache()
+
+
+def load_kg(quantity: str) -> float:
+    """Estimated load of a donation from its free-text quantity."""
+    parsed = parse_quantity(quantity or '')
+    if parsed is None or parsed[0] <= 0:
+        return ROUTE_DEFAULT_LOAD_KG
+    amount, unit = parsed
+    return amount * ROUTE_KG_PER_ITEM if unit == COUNT_UNIT else amount
+
+
+class PickupProblem:
+    """One NGO's pickups: index 0 is the NGO, 1..n the donors."""
+
+    def __init__(self, depot: Coordinates, stops: Sequence[Coordinates], loads: Sequence[float],
+                 deadlines: Sequence[float], capacity: float, speed_kmh: float, stop_minutes: float):
+        self.dist = matrix_cache.matrix([depot, *stops])
+        self.load = [0.0, *loads]
+        # Minutes from departure by which each stop must be reached (inf: no expiry)
+        self.deadline = [math.inf, *deadlines]
+        self.capacity = capacity
+        self.minutes_per_km = 60.0 / speed_kmh
+        self.stop_minutes = stop_minutes
+        self.n = len(stops)
+
+    def on_time(self, route: Sequence[int]) -> bool:
+        minutes = 0.0
+        previous = 0
+        for stop in route:
+            minutes += self.dist[previous][stop] * self.minutes_per_km
+            if minutes > self.deadline[stop]:
+                return False
+            minutes += self.stop_minutes
+            previous = stop
+        return True
+
+    def arrivals(self, route: Sequence[int]) -> List[float]:
+        minutes, previous, result = 0.0, 0, []
+        for stop in route:
+            minutes += self.dist[previous][stop] * self.minutes_per_km
+            result.append(minutes)
+            minutes += self.stop_minutes
+            previous = stop
+        return result
+
+    def cost(self, route: Sequence[int]) -> float:
+        if not route:
+            return 0.0
+        d = self.dist
+        return d[0][route[0]] + sum(d[a][b] for a, b in zip(route, route[1:])) + d[route[-1]][0]
+
+    def route_load(self, route: Sequence[int]) -> float:
+        return sum(self.load[stop] for stop in route)
+
+
+class _Budget:
+    """Hard wall-clock deadline, checked every _CLOCK_EVERY evaluations."""
+
+    def __init__(self, seconds: float):
+        self.deadline = time.perf_counter() + seconds
+        self.evaluations = 0
+        self.expired = seconds <= 0
+
+    def tick(self) -> bool:
+        """Count one evaluation; True once the budget is spent."""
+        self.evaluations += 1
+        if not self.expired and self.evaluations % _CLOCK_EVERY == 0:
+            self.expired = time.perf_counter() >= self.deadline
+        return self.expired
+
+
+def savings_routes(problem: PickupProblem, rng: random.Random) -> Tuple[List[List[int]], List[Tuple[int, str]]]:
+    """
+    Clarke-Wright savings construction.
+
+    Returns:
+        Tuple: (routes as lists of stop indices, [(stop, reason)] for stops
+        no vehicle can serve alone)
+    """
+    unrouted = []
+    route_of: Dict[int, List[int]] = {}
+    for stop in range(1, problem.n + 1):
+        if problem.load[stop] > problem.capacity:
+            unrouted.append((stop, 'over_capacity'))
+        elif not problem.on_time([stop]):
+            unrouted.append((stop, 'expires_before_pickup'))
+        else:
+            route_of[stop] = [stop]
+
+    stops = sorted(route_of)
+    # Seeded tie-break: equal savings are taken in a random but reproducible order
+    rank = {stop: r for r, stop in enumerate(rng.sample(stops, len(stops)))}
+    d = problem.dist
+    savings = sorted(
+        ((d[0][i] + d[0][j] - d[i][j], i, j) for a, i in enumerate(stops) for j in stops[a + 1:]),
+        key=lambda s: (-s[0], min(rank[s[1]], rank[s[2]]), max(rank[s[1]], rank[s[2]]))
+    )
+    loads = {id(route): problem.route_load(route) for route in route_of.values()}
+    for saving, i, j in savings:
+        if saving <= _EPSILON:
+            break
+        route_i, route_j = route_of[i], route_of[j]
+        if route_i is route_j or loads[id(route_i)] + loads[id(route_j)] > problem.capacity:
+            continue
+        # i and j must be route ends; try each orientation that makes them adjacent
+        candidates = []
+        if route_i[-1] == i and route_j[0] == j:
+            candidates.append(route_i + route_j)
+        if route_j[-1] == j and route_i[0] == i:
+            candidates.append(route_j + route_i)
+        if route_i[0] == i and route_j[0] == j:
+            candidates.append(route_i[::-1] + route_j)
+        if route_i[-1] == i and route_j[-1] == j:
+            candidates.append(route_i + route_j[::-1])
+        merged = next((route for route in candidates if problem.on_time(route)), None)
+        if merged is None:
+            continue
+        loads[id(merged)] = loads.pop(id(route_i)) + loads.pop(id(route_j))
+        for stop in merged:
+            route_of[stop] = merged
+
+    routes, seen = [], set()
+    for stop in stops:
+        route = route_of[stop]
+        if id(route) not in seen:
+            seen.add(id(route))
+            routes.append(route)
+    return routes, unrouted
+
+
+def improve_routes(problem: PickupProblem, routes: List[List[int]], rng: random.Random,
+                   budget: _Budget, max_iterations: int = ROUTE_MAX_ITERATIONS) -> Dict:
+    """
+    First-improvement local search (relocate, swap, 2-opt) over routes, in place.
+
+    Returns:
+        Dict: iterations, improvements and why it stopped ('converged',
+        'iterations' or 'time_budget')
+    """
+    d = problem.dist
+    loads = [problem.route_load(route) for route in routes]
+    improvements = 0
+
+    def relocate() -> bool:
+        nonlocal improvements
+        for a in rng.sample(range(len(routes)), len(routes)):
+            source = routes[a]
+            for position in range(len(source)):
+                stop = source[position]
+                before = source[position - 1] if position else 0
+                after = source[position + 1] if position + 1 < len(source) else 0
+                removal_gain = d[before][stop] + d[stop][after] - d[before][after]
+                rest = source[:position] + source[position + 1:]
+                for b in range(len(routes)):
+                    # Within the same route the stop moves between its remaining neighbours
+                    target = rest if b == a else routes[b]
+                    if b != a and loads[b] + problem.load[stop] > problem.capacity:
+                        continue
+                    for insert_at in range(len(target) + 1):
+                        if budget.tick():
+                            return False
+                        if b == a and insert_at == position:
+                            continue
+                        left = target[insert_at - 1] if insert_at else 0
+                        right = target[insert_at] if insert_at < len(target) else 0
+                        if d[left][stop] + d[stop][right] - d[left][right] - removal_gain >= -_EPSILON:
+                            continue
+                        new_target = target[:insert_at] + [stop] + target[insert_at:]
+                        if b == a:
+                            if problem.on_time(new_target):
+                                routes[a] = new_target
+                                improvements += 1
+                                return True
+                        elif problem.on_time(rest) and problem.on_time(new_target):
+                            routes[a], routes[b] = rest, new_target
+                            loads[a] -= problem.load[stop]
+                            loads[b] += problem.load[stop]
+                            improvements += 1
+                            return True
+        return False
+
+    def replace_delta(route: List[int], i: int, stop: int) -> float:
+        before = route[i - 1] if i else 0
+        after = route[i + 1] if i + 1 < len(route) else 0
+        return d[before][stop] + d[stop][after] - d[before][route[i]] - d[route[i]][after]
+
+    def swap() -> bool:
+        nonlocal improvements
+        for a in rng.sample(range(len(routes)), len(routes)):
+            for b in range(a + 1, len(routes)):
+                route_a, route_b = routes[a], routes[b]
+                for i, x in enumerate(route_a):
+                    for j, y in enumerate(route_b):
+                        if budget.tick():
+                            return False
+                        shift = problem.load[y] - problem.load[x]
+                        if loads[a] + shift > problem.capacity or loads[b] - shift > problem.capacity:
+                            continue
+                        if replace_delta(route_a, i, y) + replace_delta(route_b, j, x) >= -_EPSILON:
+                            continue
+                        new_a = route_a[:i] + [y] + route_a[i + 1:]
+                        new_b = route_b[:j] + [x] + route_b[j + 1:]
+                        if problem.on_time(new_a) and problem.on_time(new_b):
+                            routes[a], routes[b] = new_a, new_b
+                            loads[a] += shift
+                            loads[b] -= shift
+                            improvements += 1
+                            return True
+        return False
+
+    def two_opt() -> bool:
+        nonlocal improvements
+        for a in rng.sample(range(len(routes)), len(routes)):
+            route = routes[a]
+            path = [0, *route, 0]
+            for i in range(1, len(path) - 2):
+                for j in range(i + 1, len(path) - 1):
+                    if budget.tick():
+                        return False
+                    delta = (d[path[i - 1]][path[j]] + d[path[i]][path[j + 1]]
+                             - d[path[i - 1]][path[i]] - d[path[j]][path[j + 1]])
+                    if delta >= -_EPSILON:
+                        continue
+                    candidate = route[:i - 1] + route[i - 1:j][::-1] + route[j:]
+                    if problem.on_time(candidate):
+                        routes[a] = candidate
+                        improvements += 1
+                        return True
+        return False
+
+    iterations = 0
+    stopped = 'converged'
+    while True:
+        if budget.expired:
+            stopped = 'time_budget'
+            break
+        if iterations >= max_iterations:
+            stopped = 'iterations'
+            break
+        iterations += 1
+        if not (relocate() or swap() or two_opt()):
+            stopped = 'time_budget' if budget.expired else 'converged'
+            break
+        # A relocate can empty a route; that vehicle is no longer needed
+        for index in [i for i, route in enumerate(routes) if not route][::-1]:
+            del routes[index]
+            del loads[index]
+    return {'iterations': iterations, 'improvements': improvements, 'stopped': stopped}
+
+
+def _round(value: float, digits: int = 2) -> float:
+    return round(value, digits)
+
+
+def plan_routes(matches: List[Dict], capacity_kg: float = ROUTE_VEHICLE_CAPACITY_KG,
+                speed_kmh: float = ROUTE_SPEED_KMH, stop_minutes: float = ROUTE_STOP_MINUTES,
+                time_budget_ms: float = ROUTE_TIME_BUDGET_MS, seed: int = 0,
+                max_iterations: int = ROUTE_MAX_ITERATIONS, now: Optional[datetime] = None) -> Dict:
+    """
+    Plan pickup trips for every NGO from the /api/matches pairs.
+
+    Args:
+        matches (List[Dict]): Match payloads ('donor' and 'matched_ngo' with coordinates)
+        capacity_kg (float): Load one vehicle can carry per trip
+        speed_kmh (float): Average road speed
+        stop_minutes (float): Time spent at each pickup
+        time_budget_ms (float): Hard limit on local search time, shared by all NGOs
+        seed (int): Seed for tie-breaking and search order
+        max_iterations (int): Local search passes per NGO
+        now (Optional[datetime]): Departure time (default: now)
+
+    Returns:
+        Dict: 'routes' per NGO, 'unrouted' donors with a reason, 'summary' and 'solver' stats
+    """
+    started = time.perf_counter()
+    now = now or datetime.now().astimezone()
+    by_ngo: "OrderedDict[str, Tuple[Dict, List[Dict]]]" = OrderedDict()
+    for match in matches:
+        ngo = match['matched_ngo']
+        by_ngo.setdefault(ngo['id'], (ngo, []))[1].append(match['donor'])
+
+    problems = []
+    for ngo_id in sorted(by_ngo):
+        ngo, donors = by_ngo[ngo_id]
+        deadlines = []
+        for donor in donors:
+            expires_at = donor_expires_at(donor.get('timestamp'), donor.get('expiry_time_hours'))
+            deadlines.append((expires_at - now).total_seconds() / 60 if expires_at is not None else math.inf)
+        problem = PickupProblem(
+            tuple(ngo['coordinates']), [tuple(donor['coordinates']) for donor in donors],
+            [load_kg(donor.get('quantity', '')) for donor in donors], deadlines,
+            capacity_kg, speed_kmh, stop_minutes
+        )
+        problems.append((ngo, donors, problem))
+
+    rng = random.Random(seed)
+    constructed = []
+    for ngo, donors, problem in problems:
+        routes, unrouted = savings_routes(problem, rng)
+        constructed.append((ngo, donors, problem, routes, unrouted))
+    construction_ms = (time.perf_counter() - started) * 1000
+
+    # Local search: each NGO gets a share of what is left, by its number of donors
+    search_started = time.perf_counter()
+    remaining_stops = sum(problem.n for _, _, problem in problems)
+    iterations = improvements = 0
+    stop_reasons = {}
+    for ngo, donors, problem, routes, _ in constructed:
+        spent = time.perf_counter() - search_started
+        left = max(0.0, time_budget_ms / 1000 - spent)
+        share = left * problem.n / remaining_stops if remaining_stops else 0.0
+        remaining_stops -= problem.n
+        result = improve_routes(problem, routes, rng, _Budget(share), max_iterations)
+        iterations += result['iterations']
+        improvements += result['improvements']
+        stop_reasons[result['stopped']] = stop_reasons.get(result['stopped'], 0) + 1
+
+    ngo_routes, unrouted_donors = [], []
+    total_km = naive_km = 0.0
+    stops_served = 0
+    for ngo, donors, problem, routes, unrouted in constructed:
+        vehicles = []
+        for route in routes:
+            arrivals = problem.arrivals(route)
+            distance = problem.cost(route)
+            total_km += distance
+            naive_km += sum(2 * problem.dist[0][stop] for stop in route)
+            stops_served += len(route)
+            vehicles.append({
+                'stops': [{
+                    'donor_id': donors[stop - 1]['id'],
+                    'location': donors[stop - 1].get('location', ''),
+                    'coordinates': donors[stop - 1]['coordinates'],
+                    'load_kg': _round(problem.load[stop]),
+                    'arrival_min': _round(arrival, 1),
+                    'expires_in_min': _round(problem.deadline[stop], 1) if problem.deadline[stop] != math.inf else None
+                } for stop, arrival in zip(route, arrivals)],
+                'load_kg': _round(problem.route_load(route)),
+                'distance_km': _round(distance),
+                'duration_min': _round(arrivals[-1] + problem.stop_minutes
+                                       + problem.dist[route[-1]][0] * problem.minutes_per_km, 1)
+            })
+        unrouted_donors.extend({'donor_id': donors[stop - 1]['id'], 'ngo_id': ngo['id'], 'reason': reason}
+                               for stop, reason in unrouted)
+        if vehicles:
+            ngo_routes.append({
+                'ngo': {key: ngo.get(key) for key in ('id', 'ngo_name', 'location', 'coordinates')},
+                'vehicles': vehicles
+            })
+
+    return {
+        # Departure time the deadlines and expires_in_min refer to
+        'departs_at': now.isoformat(),
+        'routes': ngo_routes,
+        'unrouted': unrouted_donors,
+        'summary': {
+            'ngos': len(ngo_routes),
+            'vehicles': sum(len(entry['vehicles']) for entry in ngo_routes),
+            'stops': stops_served,
+            'distance_km': _round(total_km),
+            # One out-and-back trip per donor, for comparison
+            'direct_trips_km': _round(naive_km),
+            'saved_pct': _round(100 * (1 - total_km / naive_km), 1) if naive_km else 0.0
+        },
+        'solver': {
+            'seed': seed,
+            'capacity_kg': capacity_kg,
+            'time_budget_ms': time_budget_ms,
+            'construction_ms': _round(construction_ms),
+            'search_ms': _round((time.perf_counter() - search_started) * 1000),
+            'iterations': iterations,
+            'improvements': improvements,
+            'stopped': stop_reasons
+        }
+    }
+
+
+def route_options(args) -> Dict:
+    """
+    Planner options from request query arguments.
+
+    Raises:
+        ValueError: If an option is not a number or out of range
+    """
+    def number(name: str, default: float, low: float, high: float, cast=float):
+        raw = args.get(name)
+        if raw in (None, ''):
+            return default
+        try:
+            value = cast(raw)
+        except ValueError:
+            raise ValueError(f'{name} must be a number')
+        if not low <= value <= high:
+            raise ValueError(f'{name} must be between {low:g} and {high:g}')
+        return value
+
+    return {
+        'capacity_kg': number('capacity_kg', ROUTE_VEHICLE_CAPACITY_KG, 1, 100000),
+        'speed_kmh': number('speed_kmh', ROUTE_SPEED_KMH, 1, 200),
+        'time_budget_ms': number('budget_ms', ROUTE_TIME_BUDGET_MS, 0, ROUTE_MAX_TIME_BUDGET_MS),
+        'seed': number('seed', 0, 0, 2 ** 31 - 1, int)
+    }
+
+
+def route_stats() -> Dict:
+    return {'matrix_cache': matrix_cache.stats()}
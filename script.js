@@ -20,6 +20,41 @@ const ngoForm = document.getElementById('ngoForm');
 const successMessage = document.getElementById('successMessage');
 const successText = document.getElementById('successText');
 
+// Optional coordinates from the browser; the backend uses them instead of geocoding the location
+function readCoordinates(formData) {
+    const lat = parseFloat(formData.get('lat'));
+    const lon = parseFloat(formData.get('lon'));
+    return Number.isFinite(lat) && Number.isFinite(lon) ? { lat, lon } : {};
+}
+
+function clearCoordinates(form) {
+    form.elements.lat.value = '';
+    form.elements.lon.value = '';
+    form.querySelector('.locate-btn').textContent = '📍 Use my current location';
+}
+
+document.querySelectorAll('.locate-btn').forEach(button => {
+    button.addEventListener('click', () => {
+        const form = document.getElementById(button.dataset.form);
+        if (!navigator.geolocation) {
+            button.textContent = 'Location is not available in this browser';
+            return;
+        }
+        button.disabled = true;
+        button.textContent = 'Locating...';
+        navigator.geolocation.getCurrentPosition(position => {
+            form.elements.lat.value = position.coords.latitude.toFixed(6);
+            form.elements.lon.value = position.coords.longitude.toFixed(6);
+            button.textContent = '📍 Current location attached';
+            button.disabled = false;
+        }, () => {
+            clearCoordinates(form);
+            button.textContent = 'Could not get your location';
+            button.disabled = false;
+        }, { timeout: 10000, maximumAge: 60000 });
+    });
+});
+
 // Donor form submission
 donorForm.addEventListener('submit', async (e) => {
     e.preventDefault();
@@ -30,6 +65,7 @@ donorForm.addEventListener('submit', async (e) => {
         quantity: formData.get('quantity'),
         expiryTime: parseInt(formData.get('expiryTime')),
         location: formData.get('location'),
+        ...readCoordinates(formData),
         timestamp: firebase.firestore.FieldValue.serverTimestamp(),
         type: 'donor'
     };
@@ -38,6 +74,7 @@ donorForm.addEventListener('submit', async (e) => {
         await db.collection('donations').add(donorData);
         showSuccessMessage('Donation submitted successfully! Your food donation has been recorded.');
         donorForm.reset();
+        clearCoordinates(donorForm);
     } catch (error) {
         console.error('Error submitting donation:', error);
         showSuccessMessage('Error submitting donation. Please try again.');
@@ -53,6 +90,7 @@ ngoForm.addEventListener('submit', async (e) => {
         ngoName: formData.get('ngoName'),
         foodNeeded: formData.get('foodNeeded'),
         location: formData.get('location'),
+        ...readCoordinates(formData),
         timestamp: firebase.firestore.FieldValue.serverTimestamp(),
         type: 'ngo'
     };
@@ -61,6 +99,7 @@ ngoForm.addEventListener('submit', async (e) => {
         await db.collection('ngoRequests').add(ngoData);
         showSuccessMessage('NGO request submitted successfully! Your food request has been recorded.');
         ngoForm.reset();
+        clearCoordinates(ngoForm);
     } catch (error) {
         console.error('Error submitting NGO request:', error);
         showSuccessMessage('Error submitting NGO request. Please try again.');
@@ -0,0 +1,125 @@
+"""
+Production server for the Food Donation backends.
+
+Pre-forks a configurable number of worker processes that share one listening
+socket; the kernel spreads incoming connections across them. Each worker runs
+a threaded WSGI server without the debug reloader. Caches that are expensive
+to warm live in files every worker maps (the SQLite geocode cache and the NGO
+spatial index under BACKEND_DATA_DIR), so adding workers doesn't multiply
+warm-up work.
+
+Usage:
+    python serve.py app_sheets --workers 4 --port 5000
+"""
+
+import argparse
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict
+
+# Workers that die this soon after starting are not respawned in a tight loop
+MIN_WORKER_LIFETIME_SECONDS = 5.0
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description='Run a backend with multiple worker processes.')
+    parser.add_argument('module', nargs='?', default=os.getenv('BACKEND_MODULE', 'app_sheets'),
+                        help='Backend module exposing a Flask "app" (app, app_sheets, app_sheets_demo, app_simple)')
+    parser.add_argument('--host', default=os.getenv('HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '5000')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_WORKERS', str(os.cpu_count() or 1))),
+                        help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--backlog', type=int, default=2048, help='Listen backlog of the shared socket')
+    return parser.parse_args(argv)
+
+
+def bind_socket(host: str, port: int, backlog: int) -> socket.socket:
+    """Create the listening socket in the master so every worker inherits it."""
+    family = socket.AF_INET6 if ':' in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(module_name: str, sock: socket.socket, host: str, port: int) -> None:
+    """Worker entry point: import the app after fork and serve on the shared socket."""
+    from werkzeug.serving import make_server
+
+    # Import after fork: Firebase/gRPC and HTTP clients must not be shared across processes
+    module = importlib.import_module(module_name)
+    server = make_server(host, port, module.app, threaded=True, fd=sock.fileno())
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"👷 Worker {os.getpid()} serving {module_name}")
+    server.serve_forever()
+
+
+def spawn_worker(module_name: str, sock: socket.socket, host: str, port: int) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        # The master's shutdown handler is meaningless here; Ctrl+C reaches the
+        # whole process group, and the master stops workers with SIGTERM
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        try:
+            run_worker(module_name, sock, host, port)
+        except SystemExit as e:
+            code = e.code or 0
+        except BaseException as e:
+            print(f"❌ Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    sock = bind_socket(args.host, args.port, args.backlog)
+    workers: Dict[int, float] = {}
+    stopping = False
+
+    def shutdown(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    print(f"🚀 Starting {args.module} with {args.workers} workers on http://{args.host}:{args.port}")
+    for _ in range(args.workers):
+        workers[spawn_worker(args.module, sock, args.host, args.port)] = time.monotonic()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = workers.pop(pid, None)
+        if stopping or started is None:
+            continue
+        print(f"⚠️ Worker {pid} exited with status {status}")
+        if time.monotonic() - started < MIN_WORKER_LIFETIME_SECONDS:
+            time.sleep(MIN_WORKER_LIFETIME_SECONDS)
+        workers[spawn_worker(args.module, sock, args.host, args.port)] = time.monotonic()
+
+    sock.close()
+    print("👋 Server stopped")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,296 @@
+"""
+Geographic sharding for donor-NGO matching.
+
+Donors are partitioned by geohash prefix. Each shard is matched against the
+NGOs inside its cell widened by an overlap margin, independently of every
+other shard, so shards can run on a local process pool or be sent to other
+backend nodes (POST /api/shards/match). A shard's answer is only accepted
+when the nearest NGO it found is closer than the edge of the widened cell;
+any other donor is re-matched against the global index by the coordinator.
+The merged result is therefore identical to the global computation.
+"""
+
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from parallel_match import MATCH_WORKERS, get_process_pool, nearest_all
+from spatial_index import NgoSpatialIndex, block_bound_km, geodesic_km
+
+# off: never shard; auto: shard above MIN_SHARDED_DONORS; local/nodes: always shard
+SHARD_MODE = os.getenv('MATCH_SHARDING', 'auto')
+
+# Geohash prefix length per shard (3 is roughly 156 x 156 km)
+SHARD_PRECISION = int(os.getenv('MATCH_SHARD_PRECISION', '3'))
+
+# NGOs this far outside a shard's cell are still considered for its donors
+SHARD_MARGIN_KM = float(os.getenv('MATCH_SHARD_MARGIN_KM', '50'))
+
+MIN_SHARDED_DONORS = int(os.getenv('MATCH_SHARD_MIN_DONORS', '2000'))
+
+# Base URLs of backend nodes that accept shards; empty means match locally
+SHARD_NODES = [url.strip().rstrip('/') for url in os.getenv('MATCH_SHARD_NODES', '').split(',') if url.strip()]
+
+SHARD_NODE_TIMEOUT = float(os.getenv('MATCH_SHARD_NODE_TIMEOUT', '30'))
+
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_KM_PER_DEGREE = 111.32
+
+Coordinates = Tuple[float, float]
+Bounds = Tuple[float, float, float, float]  # south, north, west, east
+
+
+def geohash_encode(lat: float, lon: float, precision: int = SHARD_PRECISION) -> str:
+    """Standard base32 geohash of a point."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        value, interval = (lon, lon_range) if even else (lat, lat_range)
+        mid = (interval[0] + interval[1]) / 2
+        bits <<= 1
+        if value >= mid:
+            bits |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def geohash_bounds(geohash: str) -> Bounds:
+    """(south, north, west, east) of a geohash cell."""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if (value >> shift) & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def expand_bounds(bounds: Bounds, margin_km: float) -> Bounds:
+    """Widen a cell by roughly margin_km on every side (longitude scaled by latitude)."""
+    south, north, west, east = bounds
+    d_lat = margin_km / _KM_PER_DEGREE
+    south, north = max(-90.0, south - d_lat), min(90.0, north + d_lat)
+    cos_lat = math.cos(math.radians(max(abs(south), abs(north))))
+    d_lon = margin_km / (_KM_PER_DEGREE * cos_lat) if cos_lat > 1e-6 else 360.0
+    if east - west + 2 * d_lon >= 360.0:
+        return south, north, -180.0, 180.0
+    return south, north, west - d_lon, east + d_lon
+
+
+def _in_bounds(lat: float, lon: float, bounds: Bounds) -> bool:
+    south, north, west, east = bounds
+    if not south <= lat <= north:
+        return False
+    return east - west >= 360.0 or (lon - west) % 360.0 <= east - west
+
+
+def _lon_within(lon: float, west: float) -> float:
+    """Shift lon into [west, west + 360) so it can be compared against a widened cell."""
+    return west + (lon - west) % 360.0
+
+
+def _covering_cells(bounds: Bounds, precision: int, limit: int) -> Optional[List[str]]:
+    """
+    Geohashes of every cell at this precision that overlaps bounds.
+
+    Returns None when that is more than limit cells, in which case the caller
+    should scan its buckets instead.
+    """
+    lon_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    height, width = 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+    south, north, west, east = bounds
+    rows = range(max(0, int((south + 90.0) // height)),
+                 min((1 << lat_bits) - 1, int((north + 90.0) // height)) + 1)
+    if east - west >= 360.0:
+        columns = range(1 << lon_bits)
+    else:
+        first, last = int((west + 180.0) // width), int((east + 180.0) // width)
+        columns = range(first, last + 1) if last - first < (1 << lon_bits) else range(1 << lon_bits)
+    if len(rows) * len(columns) > limit:
+        return None
+    columns = sorted({column % (1 << lon_bits) for column in columns})
+    return [geohash_encode(-90.0 + (row + 0.5) * height, -180.0 + (column + 0.5) * width, precision)
+            for row in rows for column in columns]
+
+
+def build_shard_tasks(donor_coords: Sequence[Coordinates], ngo_locations: List[Dict],
+                      precision: int = SHARD_PRECISION,
+                      margin_km: float = SHARD_MARGIN_KM) -> List[Dict]:
+    """
+    Partition donors into self-contained, JSON-serializable shard tasks.
+
+    Each task carries its donors as [donor_index, lat, lon], the NGOs inside
+    the widened cell as [ngo_position, lat, lon] in global list order (so tie
+    breaking matches the global index), and the widened cell's bounds. NGOs
+    are bucketed by cell once, so each shard only looks at the cells its
+    widened bounds cover.
+    """
+    shards: Dict[str, List[List[float]]] = {}
+    for i, (lat, lon) in enumerate(donor_coords):
+        shards.setdefault(geohash_encode(lat, lon, precision), []).append([i, lat, lon])
+
+    buckets: Dict[str, List[List[float]]] = {}
+    for position, ngo in enumerate(ngo_locations):
+        lat, lon = ngo['coordinates']
+        buckets.setdefault(geohash_encode(lat, lon, precision), []).append([position, lat, lon])
+
+    tasks = []
+    for geohash, donors in sorted(shards.items()):
+        bounds = expand_bounds(geohash_bounds(geohash), margin_km)
+        cells = _covering_cells(bounds, precision, len(buckets))
+        # A very wide margin covers more cells than there are occupied buckets
+        candidates = (buckets.values() if cells is None
+                      else (buckets[cell] for cell in cells if cell in buckets))
+        ngos = sorted(ngo for bucket in candidates for ngo in bucket if _in_bounds(ngo[1], ngo[2], bounds))
+        tasks.append({'shard': geohash, 'bounds': list(bounds), 'donors': donors, 'ngos': ngos})
+    return tasks
+
+
+def match_shard(task: Dict) -> List[List]:
+    """
+    Match one shard's donors against its NGOs.
+
+    Returns:
+        List[List]: [donor_index, ngo_position, distance_km, certified] per donor;
+        ngo_position is -1 when the shard has no NGOs. Uncertified answers may
+        have a closer NGO outside the shard and must be re-matched globally.
+    """
+    south, north, west, east = task['bounds']
+    ngos = task['ngos']
+    index = NgoSpatialIndex.build([{'id': ngo[0], 'coordinates': (ngo[1], ngo[2])} for ngo in ngos])
+    results = []
+    for donor_index, lat, lon in task['donors']:
+        nearest = index.nearest((lat, lon), geodesic_km)
+        if nearest is None:
+            results.append([donor_index, -1, 0.0, False])
+            continue
+        local_position, distance = nearest
+        edge_km = block_bound_km(lat, _lon_within(lon, west), south, north, west, east)
+        # Strict: an NGO exactly on the edge distance could tie and win on position
+        results.append([donor_index, ngos[local_position][0], distance, distance < edge_km])
+    return results
+
+
+class NodeExecutor:
+    """Sends shard tasks to other backend nodes, matching locally if a node fails."""
+
+    def __init__(self, urls: List[str]):
+        import requests
+        from http_pool import mount_shared_adapter
+
+        self.urls = urls
+        self._session = mount_shared_adapter(requests.Session())
+        self._threads = ThreadPoolExecutor(max_workers=max(1, 2 * len(urls)), thread_name_prefix='shard-node')
+
+    def _run(self, numbered_task: Tuple[int, Dict]) -> List[List]:
+        n, task = numbered_task
+        url = self.urls[n % len(self.urls)]
+        try:
+            response = self._session.post(f'{url}/api/shards/match', json=task, timeout=SHARD_NODE_TIMEOUT)
+            response.raise_for_status()
+            return response.json()['results']
+        except Exception as e:
+            print(f"Shard {task['shard']} failed on {url}, matching locally: {e}")
+            return match_shard(task)
+
+    def map(self, fn: Callable, tasks: List[Dict], chunksize: int = 1):
+        return self._threads.map(self._run, enumerate(tasks))
+
+
+_node_executor: Optional[NodeExecutor] = None
+_node_executor_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {'runs': 0, 'shards': 0, 'certified': 0, 'fallback': 0, 'errors': 0, 'last_mode': 'off'}
+
+
+def shard_mode(n_donors: int) -> str:
+    """Strategy for a run: 'off', 'local' (process pool) or 'nodes'."""
+    if SHARD_MODE == 'off' or (SHARD_MODE == 'auto' and n_donors < MIN_SHARDED_DONORS):
+        return 'off'
+    if SHARD_NODES and SHARD_MODE in ('auto', 'nodes'):
+        return 'nodes'
+    return 'local'
+
+
+def _get_executor(mode: str):
+    """Process pool for 'local'; a long-lived node executor for 'nodes'."""
+    global _node_executor
+    if mode == 'local':
+        return get_process_pool()
+    with _node_executor_lock:
+        if _node_executor is None:
+            _node_executor = NodeExecutor(SHARD_NODES)
+        return _node_executor
+
+
+def match_donors(donor_coords: Sequence[Coordinates], ngo_locations: List[Dict],
+                 ngo_index: NgoSpatialIndex) -> List[Optional[Tuple[int, float]]]:
+    """
+    Nearest NGO for every donor, sharded when the dataset is large enough.
+
+    Args:
+        donor_coords (Sequence[Coordinates]): Geocoded donor coordinates
+        ngo_locations (List[Dict]): Geocoded NGOs the index was built from
+        ngo_index (NgoSpatialIndex): Global index, used unsharded and for fallbacks
+
+    Returns:
+        List[Optional[Tuple[int, float]]]: (ngo position, distance_km) per donor,
+        exactly as ngo_index.nearest would return
+    """
+    mode = shard_mode(len(donor_coords))
+    if mode == 'off' or not ngo_locations:
+        return nearest_all(donor_coords, ngo_index)
+
+    tasks = build_shard_tasks(donor_coords, ngo_locations)
+    results: List[Optional[Tuple[int, float]]] = [None] * len(donor_coords)
+    fallback = []
+    try:
+        executor = _get_executor(mode)
+        chunksize = max(1, len(tasks) // (4 * MATCH_WORKERS))
+        for shard in executor.map(match_shard, tasks, chunksize=chunksize):
+            for donor_index, position, shard_distance, certified in shard:
+                if certified:
+                    results[donor_index] = (position, shard_distance)
+                else:
+                    fallback.append(donor_index)
+    except Exception as e:
+        print(f"Sharded matching failed, matching in-process: {e}")
+        with _stats_lock:
+            _stats['errors'] += 1
+        return nearest_all(donor_coords, ngo_index)
+
+    # Donors near a shard edge, or in a shard without NGOs, are matched globally
+    for donor_index, result in zip(fallback, nearest_all([donor_coords[i] for i in fallback], ngo_index)):
+        results[donor_index] = result
+
+    with _stats_lock:
+        _stats['runs'] += 1
+        _stats['shards'] += len(tasks)
+        _stats['certified'] += len(donor_coords) - len(fallback)
+        _stats['fallback'] += len(fallback)
+        _stats['last_mode'] = mode
+    return results
+
+
+def shard_stats() -> Dict:
+    with _stats_lock:
+        stats = dict(_stats)
+    stats.update(mode=SHARD_MODE, precision=SHARD_PRECISION, margin_km=SHARD_MARGIN_KM, nodes=len(SHARD_NODES))
+    return stats
@@ -0,0 +1,135 @@
+"""
+Incremental replica of an append-only Google Sheets worksheet.
+
+Rows are only ever appended through the API, so after one full read a
+replica only needs the rows below the last one it has seen. sync() skips the
+API entirely while the dataset version is unchanged, otherwise fetches just
+the tail (re-reading the last known row as an anchor to detect rows removed
+or shifted above it), and every SHEETS_FULL_SYNC_SECONDS does a full read
+whose checksum is compared with the replica to catch manual edits. Rows are
+parsed once, when they first arrive.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+# Seconds between full re-reads that catch edits made in the Sheets UI (0: always full)
+SHEETS_FULL_SYNC_SECONDS = float(os.getenv('SHEETS_FULL_SYNC_SECONDS', '300'))
+
+RowParser = Callable[[Dict[str, str]], Optional[Dict]]
+
+
+def column_letter(number: int) -> str:
+    """Spreadsheet column name for a 1-based column number (1 → A, 27 → AA)."""
+    letters = ''
+    while number > 0:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def rows_checksum(rows: List[List[str]]) -> str:
+    digest = hashlib.sha256()
+    for row in rows:
+        digest.update('\x1f'.join(row).encode())
+        digest.update(b'\x1e')
+    return digest.hexdigest()
+
+
+class SheetReplica:
+    """
+    Local copy of one worksheet, kept current by tail reads.
+
+    parse_row turns a {header: value} dict into a record, or None to skip
+    the row (e.g. blank IDs).
+    """
+
+    def __init__(self, name: str, parse_row: RowParser, full_sync_seconds: float = SHEETS_FULL_SYNC_SECONDS):
+        self.name = name
+        self._parse_row = parse_row
+        self.full_sync_seconds = full_sync_seconds
+        self._lock = threading.Lock()
+        self.headers: List[str] = []
+        self._rows: List[List[str]] = []
+        self._records: List[Optional[Dict]] = []
+        self._version: Optional[str] = None
+        self._full_at: Optional[float] = None
+        self.stats_counters = {'full_reads': 0, 'tail_reads': 0, 'unchanged': 0, 'rows_fetched': 0,
+                               'anchor_mismatches': 0, 'drift_repairs': 0}
+
+    def invalidate(self) -> None:
+        """Force a full read next time (after this process deleted or reshaped rows)."""
+        with self._lock:
+            self._full_at = None
+
+    def _normalize(self, row: List) -> List[str]:
+        row = [str(value) for value in row[:len(self.headers)]]
+        return row + [''] * (len(self.headers) - len(row))
+
+    def _parse(self, row: List[str]) -> Optional[Dict]:
+        return self._parse_row(dict(zip(self.headers, row)))
+
+    def _full_read(self, worksheet) -> None:
+        values = worksheet.get_all_values()
+        self.stats_counters['full_reads'] += 1
+        self.stats_counters['rows_fetched'] += len(values)
+        old_checksum = rows_checksum([self.headers] + self._rows) if self._full_at is not None else None
+        self.headers = [str(header) for header in values[0]] if values else []
+        rows = [self._normalize(row) for row in values[1:]]
+        if old_checksum is not None and rows_checksum([self.headers] + rows) != old_checksum:
+            # The incremental replica had drifted from the sheet (manual edit, deletion)
+            self.stats_counters['drift_repairs'] += 1
+        self._rows = rows
+        self._records = [self._parse(row) for row in rows]
+        self._full_at = time.monotonic()
+
+    def _tail_read(self, worksheet) -> bool:
+        """Append rows added since the last read. Returns False if the replica no longer lines up."""
+        # Start at the last known row (sheet row len(rows) + 1) so it can be checked as an anchor
+        anchor = len(self._rows) + 1
+        last_column = column_letter(max(len(self.headers), 1))
+        values = worksheet.get(f'A{anchor}:{last_column}')
+        self.stats_counters['tail_reads'] += 1
+        self.stats_counters['rows_fetched'] += len(values)
+        if not values:
+            return False
+        expected = self._rows[-1] if self._rows else self.headers
+        if self._normalize(values[0]) != expected:
+            self.stats_counters['anchor_mismatches'] += 1
+            return False
+        new_rows = [self._normalize(row) for row in values[1:]]
+        self._rows.extend(new_rows)
+        self._records.extend(self._parse(row) for row in new_rows)
+        return True
+
+    def sync(self, worksheet, version: Optional[str]) -> List[Dict]:
+        """
+        Bring the replica up to date and return its records.
+
+        Args:
+            worksheet: gspread Worksheet to read
+            version (Optional[str]): Current dataset version; None forces a read
+
+        Returns:
+            List[Dict]: Parsed records in sheet order
+        """
+        with self._lock:
+            now = time.monotonic()
+            full_due = self._full_at is None or now - self._full_at >= self.full_sync_seconds
+            if full_due:
+                self._full_read(worksheet)
+            elif version is not None and version == self._version:
+                self.stats_counters['unchanged'] += 1
+            elif not self._tail_read(worksheet):
+                self._full_read(worksheet)
+            self._version = version
+            # Copies: callers annotate records (e.g. with coordinates)
+            return [dict(record) for record in self._records if record is not None]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return dict(self.stats_counters, rows=len(self._rows),
+                        full_sync_seconds=self.full_sync_seconds)
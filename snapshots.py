@@ -0,0 +1,409 @@
+"""
+Warm-start snapshots of in-memory caches.
+
+A restarted worker otherwise begins with an empty geocode memory and
+recomputes every match from scratch. A Snapshotter periodically writes its
+registered sections (the geocode cache, recent match results) to one file
+per backend:
+
+    header    magic, format version, table crc32, table length, created_at
+    table     JSON: backend, pid, {section: [offset, length, raw length, crc32]}
+    sections  zlib-compressed JSON, one after another
+
+The file is replaced atomically, memory-mapped on load and checked section by
+section, so a torn or corrupt snapshot is skipped rather than half-restored.
+Restored data is validated against the live backend rather than trusted:
+geocodes keep their update times and never overwrite newer SQLite rows, and
+match results are keyed by a digest of the matcher's inputs, so they are
+reused only while the current donors, NGOs and coordinates are identical.
+
+    python snapshots.py app_sheets_demo              # inspect a backend's snapshot
+    python snapshots.py app --dir /var/lib/food/snapshots
+"""
+
+import argparse
+import atexit
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from travel_time import travel_table_key
+
+SNAPSHOT_DIR = os.getenv(
+    'SNAPSHOT_DIR',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'snapshots')
+)
+
+# Restore at startup and write snapshots while running
+SNAPSHOT_ENABLED = os.getenv('SNAPSHOT_ENABLED', '1') == '1'
+
+# Seconds between snapshots (one more is written at exit)
+SNAPSHOT_INTERVAL_SECONDS = float(os.getenv('SNAPSHOT_INTERVAL_SECONDS', '300'))
+
+# Snapshots older than this are ignored at startup (0 accepts any age)
+SNAPSHOT_MAX_AGE_SECONDS = float(os.getenv('SNAPSHOT_MAX_AGE_SECONDS', str(7 * 24 * 3600)))
+
+# Distinct match inputs whose results are kept (and snapshotted)
+SNAPSHOT_MATCH_ENTRIES = int(os.getenv('SNAPSHOT_MATCH_ENTRIES', '4'))
+
+# zlib level: 1 is fastest, 9 smallest
+SNAPSHOT_COMPRESSION_LEVEL = int(os.getenv('SNAPSHOT_COMPRESSION_LEVEL', '1'))
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+_MAGIC = b'WARMSNAP'
+_HEADER = struct.Struct('<8sIIId')  # magic, format version, table crc32, table bytes, created_at
+
+# Settings that change match results; part of every match digest
+_MATCH_CONFIG_PREFIXES = ('MATCH_', 'TRAVEL_')
+
+# (dump, restore): dump returns JSON-serializable data, restore loads it and returns items restored
+Section = Tuple[Callable[[], Any], Callable[[Any], int]]
+
+
+class SnapshotError(Exception):
+    """A snapshot file is missing, from another backend or format, or corrupt."""
+
+
+class Snapshot:
+    """A memory-mapped snapshot file; sections are checked and decoded on read."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            try:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                raise SnapshotError('empty snapshot file')
+        try:
+            if len(self._map) < _HEADER.size:
+                raise SnapshotError('truncated header')
+            magic, version, table_crc, table_bytes, self.created_at = _HEADER.unpack_from(self._map, 0)
+            if magic != _MAGIC:
+                raise SnapshotError('not a snapshot file')
+            if version != SNAPSHOT_FORMAT_VERSION:
+                raise SnapshotError(f'format version {version}, expected {SNAPSHOT_FORMAT_VERSION}')
+            table = self._map[_HEADER.size:_HEADER.size + table_bytes]
+            if len(table) != table_bytes or zlib.crc32(table) != table_crc:
+                raise SnapshotError('section table checksum mismatch')
+            self.table = json.loads(table)
+            self._data_start = _HEADER.size + table_bytes
+        except Exception:
+            self._map.close()
+            raise
+
+    @property
+    def backend(self) -> str:
+        return self.table['backend']
+
+    @property
+    def sections(self) -> Dict[str, List[int]]:
+        return self.table['sections']
+
+    def read(self, name: str) -> Any:
+        """Decode one section; raises SnapshotError if it fails its checksum."""
+        offset, length, raw, crc = self.sections[name]
+        start = self._data_start + offset
+        payload = self._map[start:start + length]
+        if len(payload) != length or zlib.crc32(payload) != crc:
+            raise SnapshotError(f'section {name!r} checksum mismatch')
+        data = zlib.decompress(payload)
+        if len(data) != raw:
+            raise SnapshotError(f'section {name!r} length mismatch')
+        return json.loads(data)
+
+    def close(self) -> None:
+        self._map.close()
+
+    def __enter__(self) -> 'Snapshot':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class Snapshotter:
+    """
+    Periodic snapshots of named cache sections for one backend.
+
+    Args:
+        backend (str): Backend module name; also the snapshot file name
+        sections (Dict[str, Section]): (dump, restore) per section
+        directory (str): Folder holding the snapshot files
+        enabled (bool): When False, restore(), save() and start() do nothing
+    """
+
+    def __init__(self, backend: str, sections: Dict[str, Section], directory: str = SNAPSHOT_DIR,
+                 enabled: bool = SNAPSHOT_ENABLED, interval: float = SNAPSHOT_INTERVAL_SECONDS,
+                 max_age: float = SNAPSHOT_MAX_AGE_SECONDS):
+        self.backend = backend
+        self.path = os.path.join(directory, f'{backend}.snap')
+        self.sections = sections
+        self.enabled = enabled
+        self.interval = interval
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.counters = {'saves': 0, 'save_errors': 0, 'last_save': None, 'last_save_ms': None,
+                         'last_bytes': None, 'restored': {}, 'restore_ms': None, 'restore_error': None}
+
+    def save(self) -> Optional[int]:
+        """Write a snapshot of every section. Returns bytes written, or None if disabled or failed."""
+        if not self.enabled:
+            return None
+        started = time.perf_counter()
+        try:
+            table, payloads, offset = {}, [], 0
+            for name, (dump, _) in self.sections.items():
+                raw = json.dumps(dump(), separators=(',', ':')).encode('utf-8')
+                payload = zlib.compress(raw, SNAPSHOT_COMPRESSION_LEVEL)
+                table[name] = [offset, len(payload), len(raw), zlib.crc32(payload)]
+                payloads.append(payload)
+                offset += len(payload)
+            table_bytes = json.dumps({'backend': self.backend, 'pid': os.getpid(), 'sections': table}).encode('utf-8')
+            header = _HEADER.pack(_MAGIC, SNAPSHOT_FORMAT_VERSION, zlib.crc32(table_bytes), len(table_bytes), time.time())
+
+            # Several workers may snapshot at once; each writes its own temp file and the last rename wins
+            with self._lock:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+                temp_path = f'{self.path}.{os.getpid()}.tmp'
+                with open(temp_path, 'wb') as f:
+                    f.write(header)
+                    f.write(table_bytes)
+                    for payload in payloads:
+                        f.write(payload)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(temp_path, self.path)
+        except Exception as e:
+            self.counters['save_errors'] += 1
+            print(f"❌ Error writing snapshot {self.path}: {e}")
+            return None
+
+        written = len(header) + len(table_bytes) + offset
+        self.counters.update(saves=self.counters['saves'] + 1, last_save=time.time(),
+                             last_save_ms=round((time.perf_counter() - started) * 1000, 2), last_bytes=written)
+        return written
+
+    def load(self) -> Snapshot:
+        """Open this backend's snapshot; raises SnapshotError if it can't be used."""
+        try:
+            snapshot = Snapshot(self.path)
+        except FileNotFoundError:
+            raise SnapshotError('no snapshot yet')
+        if snapshot.backend != self.backend:
+            snapshot.close()
+            raise SnapshotError(f'snapshot is from {snapshot.backend}, not {self.backend}')
+        if self.max_age and time.time() - snapshot.created_at > self.max_age:
+            snapshot.close()
+            raise SnapshotError('snapshot is older than SNAPSHOT_MAX_AGE_SECONDS')
+        return snapshot
+
+    def restore(self) -> Dict[str, int]:
+        """
+        Load every known section from the snapshot into its cache.
+
+        Returns:
+            Dict[str, int]: Items restored per section; empty if there was no usable snapshot
+        """
+        if not self.enabled:
+            return {}
+        started = time.perf_counter()
+        restored = {}
+        try:
+            with self.load() as snapshot:
+                for name, (_, load_section) in self.sections.items():
+                    if name not in snapshot.sections:
+                        continue
+                    try:
+                        restored[name] = load_section(snapshot.read(name))
+                    except Exception as e:
+                        # One bad section doesn't stop the others
+                        print(f"❌ Skipped snapshot section {name}: {e}")
+                        self.counters['restore_error'] = str(e)
+        except SnapshotError as e:
+            self.counters['restore_error'] = str(e)
+            return {}
+        except Exception as e:
+            self.counters['restore_error'] = str(e)
+            print(f"❌ Error reading snapshot {self.path}: {e}")
+            return {}
+
+        self.counters.update(restored=restored, restore_ms=round((time.perf_counter() - started) * 1000, 2))
+        print(f"♻️ Restored snapshot {self.path}: "
+              + ', '.join(f'{count} {name}' for name, count in restored.items()))
+        return restored
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.save()
+
+    def start(self) -> None:
+        """Snapshot every interval on a daemon thread, and once more at exit."""
+        # Called on every request; the lock is only taken until the thread exists
+        if not self.enabled or self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name=f'snapshot-{self.backend}', daemon=True)
+            self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self) -> None:
+        """Stop the periodic thread and write a final snapshot."""
+        self._stop.set()
+        self.save()
+
+    def stats(self) -> Dict:
+        stats = dict(self.counters)
+        stats.update(path=self.path, enabled=self.enabled, interval_seconds=self.interval,
+                     running=self._thread is not None and self._thread.is_alive())
+        return stats
+
+
+def _match_config() -> List[Tuple[str, str]]:
+    return sorted((key, value) for key, value in os.environ.items() if key.startswith(_MATCH_CONFIG_PREFIXES))
+
+
+def match_inputs_digest(donors: Sequence[Dict], donor_coords: Sequence[Tuple[float, float]],
+                        ngo_locations: Sequence[Dict]) -> str:
+    """
+    Order-independent digest of everything the matcher reads.
+
+    Args:
+        donors (Sequence[Dict]): Located donors (only their ID and food type matter)
+        donor_coords (Sequence[Tuple[float, float]]): Coordinates per donor
+        ngo_locations (Sequence[Dict]): Geocoded NGOs with 'coordinates'
+
+    Returns:
+        str: Hex digest; equal digests give equal match results (the travel-time
+        table in use is part of the inputs)
+    """
+    # Store iteration order can differ between processes, so entries are sorted
+    donor_keys = sorted(repr((str(donor.get('id')), donor.get('foodType', ''), tuple(coords)))
+                        for donor, coords in zip(donors, donor_coords))
+    ngo_keys = sorted(repr((str(ngo.get('id')), ngo.get('foodNeeded', ''), tuple(ngo['coordinates'])))
+                      for ngo in ngo_locations)
+    digest = hashlib.sha1(repr(_match_config()).encode('utf-8'))
+    # Replacing the travel-time table changes results without touching the env
+    digest.update(repr(travel_table_key()).encode('utf-8'))
+    for key in donor_keys:
+        digest.update(key.encode('utf-8'))
+    digest.update(b'|')
+    for key in ngo_keys:
+        digest.update(key.encode('utf-8'))
+    return digest.hexdigest()
+
+
+MatchResults = Tuple[List[Optional[Tuple[int, float]]], List[Optional[float]]]
+
+# donor ID -> [NGO ID, distance km, travel minutes], or None if unmatched
+StoredMatches = Dict[str, Optional[List]]
+
+
+class MatchMemo:
+    """
+    Recent match results keyed by a digest of their inputs.
+
+    A version bump that leaves the inputs unchanged (a listener restart, a
+    Sheets edit elsewhere, a process restart with a restored snapshot) then
+    skips the matching itself. Results are kept by donor and NGO ID, not by
+    list position, so they apply whatever order the records arrive in.
+    """
+
+    def __init__(self, max_entries: int = SNAPSHOT_MATCH_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, StoredMatches]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def match(self, donors: Sequence[Dict], donor_coords: Sequence[Tuple[float, float]],
+              ngo_locations: Sequence[Dict], compute: Callable[[], MatchResults]) -> MatchResults:
+        """
+        Results for these inputs, from memory or from compute().
+
+        Returns:
+            MatchResults: ((NGO position, distance km) per donor, travel minutes per donor),
+            positions referring to this call's ngo_locations
+        """
+        key = match_inputs_digest(donors, donor_coords, ngo_locations)
+        with self._lock:
+            stored = self._entries.get(key)
+            if stored is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if stored is not None:
+            positions = {str(ngo.get('id')): position for position, ngo in enumerate(ngo_locations)}
+            nearest, minutes = [], []
+            for donor in donors:
+                match = stored.get(str(donor.get('id')))
+                nearest.append((positions[match[0]], match[1]) if match else None)
+                minutes.append(match[2] if match else None)
+            return nearest, minutes
+
+        nearest, minutes = compute()
+        self._put(key, {
+            str(donor.get('id')): [str(ngo_locations[result[0]].get('id')), result[1], travel] if result else None
+            for donor, result, travel in zip(donors, nearest, minutes)
+        })
+        return nearest, minutes
+
+    def _put(self, key: str, stored: StoredMatches) -> None:
+        with self._lock:
+            self._entries[key] = stored
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def dump(self) -> List:
+        """Entries as [digest, {donor ID: [NGO ID, distance km, travel minutes]}], oldest first."""
+        with self._lock:
+            return [[key, stored] for key, stored in self._entries.items()]
+
+    def restore(self, entries: List) -> int:
+        """Load dumped entries. Returns entries loaded."""
+        for key, stored in entries:
+            self._put(key, stored)
+        return len(entries)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'max_entries': self.max_entries,
+                    'hits': self.hits, 'misses': self.misses}
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Inspect a backend's warm-start snapshot.")
+    parser.add_argument('backend', help='Backend module name, e.g. app_sheets')
+    parser.add_argument('--dir', default=SNAPSHOT_DIR, help='Snapshot directory')
+    args = parser.parse_args(argv)
+
+    path = os.path.join(args.dir, f'{args.backend}.snap')
+    try:
+        with Snapshot(path) as snapshot:
+            print(json.dumps({
+                'path': path,
+                'backend': snapshot.backend,
+                'pid': snapshot.table.get('pid'),
+                'age_seconds': round(time.time() - snapshot.created_at, 1),
+                'sections': {name: {'bytes': length, 'raw_bytes': raw, 'items': len(snapshot.read(name))}
+                             for name, (_, length, raw, _) in snapshot.sections.items()}
+            }, indent=2))
+    except (OSError, SnapshotError) as e:
+        raise SystemExit(f"❌ {path}: {e}")
+
+
+if __name__ == '__main__':
+    main()
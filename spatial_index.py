@@ -0,0 +1,334 @@
+"""
+Grid spatial index over NGO coordinates for nearest-NGO queries.
+
+NGO points are bucketed into fixed-size lat/lon cells and stored in a flat
+binary file that is memory-mapped for reads. The file name carries a content
+hash of the NGO set, so a file is never overwritten with different NGOs;
+server workers built from the same NGO set share one file through the page
+cache, so N workers don't each hold (or rebuild) their own copy. Queries expand ring by ring around the
+donor's cell and stop once no point outside the searched block can beat the
+best exact distance found so far.
+"""
+
+import bisect
+import hashlib
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from geopy.distance import geodesic
+
+# Base path of the index files; each NGO set is written to <base>.<content hash>
+NGO_INDEX_PATH = os.getenv(
+    'NGO_INDEX_PATH',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'ngo_index.bin')
+)
+
+# Index files for other NGO sets are deleted once unused for this long
+NGO_INDEX_RETENTION_SECONDS = float(os.getenv('NGO_INDEX_RETENTION_SECONDS', '3600'))
+
+# Cell size in degrees (~28 km of latitude)
+CELL_DEGREES = 0.25
+
+# Below this many points a plain scan is faster than the grid
+BRUTE_FORCE_THRESHOLD = 32
+
+# Ring search gives up and scans everything beyond this radius (in cells)
+MAX_RINGS = 64
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Spherical lower bounds are shrunk by this factor to stay below WGS-84 geodesics
+BOUND_SAFETY = 0.99
+
+_MAGIC = b'NGOIDX01'
+_HEADER = struct.Struct('<8s32sdqq')  # magic, key, cell_degrees, n_points, n_cells
+
+Coordinates = Tuple[float, float]
+
+
+def index_key(ngo_locations: List[Dict]) -> str:
+    """Content hash of the (id, coordinates) pairs an index is built from."""
+    digest = hashlib.sha256()
+    for ngo in ngo_locations:
+        lat, lon = ngo['coordinates']
+        digest.update(f"{ngo['id']}|{lat!r}|{lon!r}\n".encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+def geodesic_km(coord1: Coordinates, coord2: Coordinates) -> float:
+    """Same distance the backends' calculate_distance uses."""
+    return geodesic(coord1, coord2).kilometers
+
+
+def _n_lon_cells(cell_degrees: float) -> int:
+    return int(math.ceil(360.0 / cell_degrees))
+
+
+def _cell_of(lat: float, lon: float, cell_degrees: float) -> Tuple[int, int]:
+    row = int(math.floor((lat + 90.0) / cell_degrees))
+    col = int(math.floor((lon + 180.0) / cell_degrees)) % _n_lon_cells(cell_degrees)
+    return row, col
+
+
+def block_bound_km(lat: float, lon: float, south: float, north: float,
+                   west: float, east: float) -> float:
+    """
+    Lower bound on the distance from (lat, lon), inside a lat/lon block, to
+    any point outside it. A block spanning 360 degrees of longitude only has
+    north and south edges.
+    """
+    # Parallels: the meridian arc is the shortest path to another latitude
+    bound = math.radians(min(lat - south, north - lat))
+    if east - west < 360.0:
+        d_lon = math.radians(min(lon - west, east - lon))
+        if d_lon < math.pi / 2:
+            # Meridians are great circles: perpendicular distance has a closed form
+            bound = min(bound, math.asin(math.cos(math.radians(lat)) * math.sin(d_lon)))
+    return max(0.0, bound) * EARTH_RADIUS_KM * BOUND_SAFETY
+
+
+class NgoSpatialIndex:
+    """
+    Read-only grid index over NGO coordinates.
+
+    Positions returned by queries refer to the order of the NGO list the
+    index was built from.
+    """
+
+    def __init__(self, key: str, cell_degrees: float, cell_keys: Sequence[int],
+                 cell_starts: Sequence[int], lats: Sequence[float], lons: Sequence[float],
+                 positions: Sequence[int], buffer=None, path: Optional[str] = None):
+        self.key = key
+        # Set for memory-mapped indexes; other processes can map the same file
+        self.path = path
+        self.cell_degrees = cell_degrees
+        self.n_lon = _n_lon_cells(cell_degrees)
+        self._cell_keys = cell_keys
+        self._cell_starts = cell_starts
+        self._lats = lats
+        self._lons = lons
+        self._positions = positions
+        self._buffer = buffer
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @classmethod
+    def build(cls, ngo_locations: List[Dict], cell_degrees: float = CELL_DEGREES) -> 'NgoSpatialIndex':
+        """Build an in-memory index from NGOs that carry 'coordinates'."""
+        buckets: Dict[int, List[int]] = {}
+        n_lon = _n_lon_cells(cell_degrees)
+        for position, ngo in enumerate(ngo_locations):
+            row, col = _cell_of(ngo['coordinates'][0], ngo['coordinates'][1], cell_degrees)
+            buckets.setdefault(row * n_lon + col, []).append(position)
+
+        cell_keys, cell_starts, order = [], [], []
+        for cell in sorted(buckets):
+            cell_keys.append(cell)
+            cell_starts.append(len(order))
+            order.extend(buckets[cell])
+        cell_starts.append(len(order))
+
+        return cls(
+            index_key(ngo_locations), cell_degrees, cell_keys, cell_starts,
+            [ngo_locations[p]['coordinates'][0] for p in order],
+            [ngo_locations[p]['coordinates'][1] for p in order],
+            order
+        )
+
+    def save(self, path: str) -> None:
+        """Write the index atomically (temp file + rename) so readers never see a partial file."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        n_points, n_cells = len(self._positions), len(self._cell_keys)
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self.key.encode('ascii'), self.cell_degrees, n_points, n_cells))
+            f.write(struct.pack(f'<{n_cells}q', *self._cell_keys))
+            f.write(struct.pack(f'<{n_cells + 1}q', *self._cell_starts))
+            f.write(struct.pack(f'<{n_points}d', *self._lats))
+            f.write(struct.pack(f'<{n_points}d', *self._lons))
+            f.write(struct.pack(f'<{n_points}q', *self._positions))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['NgoSpatialIndex']:
+        """Memory-map an index file; returns None if missing or unreadable."""
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(buffer) < _HEADER.size:
+            return None
+        magic, key, cell_degrees, n_points, n_cells = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC:
+            return None
+
+        view = memoryview(buffer)
+        offset = _HEADER.size
+
+        def take(count: int, fmt: str):
+            nonlocal offset
+            size = count * 8
+            part = view[offset:offset + size].cast(fmt)
+            offset += size
+            return part
+
+        cell_keys = take(n_cells, 'q')
+        cell_starts = take(n_cells + 1, 'q')
+        lats = take(n_points, 'd')
+        lons = take(n_points, 'd')
+        positions = take(n_points, 'q')
+        return cls(key.decode('ascii'), cell_degrees, cell_keys, cell_starts,
+                   lats, lons, positions, buffer=buffer, path=path)
+
+    def _cell_range(self, row: int, col: int) -> range:
+        cell = row * self.n_lon + col
+        i = bisect.bisect_left(self._cell_keys, cell)
+        if i < len(self._cell_keys) and self._cell_keys[i] == cell:
+            return range(self._cell_starts[i], self._cell_starts[i + 1])
+        return range(0)
+
+    def _outside_bound_km(self, lat: float, lon: float, row: int, col: int, rings: int) -> float:
+        """Lower bound on the distance from (lat, lon) to any point outside the searched block."""
+        south = (row - rings) * self.cell_degrees - 90.0
+        north = (row + rings + 1) * self.cell_degrees - 90.0
+        if (2 * rings + 1) < self.n_lon:
+            west = (col - rings) * self.cell_degrees - 180.0
+            east = (col + rings + 1) * self.cell_degrees - 180.0
+        else:
+            west, east = -180.0, 180.0
+        return block_bound_km(lat, lon, south, north, west, east)
+
+    def nearest(self, coords: Coordinates,
+                distance: Callable[[Coordinates, Coordinates], float]) -> Optional[Tuple[int, float]]:
+        """
+        Find the nearest indexed point.
+
+        Args:
+            coords (Coordinates): Query (latitude, longitude)
+            distance (Callable): Exact distance function in kilometers
+
+        Returns:
+            Optional[Tuple[int, float]]: (position in the source NGO list, distance_km);
+            ties resolve to the lowest position, as a linear scan would
+        """
+        if not len(self._positions):
+            return None
+        if len(self._positions) <= BRUTE_FORCE_THRESHOLD:
+            return self._scan(range(len(self._positions)), coords, distance)
+
+        lat, lon = coords[0], ((coords[1] + 180.0) % 360.0) - 180.0
+        row, col = _cell_of(lat, lon, self.cell_degrees)
+        best: Optional[Tuple[float, int]] = None
+        for rings in range(MAX_RINGS + 1):
+            for r in range(row - rings, row + rings + 1):
+                # Top and bottom rows of the ring are full; the rows between only add their edges
+                if abs(r - row) == rings:
+                    ring_cols = range(col - rings, col + rings + 1)
+                else:
+                    ring_cols = (col - rings, col + rings)
+                for c in set(cc % self.n_lon for cc in ring_cols):
+                    for i in self._cell_range(r, c):
+                        d = distance(coords, (self._lats[i], self._lons[i]))
+                        candidate = (d, self._positions[i])
+                        if best is None or candidate < best:
+                            best = candidate
+            if best is not None and best[0] <= self._outside_bound_km(lat, lon, row, col, rings):
+                return best[1], best[0]
+        # Sparse or polar neighbourhood: fall back to an exact scan
+        return self._scan(range(len(self._positions)), coords, distance)
+
+    def _scan(self, indices, coords: Coordinates, distance) -> Tuple[int, float]:
+        best = None
+        for i in indices:
+            candidate = (distance(coords, (self._lats[i], self._lons[i])), self._positions[i])
+            if best is None or candidate < best:
+                best = candidate
+        return best[1], best[0]
+
+
+_loaded: Dict[str, NgoSpatialIndex] = {}
+_touched: Dict[str, float] = {}
+_loaded_lock = threading.Lock()
+
+
+def index_file_path(base_path: str, key: str) -> str:
+    """Immutable file for the NGO set with this content key."""
+    return f'{base_path}.{key}'
+
+
+def _prune_index_files(base_path: str, keep: str) -> None:
+    """Delete index files for other NGO sets that haven't been touched recently."""
+    directory = os.path.dirname(os.path.abspath(base_path))
+    pattern = re.compile(re.escape(os.path.basename(base_path)) + r'\.[0-9a-f]{32}')
+    cutoff = time.time() - NGO_INDEX_RETENTION_SECONDS
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return
+    for name in names:
+        path = os.path.join(directory, name)
+        if not pattern.fullmatch(name) or path == os.path.abspath(keep):
+            continue
+        try:
+            # Processes that already mapped the file keep their pages after unlink
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _keep_alive(index: NgoSpatialIndex) -> None:
+    """Refresh the mtime of an index file in use so other processes don't prune it."""
+    now = time.time()
+    if index.path is None or now - _touched.get(index.path, 0.0) < NGO_INDEX_RETENTION_SECONDS / 4:
+        return
+    _touched[index.path] = now
+    try:
+        os.utime(index.path)
+    except OSError:
+        pass
+
+
+def get_ngo_index(ngo_locations: List[Dict], path: str = NGO_INDEX_PATH) -> NgoSpatialIndex:
+    """
+    Return an index for these NGOs, reusing a shared on-disk copy when possible.
+
+    The file is named by a content hash of the NGO IDs and coordinates
+    (index_file_path), so it is written once and never replaced with another
+    NGO set; a worker that finds it maps it instead of rebuilding.
+
+    Args:
+        ngo_locations (List[Dict]): NGOs with 'coordinates'
+        path (str): Base path; one index is remembered in memory per base path
+    """
+    key = index_key(ngo_locations)
+    with _loaded_lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached.key == key:
+            _keep_alive(cached)
+            return cached
+
+    file_path = index_file_path(path, key)
+    index = NgoSpatialIndex.load(file_path)
+    if index is None or index.key != key:
+        built = NgoSpatialIndex.build(ngo_locations)
+        try:
+            built.save(file_path)
+            index = NgoSpatialIndex.load(file_path) or built
+            _prune_index_files(path, file_path)
+        except OSError as e:
+            print(f"Error saving NGO index: {e}")
+            index = built
+
+    with _loaded_lock:
+        _loaded[path] = index
+        _keep_alive(index)
+    return index
@@ -0,0 +1,8 @@
+import os
+import sys
+import tempfile
+
+# Backends write their local state (job queue, caches, snapshots) under BACKEND_DATA_DIR at import time
+os.environ.setdefault('BACKEND_DATA_DIR', tempfile.mkdtemp(prefix='backend-tests-'))
+os.environ.setdefault('PREWARM_CLIENTS', '0')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from flask import Flask, Response, jsonify
+
+from admission import HIGH, LOW, AdmissionController, Gate, admitted
+
+
+def _controller(max_inflight=4, queue_timeout=0.05):
+    controller = AdmissionController(max_inflight=max_inflight, queue_timeout=queue_timeout, enabled=True)
+    controller.add_gate('matches', 2, 1, LOW)
+    controller.add_gate('writes', 4, 4, HIGH)
+    return controller
+
+
+def test_full_queue_sheds_and_waiting_times_out():
+    controller = _controller(queue_timeout=0.05)
+    assert controller.acquire('matches') and controller.acquire('matches')
+    # One waiter fits in the queue and times out; a second one is shed at once
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(controller.acquire('matches')))
+    waiter.start()
+    while controller.gates['matches'].waiting == 0 and waiter.is_alive():
+        time.sleep(0.001)
+    assert controller.acquire('matches') is False
+    waiter.join()
+    assert results == [False]
+    counters = controller.stats()['gates']['matches']
+    assert counters['shed'] == 2 and counters['timed_out'] == 1
+
+
+def test_queued_request_is_admitted_on_release():
+    controller = _controller(queue_timeout=5)
+    controller.acquire('matches')
+    controller.acquire('matches')
+    results = []
+    waiter = threading.Thread(target=lambda: results.append(controller.acquire('matches')))
+    waiter.start()
+    while controller.gates['matches'].waiting == 0:
+        time.sleep(0.001)
+    controller.release('matches', 0.01)
+    waiter.join()
+    assert results == [True]
+
+
+def test_low_priority_gates_leave_room_for_writes():
+    controller = _controller(max_inflight=4)
+    controller.gates['matches'].concurrency = 4
+    assert controller.acquire('matches') and controller.acquire('matches')
+    # Matching may only fill half the in-flight budget
+    assert controller.acquire('matches') is False
+    assert controller.acquire('writes') and controller.acquire('writes')
+    assert controller.stats()['inflight'] == 4
+
+
+def test_retry_after_estimate():
+    gate = Gate('reads', concurrency=2, queue=4, priority=HIGH)
+    assert gate.retry_after() == 1
+    gate.observe(3.0)
+    gate.waiting = 3
+    assert gate.retry_after() == 6
+
+
+def test_shed_request_gets_stale_body_or_429():
+    controller = _controller()
+    controller.acquire('matches')
+    controller.acquire('matches')
+    controller.gates['matches'].queue = 0
+    app = Flask(__name__)
+    stale = []
+
+    @app.route('/matches')
+    @admitted(controller, 'matches', lambda: stale[0] if stale else None)
+    def matches():
+        return jsonify({'success': True})
+
+    response = app.test_client().get('/matches')
+    assert response.status_code == 429
+    assert int(response.headers['Retry-After']) >= 1
+    stale.append(Response('{"cached": true}', mimetype='application/json'))
+    assert app.test_client().get('/matches').get_json() == {'cached': True}
+    assert controller.stats()['gates']['matches']['served_stale'] == 1
+
+
+def test_streamed_responses_hold_their_slot_until_closed():
+    controller = _controller()
+    app = Flask(__name__)
+
+    @app.route('/stream')
+    @admitted(controller, 'writes')
+    def stream():
+        return Response(iter(['a', 'b']), mimetype='text/plain')
+
+    response = app.test_client().get('/stream', buffered=False)
+    assert controller.gates['writes'].active == 1
+    assert response.get_data() == b'ab'
+    response.close()
+    assert controller.gates['writes'].active == 0
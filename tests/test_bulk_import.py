@@ -0,0 +1,74 @@
+import io
+import json
+
+import pytest
+
+import fakes
+from bulk_import import ImportCheckpoint, run_import
+from geocode_cache import GeocodeCache
+
+
+def _rows(count, start=0):
+    return ''.join(json.dumps({'id': f'src{i}', 'foodType': 'Rice', 'quantity': '5 kg',
+                               'expiryTime': 24, 'location': f'Street {i % 3}'}) + '\n'
+                   for i in range(start, start + count))
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    checkpoint = ImportCheckpoint(str(tmp_path / 'import.checkpoint.db'))
+    yield checkpoint
+    checkpoint.close()
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeocodeCache(str(tmp_path / 'geocode.db'))
+
+
+def _geocode(location):
+    return (40.0, -74.0)
+
+
+def test_duplicate_ids_are_inserted_once(checkpoint, cache):
+    written = []
+    text = _rows(4) + _rows(2) + json.dumps({'foodType': 'Rice'}) + '\n'
+    state = run_import(io.StringIO(text), 'donors', 'ndjson', lambda b: written.extend(b) or len(b),
+                       cache, _geocode, checkpoint, batch_size=3)
+    assert [record['id'] for record in written] == ['src0', 'src1', 'src2', 'src3']
+    assert (state['inserted'], state['duplicates'], state['invalid']) == (4, 2, 1)
+
+
+def test_resume_skips_rows_the_interrupted_run_appended(checkpoint, cache):
+    sheet = []
+
+    def crash_on_second_batch(batch):
+        sheet.extend(batch)
+        if len(sheet) > 2:
+            raise RuntimeError('quota exceeded')
+        return len(batch)
+
+    with pytest.raises(RuntimeError):
+        run_import(io.StringIO(_rows(6)), 'donors', 'ndjson', crash_on_second_batch,
+                   cache, _geocode, checkpoint, batch_size=2)
+    assert checkpoint.get_state()['rows_read'] == 2
+
+    state = run_import(io.StringIO(_rows(6)), 'donors', 'ndjson', lambda b: sheet.extend(b) or len(b),
+                       cache, _geocode, checkpoint, batch_size=2,
+                       existing_ids=lambda: {record['id'] for record in sheet})
+    assert [record['id'] for record in sheet] == [f'src{i}' for i in range(6)]
+    assert state['inserted'] == 6
+
+
+def test_batch_size_below_one_is_rejected(checkpoint, cache):
+    with pytest.raises(ValueError):
+        run_import(io.StringIO(_rows(1)), 'donors', 'ndjson', len, cache, _geocode, checkpoint, batch_size=0)
+
+
+def test_upload_rejects_batch_size_below_one():
+    import app_sheets_demo
+    fakes.install(app_sheets_demo, fakes.FaultProfile(), fakes.FaultProfile())
+    client = app_sheets_demo.app.test_client()
+    response = client.post('/api/import/donors?format=ndjson&batch_size=0', data=_rows(1))
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
@@ -0,0 +1,52 @@
+import pytest
+
+import fakes
+from client_coordinates import (accept_client_coordinates, checked_stored_coordinates, coordinate_fields,
+                                parse_client_coordinates, stored_coordinates)
+from geocode_cache import GeocodeCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = GeocodeCache(str(tmp_path / 'geocode.db'))
+    cache.put('Times Square', (40.758, -73.9855))
+    return cache
+
+
+@pytest.mark.parametrize('lat, lon', [
+    (40.7, None), ('abc', -74.0), (91, 0.5), (40.0, 181), (float('nan'), 1.0), (0, 0)
+])
+def test_malformed_coordinates_are_rejected(lat, lon):
+    with pytest.raises(ValueError):
+        parse_client_coordinates({'lat': lat, 'lon': lon})
+
+
+def test_absent_or_blank_coordinates_are_none():
+    assert parse_client_coordinates({}) is None
+    assert stored_coordinates({'lat': '', 'lon': ''}) is None
+    assert stored_coordinates({'lat': 'x', 'lon': '1'}) is None
+    assert coordinate_fields('40.5', '-74') == {'lat': 40.5, 'lon': -74.0}
+    assert coordinate_fields('', '') == {}
+
+
+def test_plausibility_check_uses_only_the_cache(cache):
+    near = {'location': 'Times Square', 'lat': 40.76, 'lon': -73.99}
+    far = {'location': 'Times Square', 'lat': 34.05, 'lon': -118.24}
+    unknown = {'location': 'Nowhere Yet', 'lat': 34.05, 'lon': -118.24}
+    assert accept_client_coordinates(near, cache) == (40.76, -73.99)
+    assert accept_client_coordinates(far, cache) is None
+    assert accept_client_coordinates(unknown, cache) == (34.05, -118.24)
+    assert cache.get('Nowhere Yet') is None
+    assert checked_stored_coordinates(far, cache) is None
+    assert checked_stored_coordinates(near, cache) == (40.76, -73.99)
+
+
+def test_demo_post_validates_client_coordinates():
+    import app_sheets_demo
+    fakes.install(app_sheets_demo, fakes.FaultProfile(), fakes.FaultProfile())
+    client = app_sheets_demo.app.test_client()
+    payload = {'ngoName': 'Pantry', 'foodNeeded': 'Rice', 'location': 'Somewhere'}
+    response = client.post('/api/ngos', json={**payload, 'lat': 95, 'lon': 10})
+    assert response.status_code == 400
+    assert response.get_json()['success'] is False
+    assert client.post('/api/ngos', json={**payload, 'lat': 40.1, 'lon': -74.2}).status_code in (200, 201)
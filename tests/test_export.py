@@ -0,0 +1,114 @@
+import io
+import time
+
+import pytest
+
+pa = pytest.importorskip('pyarrow')
+import pyarrow.ipc  # noqa: E402
+import pyarrow.parquet  # noqa: E402
+
+import export  # noqa: E402
+from export import ExportState, Exporter, parse_watermark  # noqa: E402
+from geocode_cache import GeocodeCache  # noqa: E402
+from match_log import MatchLog  # noqa: E402
+
+
+@pytest.fixture
+def source(tmp_path):
+    records = {
+        'donors': [
+            {'id': 'd1', 'foodType': 'Rice', 'quantity': '2 x 5kg', 'expiryTime': 24, 'location': 'Cached Street',
+             'timestamp': '2026-01-05T12:00:00+00:00'},
+            {'id': 'd2', 'foodType': 'Bread', 'quantity': '3 loaves', 'expiryTime': 6, 'location': 'Elsewhere',
+             'lat': 40.1, 'lon': -74.1},
+        ],
+        'ngos': [{'id': 'n1', 'ngoName': 'Pantry', 'foodNeeded': 'Rice', 'location': 'Cached Street'}]
+    }
+    cache = GeocodeCache(str(tmp_path / 'geocode.db'))
+    cache.put('Cached Street', (40.7, -74.0))
+    log = MatchLog(str(tmp_path / 'match_log'), enabled=True, retention_days=0)
+    exporter = Exporter(lambda kind: [dict(record) for record in records[kind]], cache, log,
+                        ExportState(str(tmp_path / 'export_state.db')))
+    return exporter, records, log
+
+
+def _rows(exporter, table, since=None):
+    watermark, rows = exporter.rows(table, since)
+    rows = list(rows)
+    time.sleep(0.01)
+    return watermark, {row['id']: row for row in rows} if table in ('donors', 'ngos') else rows
+
+
+def test_full_export_rows(source):
+    exporter, _, _ = source
+    _, donors = _rows(exporter, 'donors')
+    assert (donors['d1']['amount'], donors['d1']['unit']) == (10.0, 'kg')
+    assert (donors['d1']['lat'], donors['d2']['lat']) == (40.7, 40.1)
+    assert donors['d1']['created_at'].year == 2026
+    assert not donors['d1']['deleted']
+
+
+def test_incremental_export_returns_changes_and_tombstones_once(source):
+    exporter, records, _ = source
+    watermark, _ = _rows(exporter, 'donors')
+    watermark, unchanged = _rows(exporter, 'donors', watermark)
+    assert unchanged == {}
+
+    records['donors'][0]['quantity'] = '4 kg'
+    del records['donors'][1]
+    watermark, changed = _rows(exporter, 'donors', watermark)
+    assert changed['d1']['amount'] == 4.0 and not changed['d1']['deleted']
+    assert changed['d2'] == {'id': 'd2', 'changed_at': changed['d2']['changed_at'], 'deleted': True}
+
+    _, after = _rows(exporter, 'donors', watermark)
+    assert after == {}
+
+
+def test_coordinates_and_matches_tables(source, monkeypatch):
+    exporter, _, log = source
+    monkeypatch.setattr(export, 'EXPORT_MATCHES_LAG_SECONDS', 0)
+    log.append({'version': 'v1', 'decisions': [['d1', 'n1', 1.5, None], ['d2', None, None, None]]})
+    time.sleep(0.01)
+    watermark, matches = _rows(exporter, 'matches')
+    assert [(row['donor_id'], row['ngo_id']) for row in matches] == [('d1', 'n1'), ('d2', None)]
+    assert _rows(exporter, 'matches', watermark)[1] == []
+
+    watermark, coordinates = _rows(exporter, 'coordinates')
+    assert [row['location'] for row in coordinates] == ['cached street']
+    assert _rows(exporter, 'coordinates', watermark)[1] == []
+
+
+@pytest.mark.parametrize('fmt', ['arrow', 'parquet'])
+def test_encoded_exports_round_trip(source, tmp_path, fmt):
+    exporter, _, _ = source
+    path = str(tmp_path / f'donors.{fmt}')
+    result = exporter.write('donors', fmt, path)
+    table = pa.parquet.read_table(path) if fmt == 'parquet' else pa.ipc.open_stream(path).read_all()
+    assert result['rows'] == table.num_rows == 2
+    assert table.schema == export.table_schema('donors')
+    assert sorted(table.column('id').to_pylist()) == ['d1', 'd2']
+
+
+def test_bad_table_format_or_watermark(source):
+    exporter, _, _ = source
+    with pytest.raises(ValueError):
+        exporter.rows('users')
+    with pytest.raises(ValueError):
+        exporter.stream('donors', 'csv')
+    with pytest.raises(ValueError):
+        parse_watermark('yesterday')
+    assert parse_watermark('2026-01-05T00:00:00Z') == parse_watermark('1767571200')
+
+
+def test_export_endpoint_streams_arrow():
+    import fakes
+    import app_sheets_demo
+    fakes.install(app_sheets_demo, fakes.FaultProfile(), fakes.FaultProfile())
+    client = app_sheets_demo.app.test_client()
+    response = client.get('/api/export/ngos?format=arrow')
+    assert response.status_code == 200
+    assert float(response.headers['X-Export-Watermark']) > 0
+    assert pa.ipc.open_stream(io.BytesIO(response.data)).read_all().schema == export.table_schema('ngos')
+    # A streamed export holds its admission slot until the response is closed
+    response.close()
+    assert client.get('/api/export/ngos?format=csv').status_code == 400
@@ -0,0 +1,50 @@
+import pytest
+
+from food_taxonomy import CategoryIndex, category_names, filter_ngos_by_needs, food_mask, is_compatible
+
+
+@pytest.mark.parametrize('text, category', [
+    ('Cookies', 'snacks'),
+    ('Veggies', 'produce'),
+    ('Brownies', 'bakery'),
+    ('Pies', 'bakery'),
+    ('Sweets', 'snacks'),
+    ('Groceries', 'canned'),
+    ('Berries', 'fruit'),
+    ('Tomatoes', 'produce'),
+    ('Dry goods', 'canned'),
+    ('Food packets', 'prepared'),
+])
+def test_plural_food_words_are_recognized(text, category):
+    assert category in category_names(food_mask(text))
+
+
+def test_singular_and_plural_give_the_same_mask():
+    for singular, plural in [('cookie', 'cookies'), ('veggie', 'veggies'), ('berry', 'berries'),
+                             ('potato', 'potatoes'), ('egg', 'eggs')]:
+        assert food_mask(singular) == food_mask(plural) != 0
+
+
+def test_unknown_words_have_no_category():
+    assert food_mask('glass') == 0
+
+
+@pytest.mark.parametrize('text', ['Laundry goods', 'Sundry goods', 'Hydry goods'])
+def test_phrases_match_whole_words_only(text):
+    assert 'canned' not in category_names(food_mask(text))
+
+
+def test_category_index_compatibility_is_a_bitwise_and():
+    ngos = [{'foodNeeded': 'Rice, Bread'}, {'foodNeeded': 'Vegetables'}, {'foodNeeded': 'Anything helps'}]
+    index = CategoryIndex([food_mask(ngo['foodNeeded']) for ngo in ngos])
+    assert index.compatible(food_mask('Sourdough bread')) == [0, 2]
+    assert index.compatible(food_mask('Mystery box')) == [0, 1, 2]
+    assert is_compatible(food_mask('Carrots'), food_mask('Vegetables'))
+    assert not is_compatible(food_mask('Carrots'), food_mask('Bread'))
+
+
+def test_needs_query_uses_the_index():
+    ngos = [{'foodNeeded': 'Rice, Bread'}, {'foodNeeded': 'Vegetables'}]
+    assert filter_ngos_by_needs(ngos, 'bread') == [ngos[0]]
+    with pytest.raises(ValueError):
+        filter_ngos_by_needs(ngos, 'spaceships')
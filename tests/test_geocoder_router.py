@@ -0,0 +1,89 @@
+import time
+
+import pytest
+
+import geocoder_router
+from geocoder_router import (CLOSED, HALF_OPEN, OPEN, AllProvidersFailed, CircuitBreaker, GeocoderRouter,
+                             LatencyHistogram, LocalGeocoder, Provider)
+
+TABLE = {'Times Square': (40.758, -73.9855)}
+
+
+def _provider(name, **kwargs):
+    return Provider(name, LocalGeocoder(TABLE, **kwargs))
+
+
+def _failing(name):
+    return Provider(name, LocalGeocoder(TABLE, failure_rate=1.0, seed=0))
+
+
+@pytest.mark.parametrize('hedging', [True, False])
+def test_errors_fail_over_to_the_next_provider(hedging):
+    router = GeocoderRouter([_failing('down'), _provider('up')], hedging=hedging, seed=1)
+    for _ in range(5):
+        assert router.geocode('times square') == (40.758, -73.9855)
+    assert router.stats()['providers']['up']['wins'] == 5
+
+
+def test_no_match_is_none_but_no_answer_raises():
+    assert GeocoderRouter([_provider('up')]).geocode('Atlantis') is None
+    with pytest.raises(AllProvidersFailed):
+        GeocoderRouter([_failing('a'), _failing('b')], hedging=False).geocode('Times Square')
+
+
+def test_slow_primary_is_hedged(monkeypatch):
+    monkeypatch.setattr(geocoder_router, 'GEOCODER_HEDGE_DEFAULT_MS', 20)
+    slow, fast = _provider('slow', latency=0.5), _provider('fast')
+    router = GeocoderRouter([slow, fast], seed=0)
+    # Make the slow provider the only plausible primary
+    monkeypatch.setattr(router, '_ranked', lambda: [slow, fast])
+    started = time.perf_counter()
+    assert router.geocode('Times Square') == (40.758, -73.9855)
+    assert time.perf_counter() - started < 0.4
+    stats = router.stats()
+    assert stats['hedged'] == 1
+    assert stats['providers']['fast']['wins'] == 1
+
+
+def test_breaker_opens_then_allows_one_trial_after_cooldown():
+    breaker = CircuitBreaker(failures=2, cooldown=0.05)
+    breaker.failure()
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.failure()
+    assert breaker.state == OPEN and not breaker.allow()
+    time.sleep(0.06)
+    assert breaker.allow() and breaker.state == HALF_OPEN
+    assert not breaker.allow()
+    breaker.failure()
+    assert breaker.state == OPEN and breaker.trips == 2
+    time.sleep(0.06)
+    assert breaker.allow()
+    breaker.success()
+    assert breaker.state == CLOSED
+
+
+def test_open_breakers_leave_no_provider():
+    provider = _failing('down')
+    provider.breaker = CircuitBreaker(failures=1, cooldown=60)
+    router = GeocoderRouter([provider])
+    with pytest.raises(AllProvidersFailed):
+        router.geocode('Times Square')
+    with pytest.raises(AllProvidersFailed, match='circuit open'):
+        router.geocode('Times Square')
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram()
+    for ms in (5, 30, 30, 200, 20000):
+        histogram.record(ms / 1000)
+    assert histogram.percentile(0.5) == 30
+    buckets = histogram.buckets()
+    assert buckets['le_10ms'] == 1 and buckets['le_50ms'] == 2 and buckets['gt_10000ms'] == 1
+
+
+def test_local_table_from_csv(tmp_path):
+    path = tmp_path / 'table.csv'
+    path.write_text('location,lat,lon\nTimes Square,40.758,-73.9855\nbroken,x,y\n')
+    geocoder = LocalGeocoder.from_csv(str(path))
+    assert geocoder(' times square ') == (40.758, -73.9855)
+    assert geocoder('broken') is None
@@ -0,0 +1,62 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import http_pool
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    failures = []
+
+    def do_GET(self):
+        status = 503 if self.path == '/flaky' and self.failures and self.failures.pop() else 200
+        body = b'{}'
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{httpd.server_address[1]}'
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(http_pool, '_shared_adapter', None)
+    monkeypatch.setattr(http_pool, 'HTTP_BACKOFF_FACTOR', 0)
+    return http_pool
+
+
+def test_sessions_share_kept_alive_connections(server, pool):
+    first = pool.mount_shared_adapter(requests.Session())
+    second = pool.mount_shared_adapter(requests.Session())
+    for session in (first, second, first, second):
+        assert session.get(f'{server}/').status_code == 200
+    stats = pool.http_stats()
+    assert stats['requests'] == 4
+    assert stats['connections_opened'] == 1
+    assert stats['connection_reuse_rate'] == 0.75
+
+
+def test_idempotent_requests_retry_on_unavailable(server, pool):
+    _Handler.failures[:] = [True, True]
+    session = pool.mount_shared_adapter(requests.Session())
+    assert session.get(f'{server}/flaky').status_code == 200
+    assert _Handler.failures == []
+
+
+def test_stats_before_any_request(pool):
+    assert pool.http_stats()['requests'] == 0
@@ -0,0 +1,111 @@
+import threading
+
+import pytest
+from flask import Flask, jsonify
+
+import idempotency
+from idempotency import IdempotencyStore, idempotent
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    store = IdempotencyStore(str(tmp_path / 'idempotency.db'))
+    app.config['store'] = store
+    app.config['created'] = []
+    app.config['release'] = threading.Event()
+    app.config['release'].set()
+
+    @app.route('/items', methods=['POST'])
+    @idempotent(store)
+    def create():
+        app.config['release'].wait(5)
+        body = app.config.get('fail')
+        if body:
+            return jsonify({'success': False, 'error': body}), 500
+        app.config['created'].append(1)
+        return jsonify({'success': True, 'id': len(app.config['created'])}), 201
+
+    return app
+
+
+def _post(client, key, payload):
+    return client.post('/items', json=payload, headers={'Idempotency-Key': key} if key else {})
+
+
+def test_retry_with_the_same_key_replays_the_first_response(app):
+    client = app.test_client()
+    first = _post(client, 'k1', {'name': 'Rice'})
+    again = _post(client, 'k1', {'name': 'Rice'})
+    assert first.status_code == again.status_code == 201
+    assert again.data == first.data
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert len(app.config['created']) == 1
+    assert app.config['store'].stats()['replays'] == 1
+
+
+def test_requests_without_a_key_are_not_deduplicated(app):
+    client = app.test_client()
+    _post(client, None, {'name': 'Rice'})
+    _post(client, None, {'name': 'Rice'})
+    assert len(app.config['created']) == 2
+
+
+def test_key_reused_for_another_body_is_rejected(app):
+    client = app.test_client()
+    _post(client, 'k1', {'name': 'Rice'})
+    assert _post(client, 'k1', {'name': 'Bread'}).status_code == 422
+    assert _post(client, 'x' * 256, {'name': 'Rice'}).status_code == 400
+
+
+def test_concurrent_retry_is_told_to_wait(app):
+    app.config['release'].clear()
+    statuses = []
+    first = threading.Thread(target=lambda: statuses.append(_post(app.test_client(), 'k1', {}).status_code))
+    first.start()
+    try:
+        for _ in range(100):
+            if app.config['store'].stats()['keys']:
+                break
+            threading.Event().wait(0.01)
+        retry = _post(app.test_client(), 'k1', {})
+        assert retry.status_code == 409
+        assert retry.headers['Retry-After'] == '1'
+    finally:
+        app.config['release'].set()
+        first.join()
+    assert statuses == [201]
+
+
+def test_server_errors_release_the_key(app):
+    client = app.test_client()
+    app.config['fail'] = 'backend down'
+    assert _post(client, 'k1', {}).status_code == 500
+    app.config['fail'] = None
+    assert _post(client, 'k1', {}).status_code == 201
+
+
+def test_abandoned_claims_and_old_keys_expire(app, monkeypatch):
+    store = app.config['store']
+    assert store.claim('k', 'fp')[0] == idempotency.NEW
+    assert store.claim('k', 'fp')[0] == idempotency.IN_PROGRESS
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_PENDING_SECONDS', 0)
+    assert store.claim('k', 'fp')[0] == idempotency.NEW
+
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_MAX_KEYS', 2)
+    for key in ('a', 'b', 'c'):
+        store.claim(key, 'fp')
+    store.prune()
+    assert store.stats()['keys'] == 2
+
+
+def test_demo_donor_post_is_idempotent():
+    import fakes
+    import app_sheets_demo
+    fakes.install(app_sheets_demo, fakes.FaultProfile(), fakes.FaultProfile())
+    client = app_sheets_demo.app.test_client()
+    payload = {'foodType': 'Rice', 'quantity': '2 kg', 'expiryTime': 5, 'location': 'Test', 'lat': 40.0, 'lon': -74.0}
+    first = client.post('/api/donors', json=payload, headers={'Idempotency-Key': 'demo-retry'})
+    again = client.post('/api/donors', json=payload, headers={'Idempotency-Key': 'demo-retry'})
+    assert first.get_json()['id'] == again.get_json()['id']
+    assert first.get_json()['id'].startswith('donor_')
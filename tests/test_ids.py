@@ -0,0 +1,49 @@
+import threading
+import time
+
+from ids import UlidGenerator, encode_ulid, new_id, ulid_timestamp_ms
+
+
+def test_ids_are_strictly_increasing_within_a_millisecond():
+    generator = UlidGenerator()
+    ids = [generator.new() for _ in range(5000)]
+    assert ids == sorted(ids)
+    assert len(set(ids)) == len(ids)
+    assert all(len(ulid) == 26 for ulid in ids)
+
+
+def test_concurrent_generation_never_collides():
+    generator = UlidGenerator()
+    ids = []
+
+    def generate():
+        batch = [generator.new() for _ in range(2000)]
+        ids.extend(batch)
+
+    threads = [threading.Thread(target=generate) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(set(ids)) == 8000
+
+
+def test_timestamp_round_trips():
+    before = time.time_ns() // 1_000_000
+    ulid = UlidGenerator().new()
+    assert before <= ulid_timestamp_ms(ulid) <= time.time_ns() // 1_000_000
+    assert ulid_timestamp_ms(encode_ulid(1234 << 80)) == 1234
+
+
+def test_random_overflow_rolls_into_the_next_millisecond():
+    generator = UlidGenerator()
+    first = generator.new()
+    generator._last_random = (1 << 80) - 1
+    generator._last_ms += 10_000
+    rolled = generator.new()
+    assert rolled > first
+    assert ulid_timestamp_ms(rolled) == generator._last_ms
+
+
+def test_new_id_prefix():
+    assert new_id('donor').startswith('donor_')
@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+import job_queue
+from job_queue import DEAD, DONE, PENDING, JobQueue, PermanentJobError, WorkerPool
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.db'))
+
+
+def _status(queue, job_id):
+    return queue._connection().execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()[0]
+
+
+def test_dedupe_only_blocks_while_pending(queue):
+    first = queue.enqueue('refresh', {}, dedupe_key='refresh')
+    assert queue.enqueue('refresh', {}, dedupe_key='refresh') is None
+    job = queue.claim('w1')
+    assert job['id'] == first
+    # The running refresh may have read stale inputs: one follow-up can queue behind it
+    follow_up = queue.enqueue('refresh', {}, dedupe_key='refresh')
+    assert follow_up is not None
+    assert queue.enqueue('refresh', {}, dedupe_key='refresh') is None
+    assert queue.complete(job)
+    assert queue.claim('w1')['id'] == follow_up
+
+
+def test_failed_jobs_back_off_then_dead_letter(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, 'RETRY_BASE_SECONDS', 0.0)
+    job_id = queue.enqueue('geocode', {'location': 'x'}, max_attempts=2)
+    assert queue.fail(queue.claim('w1'), 'timeout') == PENDING
+    job = queue.claim('w1')
+    assert job['attempts'] == 2
+    assert queue.fail(job, 'timeout') == DEAD
+    assert [dead['id'] for dead in queue.dead_letters()] == [job_id]
+
+
+def test_retry_waits_for_backoff(queue):
+    queue.enqueue('geocode', {})
+    queue.fail(queue.claim('w1'), 'timeout')
+    assert queue.claim('w1') is None
+
+
+def test_expired_lease_is_reclaimed_and_old_owner_cannot_finish(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, 'LEASE_SECONDS', 0.05)
+    job_id = queue.enqueue('slow', {})
+    stale = queue.claim('w1')
+    time.sleep(0.1)
+    fresh = queue.claim('w2')
+    assert fresh['id'] == job_id
+    assert not queue.heartbeat(job_id, 'w1')
+    assert not queue.complete(stale)
+    assert queue.fail(stale, 'late') is None
+    assert queue.complete(fresh)
+    assert _status(queue, job_id) == DONE
+
+
+def test_expired_lease_with_pending_follow_up_is_superseded(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, 'LEASE_SECONDS', 0.05)
+    queue.enqueue('refresh', {}, dedupe_key='refresh')
+    stale = queue.claim('w1')
+    follow_up = queue.enqueue('refresh', {}, dedupe_key='refresh')
+    time.sleep(0.1)
+    assert queue.claim('w2')['id'] == follow_up
+    assert _status(queue, stale['id']) == DONE
+
+
+def test_purge_done_keeps_live_jobs(queue):
+    queue.enqueue('a', {})
+    queue.complete(queue.claim('w1'))
+    pending_id = queue.enqueue('b', {}, delay=60)
+    assert queue.purge_done(older_than_seconds=-1) == 1
+    assert queue._connection().execute('SELECT id FROM jobs').fetchall() == [(pending_id,)]
+
+
+def test_periodic_jobs_are_queued_once_per_boundary(queue):
+    assert queue.enqueue_periodic('archive', 3600) is not None
+    assert queue.enqueue_periodic('archive', 3600) is None
+    assert queue.metrics()['pending'] == 1
+
+
+def test_worker_pool_renews_long_job_leases(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, 'LEASE_SECONDS', 0.2)
+    monkeypatch.setattr(job_queue, 'HEARTBEAT_SECONDS', 0.05)
+    runs = []
+    pool = WorkerPool(queue, {'slow': lambda payload: (runs.append(1), time.sleep(0.6))},
+                      workers=2, poll_interval=0.02)
+    queue.enqueue('slow', {})
+    pool.ensure_started()
+    time.sleep(1.0)
+    pool.stop()
+    assert len(runs) == 1
+    assert pool.stats()['processed'] == 1
+
+
+def test_worker_pool_counts_failures(queue):
+    def broken(payload):
+        raise PermanentJobError('bad address')
+
+    pool = WorkerPool(queue, {'geocode': broken})
+    queue.enqueue('geocode', {})
+    assert pool.run_once()
+    assert not pool.run_once()
+    assert pool.stats()['failed'] == 1
+    assert queue.metrics()['dead'] == 1
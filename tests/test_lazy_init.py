@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('module, heavy', [('app', 'firebase_admin'), ('app_sheets', 'gspread')])
+def test_import_does_not_load_the_client_libraries(module, heavy):
+    script = (f'import sys, {module}\n'
+              f'print({heavy!r} in sys.modules, {module}.app.test_client().get("/api/health").status_code)')
+    result = subprocess.run([sys.executable, '-c', script], cwd=REPO, capture_output=True, text=True,
+                            timeout=60, env={**os.environ, 'PREWARM_CLIENTS': '0'})
+    assert result.stdout.split()[-2:] == ['False', '200'], result.stderr
+
+
+def test_client_is_created_once_and_failures_are_retried(monkeypatch):
+    import app_sheets
+    monkeypatch.setattr(app_sheets, '_sheets_client', None)
+    calls = []
+
+    def failing():
+        calls.append('fail')
+        raise RuntimeError('no credentials')
+
+    monkeypatch.setattr(app_sheets, 'init_google_sheets', failing)
+    with pytest.raises(RuntimeError):
+        app_sheets.get_sheets_client()
+    health = app_sheets.app.test_client().get('/api/health').get_json()
+    assert health['sheets_status'] == 'disconnected'
+
+    def slow():
+        calls.append('init')
+        time.sleep(0.05)
+        return object()
+
+    monkeypatch.setattr(app_sheets, 'init_google_sheets', slow)
+    clients = []
+    threads = [threading.Thread(target=lambda: clients.append(app_sheets.get_sheets_client())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert calls == ['fail', 'init']
+    assert len({id(client) for client in clients}) == 1
+    assert app_sheets._sheets_client_error is None
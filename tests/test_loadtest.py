@@ -0,0 +1,82 @@
+import json
+import threading
+
+import pytest
+from geopy.exc import GeocoderQuotaExceeded, GeocoderUnavailable
+
+import fakes
+import loadtest
+
+
+def test_fault_profile_quota_errors_and_pause():
+    profile = fakes.FaultProfile(error_rate=1.0, quota_per_minute=2, seed=0)
+    geocoder = fakes.FakeNominatim(profile)
+    with pytest.raises(GeocoderUnavailable):
+        geocoder.geocode('Times Square')
+    with pytest.raises(GeocoderUnavailable):
+        geocoder.geocode('Times Square')
+    with pytest.raises(GeocoderQuotaExceeded):
+        geocoder.geocode('Times Square')
+    with profile.paused():
+        assert geocoder.geocode('Times Square') is not None
+    assert profile.stats()['quota_rejections'] == 1
+
+
+def test_fake_geocoder_is_deterministic():
+    geocoder = fakes.FakeNominatim()
+    first = geocoder.geocode('Times Square')
+    assert geocoder.geocode(' times square ').point == first.point
+    assert abs(first.latitude - 40.71) <= 0.3
+    assert fakes.FakeNominatim(not_found_rate=1.0).geocode('Times Square') is None
+
+
+def test_fake_firestore_queries_and_listeners():
+    db = fakes.FakeFirestore()
+    donations = db.collection('donations')
+    for i, food in enumerate(['rice', 'bread', 'rice']):
+        donations.document(f'd{i}').set({'foodType': food, 'rank': i})
+    query = donations.where('foodType', '==', 'rice').order_by('rank', direction='DESCENDING').limit(1)
+    assert [doc.id for doc in query.stream()] == ['d2']
+
+    seen = []
+    received = threading.Event()
+
+    def on_snapshot(snapshot, changes, read_time):
+        seen.extend((change.type.name, change.document.id) for change in changes)
+        if len(seen) == 4:
+            received.set()
+
+    watch = donations.on_snapshot(on_snapshot)
+    donations.document('d0').delete()
+    assert received.wait(5)
+    watch.unsubscribe()
+    assert seen[:3] == [('ADDED', 'd0'), ('ADDED', 'd1'), ('ADDED', 'd2')]
+    assert seen[3] == ('REMOVED', 'd0')
+
+
+def test_parse_pairs_rejects_unknown_names():
+    assert loadtest.parse_pairs('p99_ms=300, error_rate=0.01', list(loadtest.SLO_CHECKS), 'SLO') == \
+        {'p99_ms': 300.0, 'error_rate': 0.01}
+    with pytest.raises(ValueError):
+        loadtest.parse_pairs('p42_ms=1', list(loadtest.SLO_CHECKS), 'SLO')
+
+
+def test_report_and_slos():
+    samples = [('donors', 10.0, 200, 0.0), ('donors', 30.0, 304, 0.1), ('matches', 50.0, 503, 0.2)]
+    report = loadtest.build_report(samples, 1.0, {'error_rate': 0.5, 'min_rps': 10})
+    assert report['operations']['donors']['error_rate'] == 0
+    assert report['overall']['error_rate'] == round(1 / 3, 4)
+    assert report['slo']['error_rate']['passed'] and not report['slo']['min_rps']['passed']
+    assert report['slo_passed'] is False
+
+
+def test_short_in_process_run(tmp_path):
+    out = tmp_path / 'report.json'
+    status = loadtest.main(['--backend', 'app_sheets_demo', '--duration', '0.5', '--warmup', '0',
+                            '--concurrency', '2', '--seed-donors', '10', '--seed-ngos', '5', '--locations', '20',
+                            '--db-latency-ms', '0', '--geocoder-latency-ms', '0', '--slo', 'error_rate=0.5',
+                            '--json', str(out)])
+    report = json.loads(out.read_text())
+    assert status == 0
+    assert report['overall']['requests'] > 0
+    assert report['slo']['error_rate']['passed']
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+from match_events import MatchEventLog, parse_last_event_id, sse_stream
+
+NOW = datetime(2026, 1, 5, 12, 0).astimezone()
+
+
+def _match(donor_id, ngo_id, expiry_hours=24):
+    return {'donor': {'id': donor_id, 'timestamp': NOW.isoformat(), 'expiry_time_hours': expiry_hours},
+            'matched_ngo': {'id': ngo_id}}
+
+
+def _types(events):
+    return [(event['type'], event['match']['donor']['id']) for event in events]
+
+
+def test_update_publishes_deltas():
+    log = MatchEventLog()
+    assert _types(log.update([_match('d1', 'n1'), _match('d2', 'n1')], now=NOW)) == [('new', 'd1'), ('new', 'd2')]
+    assert log.update([_match('d1', 'n1'), _match('d2', 'n1')], now=NOW) == []
+    assert _types(log.update([_match('d1', 'n2')], now=NOW)) == [('reassigned', 'd1'), ('expired', 'd2')]
+
+
+def test_expire_drops_matches_past_their_expiry():
+    log = MatchEventLog()
+    log.update([_match('d1', 'n1', expiry_hours=1), _match('d2', 'n1')], now=NOW)
+    assert _types(log.expire(now=NOW + timedelta(hours=2))) == [('expired', 'd1')]
+    assert [match['donor']['id'] for match in log.snapshot()[1]] == ['d2']
+
+
+def test_events_after_resumes_or_asks_for_a_resync():
+    log = MatchEventLog(max_events=2)
+    log.update([_match(f'd{i}', 'n1') for i in range(3)], now=NOW)
+    assert [event['id'] for event in log.events_after(1, timeout=0)] == [2, 3]
+    assert log.events_after(3, timeout=0) == []
+    assert log.events_after(0, timeout=0) is None
+    assert log.events_after(9, timeout=0) is None
+
+
+def test_last_event_id_from_another_epoch_resyncs():
+    log, other = MatchEventLog(), MatchEventLog()
+    other.epoch = log.epoch + 'x'
+    assert parse_last_event_id(log, f'{log.epoch}-5') == 5
+    assert parse_last_event_id(log, f'{other.epoch}-5') is None
+    assert parse_last_event_id(log, '5') is None
+    assert parse_last_event_id(log, None) is None
+
+
+def test_stream_sends_snapshot_then_deltas():
+    log = MatchEventLog()
+    log.update([_match('d1', 'n1')], now=NOW)
+    stream = sse_stream(log, heartbeat_seconds=0.01)
+    assert next(stream).startswith('retry: 10')
+    snapshot = next(stream)
+    assert snapshot.startswith(f'id: {log.epoch}-1\nevent: snapshot\n')
+    assert log.subscribers == 1
+    assert next(stream) == ': keepalive\n\n'
+    log.update([_match('d1', 'n1'), _match('d2', 'n1')], now=NOW)
+    assert next(stream).startswith(f'id: {log.epoch}-2\nevent: new\n')
+    stream.close()
+    assert log.subscribers == 0
@@ -0,0 +1,101 @@
+import os
+import time
+
+import pytest
+
+from match_log import MatchLog, current_matcher, replay
+
+DONORS = [{'id': 'd1', 'foodType': 'Rice', 'quantity': '5 kg', 'expiryTime': 24, 'timestamp': ''},
+          {'id': 'd2', 'foodType': 'Bread', 'quantity': '2 loaves', 'expiryTime': 24, 'timestamp': ''}]
+DONOR_COORDS = [(40.70, -74.00), (40.80, -73.90)]
+NGOS = [{'id': 'n1', 'foodNeeded': 'Rice, Bread', 'coordinates': (40.71, -74.01)},
+        {'id': 'n2', 'foodNeeded': 'Rice, Bread', 'coordinates': (40.81, -73.91)}]
+
+
+def _log(tmp_path, **kwargs):
+    kwargs.setdefault('block_bytes', 1)
+    return MatchLog(str(tmp_path / 'match_log'), enabled=True, retention_days=0, **kwargs)
+
+
+def _record_current(log, version):
+    donors = [dict(donor, coordinates=list(coords)) for donor, coords in zip(DONORS, DONOR_COORDS)]
+    nearest = current_matcher(donors, [dict(ngo, coordinates=list(ngo['coordinates'])) for ngo in NGOS])
+    return log.record_run(version, DONORS, DONOR_COORDS, NGOS, nearest, [None, None], elapsed_ms=1.0)
+
+
+def test_runs_are_logged_once_per_version(tmp_path):
+    log = _log(tmp_path)
+    assert _record_current(log, 'v1')
+    assert not _record_current(log, 'v1')
+    assert _record_current(log, 'v2')
+    records = list(log.scan())
+    assert [record['version'] for record in records] == ['v1', 'v2']
+    assert records[0]['decisions'][0][:2] == ['d1', 'n1']
+    assert log.stats()['skipped_same_version'] == 1
+    assert not MatchLog(str(tmp_path / 'off'), enabled=False).record_run('v1', DONORS, DONOR_COORDS, NGOS,
+                                                                        [None, None], [None, None])
+
+
+def test_buffered_records_are_scanned_before_they_are_written(tmp_path):
+    log = _log(tmp_path, block_bytes=1 << 20, flush_seconds=3600)
+    log.append({'n': 1})
+    assert [record['n'] for record in log.scan()] == [1]
+    assert log.stats()['blocks'] == 0
+    log.flush()
+    assert log.stats()['blocks'] == 1
+    # Another reader of the directory sees the written block
+    assert [record['n'] for record in MatchLog(log.directory, enabled=False).scan()] == [1]
+
+
+def test_range_scan_reads_only_overlapping_blocks(tmp_path, monkeypatch):
+    log = _log(tmp_path)
+    stamps = []
+    for n in range(10):
+        stamps.append(log.append({'n': n}))
+        time.sleep(0.002)
+    read = []
+    original = log._read_block
+    monkeypatch.setattr(log, '_read_block', lambda block: read.append(block) or original(block))
+    assert [record['n'] for record in log.scan(stamps[3], stamps[5])] == [3, 4, 5]
+    assert len(read) == 3
+
+
+def test_writers_are_merged_in_time_order(tmp_path):
+    first, second = _log(tmp_path), _log(tmp_path)
+    for n in range(6):
+        (first if n % 2 else second).append({'n': n})
+        time.sleep(0.002)
+    reader = MatchLog(first.directory, enabled=False)
+    assert [record['n'] for record in reader.scan()] == list(range(6))
+    assert reader.stats()['segments'] == 2
+
+
+def test_corrupt_blocks_are_skipped(tmp_path):
+    log = _log(tmp_path)
+    log.append({'n': 1})
+    log.append({'n': 2})
+    block = log._blocks[log._segment_path][0]
+    log.close()
+    with open(block.path, 'r+b') as f:
+        f.seek(block.offset)
+        f.write(b'\xff\xff')
+    reader = MatchLog(log.directory, enabled=False)
+    assert [record['n'] for record in reader.scan()] == [2]
+    assert reader.stats()['corrupt_blocks'] == 1
+
+
+def test_replay_reports_changed_decisions(tmp_path):
+    log = _log(tmp_path)
+    _record_current(log, 'v1')
+    report = replay(log)
+    assert (report['runs'], report['decisions'], report['changed']) == (1, 2, 0)
+
+    swapped = replay(log, matcher=lambda donors, ngos: [(1, 1.0), (0, 1.0)])
+    assert swapped['changed'] == 2
+    assert swapped['examples'][0]['replayed_ngo'] == 'n2'
+
+
+def test_scan_rejects_bad_timestamps(tmp_path):
+    with pytest.raises(ValueError):
+        list(_log(tmp_path).scan('not a time'))
+    assert not os.path.exists(tmp_path / 'match_log')
@@ -0,0 +1,96 @@
+import threading
+
+from memory_store import MemoryStore
+from sharding import geohash_encode
+
+NYC = (40.7128, -74.0060)
+LONDON = (51.5074, -0.1278)
+
+
+def _record(record_id, coords=None, **fields):
+    return {'id': record_id, 'coords': coords, **fields}
+
+
+def _store(stripes=4):
+    return MemoryStore(locate=lambda record: record.get('coords'), stripes=stripes)
+
+
+def test_snapshot_is_unchanged_by_later_writes():
+    store = _store()
+    store.put(_record('a', NYC))
+    snapshot = store.snapshot()
+    store.put(_record('b', LONDON))
+    store.put(_record('a', LONDON, note='moved'))
+    store.delete_many(['a'])
+    assert [record['id'] for record in snapshot.values()] == ['a']
+    assert snapshot.get('a')['coords'] == NYC
+    assert snapshot.near(NYC)[0]['id'] == 'a'
+    assert [record['id'] for record in store.values()] == ['b']
+
+
+def test_replacing_a_record_keeps_its_position_and_moves_its_index():
+    store = _store()
+    store.put_many([_record('a', NYC), _record('b', NYC), _record('c')])
+    store.put(_record('a', LONDON))
+    assert [record['id'] for record in store.values()] == ['a', 'b', 'c']
+    assert [record['id'] for record in store.snapshot().near(NYC)] == ['b']
+    assert [record['id'] for record in store.snapshot().by_geohash(geohash_encode(*LONDON, 2))] == ['a']
+    assert [record['id'] for record in store.snapshot().unlocated()] == ['c']
+
+
+def test_refresh_locations_indexes_newly_geocoded_records():
+    located = {}
+    store = MemoryStore(locate=lambda record: located.get(record['id']), stripes=2)
+    store.put(_record('a'))
+    located['a'] = NYC
+    assert store.refresh_locations() == 1
+    assert store.snapshot().near(NYC)[0]['id'] == 'a'
+    assert store.refresh_locations() == 0
+
+
+def test_replace_all_drops_missing_records():
+    store = _store()
+    store.put_many([_record('a'), _record('b')])
+    store.replace_all([_record('b'), _record('c')])
+    assert sorted(record['id'] for record in store.values()) == ['b', 'c']
+
+
+def test_multi_stripe_writes_are_published_together():
+    store = _store(stripes=8)
+    batch_size = 32
+    stop = threading.Event()
+    torn = []
+
+    def read():
+        while not stop.is_set():
+            size = len(store.snapshot())
+            if size % batch_size:
+                torn.append(size)
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for reader in readers:
+        reader.start()
+    for batch in range(50):
+        store.put_many(_record(f'{batch}-{i}') for i in range(batch_size))
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert not torn
+    assert len(store) == 50 * batch_size
+    assert store.stats()['writes'] == 50
+
+
+def test_concurrent_writers_lose_nothing():
+    store = _store(stripes=4)
+
+    def write(worker):
+        for i in range(200):
+            store.put(_record(f'{worker}-{i}'))
+
+    writers = [threading.Thread(target=write, args=(worker,)) for worker in range(4)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    assert len(store) == 800
+    assert store.version == 800
@@ -0,0 +1,60 @@
+import random
+
+import pytest
+
+import parallel_match
+from spatial_index import geodesic_km, get_ngo_index
+
+
+def _brute_force(donor_coords, ngo_locations):
+    return [min(((geodesic_km(coords, ngo['coordinates']), position) for position, ngo in enumerate(ngo_locations)))
+            for coords in donor_coords]
+
+
+@pytest.fixture
+def points():
+    rng = random.Random(7)
+    ngos = [{'id': f'ngo_{i}', 'coordinates': (40 + rng.uniform(-1, 1), -74 + rng.uniform(-1, 1))} for i in range(60)]
+    donors = [(40 + rng.uniform(-1.5, 1.5), -74 + rng.uniform(-1.5, 1.5)) for _ in range(300)]
+    return donors, ngos
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(parallel_match, 'MATCH_WORKERS', 2)
+    monkeypatch.setattr(parallel_match, 'PARALLEL_MIN_DONORS', 100)
+    monkeypatch.setattr(parallel_match, 'MIN_CHUNK_SIZE', 50)
+    yield
+    if parallel_match._pool is not None:
+        parallel_match._pool.shutdown()
+        parallel_match._pool = None
+
+
+def test_pool_and_in_process_results_match_brute_force(points, pool, tmp_path):
+    donors, ngos = points
+    index = get_ngo_index(ngos, str(tmp_path / 'ngo_index.bin'))
+    expected = [(position, distance) for distance, position in _brute_force(donors, ngos)]
+
+    before = parallel_match.parallel_stats()
+    parallel = parallel_match.nearest_all(donors, index)
+    small = parallel_match.nearest_all(donors[:10], index)
+    after = parallel_match.parallel_stats()
+
+    assert after['parallel_runs'] == before['parallel_runs'] + 1
+    assert after['in_process_runs'] == before['in_process_runs'] + 1
+    assert parallel == pytest.approx(expected)
+    assert small == pytest.approx(expected[:10])
+
+
+def test_index_without_a_content_named_file_stays_in_process(points, pool, tmp_path):
+    donors, ngos = points
+    index = get_ngo_index(ngos, str(tmp_path / 'ngo_index.bin'))
+    index.path = str(tmp_path / 'ngo_index.bin')
+    before = parallel_match.parallel_stats()['in_process_runs']
+    parallel_match.nearest_all(donors, index)
+    assert parallel_match.parallel_stats()['in_process_runs'] == before + 1
+
+
+def test_chunks_cover_every_donor():
+    assert parallel_match.chunk_size_for(1000, 4) == parallel_match.MIN_CHUNK_SIZE
+    assert parallel_match.chunk_size_for(100000, 4) * 4 * parallel_match.CHUNKS_PER_WORKER >= 100000
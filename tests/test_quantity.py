@@ -0,0 +1,49 @@
+import pytest
+
+from quantity import parse_quantity, quantity_fields
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('10 kg', (10.0, 'kg')),
+    ('500g', (0.5, 'kg')),
+    ('1/2 gallon', (1.892706, 'l')),
+    ('1,000 kg', (1000.0, 'kg')),
+    ('10-12 kg', (10.0, 'kg')),
+    ('20 loaves', (20.0, 'items')),
+    ('a dozen', (12.0, 'items')),
+    ('2 tonnes', (2000.0, 'kg')),
+    ('5kg.', (5.0, 'kg')),
+])
+def test_plain_quantities(text, expected):
+    assert parse_quantity(text) == expected
+
+
+def test_unit_must_be_a_whole_word():
+    assert parse_quantity('1 t-shirt') == (1.0, 'items')
+    assert parse_quantity('3 kgx') == (3.0, 'items')
+
+
+@pytest.mark.parametrize('text, expected', [
+    ('2 x 5kg', (10.0, 'kg')),
+    ('2x5 kg', (10.0, 'kg')),
+    ('3 boxes (2 kg each)', (6.0, 'kg')),
+    ('3 boxes, 2 kg each', (6.0, 'kg')),
+    ('3 bags of 2 kg', (6.0, 'kg')),
+    ('2 trays of 24 eggs', (48.0, 'items')),
+])
+def test_packs_multiply_out(text, expected):
+    assert parse_quantity(text) == expected
+
+
+def test_amount_followed_by_of_is_not_a_pack():
+    assert parse_quantity('5 kg of 2 kinds') == (5.0, 'kg')
+
+
+def test_unreadable_quantities():
+    assert parse_quantity('some bread') is None
+    assert parse_quantity('1/0 kg') is None
+    assert quantity_fields('lots') == {'amount': None, 'unit': None}
+
+
+def test_stored_amount_wins_over_text():
+    assert quantity_fields('2 x 5kg', amount='7', unit='kg') == {'amount': 7.0, 'unit': 'kg'}
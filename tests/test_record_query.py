@@ -0,0 +1,151 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from match_events import donor_expires_at, parse_timestamp
+from record_query import (RecordIndex, RecordQuery, apply_query, get_record_index, parse_record_query,
+                          query_fields, sort_records)
+
+BASE = datetime(2026, 1, 5, 12, 0, tzinfo=timezone.utc)
+
+
+def _donor(donor_id, hours_ago, food_type='Rice', expiry_hours=24):
+    return {
+        'id': donor_id,
+        'foodType': food_type,
+        'expiryTime': expiry_hours,
+        'timestamp': (BASE - timedelta(hours=hours_ago)).isoformat()
+    }
+
+
+DONORS = [
+    _donor('a', 10, 'Rice', 4),
+    _donor('b', 5, 'Cooked  Meals', 48),
+    _donor('c', 1, 'rice', 24),
+    _donor('d', 3, 'Bread', 0),
+    {'id': 'e', 'foodType': 'Rice', 'expiryTime': 6, 'timestamp': ''}
+]
+
+
+def _ids(records):
+    return [record['id'] for record in records]
+
+
+def _brute_force(records, query, active_at=None):
+    """Reference filter: every predicate checked on every record."""
+    since = query.since.timestamp() if query.since else None
+    before = query.expires_before.timestamp() if query.expires_before else None
+    active = active_at.timestamp() if active_at else None
+    kept = []
+    for record in records:
+        created = parse_timestamp(record['timestamp'])
+        expires = donor_expires_at(record['timestamp'], record['expiryTime'])
+        created = created.timestamp() if created else None
+        expires = expires.timestamp() if expires else None
+        if query.food_type is not None and ' '.join(record['foodType'].lower().split()) != query.food_type:
+            continue
+        if since is not None and (created is None or created < since):
+            continue
+        if before is not None and (expires is None or expires >= before):
+            continue
+        if active is not None and expires is not None and expires <= active:
+            continue
+        kept.append(record)
+    return kept
+
+
+def test_parse_record_query_normalizes_values():
+    query = parse_record_query({'foodType': '  COOKED   meals ', 'since': '1767571200', 'sort': '-timestamp'}, 'donors')
+    assert query.food_type == 'cooked meals'
+    assert query.since.timestamp() == 1767571200
+    assert query.sort == 'timestamp' and query.descending
+    # An unescaped '+' in the offset arrives as a space
+    assert parse_record_query({'since': '2026-01-05T00:00:00 00:00'}, 'donors').since.timestamp() == 1767571200
+    assert parse_record_query({}, 'ngos').empty
+
+
+@pytest.mark.parametrize('args, kind', [
+    ({'sort': 'name'}, 'donors'),
+    ({'sort': 'expires_at'}, 'ngos'),
+    ({'foodType': 'Rice'}, 'ngos'),
+    ({'expires_before': '1767571200'}, 'ngos'),
+    ({'since': 'yesterday'}, 'donors')
+])
+def test_parse_record_query_rejects_bad_values(args, kind):
+    with pytest.raises(ValueError):
+        parse_record_query(args, kind)
+
+
+def test_food_type_filter_ignores_case_and_spacing():
+    assert _ids(apply_query(DONORS, RecordQuery(food_type='rice'))) == ['a', 'c', 'e']
+    assert _ids(apply_query(DONORS, RecordQuery(food_type='cooked meals'))) == ['b']
+    assert apply_query(DONORS, RecordQuery(food_type='soup')) == []
+
+
+def test_since_and_expires_before_use_creation_and_expiry_times():
+    assert _ids(apply_query(DONORS, RecordQuery(since=BASE - timedelta(hours=5)))) == ['b', 'c', 'd']
+    # 'd' has no positive expiry and 'e' no timestamp, so neither expires "before" anything
+    assert _ids(apply_query(DONORS, RecordQuery(expires_before=BASE + timedelta(hours=1)))) == ['a']
+
+
+def test_active_at_drops_expired_donations_but_keeps_undated_ones():
+    assert _ids(apply_query(DONORS, RecordQuery(), active_at=BASE)) == ['b', 'c', 'd', 'e']
+
+
+def test_sorting_puts_records_without_a_key_last_in_list_order():
+    assert _ids(apply_query(DONORS, RecordQuery(sort='timestamp'))) == ['a', 'b', 'd', 'c', 'e']
+    assert _ids(apply_query(DONORS, RecordQuery(sort='timestamp', descending=True))) == ['c', 'd', 'b', 'a', 'e']
+    assert _ids(apply_query(DONORS, RecordQuery(sort='expires_at'))) == ['a', 'c', 'b', 'd', 'e']
+    assert _ids(sort_records(DONORS, RecordQuery(sort='expires_at', descending=True))) == ['b', 'c', 'a', 'd', 'e']
+    assert sort_records(DONORS, RecordQuery(sort='timestamp')) is DONORS
+
+
+@pytest.mark.parametrize('query, active_at', [
+    (RecordQuery(food_type='rice', since=BASE - timedelta(hours=8)), None),
+    (RecordQuery(since=BASE - timedelta(hours=4), expires_before=BASE + timedelta(days=3)), None),
+    (RecordQuery(expires_before=BASE + timedelta(hours=30)), BASE),
+    (RecordQuery(food_type='bread'), BASE + timedelta(days=10)),
+    (RecordQuery(), BASE + timedelta(hours=20))
+])
+def test_index_matches_brute_force(query, active_at):
+    records = [_donor(f'r{i}', i % 17, ('Rice', 'Bread', 'Fruit')[i % 3], i % 9) for i in range(60)]
+    assert RecordIndex(records).select(query, active_at) == _brute_force(records, query, active_at)
+
+
+def test_query_fields_denormalize_food_type_and_expiry():
+    fields = query_fields(_donor('a', 0, ' Cooked Meals ', 2))
+    assert fields == {'foodTypeKey': 'cooked meals', 'expiresAt': BASE + timedelta(hours=2)}
+    assert 'expiresAt' not in query_fields(_donor('d', 0, 'Bread', 0))
+
+
+def test_record_index_is_reused_while_the_version_is_unchanged():
+    loads = []
+
+    def load():
+        loads.append(1)
+        return list(DONORS)
+
+    first = get_record_index('test_donors', '1', load)
+    assert get_record_index('test_donors', '1', load) is first
+    assert get_record_index('test_donors', '2', load) is not first
+    get_record_index('test_donors', None, load)
+    assert len(loads) == 3
+
+
+def test_demo_donor_listing_filters_and_sorts():
+    import fakes
+    import app_sheets_demo
+    fakes.install(app_sheets_demo, fakes.FaultProfile(), fakes.FaultProfile())
+    client = app_sheets_demo.app.test_client()
+    for food_type in ('Query Soup', 'query  SOUP', 'Query Bread'):
+        response = client.post('/api/donors', json={
+            'foodType': food_type, 'quantity': '2 kg', 'expiryTime': 12, 'location': 'New York, NY'
+        })
+        assert response.status_code == 200
+
+    response = client.get('/api/donors?foodType=QUERY%20soup&sort=-timestamp')
+    assert response.status_code == 200
+    donors = response.get_json()['donors']
+    assert [donor['foodType'] for donor in donors] == ['query  SOUP', 'Query Soup']
+    assert client.get('/api/donors?sort=name').status_code == 400
+    assert client.get('/api/ngos?foodType=Rice').status_code == 400
@@ -0,0 +1,102 @@
+import threading
+import time
+
+from flask import Flask
+
+from response_cache import ResponseCache, cached_json_response, request_cache_key, stale_json_response
+
+
+def _app(cache, versions, builds):
+    app = Flask(__name__)
+
+    @app.route('/items')
+    def items():
+        def build():
+            builds.append(versions[0])
+            time.sleep(0.01)
+            return {'success': True, 'version': versions[0]}, 200
+        return cached_json_response(cache, request_cache_key(), versions[0], build)
+
+    @app.route('/broken')
+    def broken():
+        def build():
+            builds.append('broken')
+            return {'success': False, 'error': 'boom'}, 500
+        return cached_json_response(cache, request_cache_key(), versions[0], build)
+
+    @app.route('/stale')
+    def stale():
+        return stale_json_response(cache) or ('', 503)
+
+    return app
+
+
+def test_etag_revalidates_until_the_version_moves():
+    cache, versions, builds = ResponseCache(), ['1'], []
+    client = _app(cache, versions, builds).test_client()
+    first = client.get('/items')
+    etag = first.headers['ETag']
+    assert first.status_code == 200 and first.headers['Cache-Control'] == 'no-cache'
+
+    again = client.get('/items', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    assert builds == ['1']
+
+    versions[0] = '2'
+    changed = client.get('/items', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.get_json()['version'] == '2'
+    assert changed.headers['ETag'] != etag
+    assert cache.stats()['entries'] == 1
+
+
+def test_query_string_order_does_not_split_the_cache():
+    cache, versions, builds = ResponseCache(), ['1'], []
+    client = _app(cache, versions, builds).test_client()
+    client.get('/items?b=2&a=1')
+    client.get('/items?a=1&b=2')
+    assert len(builds) == 1
+
+
+def test_errors_are_not_cached():
+    cache, versions, builds = ResponseCache(), ['1'], []
+    client = _app(cache, versions, builds).test_client()
+    assert client.get('/broken').status_code == 500
+    assert client.get('/broken').status_code == 500
+    assert builds == ['broken', 'broken']
+    assert 'ETag' not in client.get('/broken').headers
+
+
+def test_concurrent_misses_build_once():
+    cache, versions, builds = ResponseCache(), ['1'], []
+    app = _app(cache, versions, builds)
+    statuses = []
+
+    def fetch():
+        statuses.append(app.test_client().get('/items').status_code)
+
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert statuses == [200] * 8
+    assert builds == ['1']
+
+
+def test_lru_bound_and_striped_build_locks():
+    cache = ResponseCache(max_entries=2)
+    for key in ('a', 'b', 'c'):
+        cache.put(key, '1', 'etag', b'{}')
+    assert cache.get('a', '1') is None
+    assert cache.get('c', '1') == ('etag', b'{}')
+    assert len({id(cache.build_lock(f'/items?page={page}')) for page in range(1000)}) <= 32
+
+
+def test_stale_response_serves_the_latest_body_with_a_warning():
+    cache, versions, builds = ResponseCache(), ['1'], []
+    client = _app(cache, versions, builds).test_client()
+    assert client.get('/stale').status_code == 503
+    cache.put('/stale', 'old', 'etag', b'{"success": true}')
+    response = client.get('/stale')
+    assert response.status_code == 200
+    assert response.headers['X-Served-Stale'] == 'true'
@@ -0,0 +1,79 @@
+from datetime import timedelta
+
+import pytest
+
+import fakes
+import retention
+
+
+@pytest.fixture(scope='module')
+def demo():
+    import app_sheets_demo
+
+    fakes.install(app_sheets_demo, fakes.FaultProfile(), fakes.FaultProfile())
+    return app_sheets_demo
+
+
+@pytest.fixture
+def clock(monkeypatch, demo):
+    """Move retention's clock (and the demo backend's copy of it) by a timedelta."""
+    def advance(delta):
+        moved = retention.current_time() + delta
+        monkeypatch.setattr(retention, 'current_time', lambda: moved)
+        monkeypatch.setattr(demo, 'current_time', lambda: moved)
+    return advance
+
+
+def _post(client, path, payload):
+    response = client.post(path, json=payload)
+    body = response.get_json()
+    response.close()
+    assert response.status_code in (200, 201), body
+    return body
+
+
+def _get(client, path):
+    response = client.get(path)
+    body = response.get_json()
+    response.close()
+    assert response.status_code == 200, body
+    return body
+
+
+def test_cached_live_views_drop_donations_that_expire_without_a_write(demo, clock):
+    client = demo.app.test_client()
+    _post(client, '/api/ngos', {'ngoName': 'Expiry Pantry', 'foodNeeded': 'Bread',
+                                'location': 'Expiry Town', 'lat': 10.0, 'lon': 10.0})
+    donor_id = _post(client, '/api/donors', {'foodType': 'Bread', 'quantity': '5 loaves', 'expiryTime': 1,
+                                             'location': 'Expiry Town', 'lat': 10.01, 'lon': 10.01})['id']
+
+    donors = _get(client, '/api/donors')['donors']
+    matches = _get(client, '/api/matches')['matches']
+    assert donor_id in [donor['id'] for donor in donors]
+    assert donor_id in [match['donor']['id'] for match in matches]
+
+    clock(timedelta(hours=2))
+    donors = _get(client, '/api/donors')['donors']
+    matches = _get(client, '/api/matches')['matches']
+    assert donor_id not in [donor['id'] for donor in donors]
+    assert donor_id not in [match['donor']['id'] for match in matches]
+    # include_expired still lists it
+    assert donor_id in [donor['id'] for donor in _get(client, '/api/donors?include_expired=1')['donors']]
+
+
+def test_live_version_moves_with_the_clock(clock):
+    version = retention.live_version('7.3')
+    assert version.startswith('7.3@')
+    assert retention.live_version(None) is None
+    clock(timedelta(seconds=retention.LIVE_VIEW_RESOLUTION_SECONDS))
+    assert retention.live_version('7.3') != version
+
+
+def test_filter_active_and_archivable():
+    now = retention.current_time()
+    live = {'timestamp': now.isoformat(), 'expiryTime': 2}
+    expired = {'timestamp': (now - timedelta(hours=3)).isoformat(), 'expiryTime': 2}
+    old = {'timestamp': (now - timedelta(hours=2 + retention.ARCHIVE_GRACE_HOURS + 1)).isoformat(), 'expiryTime': 2}
+    undated = {'expiryTime': 2}
+    assert retention.filter_active([live, expired, old, undated], now) == [live, undated]
+    assert retention.partition_archivable([live, expired, old], now) == ([live, expired], [old])
@@ -0,0 +1,76 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import fakes
+import retention
+from route_planner import plan_routes
+
+NOW = datetime(2026, 1, 5, 12, 0).astimezone()
+
+
+def _match(donor_id, lat, lon, quantity='10 kg', expiry_hours=24, created=NOW):
+    return {
+        'donor': {'id': donor_id, 'coordinates': (lat, lon), 'quantity': quantity,
+                  'timestamp': created.isoformat(), 'expiry_time_hours': expiry_hours},
+        'matched_ngo': {'id': 'ngo_1', 'ngo_name': 'Pantry', 'coordinates': (40.0, -74.0)}
+    }
+
+
+def _stops(plan):
+    return [[stop['donor_id'] for stop in vehicle['stops']]
+            for entry in plan['routes'] for vehicle in entry['vehicles']]
+
+
+def test_routes_are_deterministic_for_a_seed():
+    matches = [_match(f'd{i}', 40.0 + 0.01 * (i % 5), -74.0 + 0.01 * (i // 5)) for i in range(20)]
+    first = plan_routes(matches, capacity_kg=60, seed=3, now=NOW)
+    second = plan_routes(matches, capacity_kg=60, seed=3, now=NOW)
+    assert 'time_budget' not in first['solver']['stopped']
+    assert _stops(first) == _stops(second)
+    assert sorted(donor for route in _stops(first) for donor in route) == sorted(f'd{i}' for i in range(20))
+
+
+def test_vehicle_loads_stay_within_capacity():
+    matches = [_match(f'd{i}', 40.0 + 0.01 * i, -74.0, quantity='40 kg') for i in range(5)]
+    plan = plan_routes(matches, capacity_kg=100, now=NOW)
+    assert all(vehicle['load_kg'] <= 100 for entry in plan['routes'] for vehicle in entry['vehicles'])
+
+
+def test_donations_expiring_before_pickup_are_unrouted():
+    # Created 2 hours before departure with a 2-hour expiry: already out of time
+    plan = plan_routes([_match('late', 40.01, -74.0, expiry_hours=2, created=NOW - timedelta(hours=2))], now=NOW)
+    assert plan['routes'] == []
+    assert plan['unrouted'] == [{'donor_id': 'late', 'ngo_id': 'ngo_1', 'reason': 'expires_before_pickup'}]
+    assert plan['departs_at'] == NOW.isoformat()
+
+
+@pytest.fixture
+def demo(monkeypatch):
+    import app_sheets_demo
+
+    fakes.install(app_sheets_demo, fakes.FaultProfile(), fakes.FaultProfile())
+    return app_sheets_demo
+
+
+def test_cached_routes_are_replanned_as_time_passes(demo, monkeypatch):
+    client = demo.app.test_client()
+    for path, payload in (('/api/ngos', {'ngoName': 'Route Pantry', 'foodNeeded': 'Rice',
+                                         'location': 'Route Town', 'lat': -20.0, 'lon': 30.0}),
+                          ('/api/donors', {'foodType': 'Rice', 'quantity': '3 kg', 'expiryTime': 3,
+                                           'location': 'Route Town', 'lat': -20.01, 'lon': 30.01})):
+        client.post(path, json=payload).close()
+
+    def expires_in():
+        response = client.get('/api/routes')
+        plan = response.get_json()
+        response.close()
+        return {stop['location']: stop['expires_in_min'] for entry in plan['routes']
+                for vehicle in entry['vehicles'] for stop in vehicle['stops']}['Route Town']
+
+    before = expires_in()
+    moved = retention.current_time() + timedelta(hours=1)
+    monkeypatch.setattr(retention, 'current_time', lambda: moved)
+    monkeypatch.setattr(demo, 'current_time', lambda: moved)
+    after = expires_in()
+    assert before - after == pytest.approx(60, abs=2 * retention.LIVE_VIEW_RESOLUTION_SECONDS / 60)
@@ -0,0 +1,43 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _get(url, deadline):
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                return json.loads(response.read())
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+
+def test_workers_share_the_socket_and_stop_on_sigterm():
+    port = _free_port()
+    server = subprocess.Popen([sys.executable, 'serve.py', 'app_simple', '--host', '127.0.0.1',
+                               '--port', str(port), '--workers', '2'],
+                              cwd=REPO, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    try:
+        deadline = time.monotonic() + 30
+        for _ in range(4):
+            assert _get(f'http://127.0.0.1:{port}/api/ngos', deadline)['success'] is True
+    finally:
+        server.send_signal(signal.SIGTERM)
+        output = server.communicate(timeout=30)[0].decode()
+    assert output.count('serving app_simple') == 2
+    assert 'Server stopped' in output
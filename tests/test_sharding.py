@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+import http_pool
+import parallel_match
+import sharding
+from sharding import (NodeExecutor, build_shard_tasks, geohash_bounds, geohash_encode, match_donors,
+                      match_shard)
+from spatial_index import geodesic_km, get_ngo_index
+
+
+def _brute_force(donor_coords, ngo_locations):
+    return [min(((geodesic_km(coords, ngo['coordinates']), position) for position, ngo in enumerate(ngo_locations)))
+            for coords in donor_coords]
+
+
+@pytest.fixture(scope='module')
+def points():
+    rng = random.Random(11)
+    # Two clusters three geohash cells apart, so most shards are certified but some donors sit near edges
+    ngos = [{'id': f'ngo_{i}', 'coordinates': (rng.choice([40.0, 42.0]) + rng.uniform(-1, 1), -74 + rng.uniform(-2, 2))}
+            for i in range(80)]
+    donors = [(41 + rng.uniform(-2, 2), -74 + rng.uniform(-2.5, 2.5)) for _ in range(150)]
+    return donors, ngos, _brute_force(donors, ngos)
+
+
+def test_geohash_round_trip():
+    assert geohash_encode(40.7128, -74.0060, 5) == 'dr5re'
+    south, north, west, east = geohash_bounds('dr5re')
+    assert south <= 40.7128 <= north and west <= -74.0060 <= east
+
+
+def test_certified_shard_answers_match_brute_force(points):
+    donors, ngos, expected = points
+    certified = 0
+    for task in build_shard_tasks(donors, ngos, precision=3, margin_km=50):
+        for donor_index, position, distance, is_certified in match_shard(task):
+            if is_certified:
+                certified += 1
+                assert (distance, position) == expected[donor_index]
+    assert 0 < certified < len(donors)
+
+
+@pytest.mark.parametrize('mode', ['off', 'local'])
+def test_sharded_matching_equals_the_global_result(points, monkeypatch, mode):
+    donors, ngos, expected = points
+    monkeypatch.setattr(sharding, 'SHARD_MODE', mode)
+    monkeypatch.setattr(parallel_match, 'MATCH_WORKERS', 2)
+    try:
+        results = match_donors(donors, ngos, get_ngo_index(ngos))
+    finally:
+        if parallel_match._pool is not None:
+            parallel_match._pool.shutdown()
+            parallel_match._pool = None
+    assert [(distance, position) for position, distance in results] == expected
+
+
+def test_unreachable_node_falls_back_to_local_matching(points, monkeypatch):
+    donors, ngos, _ = points
+    monkeypatch.setattr(http_pool, '_shared_adapter', None)
+    monkeypatch.setattr(http_pool, 'HTTP_RETRIES', 0)
+    tasks = build_shard_tasks(donors[:20], ngos)
+    executor = NodeExecutor(['http://127.0.0.1:1'])
+    assert list(executor.map(match_shard, tasks)) == [match_shard(task) for task in tasks]
+
+
+def test_shard_endpoint_matches_a_task(points):
+    import app_sheets_demo
+    donors, ngos, _ = points
+    task = build_shard_tasks(donors[:20], ngos)[0]
+    client = app_sheets_demo.app.test_client()
+    response = client.post('/api/shards/match', json=task)
+    assert response.get_json()['results'] == match_shard(task)
+    assert client.post('/api/shards/match', json={'donors': []}).status_code == 400
@@ -0,0 +1,81 @@
+import fakes
+from sheets_sync import SheetReplica, column_letter
+
+HEADERS = ['ID', 'Food Type', 'Note']
+
+
+def _parse(row):
+    return {'id': row['ID'], 'food': row['Food Type']} if row['ID'] else None
+
+
+def _sheet(rows=()):
+    worksheet = fakes.FakeSheetsClient().create('Test').sheet1
+    worksheet.append_rows([HEADERS] + [list(row) for row in rows])
+    return worksheet
+
+
+def _ids(records):
+    return [record['id'] for record in records]
+
+
+def test_column_letters():
+    assert [column_letter(n) for n in (1, 26, 27, 52, 703)] == ['A', 'Z', 'AA', 'AZ', 'AAA']
+
+
+def test_tail_reads_fetch_only_new_rows():
+    worksheet = _sheet([('d1', 'Rice', ''), ('', 'skipped', ''), ('d2', 'Bread', 'x')])
+    replica = SheetReplica('Test', _parse)
+    assert _ids(replica.sync(worksheet, 'v1')) == ['d1', 'd2']
+
+    assert _ids(replica.sync(worksheet, 'v1')) == ['d1', 'd2']
+    assert replica.stats()['unchanged'] == 1
+
+    worksheet.append_rows([['d3', 'Milk', ''], ['d4', 'Eggs', '']])
+    fetched = replica.stats()['rows_fetched']
+    assert _ids(replica.sync(worksheet, 'v2')) == ['d1', 'd2', 'd3', 'd4']
+    stats = replica.stats()
+    assert stats['full_reads'] == 1 and stats['tail_reads'] == 1
+    # The anchor row plus the two new ones
+    assert stats['rows_fetched'] - fetched == 3
+
+
+def test_rows_removed_above_the_anchor_force_a_full_read():
+    worksheet = _sheet([('d1', 'Rice', ''), ('d2', 'Bread', ''), ('d3', 'Milk', '')])
+    replica = SheetReplica('Test', _parse)
+    replica.sync(worksheet, 'v1')
+    worksheet.delete_rows(2)
+    worksheet.append_rows([['d4', 'Eggs', '']])
+    assert _ids(replica.sync(worksheet, 'v2')) == ['d2', 'd3', 'd4']
+    assert replica.stats()['anchor_mismatches'] == 1
+    assert replica.stats()['full_reads'] == 2
+
+
+def test_periodic_full_read_repairs_edits_a_tail_read_cannot_see():
+    worksheet = _sheet([('d1', 'Rice', ''), ('d2', 'Bread', '')])
+    replica = SheetReplica('Test', _parse, full_sync_seconds=3600)
+    replica.sync(worksheet, 'v1')
+    worksheet.update('B2', [['Brown rice']])
+    assert replica.sync(worksheet, 'v2')[0]['food'] == 'Rice'
+
+    replica._full_at -= 3600
+    assert replica.sync(worksheet, 'v3')[0]['food'] == 'Brown rice'
+    assert replica.stats()['drift_repairs'] == 1
+
+
+def test_unknown_version_always_reads_and_records_are_copies():
+    worksheet = _sheet([('d1', 'Rice', '')])
+    replica = SheetReplica('Test', _parse)
+    replica.sync(worksheet, None)
+    records = replica.sync(worksheet, None)
+    assert replica.stats()['tail_reads'] == 1
+    records[0]['coordinates'] = (40.0, -74.0)
+    assert 'coordinates' not in replica.sync(worksheet, None)[0]
+
+
+def test_invalidate_forces_a_full_read():
+    worksheet = _sheet([('d1', 'Rice', '')])
+    replica = SheetReplica('Test', _parse)
+    replica.sync(worksheet, 'v1')
+    replica.invalidate()
+    replica.sync(worksheet, 'v1')
+    assert replica.stats()['full_reads'] == 2
@@ -0,0 +1,151 @@
+import os
+import time
+
+import pytest
+
+import snapshots
+from snapshots import MatchMemo, Snapshot, SnapshotError, Snapshotter, match_inputs_digest
+
+DONORS = [{'id': 'd1', 'foodType': 'Rice'}, {'id': 'd2', 'foodType': 'Bread'}]
+DONOR_COORDS = [(40.71, -74.0), (40.75, -73.98)]
+NGOS = [{'id': 'n1', 'foodNeeded': 'Rice', 'coordinates': (40.72, -74.01)},
+        {'id': 'n2', 'foodNeeded': 'Bread', 'coordinates': (40.76, -73.97)}]
+
+
+class _Cache:
+    """A section backed by a plain dict."""
+
+    def __init__(self, items=None):
+        self.items = dict(items or {})
+
+    def dump(self):
+        return sorted(self.items.items())
+
+    def restore(self, entries):
+        self.items.update((key, value) for key, value in entries)
+        return len(entries)
+
+
+def _snapshotter(tmp_path, caches, backend='test_backend', **kwargs):
+    return Snapshotter(backend, {name: (cache.dump, cache.restore) for name, cache in caches.items()},
+                       directory=str(tmp_path), enabled=True, **kwargs)
+
+
+def test_save_and_restore_round_trip(tmp_path):
+    saved = _snapshotter(tmp_path, {'geocodes': _Cache({'Paris': [48.85, 2.35]}), 'matches': _Cache({'k': 1})})
+    assert saved.save() == os.path.getsize(saved.path)
+
+    geocodes, matches = _Cache(), _Cache()
+    restored = _snapshotter(tmp_path, {'geocodes': geocodes, 'matches': matches, 'new': _Cache()})
+    assert restored.restore() == {'geocodes': 1, 'matches': 1}
+    assert geocodes.items == {'Paris': [48.85, 2.35]}
+    assert matches.items == {'k': 1}
+    assert restored.stats()['restored'] == {'geocodes': 1, 'matches': 1}
+
+
+def test_corrupt_section_is_skipped_without_losing_the_others(tmp_path):
+    saver = _snapshotter(tmp_path, {'a': _Cache({'x': 'a' * 200}), 'b': _Cache({'y': 2})})
+    saver.save()
+    with Snapshot(saver.path) as snapshot:
+        offset, length = snapshot.sections['a'][:2]
+        position = snapshot._data_start + offset + length // 2
+    with open(saver.path, 'r+b') as f:
+        f.seek(position)
+        byte = f.read(1)
+        f.seek(position)
+        f.write(bytes([byte[0] ^ 0xFF]))
+
+    a, b = _Cache(), _Cache()
+    assert _snapshotter(tmp_path, {'a': a, 'b': b}).restore() == {'b': 1}
+    assert a.items == {} and b.items == {'y': 2}
+
+
+@pytest.mark.parametrize('damage', [
+    lambda data: b'',
+    lambda data: data[:10],
+    lambda data: b'NOTASNAP' + data[8:],
+    lambda data: data[:40] + bytes([data[40] ^ 0xFF]) + data[41:]
+])
+def test_unusable_files_are_rejected(tmp_path, damage):
+    saver = _snapshotter(tmp_path, {'a': _Cache({'x': 1})})
+    saver.save()
+    with open(saver.path, 'rb') as f:
+        data = f.read()
+    with open(saver.path, 'wb') as f:
+        f.write(damage(data))
+    cache = _Cache()
+    restorer = _snapshotter(tmp_path, {'a': cache})
+    assert restorer.restore() == {}
+    assert cache.items == {}
+    assert restorer.stats()['restore_error']
+
+
+def test_snapshots_from_another_backend_or_too_old_are_ignored(tmp_path):
+    _snapshotter(tmp_path, {'a': _Cache({'x': 1})}, backend='other').save()
+    os.replace(tmp_path / 'other.snap', tmp_path / 'mine.snap')
+    with pytest.raises(SnapshotError):
+        _snapshotter(tmp_path, {'a': _Cache()}, backend='mine').load()
+
+    _snapshotter(tmp_path, {'a': _Cache({'x': 1})}, backend='old').save()
+    time.sleep(0.05)
+    assert _snapshotter(tmp_path, {'a': _Cache()}, backend='old', max_age=0.01).restore() == {}
+    assert _snapshotter(tmp_path, {'a': _Cache()}, backend='old', max_age=0).restore() == {'a': 1}
+
+
+def test_disabled_snapshotter_does_nothing(tmp_path):
+    snapshotter = Snapshotter('off', {'a': (_Cache({'x': 1}).dump, _Cache().restore)},
+                              directory=str(tmp_path), enabled=False)
+    assert snapshotter.save() is None
+    assert snapshotter.restore() == {}
+    snapshotter.start()
+    assert not os.path.exists(snapshotter.path)
+    assert not snapshotter.stats()['running']
+
+
+def test_digest_ignores_order_but_not_inputs(monkeypatch):
+    digest = match_inputs_digest(DONORS, DONOR_COORDS, NGOS)
+    assert match_inputs_digest(DONORS[::-1], DONOR_COORDS[::-1], NGOS[::-1]) == digest
+    assert match_inputs_digest(DONORS, [DONOR_COORDS[0], (40.0, -74.0)], NGOS) != digest
+    assert match_inputs_digest([{'id': 'd1', 'foodType': 'Soup'}, DONORS[1]], DONOR_COORDS, NGOS) != digest
+
+    monkeypatch.setenv('MATCH_TEST_SETTING', '1')
+    assert match_inputs_digest(DONORS, DONOR_COORDS, NGOS) != digest
+    monkeypatch.delenv('MATCH_TEST_SETTING')
+    assert match_inputs_digest(DONORS, DONOR_COORDS, NGOS) == digest
+
+    # A replaced travel-time table changes results without touching the environment
+    monkeypatch.setattr(snapshots, 'travel_table_key', lambda: 'table-v2')
+    assert match_inputs_digest(DONORS, DONOR_COORDS, NGOS) != digest
+
+
+def _compute(calls):
+    def compute():
+        calls.append(1)
+        return [(0, 1.5), None], [12.0, None]
+    return compute
+
+
+def test_match_memo_reuses_results_by_id_whatever_the_order():
+    memo, calls = MatchMemo(), []
+    assert memo.match(DONORS, DONOR_COORDS, NGOS, _compute(calls)) == ([(0, 1.5), None], [12.0, None])
+    # Same inputs in another order: positions are remapped to this call's lists
+    nearest, minutes = memo.match(DONORS[::-1], DONOR_COORDS[::-1], NGOS[::-1], _compute(calls))
+    assert nearest == [None, (1, 1.5)]
+    assert minutes == [None, 12.0]
+    assert len(calls) == 1
+    assert memo.stats() == {'entries': 1, 'max_entries': memo.max_entries, 'hits': 1, 'misses': 1}
+
+
+def test_match_memo_evicts_oldest_and_survives_a_snapshot(tmp_path):
+    memo, calls = MatchMemo(max_entries=2), []
+    for lon in (-74.0, -74.1, -74.2):
+        memo.match(DONORS, [(40.71, lon), DONOR_COORDS[1]], NGOS, _compute(calls))
+    assert memo.stats()['entries'] == 2
+
+    _snapshotter(tmp_path, {'matches': memo}).save()
+    warm = MatchMemo(max_entries=2)
+    assert _snapshotter(tmp_path, {'matches': warm}).restore() == {'matches': 2}
+    warm.match(DONORS, [(40.71, -74.2), DONOR_COORDS[1]], NGOS, _compute(calls))
+    warm.match(DONORS, [(40.71, -74.0), DONOR_COORDS[1]], NGOS, _compute(calls))
+    assert warm.stats()['hits'] == 1
+    assert len(calls) == 4
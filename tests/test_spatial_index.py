@@ -0,0 +1,63 @@
+import os
+import random
+
+import spatial_index
+from spatial_index import NgoSpatialIndex, geodesic_km, get_ngo_index, index_file_path, index_key
+
+
+def _ngos(count, seed=0, lat=(35.0, 45.0), lon=(-80.0, -70.0)):
+    rng = random.Random(seed)
+    return [{'id': f'ngo_{i}', 'coordinates': (rng.uniform(*lat), rng.uniform(*lon))} for i in range(count)]
+
+
+def _brute_force(ngos, coords):
+    return min((geodesic_km(coords, ngo['coordinates']), position) for position, ngo in enumerate(ngos))
+
+
+def test_nearest_matches_brute_force():
+    ngos = _ngos(300)
+    index = NgoSpatialIndex.build(ngos)
+    rng = random.Random(1)
+    for _ in range(40):
+        coords = (rng.uniform(30.0, 50.0), rng.uniform(-85.0, -65.0))
+        distance, position = _brute_force(ngos, coords)
+        assert index.nearest(coords, geodesic_km) == (position, distance)
+
+
+def test_nearest_across_the_antimeridian():
+    ngos = _ngos(100, lat=(-20.0, 20.0), lon=(-179.9, -170.0)) + _ngos(100, seed=2, lat=(-20.0, 20.0), lon=(170.0, 179.9))
+    index = NgoSpatialIndex.build(ngos)
+    for coords in [(0.0, 179.95), (5.0, -179.95), (-10.0, 180.0)]:
+        distance, position = _brute_force(ngos, coords)
+        assert index.nearest(coords, geodesic_km) == (position, distance)
+
+
+def test_ties_resolve_to_the_first_position():
+    ngos = [{'id': f'ngo_{i}', 'coordinates': (40.0, -74.0)} for i in range(50)]
+    assert NgoSpatialIndex.build(ngos).nearest((40.1, -74.0), geodesic_km)[0] == 0
+
+
+def test_saved_index_maps_back_identically(tmp_path):
+    ngos = _ngos(100)
+    built = NgoSpatialIndex.build(ngos)
+    path = str(tmp_path / 'index.bin')
+    built.save(path)
+    loaded = NgoSpatialIndex.load(path)
+    assert loaded.key == built.key == index_key(ngos)
+    assert loaded.nearest((40.0, -75.0), geodesic_km) == built.nearest((40.0, -75.0), geodesic_km)
+    assert NgoSpatialIndex.load(str(tmp_path / 'missing.bin')) is None
+
+
+def test_index_files_are_named_by_content(tmp_path, monkeypatch):
+    base = str(tmp_path / 'ngo_index.bin')
+    first, second = _ngos(50), _ngos(50, seed=3)
+    index = get_ngo_index(first, base)
+    assert index.path == index_file_path(base, index_key(first))
+    assert get_ngo_index(first, base) is index
+
+    # Another NGO set gets its own file; the old one is pruned once past retention
+    monkeypatch.setattr(spatial_index, 'NGO_INDEX_RETENTION_SECONDS', 0)
+    os.utime(index.path, (0, 0))
+    other = get_ngo_index(second, base)
+    assert other.path != index.path
+    assert os.listdir(tmp_path) == [os.path.basename(other.path)]
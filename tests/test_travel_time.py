@@ -0,0 +1,62 @@
+import os
+
+import pytest
+
+import snapshots
+import travel_time
+from travel_time import TravelTimeTable
+
+DONOR = (40.025, -74.025)
+NEAR_NGO = {'id': 'near', 'coordinates': (40.075, -74.025)}
+FAR_NGO = {'id': 'far', 'coordinates': (40.025, -74.125)}
+
+
+def _table(near_minutes, far_minutes):
+    return TravelTimeTable.build([
+        (DONOR[0], DONOR[1], NEAR_NGO['coordinates'][0], NEAR_NGO['coordinates'][1], near_minutes),
+        (DONOR[0], DONOR[1], FAR_NGO['coordinates'][0], FAR_NGO['coordinates'][1], far_minutes),
+    ])
+
+
+@pytest.fixture
+def table_path(tmp_path, monkeypatch):
+    path = str(tmp_path / 'travel_times.bin')
+    monkeypatch.setattr(travel_time, 'TRAVEL_TIME_TABLE_PATH', path)
+    monkeypatch.setattr(travel_time, 'MATCH_COST_MODE', 'travel_time')
+    return path
+
+
+def test_nearest_by_time_prefers_the_faster_ngo():
+    # The geodesically closer NGO is across a river: 50 minutes versus 10
+    table = _table(near_minutes=50, far_minutes=10)
+    [(position, minutes)] = table.nearest_by_time([DONOR], [NEAR_NGO, FAR_NGO])
+    assert position == 1
+    assert minutes >= 10
+
+
+def test_saved_table_maps_back_with_the_same_key(tmp_path):
+    table = _table(5, 7)
+    table.save(str(tmp_path / 't.bin'))
+    loaded = TravelTimeTable.load(str(tmp_path / 't.bin'))
+    assert loaded.key == table.key
+    assert loaded.matrix([DONOR], [NEAR_NGO['coordinates']]) == table.matrix([DONOR], [NEAR_NGO['coordinates']])
+
+
+def test_match_digest_changes_when_the_table_is_replaced(table_path):
+    donors = [{'id': 'd1', 'foodType': 'Rice'}]
+    ngos = [NEAR_NGO, FAR_NGO]
+    _table(50, 10).save(table_path)
+    before = snapshots.match_inputs_digest(donors, [DONOR], ngos)
+    assert snapshots.match_inputs_digest(donors, [DONOR], ngos) == before
+
+    _table(10, 50).save(table_path)
+    # Same size, so force a visible mtime change even on coarse filesystems
+    stat = os.stat(table_path)
+    os.utime(table_path, (stat.st_atime, stat.st_mtime + 5))
+    assert snapshots.match_inputs_digest(donors, [DONOR], ngos) != before
+
+
+def test_distance_mode_ignores_the_table(table_path, monkeypatch):
+    _table(50, 10).save(table_path)
+    monkeypatch.setattr(travel_time, 'MATCH_COST_MODE', 'distance')
+    assert travel_time.travel_table_key() is None
@@ -0,0 +1,326 @@
+"""
+Travel-time cost mode for donor-NGO matching.
+
+Straight-line distance can pick an NGO across a river with no nearby
+bridge. With MATCH_COST_MODE=travel_time, matches minimize travel minutes
+from a precomputed grid-to-grid table instead. The table is a local file
+(no live routing service): a dense float32 matrix over the grid cells that
+appear in the source trips, memory-mapped for reads. Points are snapped to
+table cells through a cache, and a batch of donors is costed against all
+NGOs with one row lookup per distinct donor cell.
+
+Build a table from routing output (CSV with origin_lat, origin_lon,
+dest_lat, dest_lon, minutes):
+    python travel_time.py trips.csv --grid-degrees 0.05
+"""
+
+import argparse
+import array
+import bisect
+import csv
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from spatial_index import geodesic_km
+
+TRAVEL_TIME_TABLE_PATH = os.getenv(
+    'TRAVEL_TIME_TABLE_PATH',
+    os.path.join(os.getenv('BACKEND_DATA_DIR', 'data'), 'travel_times.bin')
+)
+
+# 'distance' (geodesic) or 'travel_time'
+MATCH_COST_MODE = os.getenv('MATCH_COST_MODE', 'distance')
+
+DEFAULT_GRID_DEGREES = 0.05
+
+# How far (in cells) snapping looks for a table cell around an uncovered point
+SNAP_MAX_RINGS = int(os.getenv('TRAVEL_SNAP_MAX_RINGS', '2'))
+
+# Speed for the leg between a point and its snapped cell's center
+ACCESS_SPEED_KMH = float(os.getenv('TRAVEL_ACCESS_SPEED_KMH', '20'))
+
+# Snapped points kept in memory (coordinates rounded to ~1 m)
+SNAP_CACHE_SIZE = 65536
+
+_MAGIC = b'TTGRID01'
+_HEADER = struct.Struct('<8sdq')  # magic, grid_degrees, n_cells
+
+Coordinates = Tuple[float, float]
+
+
+def _cell_key(lat: float, lon: float, grid_degrees: float) -> int:
+    n_lon = int(math.ceil(360.0 / grid_degrees))
+    row = int(math.floor((lat + 90.0) / grid_degrees))
+    col = int(math.floor((((lon + 180.0) % 360.0)) / grid_degrees)) % n_lon
+    return row * n_lon + col
+
+
+class TravelTimeTable:
+    """Read-only grid-to-grid travel-time matrix (minutes; NaN = no route)."""
+
+    def __init__(self, grid_degrees: float, cell_keys: Sequence[int], minutes: Sequence[float],
+                 buffer=None, path: Optional[str] = None):
+        self.grid_degrees = grid_degrees
+        self.n_lon = int(math.ceil(360.0 / grid_degrees))
+        self._cell_keys = cell_keys
+        self._minutes = minutes
+        self._buffer = buffer
+        self.path = path
+        self.mtime = os.path.getmtime(path) if path else None
+        self.snap = lru_cache(maxsize=SNAP_CACHE_SIZE)(self._snap)
+        self._key: Optional[str] = None
+
+    @property
+    def key(self) -> str:
+        """Content hash of the grid and its travel times (computed once per table)."""
+        if self._key is None:
+            digest = hashlib.sha1(struct.pack('<d', self.grid_degrees))
+            digest.update(memoryview(array.array('q', self._cell_keys)).cast('B'))
+            digest.update(memoryview(array.array('f', self._minutes)).cast('B'))
+            self._key = digest.hexdigest()
+        return self._key
+
+    def __len__(self) -> int:
+        return len(self._cell_keys)
+
+    @classmethod
+    def build(cls, trips: List[Tuple[float, float, float, float, float]],
+              grid_degrees: float = DEFAULT_GRID_DEGREES) -> 'TravelTimeTable':
+        """Build from (origin_lat, origin_lon, dest_lat, dest_lon, minutes); keeps the fastest per cell pair."""
+        keys = sorted({_cell_key(t[0], t[1], grid_degrees) for t in trips} |
+                      {_cell_key(t[2], t[3], grid_degrees) for t in trips})
+        position = {key: i for i, key in enumerate(keys)}
+        n = len(keys)
+        minutes = array.array('f', [math.nan]) * (n * n)
+        for i in range(n):
+            minutes[i * n + i] = 0.0
+        for o_lat, o_lon, d_lat, d_lon, value in trips:
+            cell = position[_cell_key(o_lat, o_lon, grid_degrees)] * n + position[_cell_key(d_lat, d_lon, grid_degrees)]
+            if math.isnan(minutes[cell]) or value < minutes[cell]:
+                minutes[cell] = value
+        return cls(grid_degrees, keys, minutes)
+
+    def save(self, path: str) -> None:
+        """Write the table atomically (temp file + rename)."""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(_MAGIC, self.grid_degrees, len(self._cell_keys)))
+            f.write(struct.pack(f'<{len(self._cell_keys)}q', *self._cell_keys))
+            f.write(array.array('f', self._minutes).tobytes())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['TravelTimeTable']:
+        """Memory-map a table file; returns None if missing or unreadable."""
+        try:
+            with open(path, 'rb') as f:
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        if len(buffer) < _HEADER.size:
+            return None
+        magic, grid_degrees, n_cells = _HEADER.unpack_from(buffer, 0)
+        if magic != _MAGIC or len(buffer) != _HEADER.size + 8 * n_cells + 4 * n_cells * n_cells:
+            return None
+        view = memoryview(buffer)
+        keys_end = _HEADER.size + 8 * n_cells
+        cell_keys = view[_HEADER.size:keys_end].cast('q')
+        minutes = view[keys_end:].cast('f')
+        return cls(grid_degrees, cell_keys, minutes, buffer=buffer, path=path)
+
+    def _cell_center(self, key: int) -> Coordinates:
+        row, col = divmod(key, self.n_lon)
+        return ((row + 0.5) * self.grid_degrees - 90.0, (col + 0.5) * self.grid_degrees - 180.0)
+
+    def _position(self, key: int) -> Optional[int]:
+        i = bisect.bisect_left(self._cell_keys, key)
+        if i < len(self._cell_keys) and self._cell_keys[i] == key:
+            return i
+        return None
+
+    def _snap(self, lat: float, lon: float) -> Optional[Tuple[int, float]]:
+        key = _cell_key(lat, lon, self.grid_degrees)
+        row, col = divmod(key, self.n_lon)
+        best = None
+        for rings in range(SNAP_MAX_RINGS + 1):
+            for r in range(row - rings, row + rings + 1):
+                for c in range(col - rings, col + rings + 1):
+                    if max(abs(r - row), abs(c - col)) != rings:
+                        continue
+                    position = self._position(r * self.n_lon + c % self.n_lon)
+                    if position is None:
+                        continue
+                    access_km = geodesic_km((lat, lon), self._cell_center(self._cell_keys[position]))
+                    if best is None or access_km < best[1]:
+                        best = (position, access_km)
+            if best is not None:
+                break
+        return best
+
+    def snap_point(self, coords: Coordinates) -> Optional[Tuple[int, float]]:
+        """(table position, access km) of the covering cell, or None if the table doesn't cover the point."""
+        return self.snap(round(coords[0], 5), round(coords[1], 5))
+
+    def _access_minutes(self, access_km: float) -> float:
+        return access_km / ACCESS_SPEED_KMH * 60.0
+
+    def matrix(self, origins: Sequence[Coordinates],
+               destinations: Sequence[Coordinates]) -> List[List[Optional[float]]]:
+        """Many-to-many travel minutes; None where a point is uncovered or there is no route."""
+        dest_snaps = [self.snap_point(d) for d in destinations]
+        n = len(self._cell_keys)
+        rows = []
+        for origin in origins:
+            snapped = self.snap_point(origin)
+            if snapped is None:
+                rows.append([None] * len(destinations))
+                continue
+            base = snapped[0] * n
+            access = self._access_minutes(snapped[1])
+            row = []
+            for dest in dest_snaps:
+                value = None
+                if dest is not None:
+                    minutes = self._minutes[base + dest[0]]
+                    if not math.isnan(minutes):
+                        value = minutes + access + self._access_minutes(dest[1])
+                row.append(value)
+            rows.append(row)
+        return rows
+
+    def nearest_by_time(self, donor_coords: Sequence[Coordinates],
+                        ngo_locations: List[Dict]) -> List[Optional[Tuple[int, float]]]:
+        """
+        Fastest NGO per donor.
+
+        Returns:
+            List[Optional[Tuple[int, float]]]: (ngo position, minutes) per donor;
+            None if the donor is uncovered or no NGO is reachable. Ties go to
+            the lowest position.
+        """
+        # NGOs grouped by snapped cell; each group is costed once per donor cell
+        groups: Dict[int, List[Tuple[float, int]]] = {}
+        for position, ngo in enumerate(ngo_locations):
+            snapped = self.snap_point(ngo['coordinates'])
+            if snapped is not None:
+                groups.setdefault(snapped[0], []).append((self._access_minutes(snapped[1]), position))
+        n = len(self._cell_keys)
+        group_cells = sorted(groups)
+
+        # The donor's own access leg is the same for every NGO, so the best NGO depends only on its cell
+        best_by_cell: Dict[int, Optional[Tuple[float, int]]] = {}
+        results: List[Optional[Tuple[int, float]]] = []
+        for coords in donor_coords:
+            snapped = self.snap_point(coords)
+            if snapped is None:
+                results.append(None)
+                continue
+            if snapped[0] not in best_by_cell:
+                base = snapped[0] * n
+                best = None
+                for cell in group_cells:
+                    minutes = self._minutes[base + cell]
+                    if math.isnan(minutes):
+                        continue
+                    for ngo_access, position in groups[cell]:
+                        candidate = (minutes + ngo_access, position)
+                        if best is None or candidate < best:
+                            best = candidate
+                best_by_cell[snapped[0]] = best
+            best = best_by_cell[snapped[0]]
+            results.append((best[1], best[0] + self._access_minutes(snapped[1])) if best is not None else None)
+        return results
+
+
+_table: Optional[TravelTimeTable] = None
+_table_lock = threading.Lock()
+
+
+def get_travel_table(path: str = TRAVEL_TIME_TABLE_PATH) -> Optional[TravelTimeTable]:
+    """The mapped table, reloaded when the file is replaced; None if there is no table."""
+    global _table
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _table_lock:
+        if _table is None or _table.path != path or _table.mtime != mtime:
+            _table = TravelTimeTable.load(path)
+        return _table
+
+
+def travel_table_key() -> Optional[str]:
+    """Content key of the table matching would use now; None when matching by distance or without a table."""
+    table = get_travel_table(TRAVEL_TIME_TABLE_PATH) if MATCH_COST_MODE == 'travel_time' else None
+    return table.key if table is not None else None
+
+
+def match_donors_by_cost(donor_coords: Sequence[Coordinates], ngo_locations: List[Dict],
+                         geodesic_match: Callable[[Sequence[Coordinates]], List[Optional[Tuple[int, float]]]]
+                         ) -> Tuple[List[Optional[Tuple[int, float]]], List[Optional[float]]]:
+    """
+    Match donors under MATCH_COST_MODE.
+
+    Args:
+        donor_coords (Sequence[Coordinates]): Geocoded donor coordinates
+        ngo_locations (List[Dict]): Geocoded NGOs
+        geodesic_match (Callable): Nearest-by-distance matcher for a list of coordinates
+
+    Returns:
+        Tuple: ((ngo position, distance_km) per donor, travel minutes per donor or None).
+        Donors the table can't route fall back to the geodesic match.
+    """
+    table = get_travel_table(TRAVEL_TIME_TABLE_PATH) if MATCH_COST_MODE == 'travel_time' else None
+    if table is None or not ngo_locations:
+        return geodesic_match(donor_coords), [None] * len(donor_coords)
+
+    by_time = table.nearest_by_time(donor_coords, ngo_locations)
+    nearest: List[Optional[Tuple[int, float]]] = [None] * len(donor_coords)
+    minutes: List[Optional[float]] = [None] * len(donor_coords)
+    unrouted = []
+    for i, result in enumerate(by_time):
+        if result is None:
+            unrouted.append(i)
+            continue
+        position, travel_minutes = result
+        nearest[i] = (position, geodesic_km(donor_coords[i], ngo_locations[position]['coordinates']))
+        minutes[i] = travel_minutes
+    if unrouted:
+        for i, result in zip(unrouted, geodesic_match([donor_coords[i] for i in unrouted])):
+            nearest[i] = result
+    return nearest, minutes
+
+
+def travel_stats() -> Dict:
+    table = _table
+    stats = {'cost_mode': MATCH_COST_MODE, 'table_cells': len(table) if table else 0}
+    if table is not None:
+        info = table.snap.cache_info()
+        stats.update(snap_cache_hits=info.hits, snap_cache_misses=info.misses, snap_cache_size=info.currsize)
+    return stats
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description='Build a grid-to-grid travel-time table from routed trips.')
+    parser.add_argument('trips', help='CSV with origin_lat, origin_lon, dest_lat, dest_lon, minutes')
+    parser.add_argument('--grid-degrees', type=float, default=DEFAULT_GRID_DEGREES)
+    parser.add_argument('--out', default=TRAVEL_TIME_TABLE_PATH)
+    args = parser.parse_args(argv)
+
+    with open(args.trips, newline='') as f:
+        trips = [(float(row['origin_lat']), float(row['origin_lon']), float(row['dest_lat']),
+                  float(row['dest_lon']), float(row['minutes'])) for row in csv.DictReader(f)]
+    table = TravelTimeTable.build(trips, args.grid_degrees)
+    table.save(args.out)
+    print(f"✅ Wrote {len(table)} cells ({len(trips)} trips) to {args.out}")
+
+
+if __name__ == '__main__':
+    main()